@@ -226,9 +226,11 @@ def _check_own_shard_range(broker, args):
 
 def _find_ranges(broker, args, status_file=None):
     start = last_report = time.time()
-    limit = 5 if status_file else -1
+    sample_count = getattr(args, 'sample_count', None)
+    # a sampled scan is cheap, so there is no need to report progress
+    limit = 5 if status_file and not sample_count else -1
     shard_data, last_found = broker.find_shard_ranges(
-        args.rows_per_shard, limit=limit)
+        args.rows_per_shard, limit=limit, sample_count=sample_count)
     if shard_data:
         while not last_found:
             if last_report + 10 < time.time():
@@ -444,6 +446,11 @@ def _make_parser():
     find_parser = subparsers.add_parser(
         'find', help='Find and display shard ranges')
     _add_find_args(find_parser)
+    find_parser.add_argument(
+        '--sample-count', type=int, default=None,
+        help='Estimate shard ranges from this many rows sampled from across '
+             'the db rather than scanning every row. Shard ranges are found '
+             'much faster, but their object counts are only approximate.')
     find_parser.set_defaults(func=find_ranges)
 
     # delete
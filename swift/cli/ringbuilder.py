@@ -16,6 +16,7 @@
 from __future__ import print_function
 import logging
 
+from array import array
 from collections import defaultdict
 from errno import EEXIST
 from itertools import islice
@@ -34,7 +35,7 @@ from six.moves import input
 
 from swift.common import exceptions
 from swift.common.ring import RingBuilder, Ring, RingData
-from swift.common.ring.builder import MAX_BALANCE
+from swift.common.ring.builder import MAX_BALANCE, NUMPY_INSTALLED
 from swift.common.ring.composite_builder import CompositeRingBuilder
 from swift.common.ring.utils import validate_args, \
     validate_and_normalize_ip, build_dev_from_opts, \
@@ -66,6 +67,20 @@ def format_device(dev):
             '"%(meta)s"' % copy_dev)
 
 
+def _ring_format_version(path):
+    """
+    :returns: the format a ring should be written to ``path`` in: that of the
+              ring already there if it's one that can be mapped into memory,
+              otherwise the format every Swift since 1.6.0 can read
+    """
+    try:
+        if RingData.file_format_version(path) == 2:
+            return 2
+    except (IOError, OSError, EOFError):
+        pass
+    return 1
+
+
 def _parse_search_values(argvish):
 
     new_cmd_format, opts, args = validate_args(argvish)
@@ -876,6 +891,9 @@ swift-ring-builder <builder_file> rebalance [options]
         parser.add_option('-s', '--seed', help="seed to use for rebalance")
         parser.add_option('-d', '--debug', action='store_true',
                           help="print debug information")
+        parser.add_option('-i', '--incremental', action='store_true',
+                          help="only look at the partitions that could need "
+                          "to move; requires numpy")
         options, args = parser.parse_args(argv)
 
         def get_seed(index):
@@ -900,12 +918,17 @@ swift-ring-builder <builder_file> rebalance [options]
             print('You need to finish the increase first before rebalancing.')
             exit(EXIT_WARNING)
 
+        if options.incremental and not NUMPY_INSTALLED:
+            print('An incremental rebalance requires numpy to be installed.')
+            exit(EXIT_ERROR)
+
         devs_changed = builder.devs_changed
         min_part_seconds_left = builder.min_part_seconds_left
         try:
             last_balance = builder.get_balance()
             last_dispersion = builder.dispersion
-            parts, balance, removed_devs = builder.rebalance(seed=get_seed(3))
+            parts, balance, removed_devs = builder.rebalance(
+                seed=get_seed(3), incremental=options.incremental)
             dispersion = builder.dispersion
         except exceptions.RingBuilderError as e:
             print('-' * 79)
@@ -990,10 +1013,12 @@ swift-ring-builder <builder_file> rebalance [options]
             print('-' * 79)
             status = EXIT_WARNING
         ts = time()
+        format_version = _ring_format_version(ring_file)
         builder.get_ring().save(
-            pathjoin(backup_dir, '%d.' % ts + basename(ring_file)))
+            pathjoin(backup_dir, '%d.' % ts + basename(ring_file)),
+            format_version=format_version)
         builder.save(pathjoin(backup_dir, '%d.' % ts + basename(builder_file)))
-        builder.get_ring().save(ring_file)
+        builder.get_ring().save(ring_file, format_version=format_version)
         builder.save(builder_file)
         exit(status)
 
@@ -1112,12 +1137,28 @@ swift-ring-builder <builder_file> validate
     @staticmethod
     def write_ring():
         """
-swift-ring-builder <builder_file> write_ring
+swift-ring-builder <builder_file> write_ring [--format-version <version>]
     Just rewrites the distributable ring file. This is done automatically after
     a successful rebalance, so really this is only useful after one or more
     'set_info' calls when no rebalance is needed but you want to send out the
     new device information.
+
+    The ring file is written in the format of the one it replaces, unless
+    --format-version is given: 1 for a gzipped ring that any Swift since
+    1.6.0 can read, or 2 for an uncompressed ring that servers map into
+    memory and can reload quickly. Rebalances then keep that format.
         """
+        usage = Commands.write_ring.__doc__.strip()
+        parser = optparse.OptionParser(usage)
+        parser.add_option('--format-version', type='choice',
+                          choices=['1', '2'],
+                          help='format to write the ring file in')
+        options, args = parser.parse_args(argv)
+        if options.format_version:
+            format_version = int(options.format_version)
+        else:
+            format_version = _ring_format_version(ring_file)
+
         if not builder.devs:
             print('Unable to write empty ring.')
             exit(EXIT_ERROR)
@@ -1129,8 +1170,9 @@ swift-ring-builder <builder_file> write_ring
                       'assignments but with devices; did you forget to run '
                       '"rebalance"?')
         ring_data.save(
-            pathjoin(backup_dir, '%d.' % time() + basename(ring_file)))
-        ring_data.save(ring_file)
+            pathjoin(backup_dir, '%d.' % time() + basename(ring_file)),
+            format_version=format_version)
+        ring_data.save(ring_file, format_version=format_version)
         exit(EXIT_SUCCESS)
 
     @staticmethod
@@ -1168,7 +1210,8 @@ swift-ring-builder <ring_file> write_builder [min_part_hours]
             'devs': ring.devs,
             'devs_changed': False,
             'version': 0,
-            '_replica2part2dev': ring._replica2part2dev_id,
+            '_replica2part2dev': [array('H', part2dev_id) for part2dev_id
+                                  in ring._replica2part2dev_id],
             '_last_part_moves_epoch': None,
             '_last_part_moves': None,
             '_last_part_gather_start': 0,
@@ -27,6 +27,8 @@ BufferedHTTPResponse.
 """
 
 from swift.common import constraints
+from collections import defaultdict
+import errno
 import logging
 import time
 import socket
@@ -177,6 +179,10 @@ class BufferedHTTPConnection(HTTPConnection):
         self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         return ret
 
+    pool = None
+    _pool_key = None
+    _replay = None
+
     def putrequest(self, method, url, skip_host=0, skip_accept_encoding=0):
         '''Send a request to the server.
 
@@ -199,8 +205,24 @@ class BufferedHTTPConnection(HTTPConnection):
         response.expect_response()
         return response
 
+    def send(self, data):
+        # once any request body has gone out, the request can't be replayed
+        self._replay = None
+        return HTTPConnection.send(self, data)
+
     def getresponse(self):
-        response = HTTPConnection.getresponse(self)
+        replay, self._replay = self._replay, None
+        try:
+            response = HTTPConnection.getresponse(self)
+        except (httplib.BadStatusLine, socket.error):
+            if replay is None:
+                raise
+            # The server closed this pooled connection just as we reused it;
+            # the request never got to it, so make it again on a new one.
+            self.close()
+            self.connect()
+            replay()
+            response = HTTPConnection.getresponse(self)
         logging.debug("HTTP PERF: %(time).5f seconds to %(method)s "
                       "%(host)s:%(port)s %(path)s)",
                       {'time': time.time() - self._connected_time,
@@ -209,8 +231,94 @@ class BufferedHTTPConnection(HTTPConnection):
         return response
 
 
+class ConnectionPool(object):
+    """
+    A pool of idle keep-alive BufferedHTTPConnections to backend servers,
+    keyed by (ip, port).
+
+    Connections are only returned to the pool once their response has been
+    read in full, and are checked for having been closed by the server
+    before they are handed out again. Each process should have its own pool.
+
+    :param max_idle: maximum number of idle connections kept per
+                     (ip, port); 0 disables pooling
+    :param max_idle_time: seconds an idle connection may sit in the pool
+    :param max_age: seconds after which a connection is closed rather than
+                    reused, however busy it is
+    :param logger: optional logger used to emit ``backend_pool.reused`` and
+                   ``backend_pool.new`` StatsD metrics
+    """
+
+    def __init__(self, max_idle=0, max_idle_time=10, max_age=300,
+                 logger=None):
+        self.max_idle = max_idle
+        self.max_idle_time = max_idle_time
+        self.max_age = max_age
+        self.logger = logger
+        # (ip, port) -> [(conn, released), ...], most recently used last
+        self._idle = defaultdict(list)
+
+    def _increment(self, metric):
+        if self.logger:
+            self.logger.increment('backend_pool.' + metric)
+
+    def _is_usable(self, conn, released, now):
+        if now - released >= self.max_idle_time or \
+                now - conn._connected_time >= self.max_age:
+            return False
+        try:
+            # an idle connection has nothing to read; if it does, or the
+            # server has hung up, it's no good to us
+            conn.sock.fd.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+        except socket.error as err:
+            return err.errno in (errno.EAGAIN, errno.EWOULDBLOCK)
+        return False
+
+    def get(self, ipaddr, port):
+        """
+        Take an idle connection to ``ipaddr:port`` out of the pool.
+
+        :returns: a BufferedHTTPConnection, or None if there is none usable
+        """
+        key = (ipaddr, port)
+        idle = self._idle.get(key)
+        now = time.time()
+        while idle:
+            conn, released = idle.pop()
+            if self._is_usable(conn, released, now):
+                self._increment('reused')
+                return conn
+            conn.close()
+        self._increment('new')
+        return None
+
+    def release(self, conn, resp):
+        """
+        Return ``conn`` to the pool if its response ``resp`` has been read in
+        full and the server will keep the connection open.
+
+        :returns: True if the connection was pooled; if False, the caller
+                  remains responsible for closing it
+        """
+        if conn.pool is not self or conn.sock is None or resp.will_close:
+            return False
+        if not resp.isclosed() and resp.length == 0:
+            # HEAD, 204 and 304 responses have no body to wait for
+            resp.read()
+        if not resp.isclosed() or resp._readline_buffer:
+            return False
+        idle = self._idle[conn._pool_key]
+        if len(idle) >= self.max_idle or \
+                time.time() - conn._connected_time >= self.max_age:
+            return False
+        # make sure nothing holding on to the response can kill the socket
+        resp.close()
+        idle.append((conn, time.time()))
+        return True
+
+
 def http_connect(ipaddr, port, device, partition, method, path,
-                 headers=None, query_string=None, ssl=False):
+                 headers=None, query_string=None, ssl=False, pool=None):
     """
     Helper function to create an HTTPConnection object. If ssl is set True,
     HTTPSConnection will be used. However, if ssl=False, BufferedHTTPConnection
@@ -225,6 +333,7 @@ def http_connect(ipaddr, port, device, partition, method, path,
     :param headers: dictionary of headers
     :param query_string: request query string
     :param ssl: set True if SSL should be used (default: False)
+    :param pool: optional ConnectionPool to take an idle connection from
     :returns: HTTPConnection object
     """
     if isinstance(path, six.text_type):
@@ -236,12 +345,21 @@ def http_connect(ipaddr, port, device, partition, method, path,
     elif isinstance(partition, six.integer_types):
         partition = str(partition).encode('ascii')
     path = quote(b'/' + device + b'/' + partition + path)
+    kwargs = {'pool': pool} if pool is not None else {}
     return http_connect_raw(
-        ipaddr, port, method, path, headers, query_string, ssl)
+        ipaddr, port, method, path, headers, query_string, ssl, **kwargs)
+
+
+def _send_request(conn, method, path, headers):
+    conn.putrequest(method, path, skip_host=(headers and 'Host' in headers))
+    if headers:
+        for header, value in headers.items():
+            conn.putheader(header, str(value))
+    conn.endheaders()
 
 
 def http_connect_raw(ipaddr, port, method, path, headers=None,
-                     query_string=None, ssl=False):
+                     query_string=None, ssl=False, pool=None):
     """
     Helper function to create an HTTPConnection object. If ssl is set True,
     HTTPSConnection will be used. However, if ssl=False, BufferedHTTPConnection
@@ -254,20 +372,29 @@ def http_connect_raw(ipaddr, port, method, path, headers=None,
     :param headers: dictionary of headers
     :param query_string: request query string
     :param ssl: set True if SSL should be used (default: False)
+    :param pool: optional ConnectionPool to take an idle connection from;
+                 ignored if ssl is True or the pool is disabled
     :returns: HTTPConnection object
     """
     if not port:
         port = 443 if ssl else 80
+    if pool is not None and (ssl or pool.max_idle <= 0):
+        pool = None
+    conn = None
+    if pool is not None:
+        conn = pool.get(ipaddr, port)
+    reused = conn is not None
     if ssl:
         conn = HTTPSConnection('%s:%s' % (ipaddr, port))
-    else:
+    elif not reused:
         conn = BufferedHTTPConnection('%s:%s' % (ipaddr, port))
+        if pool is not None:
+            conn.pool = pool
+            conn._pool_key = (ipaddr, port)
     if query_string:
         path += '?' + query_string
     conn.path = path
-    conn.putrequest(method, path, skip_host=(headers and 'Host' in headers))
-    if headers:
-        for header, value in headers.items():
-            conn.putheader(header, str(value))
-    conn.endheaders()
+    _send_request(conn, method, path, headers)
+    if reused:
+        conn._replay = lambda: _send_request(conn, method, path, headers)
     return conn
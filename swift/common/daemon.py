@@ -24,6 +24,7 @@ import eventlet.debug
 from eventlet.hubs import use_hub
 
 from swift.common import utils
+from swift.common.hub_monitor import HubMonitor
 
 
 class Daemon(object):
@@ -59,6 +60,8 @@ class Daemon(object):
         raise NotImplementedError('run_forever not implemented')
 
     def run(self, once=False, **kwargs):
+        HubMonitor(self.conf, self.logger,
+                   self.conf.get('log_name', 'swift')).start()
         if once:
             self.run_once(**kwargs)
         else:
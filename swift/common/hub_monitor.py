@@ -0,0 +1,208 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Monitoring of how long greenthreads wait to be scheduled by the eventlet hub.
+
+Eventlet only switches greenthreads when the one running blocks on I/O or
+sleeps, so CPU-bound work (erasure coding, checksums, JSON encoding of large
+listings and the like) holds up every other request in the process for as long
+as it runs. A :class:`HubMonitor` measures that as the lag between when a
+greenthread asked to be woken and when it actually ran, and, when the lag goes
+over a threshold, finds out what was running instead.
+
+It is enabled by setting ``hub_monitor_interval`` in the config of a WSGI
+server or daemon. Every ``hub_monitor_interval`` seconds it emits:
+
+* ``hub.lag``: a timing of how late its own greenthread was woken;
+* ``hub.lag_exceeded``: a count of times that was ``hub_lag_threshold``
+  seconds or more;
+* ``hub.greenthreads``: a timing whose value is the number of greenthreads
+  running in the WSGI server's pool.
+
+Every 30 seconds each process also writes to ``hub.recon`` in
+``recon_cache_path`` its largest lag since, the pool occupancy, and the call
+sites that most blocked the hub: whenever the lag goes over the threshold a
+watchdog thread takes the stack of whatever greenthread was running. These are
+served by the recon middleware at ``/recon/hub``.
+"""
+
+import errno
+import os
+import sys
+import time
+
+from eventlet import patcher, sleep, spawn_n
+import six
+
+from swift.common.utils import dump_recon_cache, load_recon_cache
+
+
+if six.PY3:
+    thread = patcher.original('_thread')  # non-monkeypatched module needed
+else:
+    thread = patcher.original('thread')  # non-monkeypatched module needed
+original_time = patcher.original('time')
+
+REPORT_INTERVAL = 30
+# innermost frames kept of each blocking call site
+MAX_STACK_DEPTH = 10
+# call sites reported to recon, and kept
+TOP_CALL_SITES = 5
+MAX_CALL_SITES = 1000
+
+
+def _stack_labels(frame):
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        labels.append('%s:%d(%s)' % (code.co_filename, frame.f_lineno,
+                                     code.co_name))
+        frame = frame.f_back
+    return tuple(labels)
+
+
+class HubMonitor(object):
+    """
+    Measures eventlet hub lag in the calling process.
+
+    :param conf: the server's or daemon's config
+    :param logger: the logger to emit metrics and log errors to
+    :param name: the server's or daemon's name, used as its recon key
+    :param pool: optional GreenPool whose occupancy should be reported
+    """
+
+    def __init__(self, conf, logger, name, pool=None):
+        self.logger = logger
+        self.name = name
+        self.pool = pool
+        self.interval = float(conf.get('hub_monitor_interval', 0))
+        self.lag_threshold = float(conf.get('hub_lag_threshold', 0.1))
+        self.recon_cache = os.path.join(
+            conf.get('recon_cache_path', '/var/cache/swift'), 'hub.recon')
+        self.running = False
+        # reset each report
+        self.max_lag = 0.0
+        self.lag_exceeded = 0
+        # stack -> [times seen blocking the hub, total lag]
+        self.call_sites = {}
+        # the monitor greenthread's current check, and the stack the watchdog
+        # found running when that check was overdue
+        self._check = 0
+        self._due = None
+        self._blocking_stack = None
+        self._main_thread = None
+
+    def start(self):
+        """
+        Starts monitoring, if enabled.
+
+        :returns: True if monitoring was started
+        """
+        if self.interval <= 0 or self.running:
+            return False
+        self.running = True
+        self._main_thread = thread.get_ident()
+        spawn_n(self._monitor)
+        thread.start_new_thread(self._watchdog, ())
+        return True
+
+    def stop(self):
+        self.running = False
+
+    def _monitor(self):
+        last_report = time.time()
+        while self.running:
+            self._check += 1
+            self._blocking_stack = None
+            self._due = time.time() + self.interval
+            sleep(self.interval)
+            now = time.time()
+            lag = max(0.0, now - self._due)
+            self._due = None
+            try:
+                self.record(lag, self._blocking_stack)
+                if now - last_report >= REPORT_INTERVAL:
+                    self.report()
+                    last_report = now
+            except Exception:
+                self.logger.exception('Error monitoring hub')
+
+    def _watchdog(self):
+        poll_interval = max(self.lag_threshold / 2, 0.01)
+        while self.running:
+            original_time.sleep(poll_interval)
+            check, due = self._check, self._due
+            if due is None or self._blocking_stack is not None or \
+                    original_time.time() - due < self.lag_threshold:
+                continue
+            frame = sys._current_frames().get(self._main_thread)
+            if check == self._check:
+                self._blocking_stack = _stack_labels(frame)
+
+    def record(self, lag, blocking_stack=None):
+        """
+        Records how late the hub ran the monitor's greenthread, and what it
+        was running instead if the lag was over the threshold.
+        """
+        self.logger.timing('hub.lag', lag * 1000)
+        if self.pool is not None:
+            self.logger.timing('hub.greenthreads', self.pool.running())
+        self.max_lag = max(self.max_lag, lag)
+        if lag < self.lag_threshold:
+            return
+        self.lag_exceeded += 1
+        self.logger.increment('hub.lag_exceeded')
+        if blocking_stack:
+            site = self.call_sites.setdefault(blocking_stack, [0, 0.0])
+            site[0] += 1
+            site[1] += lag
+            if len(self.call_sites) > MAX_CALL_SITES:
+                self.call_sites = dict(self._top_call_sites(MAX_CALL_SITES))
+
+    def _top_call_sites(self, limit):
+        return sorted(self.call_sites.items(),
+                      key=lambda item: item[1][1], reverse=True)[:limit]
+
+    def report(self):
+        """
+        Writes this process's hub stats to the recon cache, dropping those
+        of processes that have since exited.
+        """
+        entry = {
+            'timestamp': time.time(),
+            'max_lag': self.max_lag,
+            'lag_exceeded': self.lag_exceeded,
+            'blocking_call_sites': [
+                {'stack': list(stack), 'count': count, 'lag': lag}
+                for stack, (count, lag) in self._top_call_sites(
+                    TOP_CALL_SITES)],
+        }
+        if self.pool is not None:
+            entry['greenthreads'] = self.pool.running()
+            entry['pool_size'] = self.pool.size
+        processes = {str(os.getpid()): entry}
+        for pid in load_recon_cache(self.recon_cache).get(self.name, {}):
+            try:
+                os.kill(int(pid), 0)
+            except OSError as err:
+                if err.errno == errno.ESRCH:
+                    processes[pid] = {}
+            except ValueError:
+                processes[pid] = {}
+        dump_recon_cache({self.name: processes}, self.recon_cache,
+                         self.logger)
+        self.max_lag = 0.0
+        self.lag_exceeded = 0
@@ -388,17 +388,48 @@ class DecrypterContContext(BaseDecrypterContext):
         with closing_if_possible(resp_iter):
             resp_body = b''.join(resp_iter)
         body_json = json.loads(resp_body)
-        new_body = json.dumps([self.decrypt_obj_dict(req, obj_dict)
-                               for obj_dict in body_json]).encode('ascii')
+        new_body = json.dumps(
+            self.decrypt_obj_dicts(req, body_json)).encode('ascii')
         self.update_content_length(len(new_body))
         return [new_body]
 
-    def decrypt_obj_dict(self, req, obj_dict):
+    def decrypt_obj_dicts(self, req, obj_dicts):
+        """
+        Decrypt the etags of all entries in a container listing in one pass.
+
+        Each object's etag may have been encrypted with a different key, and
+        the key ids of the built-in keymasters include each object's path, so
+        keys are fetched for every entry. That is cheap: a listing only needs
+        the container key, and the built-in keymasters keep the keys fetched
+        for a request in ``KeyMasterContext._keys`` by secret id and key id
+        version, so only the first entry encrypted with each root secret has
+        any key derived. An unknown key id is only reported once for the
+        listing.
+
+        :param req: a Request object
+        :param obj_dicts: a list of listing entry dicts
+        :returns: the list of entry dicts with their etags decrypted
+        """
+        bad_keys = set()
+        return [self.decrypt_obj_dict(req, obj_dict, bad_keys)
+                for obj_dict in obj_dicts]
+
+    def decrypt_obj_dict(self, req, obj_dict, bad_keys=None):
+        """
+        Decrypt the etag of a single container listing entry.
+
+        :param req: a Request object
+        :param obj_dict: a listing entry dict
+        :param bad_keys: (optional) a set of unknown secret ids that have
+                         already been reported for the listing
+        :returns: the entry dict with its etag decrypted
+        """
         if 'hash' in obj_dict:
             # each object's etag may have been encrypted with a different key
             # so fetch keys based on its crypto meta
             ciphertext, crypto_meta = extract_crypto_meta(obj_dict['hash'])
-            bad_keys = set()
+            if bad_keys is None:
+                bad_keys = set()
             if crypto_meta:
                 try:
                     self.crypto.check_crypto_meta(crypto_meta)
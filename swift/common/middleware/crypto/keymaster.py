@@ -19,9 +19,11 @@ from swift.common.exceptions import UnknownSecretIdError
 from swift.common.middleware.crypto.crypto_utils import CRYPTO_KEY_CALLBACK
 from swift.common.swob import Request, HTTPException, wsgi_to_bytes
 from swift.common.utils import readconf, strict_b64decode, get_logger, \
-    split_path
+    split_path, LRUCache
 from swift.common.wsgi import WSGIContext
 
+DEFAULT_DERIVED_KEY_CACHE_SIZE = 1000
+
 
 class KeyMasterContext(WSGIContext):
     """
@@ -119,7 +121,7 @@ class KeyMasterContext(WSGIContext):
             if self.container:
                 path = account_path + '/' + key_cont
                 keys['container'] = self.keymaster.create_key(
-                    path, secret_id=secret_id)
+                    path, secret_id=secret_id, cache=True)
 
                 if self.obj:
                     if key_obj.startswith('/') and version == '1':
@@ -183,6 +185,11 @@ class BaseKeyMaster(object):
     Subclasses should define ``log_route``, ``keymaster_opts``, and
     ``keymaster_conf_section`` attributes, and implement the
     ``_get_root_secret`` function.
+
+    Account and container keys are shared by every request to the same
+    account or container, so they are memoized in a bounded LRU cache whose
+    size is set by the ``derived_key_cache_size`` option; a size of 0
+    disables the cache. Object keys are not cached.
     """
     @property
     def log_route(self):
@@ -202,7 +209,18 @@ class BaseKeyMaster(object):
     def __init__(self, app, conf):
         self.app = app
         self.logger = get_logger(conf, log_route=self.log_route)
+        self.logger.set_statsd_prefix(self.log_route)
         self.keymaster_config_path = conf.get('keymaster_config_path')
+        derived_key_cache_size = int(conf.get(
+            'derived_key_cache_size', DEFAULT_DERIVED_KEY_CACHE_SIZE))
+        if derived_key_cache_size < 0:
+            raise ValueError('derived_key_cache_size must be >= 0')
+        self._derived_key_cache_misses = 0
+        if derived_key_cache_size:
+            self._cached_derive_key = LRUCache(
+                maxsize=derived_key_cache_size)(self._derive_key_on_miss)
+        else:
+            self._cached_derive_key = None
         conf = self._load_keymaster_config_file(conf)
 
         # The _get_root_secret() function is overridden by other keymasters
@@ -276,24 +294,42 @@ class BaseKeyMaster(object):
         # anything else
         return self.app(env, start_response)
 
-    def create_key(self, path, secret_id=None):
+    def create_key(self, path, secret_id=None, cache=False):
         """
         Creates an encryption key that is unique for the given path.
 
         :param path: the (WSGI string) path of the resource being encrypted.
         :param secret_id: the id of the root secret from which the key should
             be derived.
+        :param cache: if True, the key is looked up in and added to the
+            derived key cache; set for container keys only, since object keys
+            are unique per object so are not worth caching.
         :return: an encryption key.
         :raises UnknownSecretIdError: if the secret_id is not recognised.
         """
-        try:
-            key = self._root_secrets[secret_id]
-        except KeyError:
+        if secret_id not in self._root_secrets:
             self.logger.warning('Unrecognised secret id: %s' % secret_id)
             raise UnknownSecretIdError(secret_id)
+        if not cache or self._cached_derive_key is None:
+            return self._derive_key(path, secret_id)
+
+        misses = self._derived_key_cache_misses
+        key = self._cached_derive_key(path, secret_id)
+        if self._derived_key_cache_misses > misses:
+            self.logger.increment('derived_key_cache.misses')
         else:
-            return hmac.new(key, wsgi_to_bytes(path),
-                            digestmod=hashlib.sha256).digest()
+            self.logger.increment('derived_key_cache.hits')
+        return key
+
+    def _derive_key(self, path, secret_id):
+        return hmac.new(self._root_secrets[secret_id], wsgi_to_bytes(path),
+                        digestmod=hashlib.sha256).digest()
+
+    def _derive_key_on_miss(self, path, secret_id):
+        # only called by the derived key cache when it has no entry for
+        # (path, secret_id)
+        self._derived_key_cache_misses += 1
+        return self._derive_key(path, secret_id)
 
 
 class KeyMaster(BaseKeyMaster):
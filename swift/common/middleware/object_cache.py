@@ -0,0 +1,254 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The ``object_cache`` middleware keeps small, frequently read objects
+(thumbnails, manifests, configuration blobs and the like) in the memory of
+each proxy server process, so that repeated GETs and HEADs of them need not go
+to an object server at all.
+
+Caching is opt-in per container. A user with the ability to set container
+metadata enables it by setting the ``X-Container-Object-Cache`` header to a
+true value on a container ``PUT`` or ``POST``, and disables it again by
+setting it to a false (or empty) value. The setting is kept in container
+sysmeta, so it only takes effect once cached container info is refreshed (60
+seconds by default).
+
+Only ``200 OK`` responses to plain object GETs (no query string, no
+``Range``, no ``X-Newest``) of at most ``max_object_size`` bytes are cached.
+Cached responses are served to GETs and HEADs of the same path, after the
+usual container ACL authorization, with conditional request headers evaluated
+against the cached ``Etag`` and ``Last-Modified``. Any ``PUT``, ``POST`` or
+``DELETE`` of an object passing through the same proxy server invalidates its
+cached copy; writes through *other* proxy servers are only noticed once an
+entry expires, ``cache_ttl`` seconds after it was cached. Clients that cannot
+tolerate that much staleness should use ``X-Newest``.
+
+The cache is bounded by ``max_cache_size`` bytes per process and evicts the
+least recently used entries first. Hits and misses are emitted to StatsD as
+``object_cache.hit`` and ``object_cache.miss``, and bytes served from cache as
+``object_cache.hit.bytes``.
+
+The ``object_cache`` middleware should be added to the pipeline in your
+``/etc/swift/proxy-server.conf`` file immediately left of the proxy server
+app, i.e. right of any auth, ``slo``, ``symlink`` and ``encryption``
+middleware. For example::
+
+    [pipeline:main]
+    pipeline = catch_errors cache tempauth slo object_cache proxy-server
+
+    [filter:object_cache]
+    use = egg:swift#object_cache
+    # max_object_size = 65536
+    # max_cache_size = 67108864
+    # cache_ttl = 5
+"""
+from collections import OrderedDict
+import time
+
+from swift.common.http import is_success
+from swift.common.request_helpers import get_sys_meta_prefix
+from swift.common.swob import Response, wsgify
+from swift.common.utils import config_true_value, get_logger, \
+    register_swift_info, split_path
+from swift.proxy.controllers.base import get_container_info
+
+
+CLIENT_CACHE_HEADER = 'X-Container-Object-Cache'
+SYSMETA_CACHE_HEADER = get_sys_meta_prefix('container') + 'object-cache'
+
+# request headers that make a response unsuitable for (re)use
+UNCACHEABLE_REQUEST_HEADERS = ('Range', 'X-Newest')
+# per-request response headers that must not be replayed
+UNCACHEABLE_RESPONSE_HEADERS = ('date', 'x-trans-id', 'x-openstack-request-id')
+
+
+class CacheEntry(object):
+    __slots__ = ('headers', 'body', 'expires', 'size')
+
+    def __init__(self, headers, body, expires):
+        self.headers = headers
+        self.body = body
+        self.expires = expires
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers)
+
+
+class ObjectCacheMiddleware(object):
+    def __init__(self, app, conf, logger=None):
+        self.app = app
+        self.logger = logger or get_logger(conf, log_route='object_cache')
+        self.max_object_size = int(conf.get('max_object_size', 65536))
+        self.max_cache_size = int(conf.get('max_cache_size', 67108864))
+        self.cache_ttl = float(conf.get('cache_ttl', 5))
+        self._cache = OrderedDict()
+        self._cache_size = 0
+        # path -> time of the most recent write of that path through this
+        # proxy, kept for cache_ttl seconds, so that a GET which raced a
+        # write can't put stale data back in the cache
+        self._writes = OrderedDict()
+
+    def _get(self, path, now):
+        entry = self._cache.pop(path, None)
+        if entry is None:
+            return None
+        if entry.expires <= now:
+            self._cache_size -= entry.size
+            return None
+        # re-insert as the most recently used
+        self._cache[path] = entry
+        return entry
+
+    def _set(self, path, entry):
+        self._discard(path)
+        if entry.size > self.max_cache_size:
+            return
+        self._cache[path] = entry
+        self._cache_size += entry.size
+        while self._cache_size > self.max_cache_size:
+            _path, evicted = self._cache.popitem(last=False)
+            self._cache_size -= evicted.size
+
+    def _discard(self, path):
+        entry = self._cache.pop(path, None)
+        if entry is not None:
+            self._cache_size -= entry.size
+
+    def _prune_writes(self, now):
+        while self._writes:
+            path, write_time = next(iter(self._writes.items()))
+            if write_time > now - self.cache_ttl:
+                break
+            del self._writes[path]
+
+    def invalidate(self, path):
+        """
+        Forget any cached copy of the object at ``path``, and refuse to cache
+        responses to GETs of it that were already in flight.
+        """
+        now = time.time()
+        self._discard(path)
+        self._writes.pop(path, None)
+        self._writes[path] = now
+        self._prune_writes(now)
+
+    def _may_fill(self, path, started):
+        now = time.time()
+        self._prune_writes(now)
+        if started <= now - self.cache_ttl:
+            # we may already have forgotten about a write it raced
+            return False
+        write_time = self._writes.get(path)
+        return write_time is None or write_time < started
+
+    def is_cacheable_request(self, req):
+        if req.query_string:
+            return False
+        for header in req.headers:
+            if header.lower().startswith('x-backend-'):
+                return False
+        return not any(h in req.headers for h in UNCACHEABLE_REQUEST_HEADERS)
+
+    def is_authorized(self, req, container_info):
+        # same check the proxy would make for the read
+        if 'swift.authorize' in req.environ:
+            req.acl = container_info['read_acl']
+            if req.environ['swift.authorize'](req):
+                return False
+        return True
+
+    def handle_container(self, req):
+        if req.method in ('PUT', 'POST') and \
+                CLIENT_CACHE_HEADER in req.headers:
+            enabled = config_true_value(req.headers.pop(CLIENT_CACHE_HEADER))
+            req.headers[SYSMETA_CACHE_HEADER] = 'true' if enabled else ''
+        resp = req.get_response(self.app)
+        if req.method in ('GET', 'HEAD') and is_success(resp.status_int) and \
+                config_true_value(resp.headers.get(SYSMETA_CACHE_HEADER)):
+            resp.headers[CLIENT_CACHE_HEADER] = 'true'
+        return resp
+
+    def handle_object_read(self, req):
+        if not self.is_cacheable_request(req):
+            return self.app
+        container_info = get_container_info(
+            req.environ, self.app, swift_source='OC')
+        if not is_success(container_info.get('status')) or \
+                not config_true_value(container_info.get(
+                    'sysmeta', {}).get('object-cache')):
+            return self.app
+
+        path = req.path_info
+        started = time.time()
+        entry = self._get(path, started)
+        if entry is not None:
+            if not self.is_authorized(req, container_info):
+                # let the proxy work out what the response should be
+                return self.app
+            self.logger.increment('object_cache.hit')
+            if req.method == 'GET':
+                self.logger.update_stats(
+                    'object_cache.hit.bytes', len(entry.body))
+            return Response(request=req, headers=entry.headers,
+                            body=entry.body, conditional_response=True)
+
+        self.logger.increment('object_cache.miss')
+        resp = req.get_response(self.app)
+        if req.method == 'GET' and resp.status_int == 200 and \
+                resp.content_length is not None and \
+                resp.content_length <= self.max_object_size:
+            # small enough to buffer; this also reads it from the backend
+            body = resp.body
+            if len(body) == resp.content_length and \
+                    self._may_fill(path, started):
+                headers = [(k, v) for k, v in resp.headers.items()
+                           if k.lower() not in UNCACHEABLE_RESPONSE_HEADERS]
+                self._set(path, CacheEntry(
+                    headers, body, started + self.cache_ttl))
+        return resp
+
+    def handle_object_write(self, req):
+        path = req.path_info
+        self.invalidate(path)
+        try:
+            return req.get_response(self.app)
+        finally:
+            self.invalidate(path)
+
+    @wsgify
+    def __call__(self, req):
+        try:
+            (version, account, container, obj) = split_path(
+                req.path_info, 3, 4, True)
+        except ValueError:
+            return self.app
+
+        if not obj:
+            return self.handle_container(req)
+        if req.method in ('GET', 'HEAD'):
+            return self.handle_object_read(req)
+        if req.method in ('PUT', 'POST', 'DELETE'):
+            return self.handle_object_write(req)
+        return self.app
+
+
+def filter_factory(global_conf, **local_conf):
+    conf = global_conf.copy()
+    conf.update(local_conf)
+    register_swift_info('object_cache', max_object_size=int(
+        conf.get('max_object_size', 65536)))
+
+    def object_cache_filter(app):
+        return ObjectCacheMiddleware(app, conf)
+    return object_cache_filter
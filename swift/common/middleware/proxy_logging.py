@@ -69,10 +69,31 @@ needed. With the doubled proxy logs, any consumer/processor of swift's proxy
 logs should look at the swift.source field, the rightmost log value, to decide
 if this is a middleware subrequest or not. A log processor calculating
 bandwidth usage will want to only sum up logs with no swift.source.
+
+By default access log lines are emitted through the python logging module,
+which formats and writes each line synchronously on the request path. At high
+request rates this can instead be delegated to an asynchronous sink by setting
+``access_log_sink`` to ``file`` or ``unix_dgram``. Log records are then queued
+as tuples of raw values and formatted and written out in batches by a native
+background thread, either appended to a local file or sent to a UNIX datagram
+socket, as either the space-separated format above or JSON lines
+(``access_log_sink_format = json``). When the queue is full records are
+dropped rather than slowing down requests; dropped records are counted in the
+``proxy-server.access_log_sink.dropped`` StatsD metric.
+
+Every proxy worker appends to the same file, so the sink does not rotate it
+itself. Rotate it with logrotate or the like by renaming (not copying and
+truncating) the file; each worker notices that the path no longer refers to
+the file it has open and reopens it before writing its next batch.
 """
 
+import atexit
+import collections
+import json
+import os
 import time
 
+import eventlet
 from six.moves.urllib.parse import quote
 from swift.common.swob import Request
 from swift.common.utils import (get_logger, get_remote_client,
@@ -83,6 +104,233 @@ from swift.common.storage_policy import POLICIES
 
 QUOTE_SAFE = '/:'
 
+ACCESS_LOG_FIELDS = (
+    'client_ip', 'remote_addr', 'datetime', 'request_method', 'request_path',
+    'protocol', 'status_int', 'referer', 'user_agent', 'auth_token',
+    'bytes_recvd', 'bytes_sent', 'client_etag', 'transaction_id', 'headers',
+    'request_time', 'source', 'log_info', 'request_start_time',
+    'request_end_time', 'policy_index')
+
+
+def access_log_values(record):
+    """
+    Expand an access log record into the values of each access log field.
+
+    :param record: a tuple of (client_ip, remote_addr, method, path_qs,
+                   protocol, status_int, referer, user_agent, auth_token,
+                   bytes_received, bytes_sent, etag, trans_id, headers,
+                   source, log_info, start_time, end_time, policy_index)
+    :returns: a tuple of values ordered as :data:`ACCESS_LOG_FIELDS`
+    """
+    (client_ip, remote_addr, method, path_qs, protocol, status_int, referer,
+     user_agent, auth_token, bytes_received, bytes_sent, etag, trans_id,
+     headers, source, log_info, start_time, end_time, policy_index) = record
+    return (
+        client_ip,
+        remote_addr,
+        time.strftime('%d/%b/%Y/%H/%M/%S', time.gmtime(end_time)),
+        method,
+        path_qs,
+        protocol,
+        status_int,
+        referer,
+        user_agent,
+        auth_token,
+        bytes_received,
+        bytes_sent,
+        etag,
+        trans_id,
+        headers,
+        "%.4f" % (end_time - start_time),
+        source,
+        log_info,
+        "%.9f" % start_time,
+        "%.9f" % end_time,
+        policy_index)
+
+
+def format_access_log_line(record):
+    """
+    Format an access log record as a line of space-separated, url-encoded
+    values.
+    """
+    return ' '.join(quote(str(x) if x else '-', QUOTE_SAFE)
+                    for x in access_log_values(record))
+
+
+def format_access_log_json(record):
+    """
+    Format an access log record as a JSON object keyed by field name.
+    """
+    return json.dumps(dict(zip(ACCESS_LOG_FIELDS, access_log_values(record))),
+                      sort_keys=True)
+
+
+class AccessLogSink(object):
+    """
+    Asynchronous, batching writer for access log records.
+
+    Records are appended to an in-memory queue by :meth:`put`, which never
+    blocks. A native (not green) thread, started on first use in each process,
+    formats the queued records and writes them out in batches of up to
+    ``batch_size`` records, either when a full batch is waiting or every
+    ``flush_interval`` seconds. Any records still queued when the process
+    exits normally, as a worker does after a graceful shutdown or reload, are
+    written out by :meth:`close`.
+
+    :param conf: the proxy-logging middleware configuration
+    """
+    FORMATTERS = {'text': format_access_log_line,
+                  'json': format_access_log_json}
+    MAX_DATAGRAM_SIZE = 8192
+
+    def __init__(self, conf):
+        self.target = conf.get('access_log_sink')
+        if self.target not in ('file', 'unix_dgram'):
+            raise ValueError('access_log_sink must be one of file or '
+                             'unix_dgram, not %r' % self.target)
+        self.path = conf.get('access_log_sink_path')
+        if not self.path:
+            raise ValueError('access_log_sink_path must be set when '
+                             'access_log_sink is set')
+        self.format = conf.get('access_log_sink_format', 'text')
+        if self.format not in self.FORMATTERS:
+            raise ValueError('access_log_sink_format must be one of %s' %
+                             ', '.join(sorted(self.FORMATTERS)))
+        self.formatter = self.FORMATTERS[self.format]
+        self.queue_size = int(conf.get('access_log_sink_queue_size', 10000))
+        self.batch_size = int(conf.get('access_log_sink_batch_size', 500))
+        self.flush_interval = float(conf.get(
+            'access_log_sink_flush_interval', 0.5))
+        if self.queue_size < 1 or self.batch_size < 1:
+            raise ValueError('access_log_sink_queue_size and '
+                             'access_log_sink_batch_size must be positive')
+
+        self.queue = collections.deque()
+        # records lost because the queue was full (only updated by put) and
+        # records lost because they could not be written (only updated by the
+        # background thread)
+        self.dropped = 0
+        self.failed = 0
+        self.reported_lost = 0
+        self._threading = eventlet.patcher.original('threading')
+        self._flush_lock = self._threading.Lock()
+        self._wakeup = self._threading.Event()
+        self._pid = None
+        self._stream = None
+        self._stream_id = None
+        self._sock = None
+        atexit.register(self.close)
+
+    def put(self, record):
+        """
+        Queue a record to be written.
+
+        :param record: a tuple as accepted by :func:`access_log_values`
+        :returns: the number of records dropped or not written since the
+                  last call that returned a non-zero value
+        """
+        if self._pid != os.getpid():
+            # the thread is started lazily so that it runs in each worker
+            # process rather than in the parent that loaded the pipeline
+            self._start()
+        if len(self.queue) >= self.queue_size:
+            self.dropped += 1
+        else:
+            self.queue.append(record)
+            if len(self.queue) >= self.batch_size:
+                self._wakeup.set()
+        lost = self.dropped + self.failed - self.reported_lost
+        self.reported_lost += lost
+        return lost
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._stream = self._sock = None
+        thread = self._threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Format and write out all queued records.
+        """
+        with self._flush_lock:
+            while self.queue:
+                batch = []
+                while self.queue and len(batch) < self.batch_size:
+                    batch.append(self.queue.popleft())
+                try:
+                    lines = [self.formatter(record).encode('utf-8')
+                             for record in batch]
+                    if self.target == 'file':
+                        self._write_file(lines)
+                    else:
+                        self._send_datagrams(lines)
+                except Exception:
+                    # there is nowhere safe to log this from a native thread
+                    self.failed += len(batch)
+                    self._close()
+
+    def close(self):
+        """
+        Write out all queued records and close the file or socket written to.
+        """
+        self.flush()
+        with self._flush_lock:
+            self._close()
+
+    def _close(self):
+        for f in (self._stream, self._sock):
+            if f is not None:
+                try:
+                    f.close()
+                except Exception:
+                    pass
+        self._stream = self._sock = None
+
+    def _write_file(self, lines):
+        if self._stream is not None:
+            # reopen the path once it has been moved aside or removed, as
+            # logrotate does; this never fails the batch
+            try:
+                st = os.stat(self.path)
+                reopen = (st.st_dev, st.st_ino) != self._stream_id
+            except OSError:
+                reopen = True
+            if reopen:
+                self._close()
+        if self._stream is None:
+            self._stream = open(self.path, 'ab')
+            st = os.fstat(self._stream.fileno())
+            self._stream_id = (st.st_dev, st.st_ino)
+        self._stream.write(b'\n'.join(lines) + b'\n')
+        self._stream.flush()
+
+    def _send_datagrams(self, lines):
+        if self._sock is None:
+            socket = eventlet.patcher.original('socket')
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sock.connect(self.path)
+        # pack as many newline terminated records into each datagram as fit
+        datagram = []
+        size = 0
+        for line in lines:
+            if datagram and size + len(line) + 1 > self.MAX_DATAGRAM_SIZE:
+                self._sock.send(b''.join(datagram))
+                datagram = []
+                size = 0
+            datagram.append(line + b'\n')
+            size += len(line) + 1
+        if datagram:
+            self._sock.send(b''.join(datagram))
+
 
 class ProxyLoggingMiddleware(object):
     """
@@ -112,7 +360,8 @@ class ProxyLoggingMiddleware(object):
                     'log_udp_port', 'log_statsd_host', 'log_statsd_port',
                     'log_statsd_default_sample_rate',
                     'log_statsd_sample_rate_factor',
-                    'log_statsd_metric_prefix'):
+                    'log_statsd_metric_prefix', 'log_statsd_flush_interval',
+                    'log_statsd_max_packet_size'):
             value = conf.get('access_' + key, conf.get(key, None))
             if value:
                 access_log_conf[key] = value
@@ -121,6 +370,10 @@ class ProxyLoggingMiddleware(object):
         self.access_logger.set_statsd_prefix('proxy-server')
         self.reveal_sensitive_prefix = int(
             conf.get('reveal_sensitive_prefix', 16))
+        if conf.get('access_log_sink'):
+            self.access_log_sink = AccessLogSink(conf)
+        else:
+            self.access_log_sink = None
 
     def method_from_req(self, req):
         return req.environ.get('swift.orig_req_method', req.method)
@@ -161,37 +414,34 @@ class ProxyLoggingMiddleware(object):
                                            for k, v in req.headers.items())
 
         method = self.method_from_req(req)
-        end_gmtime_str = time.strftime('%d/%b/%Y/%H/%M/%S',
-                                       time.gmtime(end_time))
-        duration_time_str = "%.4f" % (end_time - start_time)
-        start_time_str = "%.9f" % start_time
-        end_time_str = "%.9f" % end_time
         policy_index = get_policy_index(req.headers, resp_headers)
-        self.access_logger.info(' '.join(
-            quote(str(x) if x else '-', QUOTE_SAFE)
-            for x in (
-                get_remote_client(req),
-                req.remote_addr,
-                end_gmtime_str,
-                method,
-                req.path_qs,
-                req.environ.get('SERVER_PROTOCOL'),
-                status_int,
-                req.referer,
-                req.user_agent,
-                self.obscure_sensitive(req.headers.get('x-auth-token')),
-                bytes_received,
-                bytes_sent,
-                req.headers.get('etag', None),
-                req.environ.get('swift.trans_id'),
-                logged_headers,
-                duration_time_str,
-                req.environ.get('swift.source'),
-                ','.join(req.environ.get('swift.log_info') or ''),
-                start_time_str,
-                end_time_str,
-                policy_index
-            )))
+        record = (
+            get_remote_client(req),
+            req.remote_addr,
+            method,
+            req.path_qs,
+            req.environ.get('SERVER_PROTOCOL'),
+            status_int,
+            req.referer,
+            req.user_agent,
+            self.obscure_sensitive(req.headers.get('x-auth-token')),
+            bytes_received,
+            bytes_sent,
+            req.headers.get('etag', None),
+            req.environ.get('swift.trans_id'),
+            logged_headers,
+            req.environ.get('swift.source'),
+            ','.join(req.environ.get('swift.log_info') or ''),
+            start_time,
+            end_time,
+            policy_index)
+        if self.access_log_sink:
+            dropped = self.access_log_sink.put(record)
+            if dropped:
+                self.access_logger.update_stats(
+                    'access_log_sink.dropped', dropped)
+        else:
+            self.access_logger.info(format_access_log_line(record))
 
         # Log timing and bytes-transferred data to StatsD
         metric_name = self.statsd_metric_name(req, status_int, method)
@@ -23,6 +23,9 @@ from swift.common.constraints import valid_api_version
 from swift.common.memcached import MemcacheConnectionError
 from swift.common.swob import Request, Response
 
+# the number of keys with local state above which idle keys are forgotten
+MAX_LOCAL_STATES = 10000
+
 
 def interpret_conf_limits(conf, name_prefix, info=None):
     """
@@ -85,6 +88,23 @@ class MaxSleepTimeHitError(Exception):
     pass
 
 
+class LocalRateLimitState(object):
+    """
+    A worker's local view of the memcache running time for a ratelimit key.
+
+    :param running_time_m: the estimated running time for the key, in units
+                           of 1/clock_accuracy seconds
+    :param synced_at: the time at which the estimate was last synchronized
+                      with memcache
+    """
+    def __init__(self, running_time_m, synced_at):
+        self.running_time_m = running_time_m
+        # increments made locally but not yet added to the memcache counter
+        self.pending_m = 0
+        self.synced_at = synced_at
+        self.syncing = False
+
+
 class RateLimitMiddleware(object):
     """
     Rate limiting middleware
@@ -127,6 +147,9 @@ class RateLimitMiddleware(object):
             conf, 'container_ratelimit_')
         self.container_listing_ratelimits = interpret_conf_limits(
             conf, 'container_listing_ratelimit_')
+        self.sync_interval_seconds = float(
+            conf.get('sync_interval_seconds', 0))
+        self.local_states = {}
 
     def get_container_size(self, env):
         rv = 0
@@ -198,12 +221,20 @@ class RateLimitMiddleware(object):
         Returns the amount of time (a float in seconds) that the app
         should sleep.
 
+        If sync_interval_seconds is set, only the first request for a key is
+        checked against memcache, which seeds this worker's local estimate of
+        the running time for the key; subsequent requests are checked against
+        the local estimate by :meth:`_get_local_sleep_time`.
+
         :param key: a memcache key
         :param max_rate: maximum rate allowed in requests per second
         :raises MaxSleepTimeHitError: if max sleep time is exceeded.
         """
+        if self.sync_interval_seconds > 0 and key in self.local_states:
+            return self._get_local_sleep_time(key, max_rate)
         try:
-            now_m = int(round(time.time() * self.clock_accuracy))
+            now = time.time()
+            now_m = int(round(now * self.clock_accuracy))
             time_per_request_m = int(round(self.clock_accuracy / max_rate))
             running_time_m = self.memcache_client.incr(
                 key, delta=time_per_request_m)
@@ -213,22 +244,111 @@ class RateLimitMiddleware(object):
                 next_avail_time = int(now_m + time_per_request_m)
                 self.memcache_client.set(key, str(next_avail_time),
                                          serialize=False)
+                running_time_m = next_avail_time
             else:
                 need_to_sleep_m = \
                     max(running_time_m - now_m - time_per_request_m, 0)
 
-            max_sleep_m = self.max_sleep_time_seconds * self.clock_accuracy
-            if max_sleep_m - need_to_sleep_m <= self.clock_accuracy * 0.01:
+            if self._max_sleep_exceeded(need_to_sleep_m):
                 # treat as no-op decrement time
                 self.memcache_client.decr(key, delta=time_per_request_m)
                 raise MaxSleepTimeHitError(
                     "Max Sleep Time Exceeded: %.2f" %
                     (float(need_to_sleep_m) / self.clock_accuracy))
-
-            return float(need_to_sleep_m) / self.clock_accuracy
         except MemcacheConnectionError:
             return 0
 
+        if self.sync_interval_seconds > 0:
+            self._prune_local_states(now_m)
+            self.local_states[key] = LocalRateLimitState(running_time_m, now)
+        return float(need_to_sleep_m) / self.clock_accuracy
+
+    def _max_sleep_exceeded(self, need_to_sleep_m):
+        max_sleep_m = self.max_sleep_time_seconds * self.clock_accuracy
+        return max_sleep_m - need_to_sleep_m <= self.clock_accuracy * 0.01
+
+    def _get_local_sleep_time(self, key, max_rate):
+        """
+        Returns the amount of time (a float in seconds) that the app should
+        sleep, using this worker's local estimate of the running time for the
+        key.
+
+        The increment made by the request is added to the local estimate
+        only. Local increments are added to the memcache counter in one batch,
+        and the local estimate refreshed from the result, by a green thread at
+        most every sync_interval_seconds. Requests made concurrently through
+        other workers are therefore only accounted for after up to
+        sync_interval_seconds.
+
+        :param key: a memcache key
+        :param max_rate: maximum rate allowed in requests per second
+        :raises MaxSleepTimeHitError: if max sleep time is exceeded.
+        """
+        state = self.local_states[key]
+        now = time.time()
+        now_m = int(round(now * self.clock_accuracy))
+        time_per_request_m = int(round(self.clock_accuracy / max_rate))
+        running_time_m = state.running_time_m + time_per_request_m
+        need_to_sleep_m = 0
+        if (now_m - running_time_m >
+                self.rate_buffer_seconds * self.clock_accuracy):
+            running_time_m = now_m + time_per_request_m
+        else:
+            need_to_sleep_m = \
+                max(running_time_m - now_m - time_per_request_m, 0)
+
+        if self._max_sleep_exceeded(need_to_sleep_m):
+            raise MaxSleepTimeHitError(
+                "Max Sleep Time Exceeded: %.2f" %
+                (float(need_to_sleep_m) / self.clock_accuracy))
+
+        state.running_time_m = running_time_m
+        state.pending_m += time_per_request_m
+        if not state.syncing and \
+                now - state.synced_at >= self.sync_interval_seconds:
+            state.syncing = True
+            eventlet.spawn_n(self._sync_local_state, key, state)
+        return float(need_to_sleep_m) / self.clock_accuracy
+
+    def _sync_local_state(self, key, state):
+        """
+        Add the increments made locally for a key to the memcache counter and
+        refresh the local estimate with the cluster-wide running time.
+        """
+        delta_m, state.pending_m = state.pending_m, 0
+        try:
+            running_time_m = self.memcache_client.incr(key, delta=delta_m)
+            now_m = int(round(time.time() * self.clock_accuracy))
+            if (now_m - running_time_m >
+                    self.rate_buffer_seconds * self.clock_accuracy):
+                running_time_m = max(now_m, state.running_time_m)
+                self.memcache_client.set(key, str(running_time_m),
+                                         serialize=False)
+            # any increments made while syncing are still only local
+            state.running_time_m = running_time_m + state.pending_m
+        except MemcacheConnectionError:
+            state.pending_m += delta_m
+        except Exception:
+            state.pending_m += delta_m
+            self.logger.exception(
+                _('Error syncing ratelimit for %s'), key)
+        finally:
+            state.synced_at = time.time()
+            state.syncing = False
+
+    def _prune_local_states(self, now_m):
+        """
+        Forget the local state of keys that have been idle for longer than
+        rate_buffer_seconds; their running time would be reset anyway.
+        """
+        if len(self.local_states) < MAX_LOCAL_STATES:
+            return
+        buffer_m = self.rate_buffer_seconds * self.clock_accuracy
+        for key, state in list(self.local_states.items()):
+            if not state.syncing and \
+                    now_m - state.running_time_m > buffer_m:
+                del self.local_states[key]
+
     def handle_ratelimit(self, req, account_name, container_name, obj_name):
         """
         Performs rate limiting and account white/black listing.  Sleeps
@@ -25,7 +25,7 @@ from swift.common.constraints import check_mount
 from swift.common.storage_policy import POLICIES
 from swift.common.swob import Request, Response
 from swift.common.utils import get_logger, config_true_value, \
-    SWIFT_CONF_FILE, md5_hash_for_file
+    SWIFT_CONF_FILE, md5_hash_for_file, load_recon_cache
 
 
 class ReconMiddleware(object):
@@ -57,6 +57,8 @@ class ReconMiddleware(object):
                                                 'account.recon')
         self.drive_recon_cache = os.path.join(self.recon_cache_path,
                                               'drive.recon')
+        self.hub_recon_cache = os.path.join(self.recon_cache_path,
+                                            'hub.recon')
         self.account_ring_path = os.path.join(swift_dir, 'account.ring.gz')
         self.container_ring_path = os.path.join(swift_dir, 'container.ring.gz')
 
@@ -325,6 +327,10 @@ class ReconMiddleware(object):
                 raise
         return sockstat
 
+    def get_hub_info(self):
+        """get eventlet hub lag of each monitored server and daemon process"""
+        return load_recon_cache(self.hub_recon_cache)
+
     def get_time(self):
         """get current time"""
 
@@ -372,6 +378,8 @@ class ReconMiddleware(object):
             content = self.get_driveaudit_error()
         elif rcheck == "time":
             content = self.get_time()
+        elif rcheck == "hub":
+            content = self.get_hub_info()
         else:
             content = "Invalid path: %s" % req.path
             return Response(request=req, status="404 Not Found",
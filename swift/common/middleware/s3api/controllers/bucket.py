@@ -15,6 +15,7 @@
 
 from base64 import standard_b64encode as b64encode
 from base64 import standard_b64decode as b64decode
+import re
 
 from six.moves.urllib.parse import quote
 
@@ -22,16 +23,51 @@ from swift.common.http import HTTP_OK
 from swift.common.utils import json, public, config_true_value
 
 from swift.common.middleware.s3api.controllers.base import Controller
-from swift.common.middleware.s3api.etree import Element, SubElement, tostring, \
-    fromstring, XMLSyntaxError, DocumentInvalid
+from swift.common.middleware.s3api.etree import fromstring, \
+    XMLSyntaxError, DocumentInvalid, XMLNS_S3
 from swift.common.middleware.s3api.s3response import HTTPOk, S3NotImplemented, \
     InvalidArgument, \
     MalformedXML, InvalidLocationConstraint, NoSuchBucket, \
     BucketNotEmpty, InternalError, ServiceUnavailable, NoSuchKey
-from swift.common.middleware.s3api.utils import MULTIUPLOAD_SUFFIX
+from swift.common.middleware.s3api.utils import MULTIUPLOAD_SUFFIX, \
+    utf8decode
 
 MAX_PUT_BUCKET_BODY_SIZE = 10240
 
+XML_DECLARATION = "<?xml version='1.0' encoding='UTF-8'?>\n"
+# characters lxml refuses to serialize
+XML_INVALID_CHARS = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff]')
+
+
+def _xml_element(tag, text):
+    """
+    Serialize a text-only element the same way as
+    swift.common.middleware.s3api.etree.tostring.
+
+    :raises ValueError: if the text can not be represented in XML
+    """
+    if text is None:
+        return '<%s/>' % tag
+    text = utf8decode(text)
+    if XML_INVALID_CHARS.search(text):
+        raise ValueError('All strings must be XML compatible')
+    text = text.replace(u'&', u'&amp;').replace(u'<', u'&lt;').replace(
+        u'>', u'&gt;').replace(u'\r', u'&#13;')
+    return '<%s>%s</%s>' % (tag, text.encode('utf8'), tag)
+
+
+def _listing_etag(o):
+    if 's3_etag' in o:
+        # New-enough MUs are already in the right format
+        return o['s3_etag']
+    elif 'slo_etag' in o:
+        # SLOs may be in something *close* to the MU format
+        return '"%s-N"' % o['slo_etag'].strip('"')
+    # Normal objects just use the MD5
+    # This also catches sufficiently-old SLOs, but we have
+    # no way to identify those from container listings
+    return '"%s"' % o['hash']
+
 
 class BucketController(Controller):
     """
@@ -150,108 +186,108 @@ class BucketController(Controller):
         is_truncated = max_keys > 0 and len(objects) > max_keys
         objects = objects[:max_keys]
 
+        body = ''.join(self._iter_list_bucket_result(
+            req, objects, listing_type, is_truncated, tag_max_keys,
+            encoding_type, fetch_owner))
+        return HTTPOk(body=body, content_type='application/xml')
+
+    def _iter_list_bucket_result(self, req, objects, listing_type,
+                                 is_truncated, max_keys, encoding_type,
+                                 fetch_owner):
+        """
+        Yields a ListBucketResult or ListVersionsResult document piece by
+        piece, straight from the container listing, without building an
+        element tree. The output is the same as what serializing the
+        equivalent element tree with
+        :func:`~swift.common.middleware.s3api.etree.tostring` gives.
+
+        :raises ValueError: if some text can not be represented in XML
+        """
+        params = req.params
+        if listing_type == 'object-versions':
+            root = 'ListVersionsResult'
+        else:
+            root = 'ListBucketResult'
+        yield XML_DECLARATION
+        yield '<%s xmlns="%s">' % (root, XMLNS_S3)
+        yield _xml_element('Name', req.container_name)
+        yield _xml_element('Prefix', params.get('prefix'))
         if listing_type == 'object-versions':
-            elem = Element('ListVersionsResult')
-            SubElement(elem, 'Name').text = req.container_name
-            SubElement(elem, 'Prefix').text = req.params.get('prefix')
-            SubElement(elem, 'KeyMarker').text = req.params.get('key-marker')
-            SubElement(elem, 'VersionIdMarker').text = req.params.get(
-                'version-id-marker')
+            yield _xml_element('KeyMarker', params.get('key-marker'))
+            yield _xml_element('VersionIdMarker',
+                               params.get('version-id-marker'))
             if is_truncated:
                 if 'name' in objects[-1]:
-                    SubElement(elem, 'NextKeyMarker').text = \
-                        objects[-1]['name']
+                    yield _xml_element('NextKeyMarker', objects[-1]['name'])
                 if 'subdir' in objects[-1]:
-                    SubElement(elem, 'NextKeyMarker').text = \
-                        objects[-1]['subdir']
-                SubElement(elem, 'NextVersionIdMarker').text = 'null'
-        else:
-            elem = Element('ListBucketResult')
-            SubElement(elem, 'Name').text = req.container_name
-            SubElement(elem, 'Prefix').text = req.params.get('prefix')
-            if listing_type == 'version-1':
-                SubElement(elem, 'Marker').text = req.params.get('marker')
-                if is_truncated and 'delimiter' in req.params:
-                    if 'name' in objects[-1]:
-                        name = objects[-1]['name']
-                    else:
-                        name = objects[-1]['subdir']
-                    if encoding_type == 'url':
-                        name = quote(name)
-                    SubElement(elem, 'NextMarker').text = name
-            elif listing_type == 'version-2':
-                if is_truncated:
-                    if 'name' in objects[-1]:
-                        SubElement(elem, 'NextContinuationToken').text = \
-                            b64encode(objects[-1]['name'].encode('utf8'))
-                    if 'subdir' in objects[-1]:
-                        SubElement(elem, 'NextContinuationToken').text = \
-                            b64encode(objects[-1]['subdir'].encode('utf8'))
-                if 'continuation-token' in req.params:
-                    SubElement(elem, 'ContinuationToken').text = \
-                        req.params['continuation-token']
-                if 'start-after' in req.params:
-                    SubElement(elem, 'StartAfter').text = \
-                        req.params['start-after']
-                SubElement(elem, 'KeyCount').text = str(len(objects))
-
-        SubElement(elem, 'MaxKeys').text = str(tag_max_keys)
-
-        if 'delimiter' in req.params:
-            SubElement(elem, 'Delimiter').text = req.params['delimiter']
-
+                    yield _xml_element('NextKeyMarker',
+                                       objects[-1]['subdir'])
+                yield _xml_element('NextVersionIdMarker', 'null')
+        elif listing_type == 'version-1':
+            yield _xml_element('Marker', params.get('marker'))
+            if is_truncated and 'delimiter' in params:
+                if 'name' in objects[-1]:
+                    name = objects[-1]['name']
+                else:
+                    name = objects[-1]['subdir']
+                if encoding_type == 'url':
+                    name = quote(name)
+                yield _xml_element('NextMarker', name)
+        elif listing_type == 'version-2':
+            if is_truncated:
+                if 'name' in objects[-1]:
+                    yield _xml_element('NextContinuationToken', b64encode(
+                        objects[-1]['name'].encode('utf8')))
+                if 'subdir' in objects[-1]:
+                    yield _xml_element('NextContinuationToken', b64encode(
+                        objects[-1]['subdir'].encode('utf8')))
+            if 'continuation-token' in params:
+                yield _xml_element('ContinuationToken',
+                                   params['continuation-token'])
+            if 'start-after' in params:
+                yield _xml_element('StartAfter', params['start-after'])
+            yield _xml_element('KeyCount', str(len(objects)))
+
+        yield _xml_element('MaxKeys', str(max_keys))
+        if 'delimiter' in params:
+            yield _xml_element('Delimiter', params['delimiter'])
         if encoding_type == 'url':
-            SubElement(elem, 'EncodingType').text = encoding_type
-
-        SubElement(elem, 'IsTruncated').text = \
-            'true' if is_truncated else 'false'
+            yield _xml_element('EncodingType', encoding_type)
+        yield _xml_element('IsTruncated', 'true' if is_truncated else 'false')
 
+        if fetch_owner or listing_type != 'version-2':
+            owner = '<Owner>%s%s</Owner>' % (
+                _xml_element('ID', req.user_id),
+                _xml_element('DisplayName', req.user_id))
+        else:
+            owner = ''
+        if listing_type == 'object-versions':
+            entry = '<Version>%s<VersionId>null</VersionId>' \
+                '<IsLatest>true</IsLatest>%s%s%s%s%s</Version>'
+        else:
+            entry = '<Contents>%s%s%s%s%s%s</Contents>'
         for o in objects:
             if 'subdir' not in o:
                 name = o['name']
                 if encoding_type == 'url':
                     name = quote(name.encode('utf-8'))
-
-                if listing_type == 'object-versions':
-                    contents = SubElement(elem, 'Version')
-                    SubElement(contents, 'Key').text = name
-                    SubElement(contents, 'VersionId').text = 'null'
-                    SubElement(contents, 'IsLatest').text = 'true'
-                else:
-                    contents = SubElement(elem, 'Contents')
-                    SubElement(contents, 'Key').text = name
-                SubElement(contents, 'LastModified').text = \
-                    o['last_modified'][:-3] + 'Z'
-                if 's3_etag' in o:
-                    # New-enough MUs are already in the right format
-                    etag = o['s3_etag']
-                elif 'slo_etag' in o:
-                    # SLOs may be in something *close* to the MU format
-                    etag = '"%s-N"' % o['slo_etag'].strip('"')
-                else:
-                    # Normal objects just use the MD5
-                    etag = '"%s"' % o['hash']
-                    # This also catches sufficiently-old SLOs, but we have
-                    # no way to identify those from container listings
-                SubElement(contents, 'ETag').text = etag
-                SubElement(contents, 'Size').text = str(o['bytes'])
-                if fetch_owner or listing_type != 'version-2':
-                    owner = SubElement(contents, 'Owner')
-                    SubElement(owner, 'ID').text = req.user_id
-                    SubElement(owner, 'DisplayName').text = req.user_id
-                SubElement(contents, 'StorageClass').text = 'STANDARD'
+                yield entry % (
+                    _xml_element('Key', name),
+                    _xml_element('LastModified',
+                                 o['last_modified'][:-3] + 'Z'),
+                    _xml_element('ETag', _listing_etag(o)),
+                    _xml_element('Size', str(o['bytes'])),
+                    owner,
+                    '<StorageClass>STANDARD</StorageClass>')
 
         for o in objects:
             if 'subdir' in o:
-                common_prefixes = SubElement(elem, 'CommonPrefixes')
                 name = o['subdir']
                 if encoding_type == 'url':
                     name = quote(name.encode('utf-8'))
-                SubElement(common_prefixes, 'Prefix').text = name
-
-        body = tostring(elem)
-
-        return HTTPOk(body=body, content_type='application/xml')
+                yield '<CommonPrefixes>%s</CommonPrefixes>' % _xml_element(
+                    'Prefix', name)
+        yield '</%s>' % root
 
     @public
     def PUT(self, req):
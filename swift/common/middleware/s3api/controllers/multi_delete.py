@@ -17,16 +17,19 @@ import copy
 import json
 
 from swift.common.constraints import MAX_OBJECT_NAME_LENGTH
-from swift.common.utils import public, StreamingPile
+from swift.common.utils import public, ContextPool, GreenAsyncPile
 
 from swift.common.middleware.s3api.controllers.base import Controller, \
     bucket_operation
 from swift.common.middleware.s3api.etree import Element, SubElement, \
-    fromstring, tostring, XMLSyntaxError, DocumentInvalid
+    fromstring, tostring, XMLSyntaxError, DocumentInvalid, XMLNS_S3
 from swift.common.middleware.s3api.s3response import HTTPOk, S3NotImplemented, \
     NoSuchKey, ErrorResponse, MalformedXML, UserKeyMustBeSpecified, \
     AccessDenied, MissingRequestBodyError
 
+# Error codes suggesting that the backend is struggling to keep up
+BACKOFF_ERROR_CODES = ('InternalError', 'ServiceUnavailable', 'SlowDown')
+
 
 class MultiObjectDeleteController(Controller):
     """
@@ -46,6 +49,44 @@ class MultiObjectDeleteController(Controller):
 
         return tostring(elem)
 
+    def _iter_delete_results(self, do_delete, args_iter):
+        """
+        Runs do_delete for each item of args_iter, yielding results as they
+        complete.
+
+        The number of concurrent deletes starts at multi_delete_concurrency
+        and grows by one with each successful delete up to
+        max_multi_delete_concurrency; it is halved whenever a delete fails in
+        a way that suggests the backend is overloaded.
+        """
+        concurrency = self.conf.multi_delete_concurrency
+        max_concurrency = max(concurrency,
+                              self.conf.max_multi_delete_concurrency)
+        args_iter = iter(args_iter)
+        with ContextPool(max_concurrency) as pool:
+            pile = GreenAsyncPile(pool)
+            # deletes spawned whose results we haven't collected yet
+            outstanding = 0
+            exhausted = False
+            while True:
+                while not exhausted and outstanding < concurrency:
+                    try:
+                        args = next(args_iter)
+                    except StopIteration:
+                        exhausted = True
+                    else:
+                        pile.spawn(do_delete, *args)
+                        outstanding += 1
+                if not outstanding:
+                    break
+                key, err = next(pile)
+                outstanding -= 1
+                if err and err['code'] in BACKOFF_ERROR_CODES:
+                    concurrency = max(1, concurrency // 2)
+                elif concurrency < max_concurrency:
+                    concurrency += 1
+                yield key, err
+
     @public
     @bucket_operation
     def POST(self, req):
@@ -144,20 +185,36 @@ class MultiObjectDeleteController(Controller):
                 pass
             except ErrorResponse as e:
                 return key, {'code': e.__class__.__name__, 'message': e._msg}
+            except Exception:
+                # We've already started streaming the response body, so the
+                # best we can do is report the failure against this key.
+                self.logger.exception('Unexpected error deleting %r', key)
+                return key, {'code': 'InternalError',
+                             'message': 'We encountered an internal error. '
+                                        'Please try again.'}
             return key, None
 
-        with StreamingPile(self.conf.multi_delete_concurrency) as pile:
-            for key, err in pile.asyncstarmap(do_delete, (
+        def response_iter():
+            # Send each result as soon as it's known, rather than holding the
+            # whole body until the slowest delete completes.
+            yield ('<?xml version=\'1.0\' encoding=\'UTF-8\'?>\n'
+                   '<DeleteResult xmlns="%s">' % XMLNS_S3)
+            for key, err in self._iter_delete_results(do_delete, (
                     (req, key, version) for key, version in delete_list)):
                 if err:
-                    error = SubElement(elem, 'Error')
-                    SubElement(error, 'Key').text = key
-                    SubElement(error, 'Code').text = err['code']
-                    SubElement(error, 'Message').text = err['message']
+                    result = Element('Error')
+                    SubElement(result, 'Key').text = key
+                    SubElement(result, 'Code').text = err['code']
+                    SubElement(result, 'Message').text = err['message']
                 elif not self.quiet:
-                    deleted = SubElement(elem, 'Deleted')
-                    SubElement(deleted, 'Key').text = key
-
-        body = tostring(elem)
-
-        return HTTPOk(body=body)
+                    result = Element('Deleted')
+                    SubElement(result, 'Key').text = key
+                else:
+                    continue
+                yield tostring(result, use_s3ns=False, xml_declaration=False)
+            yield '</DeleteResult>'
+
+        resp = HTTPOk()
+        resp.app_iter = response_iter()
+        resp.content_type = 'application/xml'
+        return resp
@@ -64,6 +64,7 @@ import os
 import re
 import time
 
+from swift.common.constraints import CONTAINER_LISTING_LIMIT
 from swift.common.swob import Range
 from swift.common.utils import json, public, reiterate
 from swift.common.db import utf8encode
@@ -105,6 +106,30 @@ def _check_upload_info(req, app, upload_id):
     _get_upload_info(req, app, upload_id)
 
 
+def _get_uploaded_parts(req, app, upload_id):
+    """
+    Returns the segment container listing entries of the parts uploaded so
+    far for an upload, keyed by segment path like '/<container>/<object>'.
+    """
+    container = req.container_name + MULTIUPLOAD_SUFFIX
+    query = {
+        'format': 'json',
+        'limit': CONTAINER_LISTING_LIMIT,
+        'prefix': '%s/%s/' % (req.object_name, upload_id),
+        'delimiter': '/',
+        'marker': '',
+    }
+    parts = {}
+    while True:
+        resp = req.get_response(app, 'GET', container, '', query=query)
+        objects = json.loads(resp.body)
+        for o in objects:
+            parts['/%s/%s' % (container, o['name'].encode('utf8'))] = o
+        if len(objects) < CONTAINER_LISTING_LIMIT:
+            return parts
+        query['marker'] = objects[-1]['name']
+
+
 class PartController(Controller):
     """
     Handles the following APIs:
@@ -624,6 +649,14 @@ class UploadController(Controller):
                 if item and item['bytes'] < self.conf.min_segment_size]
 
         req.environ['swift.callback.slo_manifest_hook'] = size_checker
+        try:
+            # SLO can validate the parts against the segment container
+            # listing rather than HEADing each of them; any part missing from
+            # the listing, or whose listing disagrees, still gets a HEAD.
+            req.environ['swift.slo_known_segments'] = _get_uploaded_parts(
+                req, self.app, upload_id)
+        except ErrorResponse:
+            pass
         start_time = time.time()
 
         def response_iter():
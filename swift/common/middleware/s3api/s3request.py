@@ -25,7 +25,7 @@ from six.moves.urllib.parse import quote, unquote, parse_qsl
 import string
 
 from swift.common.utils import split_path, json, get_swift_info, \
-    close_if_possible
+    close_if_possible, LRUCache
 from swift.common import swob
 from swift.common.http import HTTP_OK, HTTP_CREATED, HTTP_ACCEPTED, \
     HTTP_NO_CONTENT, HTTP_UNAUTHORIZED, HTTP_FORBIDDEN, HTTP_NOT_FOUND, \
@@ -80,6 +80,21 @@ SIGV4_X_AMZ_DATE_FORMAT = '%Y%m%dT%H%M%SZ'
 SERVICE = 's3'  # useful for mocking out in tests
 
 
+@LRUCache(maxsize=1000, maxtime=86400)
+def _sigv4_signing_key(secret, *scope):
+    """
+    Derive the sigv4 signing key of a secret for a credential scope.
+
+    The key only changes daily for any given access key, region and service,
+    so there's no need to go through the four HMACs on every request.
+    """
+    derived_secret = 'AWS4' + secret
+    for scope_piece in scope:
+        derived_secret = hmac.new(
+            derived_secret, scope_piece, sha256).digest()
+    return derived_secret
+
+
 def _header_strip(value):
     # S3 seems to strip *all* control characters
     if value is None:
@@ -149,10 +164,7 @@ class SigV4Mixin(object):
     def check_signature(self, secret):
         secret = utf8encode(secret)
         user_signature = self.signature
-        derived_secret = 'AWS4' + secret
-        for scope_piece in self.scope.values():
-            derived_secret = hmac.new(
-                derived_secret, scope_piece, sha256).digest()
+        derived_secret = _sigv4_signing_key(secret, *self.scope.values())
         valid_signature = hmac.new(
             derived_secret, self.string_to_sign, sha256).hexdigest()
         return user_signature == valid_signature
@@ -343,18 +355,26 @@ class SigV4Mixin(object):
 
         :return : dict of headers to sign, the keys are all lower case
         """
+        # Lower the header names first so that only the values of headers
+        # that are actually signed (or needed below) get normalized.
+        wanted = self._signed_headers | {'user-agent'}
         if 'headers_raw' in self.environ:  # eventlet >= 0.19.0
             # See https://github.com/eventlet/eventlet/commit/67ec999
             headers_lower_dict = defaultdict(list)
             for key, value in self.environ['headers_raw']:
-                headers_lower_dict[key.lower().strip()].append(
-                    ' '.join(_header_strip(value or '').split()))
+                key = key.lower().strip()
+                if key in wanted:
+                    headers_lower_dict[key].append(
+                        ' '.join(_header_strip(value or '').split()))
             headers_lower_dict = {k: ','.join(v)
                                   for k, v in headers_lower_dict.items()}
         else:  # mostly-functional fallback
-            headers_lower_dict = dict(
-                (k.lower().strip(), ' '.join(_header_strip(v or '').split()))
-                for (k, v) in six.iteritems(self.headers))
+            headers_lower_dict = {}
+            for key, value in six.iteritems(self.headers):
+                key = key.lower().strip()
+                if key in wanted:
+                    headers_lower_dict[key] = ' '.join(
+                        _header_strip(value or '').split())
 
         if 'host' in headers_lower_dict and re.match(
                 'Boto/2.[0-9].[0-2]',
@@ -366,8 +386,9 @@ class SigV4Mixin(object):
                 headers_lower_dict['host'].split(':')[0]
 
         headers_to_sign = [
-            (key, value) for key, value in sorted(headers_lower_dict.items())
-            if key in self._signed_headers]
+            (header, value)
+            for header, value in sorted(headers_lower_dict.items())
+            if header in self._signed_headers]
 
         if len(headers_to_sign) != len(self._signed_headers):
             # NOTE: if we are missing the header suggested via
@@ -55,7 +55,9 @@ This middleware:
 """
 
 import base64
+from collections import OrderedDict
 import json
+import time
 
 from keystoneclient.v3 import client as keystone_client
 from keystoneauth1 import session as keystone_session
@@ -206,6 +208,40 @@ class S3Token(object):
                 self.keystoneclient = None
                 self._secret_cache_duration = 0
 
+        # Secrets fetched from keystone may also be kept for a short while in
+        # each proxy process, so that requests from busy clients can be
+        # validated without even a memcache round trip.
+        self._local_cache_duration = 0
+        if self._secret_cache_duration > 0:
+            self._local_cache_duration = min(
+                int(conf.get('local_secret_cache_duration', 0)),
+                self._secret_cache_duration)
+        self._local_cache_size = int(conf.get('local_secret_cache_size',
+                                              1000))
+        self._local_cache = OrderedDict()
+
+    def _get_local_cache(self, access):
+        if self._local_cache_duration <= 0:
+            return None
+        try:
+            expires, cached_auth_data = self._local_cache.pop(access)
+        except KeyError:
+            return None
+        if expires < time.time():
+            return None
+        # most recently used entries are kept at the end
+        self._local_cache[access] = (expires, cached_auth_data)
+        return cached_auth_data
+
+    def _set_local_cache(self, access, cached_auth_data):
+        if self._local_cache_duration <= 0:
+            return
+        self._local_cache.pop(access, None)
+        while len(self._local_cache) >= self._local_cache_size:
+            self._local_cache.popitem(last=False)
+        self._local_cache[access] = (
+            time.time() + self._local_cache_duration, cached_auth_data)
+
     def _deny_request(self, code):
         error_cls, message = {
             'AccessDenied': (HTTPUnauthorized, 'Access denied'),
@@ -303,17 +339,21 @@ class S3Token(object):
         memcache_token_key = 's3secret/%s' % access
         if self._secret_cache_duration > 0:
             memcache_client = cache_from_env(environ)
-        cached_auth_data = None
+        cached_auth_data = self._get_local_cache(access)
+        locally_cached = cached_auth_data is not None
 
-        if memcache_client:
+        if memcache_client and not locally_cached:
             cached_auth_data = memcache_client.get(memcache_token_key)
-            if cached_auth_data:
-                headers, token_id, tenant, secret = cached_auth_data
-                if s3_auth_details['check_signature'](secret):
-                    self._logger.debug("Cached creds valid")
-                else:
-                    self._logger.debug("Cached creds invalid")
-                    cached_auth_data = None
+        if cached_auth_data:
+            headers, token_id, tenant, secret = cached_auth_data
+            if s3_auth_details['check_signature'](secret):
+                self._logger.debug("Cached creds valid")
+                if not locally_cached:
+                    self._set_local_cache(access, cached_auth_data)
+            else:
+                self._logger.debug("Cached creds invalid")
+                self._local_cache.pop(access, None)
+                cached_auth_data = None
 
         if not cached_auth_data:
             creds_json = json.dumps(creds)
@@ -361,10 +401,12 @@ class S3Token(object):
                         cred_ref = self.keystoneclient.ec2.get(
                             user_id=user_id,
                             access=access)
+                        cached_auth_data = (
+                            headers, token_id, tenant, cred_ref.secret)
                         memcache_client.set(
-                            memcache_token_key,
-                            (headers, token_id, tenant, cred_ref.secret),
+                            memcache_token_key, cached_auth_data,
                             time=self._secret_cache_duration)
+                        self._set_local_cache(access, cached_auth_data)
                         self._logger.debug("Cached keystone credentials")
                     except Exception:
                         self._logger.warning("Unable to cache secret",
@@ -316,7 +316,9 @@ import base64
 from cgi import parse_header
 from collections import defaultdict
 from datetime import datetime
+import itertools
 import json
+import math
 import mimetypes
 import re
 import six
@@ -333,7 +335,8 @@ from swift.common.swob import Request, HTTPBadRequest, HTTPServerError, \
 from swift.common.utils import get_logger, config_true_value, \
     get_valid_utf8_str, override_bytes_from_content_type, split_path, \
     register_swift_info, RateLimitedIterator, quote, close_if_possible, \
-    closing_if_possible, LRUCache, StreamingPile, strict_b64decode
+    closing_if_possible, LRUCache, StreamingPile, strict_b64decode, \
+    last_modified_date_to_timestamp
 from swift.common.request_helpers import SegmentedIterable, \
     get_sys_meta_prefix, update_etag_is_at_header, resolve_etag_is_at_header
 from swift.common.constraints import check_utf8, MAX_BUFFERED_SLO_SEGMENTS
@@ -1193,6 +1196,34 @@ class StaticLargeObject(object):
 
             return segment_length, seg_data
 
+        # Middleware left of SLO that already knows about some of the segments
+        # (e.g. from a container listing) may provide their listing entries,
+        # keyed by segment path, so that they need not be HEADed.
+        known_segments = req.environ.get('swift.slo_known_segments') or {}
+
+        def known_segment_resp(obj_name):
+            info = known_segments.get(get_valid_utf8_str(obj_name))
+            if info is None:
+                return None
+            content_type, params = parse_header(info['content_type'])
+            if params:
+                # e.g. a nested manifest (swift_bytes) or a symlink
+                # (symlink_target); only a HEAD tells the whole story
+                return None
+            for i in path2indices[obj_name]:
+                if parsed_data[i].get('etag') not in (None, info['hash']) or \
+                        parsed_data[i].get('size_bytes') not in (
+                            None, info['bytes']):
+                    # the listing may be stale; go ask the object
+                    return None
+            seg_resp = HTTPOk(headers={'Content-Type': content_type,
+                                       'Etag': info['hash']})
+            seg_resp.content_length = info['bytes']
+            # match the Last-Modified of a HEAD, which is rounded up
+            seg_resp.last_modified = math.ceil(float(
+                last_modified_date_to_timestamp(info['last_modified'])))
+            return seg_resp
+
         heartbeat = config_true_value(req.params.get('heartbeat'))
         separator = ''
         if heartbeat:
@@ -1210,9 +1241,18 @@ class StaticLargeObject(object):
             if heartbeat:
                 yield ' '
             last_yield_time = time.time()
+            known_resps = []
+            to_head = []
+            for path in path2indices:
+                seg_resp = known_segment_resp(path)
+                if seg_resp is None:
+                    to_head.append(path)
+                else:
+                    known_resps.append((path, seg_resp))
             with StreamingPile(self.concurrency) as pile:
-                for obj_name, resp in pile.asyncstarmap(do_head, (
-                        (path, ) for path in path2indices)):
+                for obj_name, resp in itertools.chain(
+                        known_resps, pile.asyncstarmap(do_head, (
+                            (path, ) for path in to_head))):
                     now = time.time()
                     if heartbeat and (now - last_yield_time >
                                       self.yield_frequency):
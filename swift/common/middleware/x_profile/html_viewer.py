@@ -28,6 +28,7 @@ from swift.common.middleware.x_profile.exceptions import MethodNotAllowed
 from swift.common.middleware.x_profile.exceptions import DataLoadFailure
 from swift.common.middleware.x_profile.exceptions import ProfileException
 from swift.common.middleware.x_profile.profile_model import Stats2
+from swift.common.middleware.x_profile import sampler
 
 PLOTLIB_INSTALLED = True
 try:
@@ -182,6 +183,7 @@ formelements_tmpl = """
                 <option value='json'>json</option>
                 <option value='csv'>csv</option>
                 <option value='ods'>ODF.ods</option>
+                <option value='folded'>folded stacks</option>
               </select>
             </td>
             <td>
@@ -232,6 +234,7 @@ class HTMLViewer(object):
                    'json': 'application/json',
                    'csv': 'text/csv',
                    'ods': 'application/vnd.oasis.opendocument.spreadsheet',
+                   'folded': 'text/plain',
                    'python': 'text/html'}
 
     def __init__(self, app_path, profile_module, profile_log):
@@ -330,6 +333,8 @@ class HTMLViewer(object):
                                                 profile_id, *amount)
         description = "Profiling information is generated by using\
                       '%s' profiler." % self.profile_module
+        if self.profile_module == sampler.__name__:
+            description += " Times and call counts are numbers of samples."
         sort_repl = '<option value="%s">' % sort
         sort_selected = '<option value="%s" selected>' % sort
         sort = sort_tmpl.replace(sort_repl, sort_selected)
@@ -377,6 +382,9 @@ class HTMLViewer(object):
             # to avoid failure of filtering stats data.
             if nfl_esc.startswith('/'):
                 nfl_esc = nfl_esc[1:]
+            if output_format == 'folded':
+                return (self.folded_stacks(log_files, nfl_esc),
+                        [('content-type', self.format_dict[output_format])])
             stats = Stats2(*log_files)
             stats.sort_stats(sort)
             if output_format == 'python':
@@ -395,6 +403,17 @@ class HTMLViewer(object):
         except Exception as ex:
             raise ProfileException(_('Data download error: %s') % ex)
 
+    def folded_stacks(self, log_files, nfl_filter=''):
+        counts = None
+        for log_file in log_files:
+            with open(log_file, 'rb') as f:
+                counts = sampler.parse_folded(f.read(), counts)
+        if nfl_filter:
+            nfl_re = re.compile(nfl_filter)
+            counts = dict((stack, count) for stack, count in counts.items()
+                          if any(nfl_re.search(label) for label in stack))
+        return sampler.format_folded(counts)
+
     def plot(self, log_files, sort='time', limit=10, nfl_filter='',
              metric_selected='cc', plot_type='bar'):
         if not PLOTLIB_INSTALLED:
@@ -20,8 +20,12 @@ import pstats
 import tempfile
 import time
 
+import six
+
 from swift import gettext_ as _
 from swift.common.middleware.x_profile.exceptions import ODFLIBNotInstalled
+from swift.common.middleware.x_profile.sampler import folded_to_stats, \
+    parse_folded
 
 
 ODFLIB_INSTALLED = True
@@ -38,6 +42,24 @@ class Stats2(pstats.Stats):
     def __init__(self, *args, **kwds):
         pstats.Stats.__init__(self, *args, **kwds)
 
+    def load_stats(self, arg):
+        # files dumped by the sampling profiler hold folded stacks rather
+        # than a marshalled dict
+        if arg and isinstance(arg, six.string_types):
+            with open(arg, 'rb') as f:
+                data = f.read()
+            if not data.startswith((b'{', b'\xfb')):
+                self.stats = folded_to_stats(parse_folded(data))
+                self.files = [arg]
+                return
+        pstats.Stats.load_stats(self, arg)
+
+    def add(self, *arg_list):
+        # pstats would load any further files as plain Stats
+        return pstats.Stats.add(self, *[
+            arg if isinstance(arg, pstats.Stats) else Stats2(arg)
+            for arg in arg_list])
+
     def func_to_dict(self, func):
         return {'module': func[0], 'line': func[1], 'function': func[2]}
 
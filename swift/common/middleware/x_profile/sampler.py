@@ -0,0 +1,178 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Statistical sampling profiler.
+
+Instead of hooking every function call like cProfile, a timer signal
+interrupts the process every ``interval`` seconds of CPU time and the stack of
+whatever is running at that moment, in any greenthread, is counted. The cost
+is a few microseconds per sample, so it may be left running continuously.
+
+Samples are dumped as folded stacks: one line per distinct stack, with the
+frames from the outermost in, separated by semicolons and followed by the
+number of samples, e.g.::
+
+    greenthread.py:214(main);wsgi.py:539(handle_one_request);... 12
+
+which is what flame graph tools such as ``flamegraph.pl`` take as input.
+Frames are named ``filename:lineno(function)``, using the line a function
+starts on.
+"""
+
+import os
+import re
+import signal
+from collections import defaultdict
+
+import six
+
+
+DEFAULT_INTERVAL = 0.01
+
+FRAME_RE = re.compile(r'^(.*):(\d+)\((.*)\)$')
+
+
+def frame_label(code):
+    return '%s:%d(%s)' % (code.co_filename, code.co_firstlineno,
+                          code.co_name)
+
+
+def parse_label(label):
+    """
+    :returns: a (filename, lineno, function) tuple, as used by pstats
+    """
+    match = FRAME_RE.match(label)
+    if not match:
+        return (label, 0, label)
+    filename, lineno, function = match.groups()
+    return (filename, int(lineno), function)
+
+
+def parse_folded(data, counts=None):
+    """
+    Adds up the folded stacks in ``data``.
+
+    :param data: folded stacks, as written by :meth:`Profile.dump_stats`
+    :param counts: optional dict of stack -> count to add to
+    :returns: a dict mapping each stack, a tuple of frame labels from the
+              outermost in, to its number of samples
+    :raises ValueError: if ``data`` isn't folded stacks
+    """
+    if counts is None:
+        counts = defaultdict(int)
+    if isinstance(data, six.binary_type):
+        data = data.decode('utf-8')
+    for line in data.splitlines():
+        if not line:
+            continue
+        stack, _sep, count = line.rpartition(' ')
+        if not stack:
+            raise ValueError('not a folded stack: %r' % line[:80])
+        counts[tuple(stack.split(';'))] += int(count)
+    return counts
+
+
+def format_folded(counts):
+    return ''.join('%s %d\n' % (';'.join(stack), count)
+                   for stack, count in sorted(counts.items()))
+
+
+def folded_to_stats(counts):
+    """
+    Converts folded stacks to the stats dict of a :class:`pstats.Stats`, so
+    that samples can be sorted, filtered and formatted like any other profile.
+    Each function's call counts and times are numbers of samples: ``tt`` for
+    those in the function itself, and ``ct`` and the call counts for those in
+    it or anything it called.
+    """
+    stats = {}
+    for stack, count in counts.items():
+        funcs = [parse_label(label) for label in stack]
+        for func in set(funcs):
+            cc, nc, tt, ct, callers = stats.setdefault(
+                func, (0, 0, 0, 0, {}))
+            stats[func] = (cc + count, nc + count, tt, ct + count, callers)
+        cc, nc, tt, ct, callers = stats[funcs[-1]]
+        stats[funcs[-1]] = (cc, nc, tt + count, ct, callers)
+        for caller, callee in set(zip(funcs, funcs[1:])):
+            callers = stats[callee][4]
+            callers[caller] = callers.get(caller, 0) + count
+    return stats
+
+
+class Profile(object):
+    """
+    Samples the stack of the running greenthread every ``interval`` seconds
+    of CPU time, from the first call to :meth:`runctx` or :meth:`runcall` on.
+
+    Only one instance samples at a time, the most recently started.
+
+    :param interval: seconds of CPU time between samples
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        # tuple of code objects, innermost first -> number of samples
+        self.samples = defaultdict(int)
+        self._pid = None
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        self.samples[tuple(stack)] += 1
+
+    def start(self):
+        signal.signal(signal.SIGPROF, self._sample)
+        # restart rather than fail system calls that a sample interrupts
+        signal.siginterrupt(signal.SIGPROF, False)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self._pid = os.getpid()
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        self._pid = None
+
+    def _ensure_started(self):
+        # timers aren't inherited by forked workers
+        if self._pid != os.getpid():
+            self.start()
+
+    def runctx(self, cmd, globals, locals):
+        self._ensure_started()
+        six.exec_(cmd, globals, locals)
+
+    def runcall(self, func, *args, **kw):
+        self._ensure_started()
+        return func(*args, **kw)
+
+    def folded_stacks(self):
+        """
+        :returns: a dict mapping each stack sampled, a tuple of frame labels
+                  from the outermost in, to its number of samples
+        """
+        counts = defaultdict(int)
+        # copy first; a sample may be taken while we work
+        for stack, count in list(self.samples.items()):
+            counts[tuple(frame_label(code) for code in reversed(stack))] += \
+                count
+        return counts
+
+    def dump_stats(self, filename):
+        with open(filename, 'w') as f:
+            f.write(format_folded(self.folded_stacks()))
@@ -67,6 +67,18 @@ json, csv and odf spreadsheet which requires installing odfpy library::
 
     sudo pip install odfpy
 
+Profiling every call with cProfile or the eventlet profiler slows requests
+down considerably, and attributes time spent waiting on other greenthreads
+oddly. For production use, set ``profile_module`` to
+``swift.common.middleware.x_profile.sampler``: a sampling profiler that takes
+a stack sample from whichever greenthread is running every ``sample_interval``
+seconds of CPU time, which costs well under 1% of CPU at the default of 0.01.
+Its profiles can be browsed like any other, with times and call counts being
+numbers of samples, and are also available as folded stacks for flame graph
+tools::
+
+    http://SERVER_IP:PORT/__profile__/all?format=folded
+
 There's also a simple visualization capability which is enabled by using
 matplotlib toolkit. it is also required to be installed if you want to use
 it to visualize statistic data::
@@ -91,6 +103,7 @@ from swift.common.middleware.x_profile.exceptions import NotFoundException
 from swift.common.middleware.x_profile.exceptions import ProfileException
 from swift.common.middleware.x_profile.html_viewer import HTMLViewer
 from swift.common.middleware.x_profile.profile_model import ProfileLog
+from swift.common.middleware.x_profile import sampler
 
 
 DEFAULT_PROFILE_PREFIX = '/tmp/log/swift/profile/default.profile'
@@ -166,7 +179,9 @@ class ProfileMiddleware(object):
         self.unwind = config_true_value(conf.get('unwind', 'no'))
         self.profile_module = conf.get('profile_module',
                                        'eventlet.green.profile')
-        self.profiler = get_profiler(self.profile_module)
+        self.sample_interval = float(conf.get(
+            'sample_interval', sampler.DEFAULT_INTERVAL))
+        self.profiler = self._get_profiler()
         self.profile_log = ProfileLog(self.log_filename_prefix,
                                       self.dump_timestamp)
         self.viewer = HTMLViewer(self.path, self.profile_module,
@@ -237,8 +252,13 @@ class ProfileMiddleware(object):
             self.dump_checkpoint()
             return app_iter
 
+    def _get_profiler(self):
+        if self.profile_module == sampler.__name__:
+            return sampler.Profile(self.sample_interval)
+        return get_profiler(self.profile_module)
+
     def renew_profile(self):
-        self.profiler = get_profiler(self.profile_module)
+        self.profiler = self._get_profiler()
 
 
 def get_profiler(profile_module):
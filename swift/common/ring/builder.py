@@ -37,6 +37,12 @@ from swift.common.ring import RingData
 from swift.common.ring.utils import tiers_for_dev, build_tier_tree, \
     validate_and_normalize_address, validate_replicas_by_tier, pretty_dev
 
+NUMPY_INSTALLED = True
+try:
+    import numpy
+except ImportError:
+    NUMPY_INSTALLED = False
+
 # we can't store None's in the replica2part2dev array, so we high-jack
 # the max value for magic to represent the part is not currently
 # assigned to any device.
@@ -49,6 +55,17 @@ class RingValidationWarning(Warning):
     pass
 
 
+def _numpy_part2dev(part2dev):
+    """
+    Returns a numpy copy of one replica's part2dev array.
+
+    It's a copy, not a view, so that the array can still be resized.
+    """
+    if not part2dev:
+        return numpy.zeros(0, dtype=numpy.uint16)
+    return numpy.frombuffer(part2dev, dtype=numpy.uint16).copy()
+
+
 @contextlib.contextmanager
 def _set_random_seed(seed):
     # If random seed is set when entering this context then reset original
@@ -466,7 +483,7 @@ class RingBuilder(object):
         self.devs_changed = True
         self.version += 1
 
-    def rebalance(self, seed=None):
+    def rebalance(self, seed=None, incremental=False):
         """
         Rebalance the ring.
 
@@ -481,10 +498,25 @@ class RingBuilder(object):
         below 1% or doesn't change by more than 1% (only happens with a ring
         that can't be balanced no matter what).
 
+        An incremental rebalance uses numpy to find the partitions that could
+        be gathered -- those on removed or overweight devices, or with too
+        many replicas in some tier -- and only looks any further at those.
+        When only a few devices of a large ring have changed that is far
+        fewer than all of them, and the partitions still end up assigned just
+        as they would by a full rebalance.
+
         :param seed: a value for the random seed (optional)
+        :param incremental: if True, only look at the partitions that could
+                            need to move; requires numpy
         :returns: (number_of_partitions_altered, resulting_balance,
                    number_of_removed_devices)
+        :raises RingBuilderError: if incremental is True and numpy isn't
+                                  installed
         """
+        if incremental and not NUMPY_INSTALLED:
+            raise exceptions.RingBuilderError(
+                'Incremental rebalance requires numpy')
+
         # count up the devs, and cache some stuff
         num_devices = 0
         for dev in self._iter_devs():
@@ -516,16 +548,19 @@ class RingBuilder(object):
             # gather parts from replica count adjustment
             self._adjust_replica2part2dev_size(assign_parts)
             # gather parts from failed devices
-            removed_devs = self._gather_parts_from_failed_devices(assign_parts)
+            removed_devs = self._gather_parts_from_failed_devices(
+                assign_parts, incremental=incremental)
             # gather parts for dispersion (N.B. this only picks up parts that
             # *must* disperse according to the replica plan)
-            self._gather_parts_for_dispersion(assign_parts, replica_plan)
+            self._gather_parts_for_dispersion(assign_parts, replica_plan,
+                                              incremental=incremental)
 
             # we'll gather a few times, or until we archive the plan
             for gather_count in range(MAX_BALANCE_GATHER_COUNT):
                 self._gather_parts_for_balance(assign_parts, replica_plan,
                                                # firsrt attempt go for disperse
-                                               gather_count == 0)
+                                               gather_count == 0,
+                                               incremental=incremental)
                 if not assign_parts:
                     # most likely min part hours
                     finish_status = 'Unable to finish'
@@ -586,6 +621,8 @@ class RingBuilder(object):
         :returns: number of parts with different assignments than
             old_replica2part2dev if provided
         """
+        if NUMPY_INSTALLED:
+            return self._build_dispersion_graph_numpy(old_replica2part2dev)
 
         # Since we're going to loop over every replica of every part we'll
         # also count up changed_parts if old_replica2part2dev is passed in
@@ -639,6 +676,77 @@ class RingBuilder(object):
         self.version += 1
         return changed_parts
 
+    def _build_dispersion_graph_numpy(self, old_replica2part2dev=None):
+        """
+        Does the same as _build_dispersion_graph, a tier depth at a time over
+        numpy arrays of every part's replicas rather than a part at a time.
+
+        :param old_replica2part2dev: if called from rebalance, the
+            old_replica2part2dev can be used to count moved parts.
+
+        :returns: number of parts with different assignments than
+            old_replica2part2dev if provided
+        """
+        old_replica2part2dev = old_replica2part2dev or []
+        int_replicas = int(math.ceil(self.replicas))
+        max_allowed_replicas = self._build_max_replicas_by_tier()
+
+        # like zip(), only go as far as the replica with fewest parts
+        num_parts = min([len(part2dev) for part2dev
+                         in self._replica2part2dev or []] or [0])
+        replica2part2dev = [_numpy_part2dev(part2dev)[:num_parts]
+                            for part2dev in self._replica2part2dev or []]
+
+        changed_parts = 0
+        for replica, part2dev in enumerate(replica2part2dev):
+            if replica >= len(old_replica2part2dev):
+                changed_parts += num_parts
+                continue
+            old_part2dev = _numpy_part2dev(
+                old_replica2part2dev[replica])[:num_parts]
+            changed_parts += num_parts - len(old_part2dev)
+            changed_parts += int(numpy.count_nonzero(
+                part2dev[:len(old_part2dev)] != old_part2dev))
+
+        dispersion_graph = {}
+        parts_at_risk = numpy.zeros(num_parts)
+        for depth in range(1, 5):
+            tier_index, tiers = self._build_tier_index(depth)
+            max_allowed = numpy.array(
+                [max_allowed_replicas[tier] for tier in tiers] + [0])
+            replica2part2tier = [tier_index[part2dev]
+                                 for part2dev in replica2part2dev]
+            # parts_with_replicas[t][n] is the number of parts with n
+            # replicas in tiers[t]
+            parts_with_replicas = numpy.zeros(
+                len(tiers) * (int_replicas + 1), dtype=numpy.int64)
+            risk_at_depth = numpy.zeros(num_parts)
+            for replica, part2tier in enumerate(replica2part2tier):
+                # count each tier of each part at its first replica there
+                first = part2tier >= 0
+                for earlier in replica2part2tier[:replica]:
+                    first &= earlier != part2tier
+                replicas_at_tier = sum(
+                    other == part2tier for other in replica2part2tier)
+                parts_with_replicas += numpy.bincount(
+                    part2tier[first] * (int_replicas + 1) +
+                    replicas_at_tier[first],
+                    minlength=len(parts_with_replicas))
+                over = replicas_at_tier - max_allowed[part2tier]
+                risk_at_depth += numpy.where(first & (over > 0), over, 0)
+            # count each part-replica once at tier where dispersion is worst
+            parts_at_risk = numpy.maximum(parts_at_risk, risk_at_depth)
+            for tier, counts in zip(tiers, parts_with_replicas.reshape(
+                    len(tiers), int_replicas + 1).tolist()):
+                if sum(counts):
+                    dispersion_graph[tier] = \
+                        [self.parts - sum(counts)] + counts[1:]
+        self._dispersion_graph = dispersion_graph
+        self.dispersion = 100.0 * float(parts_at_risk.sum()) / (
+            self.parts * self.replicas)
+        self.version += 1
+        return changed_parts
+
     def validate(self, stats=False):
         """
         Validate the ring.
@@ -674,10 +782,20 @@ class RingBuilder(object):
         if stats:
             # dev_usage[dev_id] will equal the number of partitions assigned to
             # that device.
-            dev_usage = array('I', (0 for _junk in range(dev_len)))
-            for part2dev in self._replica2part2dev:
-                for dev_id in part2dev:
-                    dev_usage[dev_id] += 1
+            if NUMPY_INSTALLED:
+                dev_usage = numpy.zeros(dev_len, dtype=numpy.int64)
+                for part2dev in self._replica2part2dev:
+                    dev_ids = _numpy_part2dev(part2dev)
+                    if len(dev_ids) and dev_ids.max() >= dev_len:
+                        # just like dev_usage[dev_id] += 1 would
+                        raise IndexError('array index out of range')
+                    dev_usage += numpy.bincount(dev_ids, minlength=dev_len)
+                dev_usage = array('I', dev_usage.tolist())
+            else:
+                dev_usage = array('I', (0 for _junk in range(dev_len)))
+                for part2dev in self._replica2part2dev:
+                    for dev_id in part2dev:
+                        dev_usage[dev_id] += 1
 
         for dev in self._iter_devs():
             if not isinstance(dev['port'], int):
@@ -687,8 +805,18 @@ class RingBuilder(object):
 
         int_replicas = int(math.ceil(self.replicas))
         rep2part_len = list(map(len, self._replica2part2dev))
+        if NUMPY_INSTALLED:
+            # only the first invalid part needs going through, to raise
+            # the same error as going through every part would
+            invalid_part = self._find_invalid_part(int_replicas)
+            if invalid_part is None:
+                parts = []
+            else:
+                parts = [invalid_part]
+        else:
+            parts = range(self.parts)
         # check the assignments of each part's replicas
-        for part in range(self.parts):
+        for part in parts:
             devs_for_part = []
             for replica, part_len in enumerate(rep2part_len):
                 if part_len <= part:
@@ -737,6 +865,40 @@ class RingBuilder(object):
             return dev_usage, worst
         return None, None
 
+    def _find_invalid_part(self, int_replicas):
+        """
+        Find the first part whose replicas' assignments validate() would
+        find a problem with, using numpy.
+
+        :param int_replicas: the replica count, rounded up
+        :returns: the first invalid part, or None if there are none
+        """
+        invalid_parts = []
+        # parts past the end of any but the last replica's assignments
+        if self._replica2part2dev[:int_replicas - 1]:
+            shortest = min(map(len, self._replica2part2dev[:int_replicas - 1]))
+            if shortest < self.parts:
+                invalid_parts.append(shortest)
+
+        # each part's replicas are checked up to the first that's too short
+        replica2part2dev = []
+        parts_to_check = self.parts
+        for part2dev in self._replica2part2dev:
+            parts_to_check = min(parts_to_check, len(part2dev))
+            replica2part2dev.append(
+                _numpy_part2dev(part2dev)[:parts_to_check])
+
+        real_devs = numpy.zeros(NONE_DEV + 1, dtype=bool)
+        real_devs[[dev_id for dev_id, dev in enumerate(self.devs)
+                   if dev]] = True
+        for replica, part2dev in enumerate(replica2part2dev):
+            invalid = ~real_devs[part2dev]
+            for other in replica2part2dev[:replica]:
+                invalid |= other[:len(part2dev)] == part2dev
+            if invalid.any():
+                invalid_parts.append(int(numpy.argmax(invalid)))
+        return min(invalid_parts) if invalid_parts else None
+
     def _build_balance_per_dev(self):
         """
         Build a map of <device_id> => <balance> where <balance> is a float
@@ -853,6 +1015,64 @@ class RingBuilder(object):
         """
         return build_tier_tree(d for d in self._iter_devs() if d['weight'])
 
+    def _build_tier_index(self, depth):
+        """
+        Number the tiers of the devices at the given depth, for looking up
+        the tiers of numpy arrays of device ids.
+
+        :param depth: 1 for regions, 2 for zones, 3 for servers or 4 for
+                      devices
+        :returns: a tuple of a numpy array mapping each device id to the
+                  number of its tier, or -1 for no device, and a list of the
+                  tiers in the order numbered
+        """
+        tier_index = numpy.full(NONE_DEV + 1, -1, dtype=numpy.int32)
+        tiers = []
+        tier_numbers = {}
+        for dev in self._iter_devs():
+            tier = (dev.get('tiers') or tiers_for_dev(dev))[depth - 1]
+            if tier not in tier_numbers:
+                tier_numbers[tier] = len(tiers)
+                tiers.append(tier)
+            tier_index[dev['id']] = tier_numbers[tier]
+        return tier_index, tiers
+
+    def _parts_on_devs(self, dev_ids):
+        """
+        Returns a numpy array of the partitions with a replica on any of the
+        given devices, in ascending order.
+        """
+        on_devs = numpy.zeros(NONE_DEV + 1, dtype=bool)
+        on_devs[list(dev_ids)] = True
+        found = numpy.zeros(self.parts, dtype=bool)
+        for part2dev in self._replica2part2dev:
+            found[:len(part2dev)] |= on_devs[_numpy_part2dev(part2dev)]
+        return numpy.flatnonzero(found)
+
+    def _undispersed_parts(self, replica_plan):
+        """
+        Returns the partitions with more replicas in any tier than the
+        replica plan's max for it, in ascending order.
+        """
+        replica2part2dev = []
+        for part2dev in self._replica2part2dev:
+            padded = numpy.full(self.parts, NONE_DEV, dtype=numpy.uint16)
+            padded[:len(part2dev)] = _numpy_part2dev(part2dev)
+            replica2part2dev.append(padded)
+        undispersed = numpy.zeros(self.parts, dtype=bool)
+        for depth in range(1, 5):
+            tier_index, tiers = self._build_tier_index(depth)
+            max_replicas = numpy.array(
+                [replica_plan[tier]['max'] for tier in tiers] + [0])
+            replica2part2tier = [tier_index[part2dev]
+                                 for part2dev in replica2part2dev]
+            for part2tier in replica2part2tier:
+                replicas_at_tier = sum(
+                    other == part2tier for other in replica2part2tier)
+                undispersed |= (part2tier >= 0) & (
+                    replicas_at_tier > max_replicas[part2tier])
+        return numpy.flatnonzero(undispersed).tolist()
+
     def _set_parts_wanted(self, replica_plan):
         """
         Sets the parts_wanted key for each of the devices to the number of
@@ -925,20 +1145,30 @@ class RingBuilder(object):
         elapsed_hours = int(time() - self._last_part_moves_epoch) // 3600
         if elapsed_hours <= 0:
             return
-        for part in range(self.parts):
-            # The "min(self._last_part_moves[part] + elapsed_hours, 0xff)"
-            # which was here showed up in profiling, so it got inlined.
-            last_plus_elapsed = self._last_part_moves[part] + elapsed_hours
-            if last_plus_elapsed < 0xff:
-                self._last_part_moves[part] = last_plus_elapsed
-            else:
-                self._last_part_moves[part] = 0xff
+        if NUMPY_INSTALLED:
+            last_part_moves = numpy.minimum(numpy.frombuffer(
+                self._last_part_moves, dtype=numpy.uint8).astype(
+                    numpy.int64) + elapsed_hours, 0xff).astype(numpy.uint8)
+            self._last_part_moves = array('B', last_part_moves.tobytes())
+        else:
+            for part in range(self.parts):
+                # The "min(self._last_part_moves[part] + elapsed_hours, 0xff)"
+                # which was here showed up in profiling, so it got inlined.
+                last_plus_elapsed = self._last_part_moves[part] + elapsed_hours
+                if last_plus_elapsed < 0xff:
+                    self._last_part_moves[part] = last_plus_elapsed
+                else:
+                    self._last_part_moves[part] = 0xff
         self._last_part_moves_epoch = int(time())
 
-    def _gather_parts_from_failed_devices(self, assign_parts):
+    def _gather_parts_from_failed_devices(self, assign_parts,
+                                          incremental=False):
         """
         Update the map of partition => [replicas] to be reassigned from
         removed devices.
+
+        :param incremental: if True, only look at the replicas on removed
+                            devices
         """
         # First we gather partitions from removed devices. Since removed
         # devices usually indicate device failures, we have no choice but to
@@ -948,7 +1178,15 @@ class RingBuilder(object):
         if self._remove_devs:
             dev_ids = [d['id'] for d in self._remove_devs if d['parts']]
             if dev_ids:
-                for part, replica in self._each_part_replica():
+                if incremental:
+                    part_replicas = (
+                        (part, replica) for replica, part2dev
+                        in enumerate(self._replica2part2dev)
+                        for part in numpy.flatnonzero(numpy.isin(
+                            _numpy_part2dev(part2dev), dev_ids)).tolist())
+                else:
+                    part_replicas = self._each_part_replica()
+                for part, replica in part_replicas:
                     dev_id = self._replica2part2dev[replica][part]
                     if dev_id in dev_ids:
                         self._replica2part2dev[replica][part] = NONE_DEV
@@ -1032,14 +1270,22 @@ class RingBuilder(object):
             "%d new parts and %d removed parts from replica-count change",
             new_parts, removed_parts)
 
-    def _gather_parts_for_dispersion(self, assign_parts, replica_plan):
+    def _gather_parts_for_dispersion(self, assign_parts, replica_plan,
+                                     incremental=False):
         """
         Update the map of partition => [replicas] to be reassigned from
         insufficiently-far-apart replicas.
+
+        :param incremental: if True, only look at the partitions with too
+                            many replicas in some tier
         """
+        if incremental:
+            parts = self._undispersed_parts(replica_plan)
+        else:
+            parts = range(self.parts)
         # Now we gather partitions that are "at risk" because they aren't
         # currently sufficient spread out across the cluster.
-        for part in range(self.parts):
+        for part in parts:
             if (not self._can_part_move(part)):
                 continue
             # First, add up the count of replicas at each tier for each
@@ -1087,7 +1333,8 @@ class RingBuilder(object):
                 self._set_part_moved(part)
 
     def _gather_parts_for_balance_can_disperse(self, assign_parts, start,
-                                               replica_plan):
+                                               replica_plan,
+                                               incremental=False):
         """
         Update the map of partition => [replicas] to be reassigned from
         overweight drives where the replicas can be better dispersed to
@@ -1096,6 +1343,8 @@ class RingBuilder(object):
         :param assign_parts: the map of partition => [replica] to update
         :param start: offset into self.parts to begin search
         :param replica_plan: replicanth targets for tiers
+        :param incremental: if True, only look at the partitions on
+                            overweight devices
         """
         tier2children = self._build_tier2children()
         parts_wanted_in_tier = defaultdict(int)
@@ -1105,8 +1354,7 @@ class RingBuilder(object):
                 parts_wanted_in_tier[tier] += wanted
         # Last, we gather partitions from devices that are "overweight" because
         # they have more partitions than their parts_wanted.
-        for offset in range(self.parts):
-            part = (start + offset) % self.parts
+        for part in self._parts_for_balance(start, incremental):
             if (not self._can_part_move(part)):
                 continue
             # For each part we'll look at the devices holding those parts and
@@ -1161,7 +1409,7 @@ class RingBuilder(object):
                 break
 
     def _gather_parts_for_balance(self, assign_parts, replica_plan,
-                                  disperse_first):
+                                  disperse_first, incremental=False):
         """
         Gather parts that look like they should move for balance reasons.
 
@@ -1169,6 +1417,8 @@ class RingBuilder(object):
         we'll switch strategies if things don't seem to move.
         :param disperse_first: boolean, avoid replicas on overweight devices
                                that need to be there for dispersion
+        :param incremental: if True, only look at the partitions on
+                            overweight devices
         """
         # pick a random starting point on the other side of the ring
         quarter_turn = (self.parts // 4)
@@ -1183,10 +1433,56 @@ class RingBuilder(object):
 
         if disperse_first:
             self._gather_parts_for_balance_can_disperse(
-                assign_parts, start, replica_plan)
-        self._gather_parts_for_balance_forced(assign_parts, start)
+                assign_parts, start, replica_plan, incremental=incremental)
+        self._gather_parts_for_balance_forced(assign_parts, start,
+                                              incremental=incremental)
+
+    def _parts_for_balance(self, start, incremental=False):
+        """
+        Returns the partitions to look at when gathering for balance, in the
+        order they come in going round the ring from start.
+
+        :param start: offset into self.parts to begin search
+        :param incremental: if True, only the partitions on overweight
+                            devices; the only ones that can be gathered
+        """
+        if incremental:
+            return self._iter_parts_on_overweight_devs(start)
+        return ((start + offset) % self.parts for offset in range(self.parts))
+
+    def _iter_parts_on_overweight_devs(self, start):
+        """
+        Generator yielding the partitions with a replica on an overweight
+        device, in the order they come in going round the ring from start.
+
+        Gathering parts only ever leaves devices less overweight, so whenever
+        half the devices searched for have stopped being overweight the
+        partitions left are found again for those that still are, and once
+        none are there's nothing left to yield.
+        """
+        overweight_devs = [dev for dev in self._iter_devs()
+                           if dev['parts_wanted'] < 0]
+        # how far round the ring from start we've already yielded
+        done = 0
+        while overweight_devs:
+            num_searched = len(overweight_devs)
+            parts = self._parts_on_devs(dev['id'] for dev in overweight_devs)
+            offsets = (parts - start) % self.parts
+            not_done = offsets >= done
+            parts = parts[not_done][numpy.argsort(offsets[not_done])]
+            for i, part in enumerate(parts.tolist()):
+                yield part
+                done = (part - start) % self.parts + 1
+                if i % 1024 == 1023:
+                    overweight_devs = [dev for dev in overweight_devs
+                                       if dev['parts_wanted'] < 0]
+                    if len(overweight_devs) <= num_searched // 2:
+                        break
+            else:
+                return
 
-    def _gather_parts_for_balance_forced(self, assign_parts, start, **kwargs):
+    def _gather_parts_for_balance_forced(self, assign_parts, start,
+                                         incremental=False, **kwargs):
         """
         Update the map of partition => [replicas] to be reassigned from
         overweight drives without restriction, parts gathered from this method
@@ -1199,9 +1495,10 @@ class RingBuilder(object):
 
         :param assign_parts: the map of partition => [replica] to update
         :param start: offset into self.parts to begin search
+        :param incremental: if True, only look at the partitions on
+                            overweight devices
         """
-        for offset in range(self.parts):
-            part = (start + offset) % self.parts
+        for part in self._parts_for_balance(start, incremental):
             if (not self._can_part_move(part)):
                 continue
             overweight_dev_replica = []
@@ -14,6 +14,9 @@
 # limitations under the License.
 
 import array
+import copy
+import ctypes
+import mmap
 import six.moves.cPickle as pickle
 import json
 from collections import defaultdict
@@ -35,12 +38,92 @@ from swift.common.utils import hash_path, validate_configuration
 from swift.common.ring.utils import tiers_for_dev
 
 
+# part2dev tables in v2 ring files start on a multiple of this many bytes
+V2_TABLE_ALIGNMENT = 8
+
+
 def calc_replica_count(replica2part2dev_id):
     base = len(replica2part2dev_id) - 1
     extra = 1.0 * len(replica2part2dev_id[-1]) / len(replica2part2dev_id[0])
     return base + extra
 
 
+def calc_dev_ids_with_parts(replica2part2dev_id):
+    """
+    :returns: the set of ids of devices with at least one partition replica
+              assigned
+    """
+    dev_ids = set()
+    for part2dev_id in replica2part2dev_id:
+        dev_ids.update(part2dev_id)
+    return dev_ids
+
+
+def calc_tier2dev_ids(devs):
+    """
+    :returns: a list of ``[tier, dev_ids]`` pairs, one for each tier of the
+              given devices, with the ids of the devices in the tier in the
+              order they're in ``devs``
+    """
+    tier2dev_ids = defaultdict(list)
+    for dev in devs:
+        if not dev:
+            continue
+        for tier in tiers_for_dev(dev):
+            tier2dev_ids[tier].append(dev['id'])
+    return sorted([list(tier), dev_ids]
+                  for tier, dev_ids in tier2dev_ids.items())
+
+
+def _v2_table_offset(json_len):
+    # magic, version and JSON length, then the JSON, then padding
+    end_of_json = 10 + json_len
+    return -(-end_of_json // V2_TABLE_ALIGNMENT) * V2_TABLE_ALIGNMENT
+
+
+def _part2dev_view_eq(self, other):
+    try:
+        return len(self) == len(other) and all(
+            a == b for a, b in zip(self, other))
+    except TypeError:
+        return NotImplemented
+
+
+def _part2dev_view_ne(self, other):
+    eq = _part2dev_view_eq(self, other)
+    return eq if eq is NotImplemented else not eq
+
+
+_part2dev_view_types = {}
+
+
+def _part2dev_view(buf, offset, length):
+    """
+    On Python 2, which has no typed memoryviews, returns a ctypes array of
+    unsigned shorts viewing ``length`` of them in ``buf`` from ``offset``.
+    Like an array, and the memoryviews of Python 3, it is equal to any
+    sequence of the same numbers.
+    """
+    view_type = _part2dev_view_types.get(length)
+    if view_type is None:
+        view_type = _part2dev_view_types[length] = type(
+            'Part2DevView', (ctypes.Array,), {
+                '_type_': ctypes.c_uint16, '_length_': length,
+                '__eq__': _part2dev_view_eq, '__ne__': _part2dev_view_ne,
+                '__hash__': None})
+    return view_type.from_buffer(buf, offset)
+
+
+def _part2dev_bytes(part2dev_id):
+    if isinstance(part2dev_id, ctypes.Array):
+        part2dev_id = memoryview(part2dev_id)
+    elif not isinstance(part2dev_id, (array.array, memoryview)):
+        part2dev_id = array.array('H', part2dev_id)
+    if hasattr(part2dev_id, 'tobytes'):
+        return part2dev_id.tobytes()
+    return part2dev_id.tostring()
+
+
 class RingData(object):
     """Partitioned consistent hashing ring data (used for serialization)."""
 
@@ -50,6 +133,11 @@ class RingData(object):
         self._replica2part2dev_id = replica2part2dev_id
         self._part_shift = part_shift
         self.next_part_power = next_part_power
+        # set when loaded from a file that has them precomputed
+        self.dev_ids_with_parts = None
+        self.tier2dev_ids = None
+        # set when loaded from a file
+        self.mtime = None
 
         for dev in self.devs:
             if dev is not None:
@@ -95,6 +183,65 @@ class RingData(object):
 
         return ring_dict
 
+    @classmethod
+    def deserialize_v2(cls, ring_file, metadata_only=False):
+        """
+        Deserialize a v2 ring file into a dictionary with `devs`,
+        `part_shift`, `replica2part2dev_id`, `dev_ids_with_parts` and
+        `tier2dev_ids` keys.
+
+        A v2 ring file isn't compressed, so its `replica2part2dev_id` tables
+        are mapped into memory rather than read. Their pages are then loaded
+        as they are used, and shared by every process using the same ring.
+        The tables are typed views of the mapping: memoryviews on Python 3,
+        and ctypes arrays on Python 2, which has no typed memoryviews. Only
+        when the ring was written on a machine of the other byte order are
+        they copied out of the mapping into arrays instead.
+
+        :param file ring_file: An opened file which has already consumed the
+                               6 bytes of magic and version.
+        :param bool metadata_only: If True, only load `devs` and `part_shift`
+        :returns: A dict containing `devs`, `part_shift`,
+                  `replica2part2dev_id`, `dev_ids_with_parts` and
+                  `tier2dev_ids`
+        """
+
+        json_len, = struct.unpack('!I', ring_file.read(4))
+        ring_dict = json.loads(ring_file.read(json_len))
+        ring_dict['replica2part2dev_id'] = []
+
+        if metadata_only:
+            return ring_dict
+
+        byteswap = (ring_dict.get('byteorder', sys.byteorder) != sys.byteorder)
+        cast_tables = hasattr(memoryview, 'cast')
+
+        if byteswap or cast_tables:
+            mapped = mmap.mmap(ring_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # ctypes can only make views of a writable buffer; a private
+            # mapping is one, and is still backed by the page cache, shared
+            # with every other process, for as long as nothing writes to it
+            mapped = mmap.mmap(ring_file.fileno(), 0, access=mmap.ACCESS_COPY)
+        if cast_tables and not byteswap:
+            mapped = memoryview(mapped)
+        offset = _v2_table_offset(json_len)
+        for length in ring_dict['replica_lengths']:
+            end = offset + 2 * length
+            if end > len(mapped):
+                raise ValueError('Ring file is truncated')
+            if byteswap:
+                part2dev = array.array('H', mapped[offset:end])
+                part2dev.byteswap()
+            elif cast_tables:
+                part2dev = mapped[offset:end].cast('H')
+            else:
+                part2dev = _part2dev_view(mapped, offset, length)
+            ring_dict['replica2part2dev_id'].append(part2dev)
+            offset = end
+
+        return ring_dict
+
     @classmethod
     def load(cls, filename, metadata_only=False):
         """
@@ -104,32 +251,69 @@ class RingData(object):
         :param bool metadata_only: If True, only load `devs` and `part_shift`.
         :returns: A RingData instance containing the loaded data.
         """
-        gz_file = BufferedReader(GzipFile(filename, 'rb'))
-
-        # See if the file is in the new format
-        magic = gz_file.read(4)
-        if magic == b'R1NG':
-            format_version, = struct.unpack('!H', gz_file.read(2))
-            if format_version == 1:
-                ring_data = cls.deserialize_v1(
-                    gz_file, metadata_only=metadata_only)
+        with open(filename, 'rb') as ring_file:
+            # the mtime of the file actually read, even if it is replaced
+            # while being loaded
+            mtime = os.fstat(ring_file.fileno()).st_mtime
+            if ring_file.read(6) == struct.pack('!4sH', b'R1NG', 2):
+                ring_dict = cls.deserialize_v2(
+                    ring_file, metadata_only=metadata_only)
+                ring_data = RingData(ring_dict['replica2part2dev_id'],
+                                     ring_dict['devs'],
+                                     ring_dict['part_shift'],
+                                     ring_dict.get('next_part_power'))
+                ring_data.dev_ids_with_parts = set(
+                    ring_dict['dev_ids_with_parts'])
+                ring_data.tier2dev_ids = ring_dict.get('tier2dev_ids')
+                ring_data.mtime = mtime
+                return ring_data
+
+            ring_file.seek(0)
+            gz_file = BufferedReader(GzipFile(fileobj=ring_file, mode='rb'))
+
+            # See if the file is in the new format
+            magic = gz_file.read(4)
+            if magic == b'R1NG':
+                format_version, = struct.unpack('!H', gz_file.read(2))
+                if format_version == 1:
+                    ring_data = cls.deserialize_v1(
+                        gz_file, metadata_only=metadata_only)
+                else:
+                    raise Exception('Unknown ring format version %d' %
+                                    format_version)
             else:
-                raise Exception('Unknown ring format version %d' %
-                                format_version)
-        else:
-            # Assume old-style pickled ring
-            gz_file.seek(0)
-            ring_data = pickle.load(gz_file)
+                # Assume old-style pickled ring
+                gz_file.seek(0)
+                ring_data = pickle.load(gz_file)
 
         if not hasattr(ring_data, 'devs'):
             ring_data = RingData(ring_data['replica2part2dev_id'],
                                  ring_data['devs'], ring_data['part_shift'],
                                  ring_data.get('next_part_power'))
+        ring_data.mtime = mtime
         return ring_data
 
-    def serialize_v1(self, file_obj):
-        # Write out new-style serialization magic and version:
-        file_obj.write(struct.pack('!4sH', b'R1NG', 1))
+    @classmethod
+    def file_format_version(cls, filename):
+        """
+        :param filename: Path to a ring file.
+        :returns: the version of the format the ring file is in; 0 for the
+                  pickled rings of Swift 1.6.0 and earlier
+        """
+        with open(filename, 'rb') as ring_file:
+            if ring_file.read(6) == struct.pack('!4sH', b'R1NG', 2):
+                return 2
+        gz_file = GzipFile(filename, 'rb')
+        try:
+            magic = gz_file.read(6)
+        finally:
+            gz_file.close()
+        if magic[:4] == b'R1NG':
+            return struct.unpack('!H', magic[4:])[0]
+        return 0
+
+    def _serialize_header(self, file_obj, format_version, **extra):
+        file_obj.write(struct.pack('!4sH', b'R1NG', format_version))
         ring = self.to_dict()
 
         # Only include next_part_power if it is set in the
@@ -137,6 +321,7 @@ class RingData(object):
         _text = {'devs': ring['devs'], 'part_shift': ring['part_shift'],
                  'replica_count': len(ring['replica2part2dev_id']),
                  'byteorder': sys.byteorder}
+        _text.update(extra)
 
         next_part_power = ring.get('next_part_power')
         if next_part_power is not None:
@@ -147,24 +332,60 @@ class RingData(object):
         json_len = len(json_text)
         file_obj.write(struct.pack('!I', json_len))
         file_obj.write(json_text)
-        for part2dev_id in ring['replica2part2dev_id']:
-            file_obj.write(part2dev_id.tostring())
+        return json_len
 
-    def save(self, filename, mtime=1300507380.0):
+    def serialize_v1(self, file_obj):
+        # Write out new-style serialization magic and version:
+        self._serialize_header(file_obj, 1)
+        for part2dev_id in self._replica2part2dev_id:
+            file_obj.write(_part2dev_bytes(part2dev_id))
+
+    def serialize_v2(self, file_obj):
+        """
+        Write this ring out in the v2 format: like v1, but uncompressed, with
+        the part2dev tables aligned and their lengths given up front so they
+        can be mapped into memory, and with the ids of devices having any
+        partitions assigned and the devices in each tier precomputed.
+        """
+        json_len = self._serialize_header(
+            file_obj, 2,
+            replica_lengths=[len(part2dev_id) for part2dev_id
+                             in self._replica2part2dev_id],
+            dev_ids_with_parts=sorted(calc_dev_ids_with_parts(
+                self._replica2part2dev_id)),
+            tier2dev_ids=calc_tier2dev_ids(self.devs))
+        file_obj.write(b'\0' * (_v2_table_offset(json_len) - 10 - json_len))
+        for part2dev_id in self._replica2part2dev_id:
+            file_obj.write(_part2dev_bytes(part2dev_id))
+
+    def save(self, filename, mtime=1300507380.0, format_version=1):
         """
         Serialize this RingData instance to disk.
 
+        The file is written alongside and then renamed into place, so
+        processes that have the old file mapped into memory keep it.
+
         :param filename: File into which this instance should be serialized.
         :param mtime: time used to override mtime for gzip, default or None
                       if the caller wants to include time
+        :param format_version: 1 for a gzipped ring, which any Swift since
+                               1.6.0 can read, or 2 for one that can be
+                               mapped into memory
         """
-        # Override the timestamp so that the same ring data creates
-        # the same bytes on disk. This makes a checksum comparison a
-        # good way to see if two rings are identical.
+        if format_version not in (1, 2):
+            raise ValueError('Unknown ring format version %r' %
+                             format_version)
         tempf = NamedTemporaryFile(dir=".", prefix=filename, delete=False)
-        gz_file = GzipFile(filename, mode='wb', fileobj=tempf, mtime=mtime)
-        self.serialize_v1(gz_file)
-        gz_file.close()
+        if format_version == 2:
+            self.serialize_v2(tempf)
+        else:
+            # Override the timestamp so that the same ring data creates
+            # the same bytes on disk. This makes a checksum comparison a
+            # good way to see if two rings are identical.
+            gz_file = GzipFile(filename, mode='wb', fileobj=tempf,
+                               mtime=mtime)
+            self.serialize_v1(gz_file)
+            gz_file.close()
         tempf.flush()
         os.fsync(tempf.fileno())
         tempf.close()
@@ -218,29 +439,39 @@ class Ring(object):
                     # ring data if the new ring data is invalid.
                     return
 
-            self._mtime = getmtime(self.serialized_path)
-            self._devs = ring_data.devs
-            # NOTE(akscram): Replication parameters like replication_ip
-            #                and replication_port are required for
-            #                replication process. An old replication
-            #                ring doesn't contain this parameters into
-            #                device. Old-style pickled rings won't have
-            #                region information.
-            for dev in self._devs:
-                if dev:
-                    dev.setdefault('region', 1)
-                    if 'ip' in dev:
-                        dev.setdefault('replication_ip', dev['ip'])
-                    if 'port' in dev:
-                        dev.setdefault('replication_port', dev['port'])
-
-            self._replica2part2dev_id = ring_data._replica2part2dev_id
-            self._part_shift = ring_data._part_shift
-            self._rebuild_tier_data()
-            self._update_bookkeeping()
-            self._next_part_power = ring_data.next_part_power
-
-    def _update_bookkeeping(self):
+            # Work out everything from the new ring data on a copy, then swap
+            # it all in at once, so that nothing sees a mix of the two rings.
+            new_ring = copy.copy(self)
+            new_ring._load_ring_data(ring_data)
+            # If the file is replaced while it's loaded, the new file's mtime
+            # must not be recorded for the old file's data.
+            new_ring._mtime = ring_data.mtime
+            self.__dict__.update(new_ring.__dict__)
+
+    def _load_ring_data(self, ring_data):
+        self._devs = ring_data.devs
+        # NOTE(akscram): Replication parameters like replication_ip
+        #                and replication_port are required for
+        #                replication process. An old replication
+        #                ring doesn't contain this parameters into
+        #                device. Old-style pickled rings won't have
+        #                region information.
+        for dev in self._devs:
+            if dev:
+                dev.setdefault('region', 1)
+                if 'ip' in dev:
+                    dev.setdefault('replication_ip', dev['ip'])
+                if 'port' in dev:
+                    dev.setdefault('replication_port', dev['port'])
+
+        self._replica2part2dev_id = ring_data._replica2part2dev_id
+        self._part_shift = ring_data._part_shift
+        self._rebuild_tier_data(getattr(ring_data, 'tier2dev_ids', None))
+        self._update_bookkeeping(
+            getattr(ring_data, 'dev_ids_with_parts', None))
+        self._next_part_power = ring_data.next_part_power
+
+    def _update_bookkeeping(self, dev_ids_with_parts=None):
         # Do this now, when we know the data has changed, rather than
         # doing it on every call to get_more_nodes().
         #
@@ -249,10 +480,12 @@ class Ring(object):
         # way, a region, zone, or server with no partitions assigned
         # does not count toward our totals, thereby keeping the early
         # bailouts in get_more_nodes() working.
-        dev_ids_with_parts = set()
-        for part2dev_id in self._replica2part2dev_id:
-            for dev_id in part2dev_id:
-                dev_ids_with_parts.add(dev_id)
+        #
+        # Ring files in the v2 format come with dev_ids_with_parts
+        # worked out, saving a pass over every partition replica.
+        if dev_ids_with_parts is None:
+            dev_ids_with_parts = calc_dev_ids_with_parts(
+                self._replica2part2dev_id)
         regions = set()
         zones = set()
         ips = set()
@@ -275,13 +508,20 @@ class Ring(object):
     def part_power(self):
         return 32 - self._part_shift
 
-    def _rebuild_tier_data(self):
+    def _rebuild_tier_data(self, tier2dev_ids=None):
         self.tier2devs = defaultdict(list)
-        for dev in self._devs:
-            if not dev:
-                continue
-            for tier in tiers_for_dev(dev):
-                self.tier2devs[tier].append(dev)
+        if tier2dev_ids is None:
+            for dev in self._devs:
+                if not dev:
+                    continue
+                for tier in tiers_for_dev(dev):
+                    self.tier2devs[tier].append(dev)
+        else:
+            # Ring files in the v2 format come with the devices in each tier
+            # worked out.
+            for tier, dev_ids in tier2dev_ids:
+                self.tier2devs[tuple(tier)] = [
+                    self._devs[dev_id] for dev_id in dev_ids]
 
         tiers_by_length = defaultdict(list)
         for tier in self.tier2devs:
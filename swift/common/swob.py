@@ -147,6 +147,31 @@ class WsgiBytesIO(BytesIO):
         pass
 
 
+def _memoized(maxsize):
+    """
+    Decorator to memoize a function of one (hashable) argument. The memo
+    forgets everything once it holds ``maxsize`` entries, so it stays small
+    even when fed client-controlled values.
+    """
+    def decorator(func):
+        memo = {}
+
+        @functools.wraps(func)
+        def wrapper(arg):
+            try:
+                return memo[arg]
+            except KeyError:
+                pass
+            value = func(arg)
+            if len(memo) >= maxsize:
+                memo.clear()
+            memo[arg] = value
+            return value
+        wrapper.memo = memo
+        return wrapper
+    return decorator
+
+
 def _datetime_property(header):
     """
     Set and retrieve the datetime value of self.headers[header]
@@ -220,7 +245,7 @@ def _header_int_property(header):
                     doc="Retrieve and set the %s header as an int" % header)
 
 
-def header_to_environ_key(header_name):
+def _header_to_environ_key(header_name):
     # Why the to/from wsgi dance? Headers that include something like b'\xff'
     # on the wire get translated to u'\u00ff' on py3, which gets upper()ed to
     # u'\u0178', which is nonsense in a WSGI string.
@@ -233,6 +258,23 @@ def header_to_environ_key(header_name):
     return header_name
 
 
+_memoized_header_to_environ_key = _memoized(1024)(_header_to_environ_key)
+
+
+def header_to_environ_key(header_name):
+    if type(header_name) is str:
+        return _memoized_header_to_environ_key(header_name)
+    # don't let a py2 unicode header name into the memo, where an equal str
+    # would find it and get back a unicode environ key
+    return _header_to_environ_key(header_name)
+
+
+@_memoized(1024)
+def _environ_key_to_header(environ_key):
+    # See the to/from WSGI comment in header_to_environ_key
+    return str_to_wsgi(wsgi_to_str(environ_key[5:]).replace('_', '-').title())
+
+
 class HeaderEnvironProxy(MutableMapping):
     """
     A dict-like object that proxies requests to a wsgi environ,
@@ -267,12 +309,14 @@ class HeaderEnvironProxy(MutableMapping):
     def __contains__(self, key):
         return header_to_environ_key(key) in self.environ
 
+    def get(self, key, default=None):
+        return self.environ.get(header_to_environ_key(key), default)
+
     def __delitem__(self, key):
         del self.environ[header_to_environ_key(key)]
 
     def keys(self):
-        # See the to/from WSGI comment in header_to_environ_key
-        keys = [str_to_wsgi(wsgi_to_str(key[5:]).replace('_', '-').title())
+        keys = [_environ_key_to_header(key)
                 for key in self.environ if key.startswith('HTTP_')]
         if 'CONTENT_LENGTH' in self.environ:
             keys.append('Content-Length')
@@ -548,13 +592,21 @@ class Range(object):
 
     :param headerval: value of the header as a str
     """
+    __slots__ = ('ranges',)
+
     def __init__(self, headerval):
         if not headerval:
             raise ValueError('Invalid Range header: %r' % headerval)
+        # the parsed ranges are shared, but callers may modify ours
+        self.ranges = list(self._parse(headerval))
+
+    @staticmethod
+    @_memoized(1024)
+    def _parse(headerval):
         headerval = headerval.replace(' ', '')
         if not headerval.lower().startswith('bytes='):
             raise ValueError('Invalid Range header: %s' % headerval)
-        self.ranges = []
+        ranges = []
         for rng in headerval[6:].split(','):
             # Check if the range has required hyphen.
             if rng.find('-') == -1:
@@ -580,7 +632,8 @@ class Range(object):
                 end = None
                 if start is None:
                     raise ValueError('Invalid Range header: %s' % headerval)
-            self.ranges.append((start, end))
+            ranges.append((start, end))
+        return tuple(ranges)
 
     def __str__(self):
         string = 'bytes='
@@ -701,16 +754,24 @@ class Match(object):
 
     :param headerval: value of the header as a str
     """
+    __slots__ = ('tags',)
+
     def __init__(self, headerval):
-        self.tags = set()
+        self.tags = set(self._parse(headerval))
+
+    @staticmethod
+    @_memoized(1024)
+    def _parse(headerval):
+        tags = set()
         for tag in headerval.split(','):
             tag = tag.strip()
             if not tag:
                 continue
             if tag.startswith('"') and tag.endswith('"'):
-                self.tags.add(tag[1:-1])
+                tags.add(tag[1:-1])
             else:
-                self.tags.add(tag)
+                tags.add(tag)
+        return frozenset(tags)
 
     def __contains__(self, val):
         if val and val.startswith('"') and val.endswith('"'):
@@ -740,15 +801,22 @@ class Accept(object):
            r')(' + extension + r'*?\s*)$')
     acc_pattern = re.compile(acc)
 
+    __slots__ = ('headerval',)
+
     def __init__(self, headerval):
         self.headerval = headerval
 
     def _get_types(self):
-        types = []
         if not self.headerval:
             return []
-        for typ in self.headerval.split(','):
-            type_parms = self.acc_pattern.findall(typ)
+        return list(self._parse(self.headerval))
+
+    @staticmethod
+    @_memoized(1024)
+    def _parse(headerval):
+        types = []
+        for typ in headerval.split(','):
+            type_parms = Accept.acc_pattern.findall(typ)
             if not type_parms:
                 raise ValueError('Invalid accept header')
             typ, subtype, parms = type_parms[0]
@@ -768,12 +836,12 @@ class Accept(object):
                     quality = float(value)
 
             pattern = '^' + \
-                (self.token if typ == '*' else re.escape(typ)) + '/' + \
-                (self.token if subtype == '*' else re.escape(subtype)) + '$'
+                (Accept.token if typ == '*' else re.escape(typ)) + '/' + \
+                (Accept.token if subtype == '*' else re.escape(subtype)) + '$'
             types.append((pattern, quality, '*' not in (typ, subtype)))
         # sort candidates by quality, then whether or not there were globs
         types.sort(reverse=True, key=lambda t: (t[1], t[2]))
-        return [t[0] for t in types]
+        return tuple(t[0] for t in types)
 
     def best_match(self, options):
         """
@@ -864,6 +932,21 @@ def _host_url_property():
     return property(getter, doc="Get url for request/response up to path")
 
 
+@_memoized(1024)
+def _parse_query_string(query_string):
+    if six.PY2:
+        return tuple(urllib.parse.parse_qsl(query_string, True))
+    return tuple(urllib.parse.parse_qsl(
+        query_string, keep_blank_values=True, encoding='latin-1'))
+
+
+@_memoized(1024)
+def _quote_path(path):
+    if six.PY2:
+        return urllib.parse.quote(path)
+    return urllib.parse.quote(path, encoding='latin-1')
+
+
 def is_chunked(headers):
     te = None
     for key in headers:
@@ -1000,13 +1083,8 @@ class Request(object):
         "Provides QUERY_STRING parameters as a dictionary"
         if self._params_cache is None:
             if 'QUERY_STRING' in self.environ:
-                if six.PY2:
-                    self._params_cache = dict(urllib.parse.parse_qsl(
-                        self.environ['QUERY_STRING'], True))
-                else:
-                    self._params_cache = dict(urllib.parse.parse_qsl(
-                        self.environ['QUERY_STRING'],
-                        keep_blank_values=True, encoding='latin-1'))
+                self._params_cache = dict(_parse_query_string(
+                    self.environ['QUERY_STRING']))
             else:
                 self._params_cache = {}
         return self._params_cache
@@ -1048,13 +1126,8 @@ class Request(object):
     @property
     def path(self):
         "Provides the full path of the request, excluding the QUERY_STRING"
-        if six.PY2:
-            return urllib.parse.quote(self.environ.get('SCRIPT_NAME', '') +
-                                      self.environ['PATH_INFO'])
-        else:
-            return urllib.parse.quote(self.environ.get('SCRIPT_NAME', '') +
-                                      self.environ['PATH_INFO'],
-                                      encoding='latin-1')
+        return _quote_path(self.environ.get('SCRIPT_NAME', '') +
+                           self.environ['PATH_INFO'])
 
     @property
     def swift_entity_path(self):
@@ -1231,6 +1304,7 @@ class Response(object):
     accept_ranges = _header_property('accept-ranges')
     charset = _resp_charset_property()
     app_iter = _resp_app_iter_property()
+    _boundary = None
 
     def __init__(self, body=None, status=200, headers=None, app_iter=None,
                  request=None, conditional_response=False,
@@ -1248,7 +1322,6 @@ class Response(object):
         self.app_iter = app_iter
         self.response_iter = None
         self.status = status
-        self.boundary = b"%.32x" % random.randint(0, 256 ** 16)
         if request:
             self.environ = request.environ
         else:
@@ -1269,6 +1342,20 @@ class Response(object):
         if 'charset' in kw and 'content_type' in kw:
             self.charset = kw['charset']
 
+    @property
+    def boundary(self):
+        """
+        The MIME boundary for multipart/byteranges responses; only made up
+        when first needed, since most responses never need one.
+        """
+        if self._boundary is None:
+            self._boundary = b"%.32x" % random.randint(0, 256 ** 16)
+        return self._boundary
+
+    @boundary.setter
+    def boundary(self, value):
+        self._boundary = value
+
     @property
     def conditional_etag(self):
         """
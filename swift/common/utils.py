@@ -105,6 +105,8 @@ _libc_accept = None
 _libc_setpriority = None
 # see man -s 2 syscall
 _posix_syscall = None
+# see man -s 2 sched_setaffinity
+_libc_sched_setaffinity = None
 
 # If set to non-zero, fallocate routines will fail based on free space
 # available being at or below this amount, in bytes.
@@ -1824,6 +1826,106 @@ class StatsdClient(object):
                                sample_rate)
 
 
+class AggregatingStatsdClient(StatsdClient):
+    """
+    A StatsdClient that aggregates metrics in-process and periodically sends
+    them as multi-metric packets rather than sending one UDP datagram per
+    metric.
+
+    Counters are summed per metric name (scaled up by any sample rate, so no
+    sample rate is sent). Timing samples are not aggregated, since the StatsD
+    server has to combine them with those of other processes; each is sent as
+    a ``|ms`` timer, with its sample rate, but many are sent per packet.
+
+    Aggregated metrics are flushed when a metric is recorded more than
+    ``flush_interval`` seconds after the first metric of the current window,
+    and also by a green thread scheduled for the end of each window.
+
+    :param flush_interval: seconds between flushes
+    :param max_packet_size: the maximum size in bytes of each packet sent
+    """
+    def __init__(self, host, port, base_prefix='', tail_prefix='',
+                 default_sample_rate=1, sample_rate_factor=1, logger=None,
+                 flush_interval=1.0, max_packet_size=1400):
+        super(AggregatingStatsdClient, self).__init__(
+            host, port, base_prefix, tail_prefix, default_sample_rate,
+            sample_rate_factor, logger)
+        self.flush_interval = flush_interval
+        self.max_packet_size = max_packet_size
+        self._counters = {}
+        self._timings = []
+        self._window_start = None
+
+    def _send(self, m_name, m_value, m_type, sample_rate):
+        if sample_rate is None:
+            sample_rate = self._default_sample_rate
+        sample_rate = sample_rate * self._sample_rate_factor
+        if sample_rate < 1 and self.random() >= sample_rate:
+            return
+        name = self._prefix + m_name
+        if m_type == 'ms':
+            self._timings.append((name, m_value, sample_rate))
+        else:
+            if sample_rate < 1:
+                m_value = m_value / float(sample_rate)
+            self._counters[name] = self._counters.get(name, 0) + m_value
+
+        now = time.time()
+        if self._window_start is None:
+            self._window_start = now
+            eventlet.spawn_after(self.flush_interval, self.flush)
+        elif now - self._window_start >= self.flush_interval:
+            self.flush()
+
+    def _aggregate(self, counters, timings):
+        lines = []
+        for name, value in sorted(counters.items()):
+            if value == int(value):
+                value = int(value)
+            lines.append('%s:%s|c' % (name, value))
+        for name, value, sample_rate in timings:
+            if sample_rate < 1:
+                lines.append('%s:%s|ms|@%s' % (name, value, sample_rate))
+            else:
+                lines.append('%s:%s|ms' % (name, value))
+        return lines
+
+    def _packets(self, lines):
+        packet = []
+        size = 0
+        for line in lines:
+            if six.PY3:
+                line = line.encode('utf-8')
+            if packet and size + len(line) + 1 > self.max_packet_size:
+                yield b'\n'.join(packet)
+                packet = []
+                size = 0
+            packet.append(line)
+            size += len(line) + 1
+        if packet:
+            yield b'\n'.join(packet)
+
+    def flush(self):
+        """
+        Send all aggregated metrics.
+        """
+        counters, self._counters = self._counters, {}
+        timings, self._timings = self._timings, []
+        self._window_start = None
+        if not (counters or timings):
+            return
+        with closing(self._open_socket()) as sock:
+            for packet in self._packets(self._aggregate(counters, timings)):
+                try:
+                    sock.sendto(packet, self._target)
+                except IOError as err:
+                    if self.logger:
+                        self.logger.warning(
+                            _('Error sending UDP message to %(target)r: '
+                              '%(err)s'),
+                            {'target': self._target, 'err': err})
+
+
 def timing_stats(**dec_kwargs):
     """
     Returns a decorator that logs timing events or errors for public methods in
@@ -2154,6 +2256,8 @@ def get_logger(conf, name=None, log_to_console=False, log_route=None,
         log_statsd_default_sample_rate = 1.0
         log_statsd_sample_rate_factor = 1.0
         log_statsd_metric_prefix = (empty-string)
+        log_statsd_flush_interval = 0 (milliseconds; 0 disables aggregation)
+        log_statsd_max_packet_size = 1400
 
     :param conf: Configuration dict to read settings from
     :param name: Name of the logger
@@ -2229,9 +2333,19 @@ def get_logger(conf, name=None, log_to_console=False, log_route=None,
             'log_statsd_default_sample_rate', 1))
         sample_rate_factor = float(conf.get(
             'log_statsd_sample_rate_factor', 1))
-        statsd_client = StatsdClient(statsd_host, statsd_port, base_prefix,
-                                     name, default_sample_rate,
-                                     sample_rate_factor, logger=logger)
+        flush_interval = float(conf.get('log_statsd_flush_interval', 0))
+        if flush_interval > 0:
+            statsd_client = AggregatingStatsdClient(
+                statsd_host, statsd_port, base_prefix, name,
+                default_sample_rate, sample_rate_factor, logger=logger,
+                flush_interval=flush_interval / 1000.0,
+                max_packet_size=int(conf.get(
+                    'log_statsd_max_packet_size', 1400)))
+        else:
+            statsd_client = StatsdClient(statsd_host, statsd_port,
+                                         base_prefix, name,
+                                         default_sample_rate,
+                                         sample_rate_factor, logger=logger)
         logger.statsd_client = statsd_client
     else:
         logger.statsd_client = None
@@ -3810,6 +3924,11 @@ class LRUCache(object):
         self.head[self.NEXT] = self.tail
 
     def set_cache(self, value, *key):
+        old_link = self.mapping.pop(key, None)
+        if old_link is not None:
+            # e.g. a timed out entry being repopulated
+            old_link[self.PREV][self.NEXT] = old_link[self.NEXT]
+            old_link[self.NEXT][self.PREV] = old_link[self.PREV]
         while len(self.mapping) >= self.maxsize:
             old_next, old_key = self.head[self.NEXT][self.NEXT:self.NEXT + 2]
             self.head[self.NEXT], old_next[self.PREV] = old_next, self.head
@@ -5194,6 +5313,36 @@ def modify_priority(conf, logger):
     _ioprio_set(io_class, io_priority)
 
 
+def set_cpu_affinity(pid, cpus):
+    """
+    Restrict a process to running on the given CPUs.
+
+    :param pid: the process's pid, or 0 for the calling process
+    :param cpus: an iterable of CPU numbers
+    :raises ValueError: if no CPUs, or a negative CPU number, are given
+    :raises OSError: if the affinity could not be set, e.g. because none of
+                     the given CPUs exist
+    :raises AttributeError: if the platform has no sched_setaffinity
+    """
+    cpus = set(cpus)
+    if not cpus or min(cpus) < 0:
+        raise ValueError('Invalid CPU list: %r' % sorted(cpus))
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(pid, cpus)
+        return
+
+    global _libc_sched_setaffinity
+    if _libc_sched_setaffinity is None:
+        _libc_sched_setaffinity = load_libc_function(
+            'sched_setaffinity', fail_if_missing=True, errcheck=True)
+    # a cpu_set_t is a bitmask in an array of unsigned longs
+    bits = ctypes.sizeof(ctypes.c_ulong) * 8
+    mask = (ctypes.c_ulong * (max(cpus) // bits + 1))()
+    for cpu in cpus:
+        mask[cpu // bits] |= 1 << (cpu % bits)
+    _libc_sched_setaffinity(pid, ctypes.sizeof(mask), mask)
+
+
 def o_tmpfile_in_path_supported(dirpath):
     fd = None
     try:
@@ -17,16 +17,21 @@
 
 from __future__ import print_function
 
+from collections import defaultdict
 import errno
+import gc
+import json
 import os
 import signal
+import sys
 import time
 from swift import gettext_ as _
 from textwrap import dedent
 
 import eventlet
 import eventlet.debug
-from eventlet import greenio, GreenPool, sleep, wsgi, listen, Timeout
+from eventlet import corolocal, greenio, GreenPool, sleep, wsgi, listen, \
+    Timeout
 from paste.deploy import loadwsgi
 from eventlet.green import socket, ssl, os as green_os
 import six
@@ -34,12 +39,13 @@ from six import BytesIO
 from six import StringIO
 
 from swift.common import utils, constraints
+from swift.common.hub_monitor import HubMonitor
 from swift.common.storage_policy import BindPortsCache
 from swift.common.swob import Request, wsgi_unquote
 from swift.common.utils import capture_stdio, disable_fallocate, \
     drop_privileges, get_logger, NullLogger, config_true_value, \
     validate_configuration, get_hub, config_auto_int_value, \
-    reiterate
+    reiterate, split_path, list_from_csv, set_cpu_affinity
 
 SIGNUM_TO_NAME = {getattr(signal, n): n for n in dir(signal)
                   if n.startswith('SIG') and '_' not in n}
@@ -145,10 +151,46 @@ def wrap_conf_type(f):
 appconfig = wrap_conf_type(loadwsgi.appconfig)
 
 
-def get_socket(conf):
+def reuse_port_supported():
+    """
+    Check whether listen sockets can share a port with ``SO_REUSEPORT`` and
+    have the kernel balance new connections between them, which Linux does
+    from 3.9 on. Other platforms may accept the option without balancing.
+
+    :returns: True if :func:`get_socket` may be called with ``reuse_port``
+    """
+    if not sys.platform.startswith('linux') or \
+            not hasattr(socket, 'SO_REUSEPORT'):
+        return False
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    except socket.error:
+        return False
+    finally:
+        sock.close()
+    return True
+
+
+def reuse_port_listen(addr, family=socket.AF_INET, backlog=50):
+    """
+    Like :func:`eventlet.listen`, but sets ``SO_REUSEPORT`` so that other
+    sockets, each with the option set too, may listen on the same port.
+    """
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(addr)
+    sock.listen(backlog)
+    return sock
+
+
+def get_socket(conf, reuse_port=False):
     """Bind socket to bind ip:port in conf
 
     :param conf: Configuration dict to read settings from
+    :param reuse_port: if True, the socket is bound with ``SO_REUSEPORT``,
+                       see :func:`reuse_port_supported`
 
     :returns: a socket object as returned from socket.listen or
               ssl.wrap_socket if conf specifies cert_file
@@ -173,10 +215,12 @@ def get_socket(conf):
     except (ValueError, KeyError, TypeError):
         raise ConfigFileError()
 
+    listen_func = reuse_port_listen if reuse_port else listen
     while not sock and time.time() < retry_until:
         try:
-            sock = listen(bind_addr, backlog=int(conf.get('backlog', 4096)),
-                          family=address_family)
+            sock = listen_func(bind_addr,
+                               backlog=int(conf.get('backlog', 4096)),
+                               family=address_family)
             if 'cert_file' in conf:
                 warn_ssl = True
                 sock = ssl.wrap_socket(sock, certfile=conf['cert_file'],
@@ -365,10 +409,165 @@ def _add_pipeline_properties(app, *names):
                     pipeline_property(property_name))
 
 
+def _context_name(ctx):
+    return getattr(ctx, 'name', None) or ctx.entry_point_name
+
+
+class _TimedApp(object):
+    """
+    Stands in for one app or middleware of a pipeline built by a
+    :class:`PipelineTimer`; anything but calling it goes to the real thing.
+    """
+
+    def __init__(self, timer, name, app):
+        self.timer = timer
+        self.name = name
+        self.app = app
+
+    def __call__(self, env, start_response):
+        return self.timer.call(self.name, self.app, env, start_response)
+
+    def __getattr__(self, name):
+        return getattr(self.app, name)
+
+
+class PipelineTimer(object):
+    """
+    Times each app and middleware of a pipeline.
+
+    For each request passing through a middleware, the time until it returns
+    its response (not including the time spent streaming the response body)
+    is recorded both inclusively and as self time, i.e. less the time spent
+    in the rest of the pipeline on its behalf. Times are kept per middleware
+    and request type (e.g. ``object.GET``, going by the client's request
+    rather than any subrequests made for it), and emitted to StatsD as
+    ``pipeline.<middleware>.<request type>.timing`` and
+    ``pipeline.<middleware>.<request type>.self.timing``. Methods not listed
+    in ``log_statsd_valid_http_methods`` are recorded as ``BAD_METHOD``, as
+    proxy-logging does.
+
+    If ``pipeline_timing_endpoint`` is true, totals since the process started
+    are served as JSON at ``pipeline_timing_path`` to requests from the
+    loopback interface. Note that each worker process keeps its own, and
+    that requests relayed by a TLS terminator or load balancer on the same
+    host also come from the loopback interface.
+
+    :param conf: the app's config
+    :param logger: optional logger; by default one is made from ``conf``
+    """
+
+    def __init__(self, conf, logger=None):
+        self.logger = logger or get_logger(conf, log_route='pipeline-timing')
+        if config_true_value(conf.get('pipeline_timing_endpoint')):
+            self.path = conf.get('pipeline_timing_path', '/pipeline_timing')
+        else:
+            self.path = None
+        self.valid_methods = [
+            m.strip().upper() for m in conf.get(
+                'log_statsd_valid_http_methods',
+                'GET,HEAD,POST,PUT,DELETE,COPY,OPTIONS').split(',')
+            if m.strip()]
+        self.names = []
+        self._name_counts = defaultdict(int)
+        # (name, request type) -> [count, inclusive time, self time]
+        self.totals = defaultdict(lambda: [0, 0.0, 0.0])
+        # per-greenthread stack of [request type, time in callees]
+        self._local = corolocal.local()
+
+    def request_type(self, env):
+        method = env.get('REQUEST_METHOD')
+        if method not in self.valid_methods:
+            method = 'BAD_METHOD'
+        try:
+            version, account, container, obj = split_path(
+                env.get('PATH_INFO', ''), 2, 4, True)
+        except ValueError:
+            return 'other.' + method
+        if not constraints.valid_api_version(version):
+            return 'other.' + method
+        entity = 'object' if obj else 'container' if container else 'account'
+        return entity + '.' + method
+
+    def add_name(self, name):
+        """
+        Adds a middleware to the list of those timed, in pipeline order.
+
+        :returns: the name to time it by, which is made unique if the same
+                  middleware appears more than once
+        """
+        self._name_counts[name] += 1
+        if self._name_counts[name] > 1:
+            name = '%s-%d' % (name, self._name_counts[name])
+        self.names.append(name)
+        return name
+
+    def create(self, ctx):
+        """
+        Builds the pipeline for a pipeline context, timing each of its
+        filters and its app.
+        """
+        filters = [(self.add_name(_context_name(c)), c.create())
+                   for c in ctx.filter_contexts]
+        app = _TimedApp(self, self.add_name(_context_name(ctx.app_context)),
+                        ctx.app_context.create())
+        for name, make_filter in reversed(filters):
+            app = _TimedApp(self, name, make_filter(app))
+        return app
+
+    def call(self, name, app, env, start_response):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        if stack:
+            req_type = stack[0][0]
+        else:
+            if self.path and env.get('PATH_INFO') == self.path:
+                return self.handle_request(env, start_response)
+            req_type = self.request_type(env)
+        frame = [req_type, 0.0]
+        stack.append(frame)
+        start = time.time()
+        try:
+            return app(env, start_response)
+        finally:
+            elapsed = time.time() - start
+            stack.pop()
+            if stack:
+                stack[-1][1] += elapsed
+            self.record(name, req_type, elapsed, elapsed - frame[1])
+
+    def record(self, name, req_type, elapsed, self_elapsed):
+        totals = self.totals[name, req_type]
+        totals[0] += 1
+        totals[1] += elapsed
+        totals[2] += self_elapsed
+        metric = 'pipeline.%s.%s' % (name, req_type)
+        self.logger.timing(metric + '.timing', elapsed * 1000)
+        self.logger.timing(metric + '.self.timing', self_elapsed * 1000)
+
+    def handle_request(self, env, start_response):
+        if env.get('REMOTE_ADDR') not in ('127.0.0.1', '::1'):
+            start_response('403 Forbidden', [('Content-Length', '0')])
+            return [b'']
+        timings = {}
+        for (name, req_type), (count, elapsed, self_elapsed) in \
+                self.totals.items():
+            timings.setdefault(name, {})[req_type] = {
+                'count': count, 'time': elapsed, 'self_time': self_elapsed}
+        body = json.dumps({'pipeline': self.names,
+                           'timings': timings}).encode('ascii')
+        start_response('200 OK', [('Content-Type', 'application/json'),
+                                  ('Content-Length', str(len(body)))])
+        return [body]
+
+
 def loadapp(conf_file, global_conf=None, allow_modify_pipeline=True):
     """
     Loads a context from a config file, and if the context is a pipeline
     then presents the app with the opportunity to modify the pipeline.
+
+    If the app's config sets ``pipeline_timing`` to a true value, each
+    middleware in the pipeline is timed by a :class:`PipelineTimer`.
     """
     global_conf = global_conf or {}
     ctx = loadcontext(loadwsgi.APP, conf_file, global_conf=global_conf)
@@ -378,6 +577,10 @@ def loadapp(conf_file, global_conf=None, allow_modify_pipeline=True):
         func = getattr(app, 'modify_wsgi_pipeline', None)
         if func and allow_modify_pipeline:
             func(PipelineWrapper(ctx))
+        app_conf = dict(ctx.app_context.global_conf)
+        app_conf.update(ctx.app_context.local_conf)
+        if config_true_value(app_conf.get('pipeline_timing')):
+            return PipelineTimer(app_conf).create(ctx)
     return ctx.create()
 
 
@@ -518,7 +721,7 @@ class SwiftHttpProxiedProtocol(SwiftHttpProtocol):
         return environ
 
 
-def run_server(conf, logger, sock, global_conf=None):
+def run_server(conf, logger, sock, global_conf=None, app=None):
     # Ensure TZ environment variable exists to avoid stat('/etc/localtime') on
     # some platforms. This locks in reported times to UTC.
     os.environ['TZ'] = 'UTC+0'
@@ -534,15 +737,17 @@ def run_server(conf, logger, sock, global_conf=None):
         # let eventlet.wsgi.server log to stderr
         wsgi_logger = None
     # utils.LogAdapter stashes name in server; fallback on unadapted loggers
-    if not global_conf:
-        if hasattr(logger, 'server'):
-            log_name = logger.server
-        else:
-            log_name = logger.name
-        global_conf = {'log_name': log_name}
-    app = loadapp(conf['__file__'], global_conf=global_conf)
+    if hasattr(logger, 'server'):
+        log_name = logger.server
+    else:
+        log_name = logger.name
+    if app is None:
+        if not global_conf:
+            global_conf = {'log_name': log_name}
+        app = loadapp(conf['__file__'], global_conf=global_conf)
     max_clients = int(conf.get('max_clients', '1024'))
     pool = RestrictedGreenPool(size=max_clients)
+    HubMonitor(conf, logger, log_name, pool=pool).start()
 
     # Select which protocol class to use (normal or one expecting PROXY
     # protocol)
@@ -687,6 +892,154 @@ class WorkersStrategy(object):
         self.sock.close()
 
 
+def parse_cpu_list(value):
+    """
+    Parse a list of CPUs like ``0-3,8,10-11``.
+
+    :param value: a comma-separated list of CPU numbers and ranges of them
+    :returns: a list of CPU numbers, in the order given
+    :raises ValueError: if ``value`` can't be parsed
+    """
+    cpus = []
+    for part in list_from_csv(value):
+        first, _sep, last = part.partition('-')
+        first = int(first)
+        last = int(last) if last else first
+        if first < 0 or last < first:
+            raise ValueError('Invalid CPU range: %r' % part)
+        cpus.extend(range(first, last + 1))
+    return cpus
+
+
+class ReusePortStrategy(WorkersStrategy):
+    """
+    WSGI server management strategy object for a configured number of
+    forked-off workers which each accept on their own listen socket, all bound
+    to the same port with ``SO_REUSEPORT``.
+
+    With one shared listen socket, every idle worker is woken for each new
+    connection and the one to accept it is whichever gets there first. Here
+    the kernel instead hashes each new connection to one of the sockets, so
+    workers share connections evenly, but a worker that is busy gets its
+    share regardless.
+
+    Each worker may also be pinned to a CPU: the ``cpu_affinity`` list of CPUs
+    is assigned to workers in turn.
+
+    Used in :py:func:`run_wsgi`.
+
+    :param dict conf: Server configuration dictionary.
+    :param logger: The server's :py:class:`~swift.common.utils.LogAdaptor`
+                   object.
+    """
+
+    def __init__(self, conf, logger):
+        super(ReusePortStrategy, self).__init__(conf, logger)
+        self.cpus = parse_cpu_list(conf.get('cpu_affinity', ''))
+        self.socks = []
+        self.children = [None] * self.worker_count
+        self.forking_idx = None
+
+    def do_bind_ports(self):
+        """
+        Bind a listen socket for each worker and drop privileges (since the
+        parent process will never need to bind again).
+        """
+
+        try:
+            self.socks = [get_socket(self.conf, reuse_port=True)
+                          for _junk in range(max(self.worker_count, 1))]
+        except ConfigFilePortError:
+            msg = 'bind_port wasn\'t properly set in the config file. ' \
+                'It must be explicitly set to a valid port number.'
+            return msg
+        self.sock = self.socks[0]
+        drop_privileges(self.conf.get('user', 'swift'))
+
+    def new_worker_socks(self):
+        """
+        Yield a sequence of (socket, worker_idx) tuples for each server which
+        should be forked-off and started.
+
+        The worker_idx item for each socket will passed into the
+        :py:meth:`log_sock_exit` and :py:meth:`register_worker_start` methods.
+        """
+
+        for worker_idx, pid in enumerate(self.children):
+            if pid is None:
+                self.forking_idx = worker_idx
+                yield self.socks[worker_idx], worker_idx
+        self.forking_idx = None
+
+    def post_fork_hook(self):
+        """
+        Called in each child process, prior to starting the actual wsgi server,
+        to close the listen sockets of the other workers.
+
+        Otherwise every worker would hold every socket open, and a socket
+        whose worker had exited would keep having connections hashed to it
+        until all its siblings had exited too. The sockets are only closed,
+        not shut down, since the parent and the other workers share them.
+        """
+
+        for worker_idx, sock in enumerate(self.socks):
+            if worker_idx != self.forking_idx:
+                sock.close()
+
+    def log_sock_exit(self, sock, worker_idx):
+        """
+        Log a server's exit.
+        """
+
+        self.logger.notice('Child %d (PID %d) exiting normally',
+                           worker_idx, os.getpid())
+
+    def register_worker_start(self, sock, worker_idx, pid):
+        """
+        Called when a new worker is started; pins it to its CPU, if any.
+
+        :param socket sock: The listen socket for the worker just started.
+        :param worker_idx: The socket's worker_idx as yielded by
+                           :py:meth:`new_worker_socks`.
+        :param int pid: The new worker process' PID
+        """
+
+        self.logger.notice('Started child %d (PID %d) from parent %d',
+                           worker_idx, pid, os.getpid())
+        self.children[worker_idx] = pid
+        if not self.cpus:
+            return
+        cpu = self.cpus[worker_idx % len(self.cpus)]
+        try:
+            set_cpu_affinity(pid, [cpu])
+        except (AttributeError, OSError, ValueError) as err:
+            self.logger.error('Unable to pin child %d (PID %d) to CPU %d: %s',
+                              worker_idx, pid, cpu, err)
+
+    def register_worker_exit(self, pid):
+        """
+        Called when a worker has exited.
+
+        :param int pid: The PID of the worker that exited.
+        """
+
+        if pid not in self.children:
+            return
+        worker_idx = self.children.index(pid)
+        self.logger.error('Removing dead child %d (PID: %s) from parent %s',
+                          worker_idx, pid, os.getpid())
+        self.children[worker_idx] = None
+
+    def shutdown_sockets(self):
+        """
+        Shutdown any listen sockets.
+        """
+
+        for sock in self.socks:
+            greenio.shutdown_safe(sock)
+            sock.close()
+
+
 class PortPidState(object):
     """
     A helper class for :py:class:`ServersPerPortStrategy` to track listen
@@ -984,7 +1337,8 @@ def run_wsgi(conf_path, app_section, *args, **kwargs):
     Runs the server according to some strategy.  The default strategy runs a
     specified number of workers in pre-fork model.  The object-server (only)
     may use a servers-per-port strategy if its config has a servers_per_port
-    setting with a value greater than zero.
+    setting with a value greater than zero.  Otherwise, if its config has
+    reuse_port set, each worker gets a listen socket of its own.
 
     :param conf_path: Path to paste.deploy style configuration file/directory
     :param app_section: App name from conf file to load config from
@@ -1009,6 +1363,13 @@ def run_wsgi(conf_path, app_section, *args, **kwargs):
     if servers_per_port and app_section == 'object-server':
         strategy = ServersPerPortStrategy(
             conf, logger, servers_per_port=servers_per_port)
+    elif config_true_value(conf.get('reuse_port', 'false')):
+        if reuse_port_supported():
+            strategy = ReusePortStrategy(conf, logger)
+        else:
+            logger.warning('reuse_port is set but SO_REUSEPORT is not '
+                           'supported; workers will share a listen socket')
+            strategy = WorkersStrategy(conf, logger)
     else:
         strategy = WorkersStrategy(conf, logger)
 
@@ -1019,7 +1380,17 @@ def run_wsgi(conf_path, app_section, *args, **kwargs):
     global_conf = {'log_name': log_name}
     if 'global_conf_callback' in kwargs:
         kwargs['global_conf_callback'](conf, global_conf)
-    loadapp(conf_path, global_conf=global_conf)
+    app = loadapp(conf_path, global_conf=global_conf)
+    if config_true_value(conf.get('preload_app', 'false')):
+        # Workers will use this app, and the rings it has loaded, rather than
+        # each loading their own. Its memory is shared with them copy-on-write
+        # for as long as nothing writes to it; keep the garbage collector from
+        # doing so where it can.
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+    else:
+        app = None
 
     # set utils.FALLOCATE_RESERVE if desired
     utils.FALLOCATE_RESERVE, utils.FALLOCATE_IS_PERCENT = \
@@ -1038,7 +1409,8 @@ def run_wsgi(conf_path, app_section, *args, **kwargs):
 
     no_fork_sock = strategy.no_fork_sock()
     if no_fork_sock:
-        run_server(conf, logger, no_fork_sock, global_conf=global_conf)
+        run_server(conf, logger, no_fork_sock, global_conf=global_conf,
+                   app=app)
         return 0
 
     def stop_with_signal(signum, *args):
@@ -1058,7 +1430,7 @@ def run_wsgi(conf_path, app_section, *args, **kwargs):
                 signal.signal(signal.SIGHUP, signal.SIG_DFL)
                 signal.signal(signal.SIGTERM, signal.SIG_DFL)
                 strategy.post_fork_hook()
-                run_server(conf, logger, sock)
+                run_server(conf, logger, sock, app=app)
                 strategy.log_sock_exit(sock, sock_info)
                 return 0
             else:
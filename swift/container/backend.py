@@ -2067,30 +2067,89 @@ class ContainerBroker(DatabaseBroker):
         return (self.root_account == self.account and
                 self.root_container == self.container)
 
-    def _get_next_shard_range_upper(self, shard_size, last_upper=None):
+    def _get_next_shard_range_uppers(self, shard_size, max_count,
+                                     last_upper=None):
         """
-        Returns the name of the object that is ``shard_size`` rows beyond
-        ``last_upper`` in the object table ordered by name. If ``last_upper``
-        is not given then it defaults to the start of object table ordered by
-        name.
+        Returns the names of up to ``max_count`` objects, each of which is
+        ``shard_size`` rows beyond the previous one in the object table
+        ordered by name, starting from ``last_upper``. If ``last_upper`` is not
+        given then it defaults to the start of object table ordered by name.
 
+        Each query resumes the walk of the name index from the previous name
+        that was found, so the index is walked once for all of the names.
+
+        :param shard_size: the number of rows between successive names.
+        :param max_count: the maximum number of names to return.
         :param last_upper: the upper bound of the last found shard range.
-        :return: an object name, or None if the number of rows beyond
-            ``last_upper`` is less than ``shard_size``.
+        :return: a list of object names; the list is shorter than
+            ``max_count`` if the number of rows beyond the last name is less
+            than ``shard_size``.
         """
+        uppers = []
+        if max_count <= 0:
+            return uppers
+        self._commit_puts_stale_ok()
+        with self.get() as connection:
+            sql = ('SELECT name FROM object WHERE %s=0 AND name > ? '
+                   'ORDER BY name LIMIT 1 OFFSET %d' %
+                   (self._get_deleted_key(connection), shard_size - 1))
+            last_upper = str(last_upper or '')
+            while len(uppers) < max_count:
+                row = connection.execute(sql, (last_upper,)).fetchone()
+                if not row:
+                    break
+                last_upper = row['name']
+                uppers.append(last_upper)
+        return uppers
+
+    def _get_sampled_shard_range_uppers(self, shard_size, max_count,
+                                        object_count, sample_count,
+                                        last_upper=None):
+        """
+        Estimates the names of up to ``max_count`` objects, each of which is
+        approximately ``shard_size`` rows beyond the previous one in the
+        object table ordered by name, starting from ``last_upper``.
+
+        Rather than walking the name index, ``sample_count`` rows are read at
+        evenly spaced ROWIDs across the object table, and each sampled name is
+        assumed to represent an equal share of ``object_count`` rows.
+
+        :param shard_size: the approximate number of rows between successive
+            names.
+        :param max_count: the maximum number of names to return.
+        :param object_count: the number of undeleted rows in the object table.
+        :param sample_count: the number of rows to sample.
+        :param last_upper: the upper bound of the last found shard range.
+        :return: a list of object names.
+        """
+        if max_count <= 0 or sample_count <= 0:
+            return []
         self._commit_puts_stale_ok()
         with self.get() as connection:
-            sql = ('SELECT name FROM object WHERE %s=0 ' %
+            min_rowid, max_rowid = connection.execute(
+                'SELECT MIN(ROWID), MAX(ROWID) FROM object').fetchone()
+            if min_rowid is None:
+                return []
+            sql = ('SELECT name FROM object WHERE ROWID >= ? AND %s=0 '
+                   'ORDER BY ROWID LIMIT 1' %
                    self._get_deleted_key(connection))
-            args = []
-            if last_upper:
-                sql += "AND name > ? "
-                args.append(str(last_upper))
-            sql += "ORDER BY name LIMIT 1 OFFSET %d" % (shard_size - 1)
-            row = connection.execute(sql, args).fetchone()
-            return row['name'] if row else None
+            step = max(1.0, float(max_rowid - min_rowid + 1) / sample_count)
+            samples = set()
+            rowid = min_rowid
+            while rowid <= max_rowid:
+                row = connection.execute(sql, (int(rowid),)).fetchone()
+                if not row:
+                    break
+                samples.add(row['name'])
+                rowid += step
+        rows_per_sample = float(object_count) / max(len(samples), 1)
+        if last_upper:
+            samples = [name for name in samples if name > last_upper]
+        stride = max(1, int(round(shard_size / rows_per_sample)))
+        return sorted(samples)[stride - 1::stride][:max_count]
 
-    def find_shard_ranges(self, shard_size, limit=-1, existing_ranges=None):
+    def find_shard_ranges(self, shard_size, limit=-1, existing_ranges=None,
+                          sample_count=None):
         """
         Scans the container db for shard ranges. Scanning will start at the
         upper bound of the any ``existing_ranges`` that are given, otherwise
@@ -2109,6 +2168,11 @@ class ContainerBroker(DatabaseBroker):
             given, this list should be sorted in order of upper bounds; the
             scan for new shard ranges will start at the upper bound of the last
             existing ShardRange.
+        :param sample_count: if given, shard range bounds are estimated from
+            this many rows sampled from across the object table rather than
+            found by walking the object table in name order. This is faster
+            for large containers but the object count of each shard range is
+            only approximately ``shard_size``.
         :return:  a tuple; the first value in the tuple is a list of
             dicts each having keys {'index', 'lower', 'upper', 'object_count'}
             in order of ascending 'upper'; the second value in the tuple is a
@@ -2147,20 +2211,30 @@ class ContainerBroker(DatabaseBroker):
         found_ranges = []
         sub_broker = self.get_brokers()[0]
         index = len(existing_ranges)
-        while limit is None or limit < 0 or len(found_ranges) < limit:
-            if progress + shard_size >= object_count:
-                # next shard point is at or beyond final object name so don't
-                # bother with db query
-                next_shard_upper = None
+        if limit is not None and limit < 0:
+            limit = None
+        # the upper bound of the final shard range is own_shard_range.upper so
+        # there is no need to find a name for it in the db
+        max_uppers = max(0, (object_count - progress - 1) // shard_size)
+        if limit is not None:
+            max_uppers = min(max_uppers, limit)
+        try:
+            if sample_count:
+                uppers = sub_broker._get_sampled_shard_range_uppers(
+                    shard_size, max_uppers, object_count, sample_count,
+                    last_shard_upper)
             else:
-                try:
-                    next_shard_upper = sub_broker._get_next_shard_range_upper(
-                        shard_size, last_shard_upper)
-                except (sqlite3.OperationalError, LockTimeout):
-                    self.logger.exception(
-                        "Problem finding shard upper in %r: " % self.db_file)
-                    break
-
+                uppers = sub_broker._get_next_shard_range_uppers(
+                    shard_size, max_uppers, last_shard_upper)
+        except (sqlite3.OperationalError, LockTimeout):
+            self.logger.exception(
+                "Problem finding shard upper in %r: " % self.db_file)
+            return found_ranges, False
+
+        # None marks the end of the names found in the db
+        for next_shard_upper in uppers + [None]:
+            if limit is not None and len(found_ranges) >= limit:
+                break
             if (next_shard_upper is None or
                     next_shard_upper > own_shard_range.upper):
                 # We reached the end of the container namespace, or possibly
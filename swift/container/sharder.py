@@ -21,7 +21,7 @@ from random import random
 
 import os
 import six
-from eventlet import Timeout
+from eventlet import GreenPile, Timeout
 
 from swift.common import internal_client
 from swift.common.constraints import check_drive
@@ -33,7 +33,8 @@ from swift.common.swob import str_to_wsgi
 from swift.common.utils import get_logger, config_true_value, \
     dump_recon_cache, whataremyips, Timestamp, ShardRange, GreenAsyncPile, \
     config_float_value, config_positive_int_value, \
-    quorum_size, parse_override_options, Everything, config_auto_int_value
+    quorum_size, parse_override_options, Everything, config_auto_int_value, \
+    distribute_evenly, load_recon_cache, PrefixLoggerAdapter
 from swift.container.backend import ContainerBroker, \
     RECORD_TYPE_SHARD, UNSHARDED, SHARDING, SHARDED, COLLAPSED, \
     SHARD_UPDATE_STATES
@@ -327,6 +328,12 @@ class ContainerSharder(ContainerReplicator):
             conf.get('cleave_batch_size', 2))
         self.cleave_row_batch_size = config_positive_int_value(
             conf.get('cleave_row_batch_size', 10000))
+        self.cleave_concurrency = config_positive_int_value(
+            conf.get('cleave_concurrency', 1))
+        self.sharder_workers = int(conf.get('sharder_workers', 0))
+        self.multiprocess_worker_index = None
+        self.all_local_devices = set()
+        self._next_rcache_update = time.time() + self.interval
         self.auto_shard = config_true_value(conf.get('auto_shard', False))
         self.sharding_candidates = []
         self.recon_candidates_limit = int(
@@ -483,13 +490,91 @@ class ContainerSharder(ContainerReplicator):
 
         self._transform_sharding_candidate_stats()
 
-        dump_recon_cache(
-            {'sharding_stats': self.stats,
-             'sharding_time': elapsed,
-             'sharding_last': now},
-            self.rcache, self.logger)
+        recon = {'sharding_stats': self.stats,
+                 'sharding_time': elapsed,
+                 'sharding_last': now}
+        if self.multiprocess_worker_index is not None:
+            # the parent process aggregates the stats of all workers
+            recon = {'sharding_stats_per_worker': {
+                str(self.multiprocess_worker_index): recon}}
+        dump_recon_cache(recon, self.rcache, self.logger)
         self.reported = now
 
+    def _aggregate_stats(self, all_stats):
+        """
+        Combines the stats reported by each of several sharder workers.
+
+        :param all_stats: a list of dicts, each a worker's ``self.stats``.
+        :return: a dict of stats in the same form as ``self.stats``.
+        """
+        aggregated = {}
+        sharding = defaultdict(dict)
+        for stats in all_stats:
+            for key, value in stats.items():
+                if key == 'sharding':
+                    continue
+                elif key == 'start':
+                    aggregated[key] = min(aggregated.get(key, value), value)
+                elif key == 'failure_nodes':
+                    failure_nodes = aggregated.setdefault(key, {})
+                    for ip, device_failures in value.items():
+                        ip_failures = failure_nodes.setdefault(ip, {})
+                        for device, count in device_failures.items():
+                            ip_failures[device] = \
+                                ip_failures.get(device, 0) + count
+                else:
+                    aggregated[key] = aggregated.get(key, 0) + value
+            for category, category_stats in stats.get('sharding', {}).items():
+                combined = sharding[category]
+                for key, value in category_stats.items():
+                    if key not in combined:
+                        combined[key] = value
+                    elif key == 'min_time':
+                        combined[key] = min(
+                            [v for v in (combined[key], value) if v] or [0])
+                    elif key == 'max_time':
+                        combined[key] = max(combined[key], value)
+                    elif key == 'top':
+                        combined[key] = sorted(
+                            combined[key] + value,
+                            key=lambda c: c['object_count'], reverse=True)
+                        if self.recon_candidates_limit >= 0:
+                            combined[key] = \
+                                combined[key][:self.recon_candidates_limit]
+                    else:
+                        combined[key] = combined[key] + value
+        aggregated['sharding'] = dict(sharding)
+        return aggregated
+
+    def aggregate_recon_update(self):
+        """
+        Aggregates the recon stats reported by each sharder worker.
+
+        :return: a dict of recon cache entries to be updated.
+        """
+        per_worker_stats = load_recon_cache(self.rcache).get(
+            'sharding_stats_per_worker', {})
+        workers = [str(index) for index in range(self.sharder_workers)]
+        recon_update = {}
+        # If every worker has reported some stats, then aggregate them.
+        if workers and all(worker in per_worker_stats for worker in workers):
+            recon_update['sharding_stats'] = self._aggregate_stats(
+                [per_worker_stats[worker]['sharding_stats']
+                 for worker in workers])
+            recon_update['sharding_time'] = max(
+                per_worker_stats[worker]['sharding_time']
+                for worker in workers)
+            recon_update['sharding_last'] = min(
+                per_worker_stats[worker]['sharding_last']
+                for worker in workers)
+
+        # Clear out entries for workers that no longer exist
+        workers_to_remove = set(per_worker_stats) - set(workers)
+        if workers_to_remove:
+            recon_update['sharding_stats_per_worker'] = {
+                worker: {} for worker in workers_to_remove}
+        return recon_update
+
     def _periodic_report_stats(self):
         if (time.time() - self.reported) >= 3600:  # once an hour
             self._report_stats()
@@ -769,7 +854,7 @@ class ContainerSharder(ContainerReplicator):
                 marker = objects[-1]['name']
 
     def yield_objects_to_shard_range(self, broker, src_shard_range,
-                                     dest_shard_ranges):
+                                     dest_shard_ranges, since_row=None):
         """
         Iterates through all objects in ``src_shard_range`` to place them in
         destination shard ranges provided by the ``next_shard_range`` function.
@@ -782,11 +867,14 @@ class ContainerSharder(ContainerReplicator):
             describing the source range.
         :param dest_shard_ranges: A function which should return a list of
             destination shard ranges in name order.
+        :param since_row: include only items whose ROWID is greater than
+            the given row id; by default all rows are included.
         :return: a generator of tuples of
             (object list, shard range, broker info dict)
         """
         dest_shard_range_iter = dest_shard_range = None
-        for objs, info in self.yield_objects(broker, src_shard_range):
+        for objs, info in self.yield_objects(broker, src_shard_range,
+                                             since_row=since_row):
             if not objs:
                 return
 
@@ -1145,20 +1233,116 @@ class ContainerSharder(ContainerReplicator):
                     source_broker, shard_range,
                     since_row=sync_from_row):
                 shard_broker.merge_items(objects)
-            # Note: the max row stored as a sync point is sampled *before*
-            # objects are yielded to ensure that is less than or equal to
-            # the last yielded row. Other sync points are also copied from the
-            # source broker to the shards; if another replica of the source
-            # happens to subsequently cleave into a primary replica of the
-            # shard then it will only need to cleave rows after its last sync
-            # point with this replica of the source broker.
-            shard_broker.merge_syncs(
-                [{'sync_point': source_max_row, 'remote_id': source_db_id}] +
-                source_broker.get_syncs())
+            self._merge_cleaved_syncs(
+                source_broker, source_db_id, source_max_row, shard_broker)
         else:
             self.logger.debug("Cleaving '%s': %r - shard db already in sync",
                               broker.path, shard_range)
 
+        own_shard_range, replication_quorum = self._update_cleaved_shard(
+            broker, shard_range, shard_broker)
+        success, responses = self._replicate_object(
+            shard_part, shard_broker.db_file, node_id)
+        return self._complete_cleaved_shard(
+            broker, cleaving_context, shard_range, own_shard_range, start,
+            replication_quorum, success, responses)
+
+    def _cleave_shard_ranges(self, broker, cleaving_context, shard_ranges):
+        """
+        Cleaves a batch of consecutive shard ranges concurrently.
+
+        The rows to be cleaved into each shard range are merged into its shard
+        db in turn. The shard dbs are then replicated concurrently, up to
+        ``cleave_concurrency`` at a time. The cleaving cursor is advanced past
+        each shard range, in order, until a shard range fails to be cleaved.
+
+        :param broker: the sharding container's broker.
+        :param cleaving_context: the container's
+            :class:`~swift.container.sharder.CleavingContext`.
+        :param shard_ranges: a list of shard ranges in name order.
+        :return: a list of the shard ranges that were cleaved.
+        """
+        policy_index = broker.storage_policy_index
+        cleaves = []
+        for shard_range in shard_ranges:
+            self.logger.info("Cleaving '%s' from row %s into %s for %r",
+                             broker.path, cleaving_context.last_cleave_to_row,
+                             shard_range.name, shard_range)
+            self._increment_stat('cleaved', 'attempted')
+            start = time.time()
+            try:
+                shard_part, shard_broker, node_id = self._get_shard_broker(
+                    shard_range, broker.root_path, policy_index)
+            except DeviceUnavailable as duex:
+                self.logger.warning(str(duex))
+                self._increment_stat('cleaved', 'failure', statsd=True)
+                break
+            cleaves.append(
+                (shard_range, shard_part, shard_broker, node_id, start))
+
+        # only cleave from the retiring db - misplaced objects handler will
+        # deal with any objects in the fresh db
+        source_broker = broker.get_brokers()[0]
+        source_db_id = source_broker.get_info()['id']
+        source_max_row = source_broker.get_max_row()
+        for shard_range, _part, shard_broker, _node_id, _start in cleaves:
+            sync_point = shard_broker.get_sync(source_db_id)
+            if sync_point < source_max_row:
+                sync_from_row = max(
+                    cleaving_context.last_cleave_to_row or -1, sync_point)
+                for objects, info in self.yield_objects(
+                        source_broker, shard_range,
+                        since_row=sync_from_row):
+                    shard_broker.merge_items(objects)
+                self._merge_cleaved_syncs(
+                    source_broker, source_db_id, source_max_row, shard_broker)
+            else:
+                self.logger.debug(
+                    "Cleaving '%s': %r - shard db already in sync",
+                    broker.path, shard_range)
+
+        pile = GreenPile(self.cleave_concurrency)
+        updates = []
+        for shard_range, shard_part, shard_broker, node_id, _start in cleaves:
+            updates.append(
+                self._update_cleaved_shard(broker, shard_range, shard_broker))
+            pile.spawn(self._replicate_object,
+                       shard_part, shard_broker.db_file, node_id)
+
+        ranges_done = []
+        for cleave, update, (success, responses) in zip(cleaves, updates,
+                                                        list(pile)):
+            shard_range, _part, _broker, _node_id, start = cleave
+            own_shard_range, replication_quorum = update
+            if not self._complete_cleaved_shard(
+                    broker, cleaving_context, shard_range, own_shard_range,
+                    start, replication_quorum, success, responses):
+                # don't progress the cleave cursor beyond this shard range
+                break
+            ranges_done.append(shard_range)
+        return ranges_done
+
+    def _merge_cleaved_syncs(self, source_broker, source_db_id,
+                             source_max_row, shard_broker):
+        # Note: the max row stored as a sync point is sampled *before*
+        # objects are yielded to ensure that is less than or equal to
+        # the last yielded row. Other sync points are also copied from the
+        # source broker to the shards; if another replica of the source
+        # happens to subsequently cleave into a primary replica of the
+        # shard then it will only need to cleave rows after its last sync
+        # point with this replica of the source broker.
+        shard_broker.merge_syncs(
+            [{'sync_point': source_max_row, 'remote_id': source_db_id}] +
+            source_broker.get_syncs())
+
+    def _update_cleaved_shard(self, broker, shard_range, shard_broker):
+        """
+        Updates the shard ranges in a shard db after rows have been cleaved
+        into it, ready for the shard db to be replicated.
+
+        :return: a tuple of (own shard range of ``broker``, number of
+            successful replications required)
+        """
         own_shard_range = broker.get_own_shard_range()
 
         replication_quorum = self.existing_shard_replication_quorum
@@ -1187,10 +1371,17 @@ class ContainerSharder(ContainerReplicator):
         self.logger.info(
             'Replicating new shard container %s for %s',
             shard_broker.path, shard_broker.get_own_shard_range())
+        return own_shard_range, replication_quorum
 
-        success, responses = self._replicate_object(
-            shard_part, shard_broker.db_file, node_id)
+    def _complete_cleaved_shard(self, broker, cleaving_context, shard_range,
+                                own_shard_range, start, replication_quorum,
+                                success, responses):
+        """
+        Advances the cleaving cursor past a shard range if its shard db was
+        sufficiently replicated.
 
+        :return: True if the shard range has been cleaved, False otherwise.
+        """
         replication_successes = responses.count(True)
         if (not success and (not responses or
                              replication_successes < replication_quorum)):
@@ -1264,13 +1455,16 @@ class ContainerSharder(ContainerReplicator):
                               cleaving_context.ranges_todo, broker.path)
 
         ranges_done = []
+        ranges_to_cleave = []
         for shard_range in ranges_todo[:self.cleave_batch_size]:
             if shard_range.state == ShardRange.FOUND:
                 break
             elif shard_range.state in (ShardRange.CREATED,
                                        ShardRange.CLEAVED,
                                        ShardRange.ACTIVE):
-                if self._cleave_shard_range(
+                if self.cleave_concurrency > 1:
+                    ranges_to_cleave.append(shard_range)
+                elif self._cleave_shard_range(
                         broker, cleaving_context, shard_range):
                     ranges_done.append(shard_range)
                 else:
@@ -1279,6 +1473,9 @@ class ContainerSharder(ContainerReplicator):
                 self.logger.warning('Unexpected shard range state for cleave',
                                     shard_range.state)
                 break
+        if ranges_to_cleave:
+            ranges_done = self._cleave_shard_ranges(
+                broker, cleaving_context, ranges_to_cleave)
 
         if not ranges_done:
             cleaving_context.store(broker)
@@ -1546,14 +1743,87 @@ class ContainerSharder(ContainerReplicator):
 
         self._report_stats()
 
-    def run_forever(self, *args, **kwargs):
+    def _get_local_devices(self):
+        """
+        Returns the set of the names of all devices in the container ring that
+        are local to this node.
+        """
+        ips = whataremyips(bind_ip=self.bind_ip)
+        return set(
+            node['device'] for node in self.ring.devs
+            if node and is_local_device(ips, self.port,
+                                        node['replication_ip'],
+                                        node['replication_port']))
+
+    def get_worker_args(self, once=False, **kwargs):
+        """
+        If ``sharder_workers`` is set then the local devices are distributed
+        as evenly as possible among that many worker processes, so that a
+        worker that is busy with a large container does not hold up the
+        processing of containers on other devices.
+        """
+        if self.sharder_workers < 1:
+            return []
+
+        override_options = parse_override_options(once=once, **kwargs)
+        # save this off for ring-change detection later in is_healthy()
+        self.all_local_devices = self._get_local_devices()
+        if override_options.devices:
+            devices_to_shard = [d for d in override_options.devices
+                                if d in self.all_local_devices]
+        else:
+            devices_to_shard = sorted(self.all_local_devices)
+
+        self.sharder_workers = min(self.sharder_workers,
+                                   len(devices_to_shard))
+        return [{'override_devices': devices,
+                 'override_partitions': override_options.partitions,
+                 'multiprocess_worker_index': index}
+                for index, devices in enumerate(
+                    distribute_evenly(devices_to_shard,
+                                      self.sharder_workers))]
+
+    def is_healthy(self):
+        """
+        Check whether the set of local devices remains the same, so that new
+        workers are started to shard any devices that have been added.
+
+        This is the only method called periodically in the parent process, so
+        it also aggregates the recon stats of the workers.
+
+        :returns: False if any local devices have been added or removed,
+          True otherwise
+        """
+        if time.time() >= self._next_rcache_update:
+            self._next_rcache_update = time.time() + self.interval
+            dump_recon_cache(self.aggregate_recon_update(), self.rcache,
+                             self.logger)
+        return self._get_local_devices() == self.all_local_devices
+
+    def post_multiprocess_run(self):
+        dump_recon_cache(self.aggregate_recon_update(), self.rcache,
+                         self.logger)
+
+    def _set_multiprocess_worker(self, multiprocess_worker_index):
+        self.multiprocess_worker_index = multiprocess_worker_index
+        if multiprocess_worker_index is not None:
+            self.logger = PrefixLoggerAdapter(self.logger, {})
+            self.logger.set_prefix("[worker %d/%d pid=%d] " % (
+                # use 1-based indexing for more readable logs
+                multiprocess_worker_index + 1,
+                self.sharder_workers, os.getpid()))
+
+    def run_forever(self, multiprocess_worker_index=None, *args, **kwargs):
         """Run the container sharder until stopped."""
+        self._set_multiprocess_worker(multiprocess_worker_index)
+        override_options = parse_override_options(**kwargs)
+        devices_to_shard = override_options.devices or Everything()
         self.reported = time.time()
         time.sleep(random() * self.interval)
         while True:
             begin = time.time()
             try:
-                self._one_shard_cycle(devices_to_shard=Everything(),
+                self._one_shard_cycle(devices_to_shard=devices_to_shard,
                                       partitions_to_shard=Everything())
             except (Exception, Timeout):
                 self.logger.increment('errors')
@@ -1564,8 +1834,9 @@ class ContainerSharder(ContainerReplicator):
             if elapsed < self.interval:
                 time.sleep(self.interval - elapsed)
 
-    def run_once(self, *args, **kwargs):
+    def run_once(self, multiprocess_worker_index=None, *args, **kwargs):
         """Run the container sharder once."""
+        self._set_multiprocess_worker(multiprocess_worker_index)
         self.logger.info('Begin container sharder "once" mode')
         override_options = parse_override_options(once=True, **kwargs)
         devices_to_shard = override_options.devices or Everything()
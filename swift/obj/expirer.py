@@ -15,7 +15,7 @@
 
 from six.moves import urllib
 
-from random import random
+from random import random, shuffle
 from time import time
 from os.path import join
 from swift import gettext_ as _
@@ -26,11 +26,14 @@ from eventlet import sleep, Timeout
 from eventlet.greenpool import GreenPool
 
 from swift.common.daemon import Daemon
+from swift.common.db_replicator import ReplConnection
+from swift.common.direct_client import direct_get_container, \
+    direct_delete_container_object
 from swift.common.internal_client import InternalClient, UnexpectedResponse
 from swift.common.utils import get_logger, dump_recon_cache, split_path, \
-    Timestamp
+    Timestamp, config_true_value, normalize_delete_at_timestamp, hash_path
 from swift.common.http import HTTP_NOT_FOUND, HTTP_CONFLICT, \
-    HTTP_PRECONDITION_FAILED
+    HTTP_PRECONDITION_FAILED, is_success
 
 from swift.container.reconciler import direct_delete_container_entry
 
@@ -65,6 +68,13 @@ class ObjectExpirer(Daemon):
         # marker will be retried before it is abandoned.  It is not coupled
         # with the tombstone reclaim age in the consistency engine.
         self.reclaim_age = int(conf.get('reclaim_age', 604800))
+        # When greater than 1, queue entries of successfully expired objects
+        # are collected per task container and removed from the container
+        # servers in batches of up to this many rows.
+        self.pop_batch_size = int(conf.get('pop_batch_size', 1))
+        if self.pop_batch_size < 1:
+            raise ValueError("pop_batch_size must be set to at least 1")
+        self.pending_pops = defaultdict(list)
 
     def read_conf_for_queue_access(self, swift):
         self.expiring_objects_account = \
@@ -83,6 +93,16 @@ class ObjectExpirer(Daemon):
 
         self.processes = int(self.conf.get('processes', 0))
         self.process = int(self.conf.get('process', 0))
+        # The object servers already spread each delete-at bucket over a
+        # number of task containers when tasks are enqueued, so whole task
+        # containers can be assigned to processes instead of every process
+        # listing every task and skipping the ones it doesn't own.
+        self.partition_by_container = config_true_value(
+            self.conf.get('partition_by_container', False))
+        self.direct_listing = config_true_value(
+            self.conf.get('direct_listing', False))
+        self.conn_timeout = float(self.conf.get('conn_timeout', 5))
+        self.node_timeout = float(self.conf.get('node_timeout', 15))
 
     def report(self, final=False):
         """
@@ -207,6 +227,64 @@ class ObjectExpirer(Daemon):
                 break
             yield task_container
 
+    def is_assigned_task_container(self, task_container, my_index, divisor):
+        """
+        When partitioning by container, decides whether a task container
+        belongs to this expirer; otherwise every task container is listed and
+        the tasks in it are assigned individually by iter_task_to_expire.
+        """
+        if not self.partition_by_container:
+            return True
+        return self.hash_mod(task_container, divisor) == my_index
+
+    def iter_task_objects_direct(self, task_account, task_container):
+        """
+        Yields the listing of a task container read directly from one of its
+        container servers, skipping tasks whose delete at timestamp is not yet
+        past. The listing is resumed on another primary if a node fails.
+        """
+        part, nodes = self.swift.container_ring.get_nodes(
+            task_account, task_container)
+        nodes = list(nodes)
+        shuffle(nodes)
+        # task object names start with their delete at timestamp
+        end_marker = normalize_delete_at_timestamp(time() + 1)
+        marker = ''
+        while nodes:
+            node = nodes[0]
+            try:
+                _junk, listing = direct_get_container(
+                    node, part, task_account, task_container,
+                    marker=marker, end_marker=end_marker,
+                    conn_timeout=self.conn_timeout,
+                    response_timeout=self.node_timeout)
+            except (Exception, Timeout) as err:
+                self.logger.warning(
+                    'Failed to list task container %(account)s/%(container)s '
+                    'from %(ip)s:%(port)s/%(device)s: %(err)s' % {
+                        'account': task_account, 'container': task_container,
+                        'ip': node['ip'], 'port': node['port'],
+                        'device': node['device'], 'err': str(err)})
+                nodes.pop(0)
+                continue
+            if not listing:
+                return
+            for o in listing:
+                yield o
+            marker = listing[-1]['name'].encode('utf8')
+        self.logger.error(
+            'Unable to list task container %(account)s/%(container)s' % {
+                'account': task_account, 'container': task_container})
+
+    def iter_task_objects(self, task_account, task_container):
+        """
+        Yields the listing of a task container, either from the container
+        servers directly or through the internal client.
+        """
+        if self.direct_listing:
+            return self.iter_task_objects_direct(task_account, task_container)
+        return self.swift.iter_objects(task_account, task_container)
+
     def iter_task_to_expire(self, task_account_container_list,
                             my_index, divisor):
         """
@@ -214,7 +292,7 @@ class ObjectExpirer(Daemon):
         task_container, task_object, timestamp_to_delete, and target_path
         """
         for task_account, task_container in task_account_container_list:
-            for o in self.swift.iter_objects(task_account, task_container):
+            for o in self.iter_task_objects(task_account, task_container):
                 task_object = o['name'].encode('utf8')
                 try:
                     delete_timestamp, target_account, target_container, \
@@ -229,8 +307,9 @@ class ObjectExpirer(Daemon):
                     break
 
                 # Only one expirer daemon assigned for one task
-                if self.hash_mod('%s/%s' % (task_container, task_object),
-                                 divisor) != my_index:
+                if not self.partition_by_container and \
+                        self.hash_mod('%s/%s' % (task_container, task_object),
+                                      divisor) != my_index:
                     continue
 
                 yield {'task_account': task_account,
@@ -277,7 +356,9 @@ class ObjectExpirer(Daemon):
 
                 task_account_container_list = \
                     [(task_account, task_container) for task_container in
-                     self.iter_task_containers_to_expire(task_account)]
+                     self.iter_task_containers_to_expire(task_account)
+                     if self.is_assigned_task_container(
+                         task_container, my_index, divisor)]
 
                 task_account_container_list_to_delete.extend(
                     task_account_container_list)
@@ -294,6 +375,7 @@ class ObjectExpirer(Daemon):
                     pool.spawn_n(self.delete_object, **delete_task)
 
             pool.waitall()
+            self.flush_pop_queue()
             for task_account, task_container in \
                     task_account_container_list_to_delete:
                 try:
@@ -372,7 +454,10 @@ class ObjectExpirer(Daemon):
                 if float(delete_timestamp) > time() - self.reclaim_age:
                     # we'll have to retry the DELETE later
                     raise
-            self.pop_queue(task_account, task_container, task_object)
+            if self.pop_batch_size > 1:
+                self.queue_pop(task_account, task_container, task_object)
+            else:
+                self.pop_queue(task_account, task_container, task_object)
             self.report_objects += 1
             self.logger.increment('objects')
         except UnexpectedResponse as err:
@@ -401,6 +486,97 @@ class ObjectExpirer(Daemon):
         direct_delete_container_entry(self.swift.container_ring, task_account,
                                       task_container, task_object)
 
+    def queue_pop(self, task_account, task_container, task_object):
+        """
+        Defer removing an expiring object queue entry until enough entries of
+        its task container have been collected to remove them in one batch.
+        """
+        key = (task_account, task_container)
+        self.pending_pops[key].append(task_object)
+        if len(self.pending_pops[key]) >= self.pop_batch_size:
+            self.pop_queue_batch(task_account, task_container,
+                                 self.pending_pops.pop(key))
+
+    def flush_pop_queue(self):
+        """
+        Remove all the expiring object queue entries still waiting to be
+        removed in a batch.
+        """
+        while self.pending_pops:
+            (task_account, task_container), task_objects = \
+                self.pending_pops.popitem()
+            self.pop_queue_batch(task_account, task_container, task_objects)
+
+    def pop_queue_batch(self, task_account, task_container, task_objects):
+        """
+        Remove many expiring object queue entries from a task container with
+        a single request to each of its primary container servers, by merging
+        tombstone rows for them.
+
+        The request is a REPLICATE merge_items request, which goes to each
+        container server's replication address. Any container server that
+        can't be reached that way, or that fails the request, has the entries
+        removed with one DELETE request each instead, as pop_queue does.
+
+        Entries that fail to be removed will be found and retried on a later
+        pass, just like with pop_queue.
+        """
+        timestamp = Timestamp.now().internal
+        # system accounts are always Policy-0
+        items = [{'name': task_object, 'created_at': timestamp, 'size': 0,
+                  'content_type': 'application/deleted', 'etag': 'noetag',
+                  'deleted': 1, 'storage_policy_index': 0}
+                 for task_object in task_objects]
+        part, nodes = self.swift.container_ring.get_nodes(
+            task_account, task_container)
+        pool = GreenPool()
+        for node in nodes:
+            pool.spawn_n(self._pop_queue_batch_from_node, node, part,
+                         task_account, task_container, items)
+        pool.waitall()
+
+    def _pop_queue_batch_from_node(self, node, part, task_account,
+                                   task_container, items):
+        hsh = hash_path(task_account, task_container)
+        try:
+            with Timeout(self.node_timeout):
+                resp = ReplConnection(node, part, hsh, self.logger).replicate(
+                    'merge_items', items, None)
+        except (Exception, Timeout) as err:
+            self.logger.error(
+                'Exception while removing queue entries from %(ip)s:%(port)s/'
+                '%(device)s, deleting them one at a time: %(err)s' % {
+                    'ip': node['replication_ip'],
+                    'port': node['replication_port'],
+                    'device': node['device'], 'err': str(err)})
+        else:
+            if is_success(resp.status) or resp.status == HTTP_NOT_FOUND:
+                return
+            self.logger.warning(
+                'Unexpected response %(status)s while removing queue entries '
+                'from %(ip)s:%(port)s/%(device)s, deleting them one at a '
+                'time' % {
+                    'status': resp.status, 'ip': node['replication_ip'],
+                    'port': node['replication_port'],
+                    'device': node['device']})
+
+        failures = 0
+        for item in items:
+            try:
+                direct_delete_container_object(
+                    node, part, task_account, task_container, item['name'],
+                    headers={'X-Timestamp': item['created_at']})
+            except (Exception, Timeout) as err:
+                failures += 1
+                last_err = err
+        if failures:
+            self.logger.error(
+                'Failed to delete %(failures)d of %(count)d queue entries '
+                'from %(ip)s:%(port)s/%(device)s: %(err)s' % {
+                    'failures': failures, 'count': len(items),
+                    'ip': node['ip'], 'port': node['port'],
+                    'device': node['device'], 'err': str(last_err)})
+
     def delete_actual_object(self, actual_obj, timestamp):
         """
         Deletes the end-user object indicated by the actual object name given
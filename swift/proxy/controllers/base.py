@@ -46,7 +46,7 @@ from swift.common.utils import Timestamp, config_true_value, \
     public, split_path, list_from_csv, GreenthreadSafeIterator, \
     GreenAsyncPile, quorum_size, parse_content_type, \
     document_iters_to_http_response_body, ShardRange
-from swift.common.bufferedhttp import http_connect
+from swift.common.bufferedhttp import BufferedHTTPConnection, http_connect
 from swift.common import constraints
 from swift.common.exceptions import ChunkReadTimeout, ChunkWriteTimeout, \
     ConnectionTimeout, RangeAlreadyComplete, ShortReadError
@@ -709,12 +709,31 @@ def _get_object_info(app, env, account, container, obj, swift_source=None):
     return info
 
 
+def backend_http_connect(app, *args, **kwargs):
+    """
+    Call http_connect, taking an idle connection from the app's keep-alive
+    pool of backend connections if it has one.
+
+    :param app: the proxy app
+    """
+    if app.backend_pool is not None:
+        kwargs['pool'] = app.backend_pool
+    return http_connect(*args, **kwargs)
+
+
 def close_swift_conn(src):
     """
-    Force close the http connection to the backend.
+    Force close the http connection to the backend, unless the response has
+    been read in full and the connection can go back to the keep-alive pool.
 
     :param src: the response from the backend
     """
+    conn = getattr(src, 'swift_conn', None)
+    if isinstance(conn, BufferedHTTPConnection) and conn.pool and \
+            conn.pool.release(conn, src):
+        # it belongs to the pool now; don't let anyone else close it
+        src.swift_conn = None
+        return
     try:
         # Since the backends set "Connection: close" in their response
         # headers, the response object (src) is solely responsible for the
@@ -1187,8 +1206,8 @@ class ResumingGetter(object):
         start_node_timing = time.time()
         try:
             with ConnectionTimeout(self.app.conn_timeout):
-                conn = http_connect(
-                    node['ip'], node['port'], node['device'],
+                conn = backend_http_connect(
+                    self.app, node['ip'], node['port'], node['device'],
                     self.partition, self.req_method, self.path,
                     headers=req_headers,
                     query_string=self.req_query_string)
@@ -1247,6 +1266,7 @@ class ResumingGetter(object):
             self.reasons.append(possible_source.reason)
             self.bodies.append(possible_source.read())
             self.source_headers.append(possible_source.getheaders())
+            close_swift_conn(possible_source)
 
             # if 404, record the timestamp. If a good source shows up, its
             # timestamp will be compared to the latest 404.
@@ -1374,6 +1394,8 @@ class GetOrHeadHandler(ResumingGetter):
                 res.app_iter = self._make_app_iter(req, node, source)
                 # See NOTE: swift_conn at top of file about this.
                 res.swift_conn = source.swift_conn
+            else:
+                close_swift_conn(source)
             if not res.environ:
                 res.environ = {}
             res.environ['swift_x_timestamp'] = \
@@ -1665,17 +1687,22 @@ class Controller(object):
             try:
                 start_node_timing = time.time()
                 with ConnectionTimeout(self.app.conn_timeout):
-                    conn = http_connect(node['ip'], node['port'],
-                                        node['device'], part, method, path,
-                                        headers=headers, query_string=query)
+                    conn = backend_http_connect(
+                        self.app, node['ip'], node['port'], node['device'],
+                        part, method, path, headers=headers,
+                        query_string=query)
                     conn.node = node
                 self.app.set_node_timing(node, time.time() - start_node_timing)
                 with Timeout(self.app.node_timeout):
                     resp = conn.getresponse()
+                    # See NOTE: swift_conn at top of file about this.
+                    resp.swift_conn = conn
                     if not is_informational(resp.status) and \
                             not is_server_error(resp.status):
+                        body = resp.read()
+                        close_swift_conn(resp)
                         return resp.status, resp.reason, resp.getheaders(), \
-                            resp.read()
+                            body
                     elif resp.status == HTTP_INSUFFICIENT_STORAGE:
                         self.app.error_limit(node,
                                              _('ERROR Insufficient Storage'))
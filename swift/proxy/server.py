@@ -29,6 +29,7 @@ from eventlet import Timeout
 
 from swift import __canonical_version__ as swift_version
 from swift.common import constraints
+from swift.common.bufferedhttp import ConnectionPool
 from swift.common.storage_policy import POLICIES
 from swift.common.ring import Ring
 from swift.common.utils import cache_from_env, get_logger, \
@@ -193,6 +194,16 @@ class Application(object):
         self.client_chunk_size = int(conf.get('client_chunk_size', 65536))
         self.trans_id_suffix = conf.get('trans_id_suffix', '')
         self.post_quorum_timeout = float(conf.get('post_quorum_timeout', 0.5))
+        backend_pool_max_idle = int(conf.get('backend_pool_max_idle', 0))
+        if backend_pool_max_idle > 0:
+            self.backend_pool = ConnectionPool(
+                max_idle=backend_pool_max_idle,
+                max_idle_time=float(
+                    conf.get('backend_pool_max_idle_time', 10)),
+                max_age=float(conf.get('backend_pool_max_age', 300)),
+                logger=self.logger)
+        else:
+            self.backend_pool = None
         self.error_suppression_interval = \
             int(conf.get('error_suppression_interval', 60))
         self.error_suppression_limit = \
@@ -0,0 +1,117 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of decrypting the etags of an encrypted container listing.
+
+JSON container listings of each size given are served through the
+keymaster and decrypter middlewares. Their entries' etags are encrypted as
+the encrypter does it, with keys derived from a few root secrets, and the
+number of entries decrypted per second is reported. Run it with::
+
+    python -m test.benchmark.listing_decrypt [-n ENTRIES] [-s SECRETS] \\
+        [-r REPEAT]
+"""
+from __future__ import print_function
+
+import base64
+import hashlib
+import json
+import optparse
+import sys
+import timeit
+
+from swift.common.middleware.crypto import decrypter
+from swift.common.middleware.crypto.crypto_utils import Crypto, \
+    append_crypto_meta
+from swift.common.middleware.crypto.encrypter import encrypt_header_val
+from swift.common.middleware.crypto.keymaster import KeyMaster, \
+    KeyMasterContext
+from swift.common.swob import Request
+
+
+def make_keymaster(app, secrets):
+    conf = {'active_root_secret_id': '0'}
+    for i in range(secrets):
+        conf['encryption_root_secret_%d' % i] = base64.b64encode(
+            hashlib.sha256(b'secret %d' % i).digest())
+    return KeyMaster(app, conf)
+
+
+def make_listing(keymaster, entries, secrets):
+    """
+    :returns: a JSON container listing of /a/c, with each entry's etag
+              encrypted with a key derived from one of the root secrets
+    """
+    crypto = Crypto()
+    listing = []
+    for i in range(entries):
+        name = 'o%d' % i
+        context = KeyMasterContext(keymaster, 'a', 'c', name)
+        keys = context.fetch_crypto_keys(key_id={
+            'v': '2', 'path': '/a/c/' + name, 'secret_id': str(i % secrets)})
+        etag = hashlib.md5(name.encode('ascii')).hexdigest()
+        value, crypto_meta = encrypt_header_val(
+            crypto, etag, keys['container'])
+        crypto_meta['key_id'] = keys['id']
+        listing.append({
+            'name': name, 'bytes': 1024, 'content_type': 'text/plain',
+            'last_modified': '2018-01-01T00:00:00.000000',
+            'hash': append_crypto_meta(value, crypto_meta)})
+    return json.dumps(listing).encode('ascii')
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options]', description=__doc__.split(
+            '\n\n')[0].strip())
+    parser.add_option('-n', '--entries', default='1000,10000',
+                      help='comma-separated numbers of entries in the '
+                      'listings (default %default)')
+    parser.add_option('-s', '--secrets', type='int', default=3,
+                      help='root secrets the etags are encrypted with '
+                      '(default %default)')
+    parser.add_option('-r', '--repeat', type='int', default=5,
+                      help='times to decrypt each listing; the best is '
+                      'reported (default %default)')
+    options, args = parser.parse_args(argv)
+
+    body = []
+
+    def listing_app(env, start_response):
+        start_response('200 OK', [('Content-Type', 'application/json'),
+                                  ('Content-Length', str(len(body[0])))])
+        return [body[0]]
+
+    keymaster = make_keymaster(
+        decrypter.Decrypter(listing_app, {}), options.secrets)
+
+    def get_listing():
+        resp = Request.blank('/v1/a/c').get_response(keymaster)
+        if resp.status_int != 200:
+            raise Exception('listing failed: %s' % resp.status)
+        return resp.body
+
+    print('%d root secrets' % options.secrets)
+    print('%10s %12s %14s' % ('entries', 'seconds', 'entries/sec'))
+    for entries in [int(n) for n in options.entries.split(',')]:
+        body[:] = [make_listing(keymaster, entries, options.secrets)]
+        secs = min(timeit.repeat(get_listing, number=1,
+                                 repeat=options.repeat))
+        print('%10d %12.3f %14.0f' % (entries, secs, entries / secs))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
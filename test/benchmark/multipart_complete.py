@@ -0,0 +1,163 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of completing S3 multipart uploads of many parts.
+
+Complete Multipart Upload requests for each number of parts given are sent
+through the s3api and SLO middlewares to an app that stands in for the proxy,
+answering HEADs of the parts after a simulated latency. Each upload is
+completed once with the parts validated from the segment container listing,
+and once with the listing failing so that SLO HEADs every part, and the time
+each took is reported. Authentication is left out, as it is in the s3api unit
+tests. Run it with::
+
+    python -m test.benchmark.multipart_complete [-p PARTS] [-l LATENCY] \\
+        [-c CONCURRENCY]
+"""
+from __future__ import print_function
+
+import email.utils
+import hashlib
+import json
+import optparse
+import sys
+import time
+
+from eventlet import sleep
+
+from swift.common.middleware import slo
+from swift.common.middleware.s3api.s3api import filter_factory
+from swift.common.swob import Request, HTTPCreated, HTTPNoContent, \
+    HTTPNotFound, HTTPOk
+
+UPLOAD_ID = 'X'
+PART_SIZE = 5 * 1024 * 1024
+LAST_MODIFIED = '2018-01-01T00:00:00.000000'
+
+
+def part_etag(part_number):
+    return hashlib.md5(b'part %d' % part_number).hexdigest()
+
+
+class ProxyApp(object):
+    """
+    Answers the requests completing an upload of ``parts`` parts of
+    ``object`` in ``bucket`` makes, HEADing a part taking ``latency`` seconds.
+    """
+
+    def __init__(self, parts, latency):
+        self.parts = parts
+        self.latency = latency
+        self.listing = True
+        self.part_heads = 0
+
+    def __call__(self, env, start_response):
+        req = Request(env)
+        path = env['PATH_INFO'].split('/', 3)[3]
+        if req.method == 'GET' and path == 'bucket+segments':
+            if not self.listing:
+                return HTTPNotFound()(env, start_response)
+            limit = int(req.params['limit'])
+            marker = req.params['marker']
+            start = int(marker.rsplit('/', 1)[1]) if marker else 0
+            listing = [{
+                'name': 'object/%s/%d' % (UPLOAD_ID, i),
+                'hash': part_etag(i), 'bytes': PART_SIZE,
+                'content_type': 'application/octet-stream',
+                'last_modified': LAST_MODIFIED,
+            } for i in range(start + 1, min(start + limit, self.parts) + 1)]
+            return HTTPOk(body=json.dumps(listing),
+                          content_type='application/json')(
+                env, start_response)
+        if req.method == 'HEAD' and path.startswith(
+                'bucket+segments/object/%s/' % UPLOAD_ID):
+            self.part_heads += 1
+            sleep(self.latency)
+            part_number = int(path.rsplit('/', 1)[1])
+            resp = HTTPOk(headers={'Etag': part_etag(part_number)},
+                          content_type='application/octet-stream')
+            resp.content_length = PART_SIZE
+            resp.last_modified = 1514764800
+            return resp(env, start_response)
+        if req.method == 'PUT':
+            req.body  # the manifest
+            return HTTPCreated()(env, start_response)
+        if req.method == 'HEAD' and '/' in path:
+            # the upload marker
+            return HTTPOk()(env, start_response)
+        return HTTPNoContent()(env, start_response)
+
+
+def complete_body(parts):
+    return ('<CompleteMultipartUpload>%s</CompleteMultipartUpload>' % ''.join(
+        '<Part><PartNumber>%d</PartNumber><ETag>"%s"</ETag></Part>' % (
+            i, part_etag(i)) for i in range(1, parts + 1))).encode('ascii')
+
+
+def complete(app, parts):
+    """
+    :returns: the seconds completing an upload of ``parts`` parts took
+    """
+    req = Request.blank(
+        '/bucket/object?uploadId=%s' % UPLOAD_ID,
+        environ={'REQUEST_METHOD': 'POST'},
+        headers={'Authorization': 'AWS test:tester:hmac',
+                 'Date': email.utils.formatdate(time.time())},
+        body=complete_body(parts))
+    start = time.time()
+    resp = req.get_response(app)
+    body = resp.body
+    elapsed = time.time() - start
+    if resp.status_int != 200 or b'<ETag>' not in body:
+        raise Exception('completing the upload failed: %s %s' % (
+            resp.status, body))
+    return elapsed
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options]', description=__doc__.split(
+            '\n\n')[0].strip())
+    parser.add_option('-p', '--parts', default='1000,10000',
+                      help='comma-separated numbers of parts in the uploads '
+                      '(default %default)')
+    parser.add_option('-l', '--latency', type='float', default=0.002,
+                      help='seconds a HEAD of a part takes (default '
+                      '%default)')
+    parser.add_option('-c', '--concurrency', default='2',
+                      help='parts SLO HEADs at a time (default %default)')
+    options, args = parser.parse_args(argv)
+
+    print('%gms a part HEAD, SLO concurrency %s' % (
+        options.latency * 1000, options.concurrency))
+    print('%8s %12s %12s %12s %8s' % (
+        'parts', 'listing s', 'part HEADs', 'HEAD all s', 'speedup'))
+    for parts in [int(n) for n in options.parts.split(',')]:
+        proxy = ProxyApp(parts, options.latency)
+        app = filter_factory({}, max_upload_part_num=parts)(
+            slo.filter_factory({}, max_manifest_segments=parts,
+                               concurrency=options.concurrency)(proxy))
+        listing_secs = complete(app, parts)
+        listing_heads = proxy.part_heads
+        proxy.listing = False
+        head_all_secs = complete(app, parts)
+        print('%8d %12.2f %12d %12.2f %7.1fx' % (
+            parts, listing_secs, listing_heads, head_all_secs,
+            head_all_secs / max(listing_secs, 1e-6)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
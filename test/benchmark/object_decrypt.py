@@ -0,0 +1,116 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of GETting encrypted objects.
+
+Objects of each size given are PUT through the keymaster and encryption
+middlewares to an app that keeps them in memory, as the object server would
+keep them on disk. They are then GET through the same middlewares, served in
+chunks of the proxy's default client chunk size, and the number of MB of
+plaintext decrypted per second on one core is reported. Run it with::
+
+    python -m test.benchmark.object_decrypt [-s SIZES] [-c CHUNK_SIZE] \\
+        [-r REPEAT]
+"""
+from __future__ import print_function
+
+import base64
+import hashlib
+import optparse
+import os
+import sys
+import timeit
+
+from swift.common.middleware import crypto
+from swift.common.middleware.crypto.keymaster import KeyMaster
+from swift.common.swob import Request, HTTPCreated, HTTPOk
+
+
+class ObjectStoreApp(object):
+    """
+    Keeps the last object PUT to it, with the metadata and footers the
+    encrypter sent along, and serves it back to GETs in chunks of
+    ``chunk_size`` bytes.
+    """
+
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+        self.headers = None
+        self.body = None
+
+    def __call__(self, env, start_response):
+        req = Request(env)
+        if req.method == 'PUT':
+            self.body = req.body
+            footers = {}
+            env['swift.callback.update_footers'](footers)
+            self.headers = dict(req.headers)
+            self.headers.update(footers)
+            self.headers['Content-Length'] = str(len(self.body))
+            return HTTPCreated()(env, start_response)
+        resp = HTTPOk(headers=self.headers, app_iter=(
+            self.body[i:i + self.chunk_size]
+            for i in range(0, len(self.body), self.chunk_size)))
+        return resp(env, start_response)
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options]', description=__doc__.split(
+            '\n\n')[0].strip())
+    parser.add_option('-s', '--sizes', default='1,16,128',
+                      help='comma-separated sizes of the objects in MB '
+                      '(default %default)')
+    parser.add_option('-c', '--chunk-size', type='int', default=65536,
+                      help='bytes in each chunk of the object served '
+                      '(default %default)')
+    parser.add_option('-r', '--repeat', type='int', default=5,
+                      help='times to GET each object; the best is reported '
+                      '(default %default)')
+    options, args = parser.parse_args(argv)
+
+    store = ObjectStoreApp(options.chunk_size)
+    app = KeyMaster(crypto.filter_factory({})(store), {
+        'encryption_root_secret': base64.b64encode(
+            hashlib.sha256(b'secret').digest())})
+
+    def get_object():
+        resp = Request.blank('/v1/a/c/o').get_response(app)
+        size = 0
+        for chunk in resp.app_iter:
+            size += len(chunk)
+        if resp.status_int != 200 or size != resp.content_length:
+            raise Exception('GET failed: %s' % resp.status)
+
+    print('%d byte chunks' % options.chunk_size)
+    print('%10s %12s %10s' % ('MB', 'seconds', 'MB/sec'))
+    for size in [int(n) for n in options.sizes.split(',')]:
+        body = os.urandom(size * 1024 * 1024)
+        resp = Request.blank('/v1/a/c/o', method='PUT',
+                             body=body).get_response(app)
+        if resp.status_int != 201:
+            raise Exception('PUT failed: %s' % resp.status)
+        if store.body == body:
+            raise Exception('the object was not encrypted')
+        if Request.blank('/v1/a/c/o').get_response(app).body != body:
+            raise Exception('the object was not decrypted')
+        secs = min(timeit.repeat(get_object, number=1,
+                                 repeat=options.repeat))
+        print('%10d %12.3f %10.1f' % (size, secs, size / secs))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
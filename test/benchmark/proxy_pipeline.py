@@ -0,0 +1,144 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Microbenchmark of the per-request overhead of each middleware in a proxy
+pipeline.
+
+A GET is sent through the pipeline from ``etc/proxy-server.conf-sample`` (or
+the config file given), with the proxy server app replaced by one that
+answers every request with a tiny ``200 OK``, and memcache replaced by a
+dict. The pipeline is built up one middleware at a time from the right, so
+the difference between successive timings is the cost of the middleware that
+was added. Run it with::
+
+    python -m test.benchmark.proxy_pipeline [-n REQUESTS] [-r REPEAT] \\
+        [conf_file]
+"""
+from __future__ import print_function
+
+import optparse
+import os
+import sys
+import timeit
+
+from paste.deploy import loadwsgi
+
+from swift.common.swob import Request
+from swift.common.wsgi import loadcontext
+
+
+SAMPLE_CONF = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir,
+                           'etc', 'proxy-server.conf-sample')
+
+
+class DictMemcache(object):
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key, raise_on_error=False):
+        return self.store.get(key)
+
+    def set(self, key, value, serialize=True, time=0, min_compress_len=0,
+            raise_on_error=False):
+        self.store[key] = value
+
+    def incr(self, key, delta=1, time=0):
+        self.store[key] = self.store.get(key, 0) + delta
+        return self.store[key]
+
+    def delete(self, key, server_key=None):
+        self.store.pop(key, None)
+
+
+def noop_app(env, start_response):
+    start_response('200 OK', [('Content-Length', '2'),
+                              ('Content-Type', 'text/plain'),
+                              ('Etag', 'the-etag'),
+                              ('X-Timestamp', '1500000000.00000')])
+    return [b'ok']
+
+
+def load_filters(conf_file):
+    """
+    :returns: a list of (name, filter) for the pipeline's middlewares, in
+              pipeline order; each filter takes the app to its right
+    """
+    context = loadcontext(loadwsgi.APP, os.path.abspath(conf_file))
+    return [(filter_context.name, filter_context.create())
+            for filter_context in context.filter_contexts]
+
+
+def time_pipelines(apps, path, requests, repeat):
+    """
+    Time GETs through each of the apps, taking turns so that anything else
+    happening on the machine affects them all alike.
+
+    :returns: a list of the best time per request for each app
+    """
+    memcache = DictMemcache()
+
+    def timer(app):
+        def do_get():
+            req = Request.blank(path, environ={'swift.cache': memcache})
+            resp = req.get_response(app)
+            b''.join(resp.app_iter)
+        do_get()  # warm any caches
+        # leave gc on, or reference cycles pile up between requests
+        return timeit.Timer(do_get, 'gc.enable()')
+
+    timers = [timer(app) for app in apps]
+    best = [float('inf')] * len(apps)
+    for _ in range(repeat):
+        for i, t in enumerate(timers):
+            best[i] = min(best[i], t.timeit(requests) / requests)
+    return best
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options] [conf_file]', description=__doc__.split(
+            '\n\n')[0].strip())
+    parser.add_option('-n', '--requests', type='int', default=1000,
+                      help='requests per timing (default %default)')
+    parser.add_option('-r', '--repeat', type='int', default=5,
+                      help='timings per pipeline, of which the best is '
+                      'taken (default %default)')
+    parser.add_option('-p', '--path', default='/v1/AUTH_test/c/o',
+                      help='path to GET (default %default)')
+    options, args = parser.parse_args(argv)
+    conf_file = args[0] if args else SAMPLE_CONF
+
+    # the cache middleware would talk to a real memcache; every request
+    # brings its own swift.cache instead
+    filters = [(name, f) for name, f in load_filters(conf_file)
+               if name != 'cache']
+    apps = [noop_app]
+    for name, make_filter in reversed(filters):
+        apps.append(make_filter(apps[-1]))
+    times = time_pipelines(apps, options.path, options.requests,
+                           options.repeat)
+    names = ['proxy-server (no-op)'] + [name for name, _ in reversed(filters)]
+    results = [(names[0], times[0])] + [
+        (name, times[i + 1] - times[i]) for i, name in enumerate(names[1:])]
+
+    print('%-24s %10s' % ('middleware', 'usec/req'))
+    for name, cost in reversed(results):
+        print('%-24s %10.1f' % (name, cost * 1e6))
+    print('%-24s %10.1f' % ('total', times[-1] * 1e6))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of how long loading a ring takes, and how much memory that only the
+loading process can use it takes, in each ring file format.
+
+A ring with the given part power is written to a temporary directory in each
+format, and each is then loaded by forked processes the way servers load their
+rings when they start and whenever the ring file changes. Memory is counted
+as the process's dirty private pages: pages of a ring file mapped into memory
+are clean, so they are shared with every other process mapping the same file
+and can be dropped and read back again under memory pressure. Run it with::
+
+    python -m test.benchmark.ring_load [-p PART_POWER] [-d DEVICES] \\
+        [-R REPLICAS] [-r REPEAT]
+"""
+from __future__ import print_function
+
+import json
+import optparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+
+from swift.common import utils
+from swift.common.ring import Ring, RingData
+
+
+FORMAT_VERSIONS = (1, 2)
+
+
+def write_ring(path, part_power, devices, replicas, format_version):
+    devs = [{'id': i, 'region': 1, 'zone': i % 4, 'weight': 100.0,
+             'ip': '127.0.0.%d' % (i // 10 + 1), 'port': 6200 + i % 10,
+             'replication_ip': '127.0.0.%d' % (i // 10 + 1),
+             'replication_port': 6200 + i % 10,
+             'device': 'd%d' % i, 'meta': ''}
+            for i in range(devices)]
+    # a rebalanced ring's assignments compress about as badly as these
+    rand = random.Random(part_power)
+    parts = 2 ** part_power
+    replica2part2dev_id = [
+        array('H', (rand.randrange(devices) for _junk in range(parts)))
+        for _junk in range(replicas)]
+    RingData(replica2part2dev_id, devs, 32 - part_power).save(
+        path, format_version=format_version)
+
+
+def dirty_kb():
+    dirty = 0
+    try:
+        f = open('/proc/self/smaps_rollup')
+    except IOError:
+        f = open('/proc/self/smaps')
+    with f:
+        for line in f:
+            key, _sep, rest = line.partition(':')
+            if key == 'Private_Dirty':
+                dirty += int(rest.split()[0])
+    return dirty
+
+
+def load_in_child(ring_file):
+    """
+    :returns: a tuple of the seconds it took a new process to load the ring,
+              and the kB of dirty private memory that took
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_fd)
+            before = dirty_kb()
+            start = time.time()
+            ring = Ring(ring_file)
+            elapsed = time.time() - start
+            # use the ring as a server would
+            for part in range(0, ring.partition_count, 97):
+                ring.get_part_nodes(part)
+            os.write(write_fd, json.dumps(
+                [elapsed, dirty_kb() - before]).encode('ascii'))
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        result = json.loads(f.read())
+    os.waitpid(pid, 0)
+    return result
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options]', description=__doc__.split(
+            '\n\n')[0].strip())
+    parser.add_option('-p', '--part-power', type='int', default=20,
+                      help='part power of the ring (default %default)')
+    parser.add_option('-d', '--devices', type='int', default=1000,
+                      help='devices in the ring (default %default)')
+    parser.add_option('-R', '--replicas', type='int', default=3,
+                      help='replicas in the ring (default %default)')
+    parser.add_option('-r', '--repeat', type='int', default=5,
+                      help='loads to time in each format, of which the '
+                      'median is reported (default %default)')
+    options, args = parser.parse_args(argv)
+
+    try:
+        utils.validate_hash_conf()
+    except utils.InvalidHashPathConfigError:
+        utils.HASH_PATH_SUFFIX = b'benchmark'
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        rows = []
+        for format_version in FORMAT_VERSIONS:
+            ring_file = os.path.join(tempdir, 'v%d.ring.gz' % format_version)
+            write_ring(ring_file, options.part_power, options.devices,
+                       options.replicas, format_version)
+            results = sorted(load_in_child(ring_file)
+                             for _junk in range(options.repeat))
+            rows.append((format_version, os.path.getsize(ring_file),
+                         results[len(results) // 2]))
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+    print('part power %d, %d devices, %d replicas' % (
+        options.part_power, options.devices, options.replicas))
+    print('%-8s %12s %12s %12s' % (
+        'format', 'file MB', 'load ms', 'dirty MB'))
+    for format_version, size, (elapsed, dirty) in rows:
+        print('%-8d %12.1f %12.1f %12.1f' % (
+            format_version, size / 1024.0 / 1024.0, elapsed * 1000,
+            dirty / 1024.0))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of full against incremental ring rebalances.
+
+A ``swift-ring-builder-analyzer`` scenario is run once with full rebalances
+and once with incremental ones. Each round's changes are made to the builder,
+which is then rebalanced until it settles down as the analyzer does it, and
+the time that took is reported along with the resulting balance and
+dispersion in each mode. Without a scenario file, one is used that builds a
+ring of 4 zones of 5 servers of 10 devices, then adds a device, changes the
+weight of another and removes a third. Run it with::
+
+    python -m test.benchmark.ring_rebalance [-p PART_POWER] [scenario_file]
+"""
+from __future__ import print_function
+
+import copy
+import json
+import optparse
+import sys
+import time
+
+from swift.cli.ring_builder_analyzer import parse_scenario
+from swift.common.ring import builder
+
+
+def default_scenario(part_power):
+    devs = [['add', 'r1z%d-10.0.%d.%d:6200/d%d' % (zone, zone, server, dev),
+             100]
+            for zone in range(1, 5)
+            for server in range(1, 6)
+            for dev in range(10)]
+    return {
+        'part_power': part_power,
+        'replicas': 3,
+        'overload': 0.0,
+        'random_seed': 1,
+        'rounds': [
+            devs,
+            [['add', 'r1z1-10.0.1.6:6200/d0', 100]],
+            [['set_weight', 12, 50]],
+            [['remove', 34]],
+        ],
+    }
+
+
+def run_rounds(scenario, incremental):
+    """
+    :returns: a list of (seconds, parts_moved, balance, dispersion) for each
+              round of the scenario
+    """
+    seed = scenario['random_seed']
+    rb = builder.RingBuilder(scenario['part_power'], scenario['replicas'], 1)
+    rb.set_overload(scenario['overload'])
+    command_map = {
+        'add': rb.add_dev,
+        'remove': rb.remove_dev,
+        'set_weight': rb.set_dev_weight,
+        'save': rb.save,
+    }
+
+    results = []
+    for commands in scenario['rounds']:
+        for command in commands:
+            command_map[command[0]](*command[1:])
+
+        # rebalance until it settles down, as the analyzer does
+        start = time.time()
+        total_moved, old_balance, _removed = rb.rebalance(
+            seed=seed, incremental=incremental)
+        rb.pretend_min_part_hours_passed()
+        while True:
+            parts_moved, balance, removed_devs = rb.rebalance(
+                seed=seed, incremental=incremental)
+            rb.pretend_min_part_hours_passed()
+            total_moved += parts_moved
+            if parts_moved == 0 and removed_devs == 0:
+                break
+            if abs(balance - old_balance) < 1 and not (
+                    old_balance == builder.MAX_BALANCE and
+                    balance == builder.MAX_BALANCE):
+                break
+            old_balance = balance
+        results.append((time.time() - start, total_moved, balance,
+                        rb.dispersion))
+    return results
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options] [scenario_file]', description=__doc__.split(
+            '\n\n')[0].strip())
+    parser.add_option('-p', '--part-power', type='int',
+                      help='part power to use instead of the scenario\'s '
+                      '(default 16 without a scenario file)')
+    options, args = parser.parse_args(argv)
+
+    if not builder.NUMPY_INSTALLED:
+        print('An incremental rebalance requires numpy to be installed.')
+        return 1
+    if args:
+        with open(args[0]) as f:
+            raw_scenario = json.load(f)
+    else:
+        raw_scenario = default_scenario(16)
+    if options.part_power:
+        raw_scenario['part_power'] = options.part_power
+    scenario = parse_scenario(json.dumps(raw_scenario))
+
+    full = run_rounds(copy.deepcopy(scenario), False)
+    incremental = run_rounds(copy.deepcopy(scenario), True)
+
+    print('part power %d, %g replicas' % (
+        scenario['part_power'], scenario['replicas']))
+    print('%-6s %10s %10s %8s %10s %10s %10s %10s' % (
+        'round', 'full s', 'incr s', 'speedup', 'moved', 'balance',
+        'incr bal', 'dispersion'))
+    for i, (full_result, incr_result) in enumerate(zip(full, incremental)):
+        full_time, moved, balance, dispersion = full_result
+        incr_time, _moved, incr_balance, incr_dispersion = incr_result
+        print('%-6d %10.2f %10.2f %7.1fx %10d %10.2f %10.2f %10.2f%s' % (
+            i + 1, full_time, incr_time, full_time / max(incr_time, 1e-6),
+            moved, balance, incr_balance, dispersion,
+            '' if incr_result[1:] == full_result[1:] else ' (differs)'))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of the ring builder's dispersion and balance reporting, with and
+without numpy.
+
+For each part power, a builder of 4 zones of 6 servers of 10 devices is given
+a randomly generated assignment of 3 replicas to different zones, which is
+much quicker than rebalancing one. Building the dispersion graph, validating
+the builder with stats, getting its balance and making the report of
+``swift-ring-builder <builder_file> dispersion`` are then timed going through
+every partition replica in Python, and again with numpy, and whether the two
+gave the same numbers is reported. Going through every partition in Python
+takes minutes at the larger part powers. Run it with::
+
+    python -m test.benchmark.ring_reporting [-p PART_POWERS] [--numpy-only]
+"""
+from __future__ import print_function
+
+import optparse
+import sys
+import time
+from array import array
+
+from swift.common.ring import builder
+from swift.common.ring.utils import dispersion_report
+
+
+DEFAULT_PART_POWERS = '16,20,23'
+
+
+def make_builder(part_power):
+    rb = builder.RingBuilder(part_power, 3, 1)
+    for zone in range(4):
+        for server in range(6):
+            for device in range(10):
+                rb.add_dev({
+                    'region': 1, 'zone': zone, 'weight': 100,
+                    'ip': '10.0.%d.%d' % (zone, server), 'port': 6200,
+                    'device': 'd%d' % device})
+    random_state = builder.numpy.random.RandomState(part_power)
+    first_zones = random_state.randint(4, size=rb.parts)
+    rb._replica2part2dev = []
+    for replica in range(3):
+        zones = (first_zones + replica) % 4
+        dev_ids = zones * 60 + random_state.randint(60, size=rb.parts)
+        rb._replica2part2dev.append(
+            array('H', dev_ids.astype(builder.numpy.uint16).tobytes()))
+    parts = builder.numpy.zeros(len(rb.devs), dtype=builder.numpy.int64)
+    for part2dev in rb._replica2part2dev:
+        parts += builder.numpy.bincount(
+            builder.numpy.frombuffer(part2dev, dtype=builder.numpy.uint16),
+            minlength=len(rb.devs))
+    for dev in rb._iter_devs():
+        dev['parts'] = int(parts[dev['id']])
+    return rb
+
+
+def report(rb):
+    """
+    :returns: a list of (name, seconds, result) for each report
+    """
+    results = []
+
+    def timed(name, func):
+        start = time.time()
+        result = func()
+        results.append((name, time.time() - start, result))
+
+    def dispersion_graph():
+        rb._build_dispersion_graph()
+        return rb._dispersion_graph, rb.dispersion
+
+    timed('dispersion graph', dispersion_graph)
+    timed('validate stats', lambda: rb.validate(stats=True))
+    timed('balance', rb.get_balance)
+    timed('dispersion report', lambda: dispersion_report(
+        rb, verbose=True, recalculate=True))
+    return results
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options]', description=__doc__.split(
+            '\n\n')[0].strip())
+    parser.add_option('-p', '--part-powers', default=DEFAULT_PART_POWERS,
+                      help='comma-separated part powers to report on '
+                      '(default %default)')
+    parser.add_option('--numpy-only', action='store_true',
+                      help="don't time going through every partition in "
+                      "Python")
+    options, args = parser.parse_args(argv)
+
+    if not builder.NUMPY_INSTALLED:
+        print('This benchmark requires numpy to be installed.')
+        return 1
+
+    print('%-4s %-18s %12s %12s %8s %6s' % (
+        'pp', 'report', 'python s', 'numpy s', 'speedup', 'same'))
+    for part_power in [int(pp) for pp in options.part_powers.split(',')]:
+        rb = make_builder(part_power)
+        numpy_results = report(rb)
+        if options.numpy_only:
+            python_results = [(name, None, None)
+                              for name, _secs, _result in numpy_results]
+        else:
+            builder.NUMPY_INSTALLED = False
+            try:
+                python_results = report(rb)
+            finally:
+                builder.NUMPY_INSTALLED = True
+        for (name, numpy_secs, numpy_result), (
+                _name, python_secs, python_result) in zip(
+                    numpy_results, python_results):
+            if python_secs is None:
+                print('%-4d %-18s %12s %12.3f %8s %6s' % (
+                    part_power, name, '-', numpy_secs, '-', '-'))
+                continue
+            print('%-4d %-18s %12.3f %12.3f %7.1fx %6s' % (
+                part_power, name, python_secs, numpy_secs,
+                python_secs / max(numpy_secs, 1e-6),
+                'yes' if python_result == numpy_result else 'NO'))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
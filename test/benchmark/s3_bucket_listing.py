@@ -0,0 +1,101 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of serving S3 bucket listing pages.
+
+GET Bucket requests for ListObjects, ListObjectsV2 and ListObjectVersions
+pages of the given number of keys are sent through the s3api middleware to
+an app that serves a JSON container listing, and the number of pages served
+per second is reported. Authentication is left out, as it is in the s3api
+unit tests, so that the time is spent turning the container listing into
+XML. Run it with::
+
+    python -m test.benchmark.s3_bucket_listing [-k KEYS] [-d DURATION]
+"""
+from __future__ import print_function
+
+import email.utils
+import json
+import optparse
+import sys
+import time
+
+from swift.common.middleware.s3api.s3api import filter_factory
+from swift.common.swob import Request
+
+
+LISTINGS = [
+    ('ListObjects', '/bucket'),
+    ('ListObjectsV2', '/bucket?list-type=2&fetch-owner=true'),
+    ('ListObjectVersions', '/bucket?versions'),
+]
+
+
+def make_listing_app(keys):
+    listing = json.dumps([{
+        'name': 'photos/2018/%08d.jpg' % i, 'bytes': 1024 * i,
+        'content_type': 'image/jpeg',
+        'last_modified': '2018-01-01T00:00:00.%06d' % (i % 1000000),
+        'hash': '%032x' % i} for i in range(keys + 1)])
+
+    def listing_app(env, start_response):
+        start_response('200 OK', [('Content-Type', 'application/json'),
+                                  ('Content-Length', str(len(listing)))])
+        return [listing]
+    return listing_app
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options]', description=__doc__.split(
+            '\n\n')[0].strip())
+    parser.add_option('-k', '--keys', type='int', default=1000,
+                      help='keys on each page (default %default)')
+    parser.add_option('-d', '--duration', type='float', default=5.0,
+                      help='seconds to serve each kind of page for '
+                      '(default %default)')
+    options, args = parser.parse_args(argv)
+
+    s3api = filter_factory(
+        {}, max_bucket_listing=options.keys)(make_listing_app(options.keys))
+
+    def get_page(path):
+        req = Request.blank(path, headers={
+            'Authorization': 'AWS test:tester:hmac',
+            'Date': email.utils.formatdate(time.time())})
+        resp = req.get_response(s3api)
+        if resp.status_int != 200:
+            raise Exception('listing failed: %s' % resp.status)
+        return resp.body
+
+    print('%d keys per page' % options.keys)
+    print('%-20s %10s %12s %12s' % ('listing', 'pages', 'pages/sec',
+                                    'bytes/page'))
+    for name, path in LISTINGS:
+        pages = 0
+        start = time.time()
+        while True:
+            body = get_page(path)
+            pages += 1
+            elapsed = time.time() - start
+            if elapsed >= options.duration:
+                break
+        print('%-20s %10d %12.1f %12d' % (name, pages, pages / elapsed,
+                                          len(body)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,275 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of how long a proxy server takes from starting to having every
+worker serving requests, with and without ``preload_app``.
+
+A ``swift-init proxy reload`` has the running server's parent stop accepting
+and a new parent start up, so this is the time a reload takes to get back to
+full capacity. Rings with the given part power are written to a temporary
+directory and a proxy server is started with :func:`swift.common.wsgi.run_wsgi`
+as ``swift-proxy-server`` would. Requests are then sent on new connections,
+so that any worker may accept them, until each worker has answered one.
+Reported are the times to the first answer and to the last worker's first
+answer, and how much of the workers' memory is private to each of them rather
+than shared. Run it with::
+
+    python -m test.benchmark.worker_startup [-w WORKERS] [-p PART_POWER] \\
+        [-d DEVICES] [-r REPEAT]
+"""
+from __future__ import print_function
+
+import optparse
+import os
+import pwd
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from array import array
+
+from eventlet import GreenPool, sleep
+from eventlet.green import socket as green_socket
+
+from swift.common import utils
+from swift.common.ring import RingData
+from swift.common.storage_policy import POLICIES
+from swift.common.wsgi import CPU_COUNT, run_wsgi
+
+
+PROBE_PATH = '/startup_probe'
+
+PROXY_CONF = """
+[DEFAULT]
+bind_ip = 127.0.0.1
+bind_port = %(port)d
+workers = %(workers)d
+swift_dir = %(swift_dir)s
+user = %(user)s
+preload_app = %(preload_app)s
+log_udp_host = 127.0.0.1
+log_udp_port = 9
+
+[pipeline:main]
+pipeline = startup_probe proxy-server
+
+[filter:startup_probe]
+paste.filter_factory = test.benchmark.worker_startup:filter_factory
+
+[app:proxy-server]
+use = egg:swift#proxy
+"""
+
+
+def filter_factory(global_conf, **local_conf):
+    """
+    Answers requests for ``PROBE_PATH`` with the worker's PID.
+    """
+    def probe_filter(app):
+        def probe(env, start_response):
+            if env['PATH_INFO'] != PROBE_PATH:
+                return app(env, start_response)
+            body = str(os.getpid()).encode('ascii')
+            start_response('200 OK', [('Content-Length', str(len(body)))])
+            return [body]
+        return probe
+    return probe_filter
+
+
+def free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def write_ring(path, part_power, devices, replicas=3):
+    devs = [{'id': i, 'region': 1, 'zone': i % 4, 'weight': 100.0,
+             'ip': '127.0.0.%d' % (i // 10 + 1), 'port': 6200 + i % 10,
+             'replication_ip': '127.0.0.%d' % (i // 10 + 1),
+             'replication_port': 6200 + i % 10,
+             'device': 'd%d' % i, 'meta': ''}
+            for i in range(devices)]
+    parts = 2 ** part_power
+    replica2part2dev_id = [
+        array('H', (int((part + r * devices / float(replicas))) % devices
+                    for part in range(parts)))
+        for r in range(replicas)]
+    RingData(replica2part2dev_id, devs, 32 - part_power).save(path)
+
+
+def write_rings(swift_dir, part_power, devices):
+    ring_names = ['account', 'container'] + [
+        policy.ring_name for policy in POLICIES]
+    for ring_name in ring_names:
+        write_ring(os.path.join(swift_dir, ring_name + '.ring.gz'),
+                   part_power, devices)
+
+
+def probe(port):
+    """
+    :returns: the PID of the worker that answered, or None if none did
+    """
+    try:
+        sock = green_socket.create_connection(('127.0.0.1', port))
+    except socket.error:
+        return None
+    try:
+        sock.sendall(b'GET ' + PROBE_PATH.encode('ascii') +
+                     b' HTTP/1.0\r\nConnection: close\r\n\r\n')
+        chunks = []
+        while True:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    except socket.error:
+        return None
+    finally:
+        sock.close()
+    resp = b''.join(chunks)
+    if not resp.startswith(b'HTTP/1.0 200') and \
+            not resp.startswith(b'HTTP/1.1 200'):
+        return None
+    return int(resp.rpartition(b'\r\n\r\n')[2])
+
+
+def memory_kb(pid):
+    """
+    :returns: a tuple of the process's proportional set size and the size of
+              its private pages, in kB
+    """
+    values = {'Pss': 0, 'Private_Clean': 0, 'Private_Dirty': 0}
+    try:
+        f = open('/proc/%d/smaps_rollup' % pid)
+    except IOError:
+        f = open('/proc/%d/smaps' % pid)
+    with f:
+        for line in f:
+            key, _sep, rest = line.partition(':')
+            if key in values:
+                values[key] += int(rest.split()[0])
+    return values['Pss'], values['Private_Clean'] + values['Private_Dirty']
+
+
+def start_server(conf_file):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_wsgi(conf_file, 'proxy-server')
+        finally:
+            os._exit(0)
+    return pid
+
+
+def stop_server(pid):
+    # the server's parent leads the process group of it and its workers
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+
+
+def time_startup(conf_file, port, workers, timeout=300):
+    """
+    :returns: a tuple of the seconds until the first answer, the seconds until
+              every worker has answered, and the workers' PIDs
+    """
+    start = time.time()
+    server_pid = start_server(conf_file)
+    try:
+        first = None
+        seen = set()
+        pool = GreenPool(workers * 2)
+        while len(seen) < workers:
+            if time.time() - start > timeout:
+                raise Exception('Only %d of %d workers answered in %ds' % (
+                    len(seen), workers, timeout))
+            for pid in pool.imap(probe, [port] * workers * 2):
+                if pid is None:
+                    continue
+                if first is None:
+                    first = time.time() - start
+                seen.add(pid)
+            if not seen:
+                sleep(0.01)
+        everyone = time.time() - start
+        memory = [memory_kb(pid) for pid in seen]
+    finally:
+        stop_server(server_pid)
+    return first, everyone, memory
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options]', description=__doc__.split(
+            '\n\n')[0].strip())
+    parser.add_option('-w', '--workers', type='int', default=CPU_COUNT,
+                      help='proxy workers (default %default)')
+    parser.add_option('-p', '--part-power', type='int', default=18,
+                      help='part power of the rings (default %default)')
+    parser.add_option('-d', '--devices', type='int', default=100,
+                      help='devices in the rings (default %default)')
+    parser.add_option('-r', '--repeat', type='int', default=3,
+                      help='startups to time with each setting, of which '
+                      'the median is reported (default %default)')
+    options, args = parser.parse_args(argv)
+
+    try:
+        utils.validate_hash_conf()
+    except utils.InvalidHashPathConfigError:
+        utils.HASH_PATH_SUFFIX = b'benchmark'
+
+    swift_dir = tempfile.mkdtemp()
+    try:
+        print('Writing rings with part power %d...' % options.part_power)
+        write_rings(swift_dir, options.part_power, options.devices)
+        rows = []
+        for preload_app in ('false', 'true'):
+            results = []
+            for _junk in range(options.repeat):
+                port = free_port()
+                conf_file = os.path.join(swift_dir, 'proxy-server.conf')
+                with open(conf_file, 'w') as f:
+                    f.write(PROXY_CONF % {
+                        'port': port, 'workers': options.workers,
+                        'swift_dir': swift_dir,
+                        'user': pwd.getpwuid(os.getuid()).pw_name,
+                        'preload_app': preload_app})
+                results.append(time_startup(conf_file, port,
+                                            options.workers))
+            results.sort(key=lambda result: result[1])
+            rows.append((preload_app, results[len(results) // 2]))
+    finally:
+        shutil.rmtree(swift_dir, ignore_errors=True)
+
+    print('%d workers; times in seconds, memory in MB summed over workers' %
+          options.workers)
+    print('%-12s %12s %12s %12s %12s' % (
+        'preload_app', 'first', 'all workers', 'pss', 'private'))
+    for preload_app, (first, everyone, memory) in rows:
+        print('%-12s %12.2f %12.2f %12.1f %12.1f' % (
+            preload_app, first, everyone,
+            sum(pss for pss, _junk in memory) / 1024.0,
+            sum(private for _junk, private in memory) / 1024.0))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,266 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of how workers sharing one listen socket compare with workers each
+accepting on their own ``SO_REUSEPORT`` socket.
+
+For each strategy, a server is started on the loopback interface with the
+given number of workers, each answering every request after burning the given
+amount of CPU, with its PID. Client processes then send GETs, each on a new
+connection so that every request goes through accept(), and the distribution
+of request latencies is reported along with the share of requests each worker
+served and how much CPU time the workers used per request. Run it with::
+
+    python -m test.benchmark.worker_strategies [-w WORKERS] [-c CLIENTS] \\
+        [-C CONCURRENCY] [-n REQUESTS] [--work USEC] [--cpu-affinity CPUS]
+"""
+from __future__ import print_function
+
+import json
+import multiprocessing
+import optparse
+import os
+import pwd
+import signal
+import socket
+import sys
+import time
+
+from eventlet import GreenPool, wsgi as eventlet_wsgi
+from eventlet.green import socket as green_socket
+
+from swift.common import wsgi
+from test.unit import FakeLogger
+
+
+STRATEGIES = (
+    ('shared socket', wsgi.WorkersStrategy),
+    ('reuse_port', wsgi.ReusePortStrategy),
+)
+
+
+class NullStream(object):
+    def write(self, data):
+        pass
+
+
+def free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def make_app(work):
+    def app(env, start_response):
+        end = time.time() + work
+        while time.time() < end:
+            pass
+        body = str(os.getpid()).encode('ascii')
+        start_response('200 OK', [('Content-Length', str(len(body)))])
+        return [body]
+    return app
+
+
+def serve(strategy_class, conf, work, pid_pipe):
+    """
+    Run a server the way :func:`swift.common.wsgi.run_wsgi` does, writing its
+    workers' PIDs to ``pid_pipe`` once they are started. Never returns.
+    """
+    strategy = strategy_class(conf, FakeLogger())
+    error = strategy.do_bind_ports()
+    if error:
+        os.write(pid_pipe, json.dumps({'error': error}).encode('ascii'))
+        os._exit(1)
+    pids = []
+    for sock, sock_info in strategy.new_worker_socks():
+        pid = os.fork()
+        if pid == 0:
+            eventlet_wsgi.server(sock, make_app(work), log=NullStream())
+            os._exit(0)
+        strategy.register_worker_start(sock, sock_info, pid)
+        pids.append(pid)
+    os.write(pid_pipe, (json.dumps({'pids': pids}) + '\n').encode('ascii'))
+    while True:
+        time.sleep(60)
+
+
+def start_server(strategy_class, conf, work):
+    """
+    :returns: a tuple of the server parent's PID, which leads its own process
+              group, and its workers' PIDs
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            serve(strategy_class, conf, work, write_fd)
+        finally:
+            os._exit(1)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pid_pipe:
+        result = json.loads(pid_pipe.readline())
+    if 'error' in result:
+        raise Exception(result['error'])
+    return pid, result['pids']
+
+
+def stop_server(pid):
+    os.killpg(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+
+
+def cpu_seconds(pid):
+    """
+    :returns: the user and system CPU time used by the process, or None if it
+              can't be found out
+    """
+    try:
+        with open('/proc/%d/stat' % pid) as f:
+            fields = f.read().rpartition(')')[2].split()
+    except IOError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / \
+        float(os.sysconf('SC_CLK_TCK'))
+
+
+def get(port):
+    """
+    :returns: a tuple of the request's latency and the PID of the worker that
+              served it
+    """
+    start = time.time()
+    sock = green_socket.create_connection(('127.0.0.1', port))
+    try:
+        sock.sendall(b'GET / HTTP/1.0\r\nConnection: close\r\n\r\n')
+        chunks = []
+        while True:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        sock.close()
+    elapsed = time.time() - start
+    resp = b''.join(chunks)
+    return elapsed, int(resp.rpartition(b'\r\n\r\n')[2])
+
+
+def run_client(args):
+    port, requests, concurrency = args
+    pool = GreenPool(concurrency)
+    return list(pool.imap(get, [port] * requests))
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+def run(strategy_class, conf, options):
+    pid, worker_pids = start_server(strategy_class, conf, options.work / 1e6)
+    try:
+        port = int(conf['bind_port'])
+        client_pool = multiprocessing.Pool(options.clients)
+        # warm up, and let the workers all start accepting
+        client_pool.map(run_client, [(port, 20, 2)] * options.clients)
+        cpu_before = [cpu_seconds(p) for p in worker_pids]
+        start = time.time()
+        results = client_pool.map(
+            run_client,
+            [(port, options.requests // options.clients,
+              options.concurrency)] * options.clients)
+        elapsed = time.time() - start
+        cpu_after = [cpu_seconds(p) for p in worker_pids]
+        client_pool.close()
+        client_pool.join()
+    finally:
+        stop_server(pid)
+
+    results = [result for client in results for result in client]
+    latencies = sorted(latency for latency, _junk in results)
+    served = dict((p, 0) for p in worker_pids)
+    for _junk, worker_pid in results:
+        served[worker_pid] = served.get(worker_pid, 0) + 1
+    shares = [100.0 * count / len(results) for count in served.values()]
+    mean_share = 100.0 / len(shares)
+    stddev = (sum((s - mean_share) ** 2 for s in shares) /
+              len(shares)) ** 0.5
+    if None in cpu_before + cpu_after:
+        cpu_per_req = float('nan')
+    else:
+        cpu_per_req = (sum(cpu_after) - sum(cpu_before)) / len(results)
+    return {
+        'req/s': len(results) / elapsed,
+        'p50': percentile(latencies, 50) * 1000,
+        'p90': percentile(latencies, 90) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'max': latencies[-1] * 1000,
+        'min share': min(shares),
+        'max share': max(shares),
+        'share stddev': stddev,
+        'cpu ms/req': cpu_per_req * 1000,
+    }
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options]', description=__doc__.split(
+            '\n\n')[0].strip())
+    parser.add_option('-w', '--workers', type='int',
+                      default=wsgi.CPU_COUNT,
+                      help='server workers (default %default)')
+    parser.add_option('-c', '--clients', type='int', default=2,
+                      help='client processes (default %default)')
+    parser.add_option('-C', '--concurrency', type='int', default=20,
+                      help='concurrent requests per client process '
+                      '(default %default)')
+    parser.add_option('-n', '--requests', type='int', default=10000,
+                      help='requests in all (default %default)')
+    parser.add_option('--work', type='float', default=100,
+                      help='usec of CPU burnt per request (default %default)')
+    parser.add_option('--cpu-affinity', default='',
+                      help='CPUs to pin reuse_port workers to, e.g. 0-3')
+    options, args = parser.parse_args(argv)
+    if not wsgi.reuse_port_supported():
+        print('SO_REUSEPORT is not supported here', file=sys.stderr)
+        return 1
+
+    rows = []
+    for name, strategy_class in STRATEGIES:
+        conf = {
+            'bind_ip': '127.0.0.1',
+            'bind_port': free_port(),
+            'workers': options.workers,
+            'user': pwd.getpwuid(os.getuid()).pw_name,
+            'cpu_affinity': options.cpu_affinity,
+        }
+        rows.append((name, run(strategy_class, conf, options)))
+
+    columns = ['req/s', 'p50', 'p90', 'p99', 'max', 'min share',
+               'max share', 'share stddev', 'cpu ms/req']
+    print('%d workers, %d requests, %.0f usec of work per request; '
+          'latencies in ms, shares of requests in %%' % (
+              options.workers, options.requests, options.work))
+    print('%-14s' % 'strategy' + ''.join('%13s' % c for c in columns))
+    for name, result in rows:
+        print('%-14s' % name + ''.join('%13.2f' % result[c]
+                                       for c in columns))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -152,6 +152,33 @@ class TestManageShardRanges(unittest.TestCase):
         self.assert_starts_with(err_lines[0], 'Loaded db broker for ')
         self.assert_starts_with(err_lines[1], 'Found 10 ranges in ')
 
+    def test_find_shard_ranges_sampled(self):
+        broker = self._make_broker()
+        ts = utils.Timestamp.now()
+        for i in range(100):
+            broker.merge_items([
+                {'name': 'obj%02d' % i, 'created_at': ts.internal, 'size': 0,
+                 'content_type': 'application/octet-stream',
+                 'etag': 'not-really', 'deleted': 0,
+                 'storage_policy_index': 0, 'ctype_timestamp': ts.internal,
+                 'meta_timestamp': ts.internal}])
+
+        out = StringIO()
+        err = StringIO()
+        with mock.patch('sys.stdout', out), mock.patch('sys.stderr', err):
+            main([broker.db_file, 'find', '25', '--sample-count', '20'])
+        self.assert_formatted_json(out.getvalue(), [
+            {'index': 0, 'lower': '', 'upper': 'obj20', 'object_count': 25},
+            {'index': 1, 'lower': 'obj20', 'upper': 'obj45',
+             'object_count': 25},
+            {'index': 2, 'lower': 'obj45', 'upper': 'obj70',
+             'object_count': 25},
+            {'index': 3, 'lower': 'obj70', 'upper': '', 'object_count': 25},
+        ])
+        err_lines = err.getvalue().split('\n')
+        self.assert_starts_with(err_lines[0], 'Loaded db broker for ')
+        self.assert_starts_with(err_lines[1], 'Found 4 ranges in ')
+
     def test_info(self):
         broker = self._make_broker()
         broker.update_metadata({'X-Container-Sysmeta-Sharding':
@@ -22,6 +22,7 @@ import unittest
 from test.unit import with_tempdir
 
 from swift.cli.ring_builder_analyzer import parse_scenario, run_scenario
+from swift.common.ring.builder import NUMPY_INSTALLED
 
 
 class TestRunScenario(unittest.TestCase):
@@ -49,6 +50,29 @@ class TestRunScenario(unittest.TestCase):
         self.assertIn('Rebalance', fake_stdout.getvalue())
         self.assertTrue(os.path.exists(builder_path))
 
+    @unittest.skipIf(not NUMPY_INSTALLED, 'numpy is not installed')
+    def test_it_runs_incremental(self):
+        scenario = {
+            'replicas': 3, 'part_power': 8, 'random_seed': 123, 'overload': 0,
+            'rounds': [[['add', 'r1z2-3.4.5.6:7/sda8', 100],
+                        ['add', 'z2-3.4.5.6:7/sda9', 200],
+                        ['add', 'z2-3.4.5.6:7/sda10', 200],
+                        ['add', 'z2-3.4.5.6:7/sda11', 200]],
+                       [['set_weight', 0, 150]],
+                       [['remove', 1]]]}
+
+        outputs = []
+        for incremental in (False, True):
+            fake_stdout = StringIO()
+            with mock.patch('sys.stdout', fake_stdout):
+                run_scenario(parse_scenario(json.dumps(scenario)),
+                             incremental=incremental)
+            outputs.append(fake_stdout.getvalue())
+
+        # an incremental rebalance moves the same parts as a full one
+        self.assertIn('Rebalance', outputs[1])
+        self.assertEqual(outputs[0], outputs[1])
+
 
 class TestParseScenario(unittest.TestCase):
     def test_good(self):
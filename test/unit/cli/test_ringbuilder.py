@@ -30,7 +30,8 @@ import time
 from swift.cli import ringbuilder
 from swift.cli.ringbuilder import EXIT_SUCCESS, EXIT_WARNING, EXIT_ERROR
 from swift.common import exceptions
-from swift.common.ring import RingBuilder
+from swift.common.ring import RingBuilder, RingData
+from swift.common.ring.builder import NUMPY_INSTALLED
 from swift.common.ring.composite_builder import CompositeRingBuilder
 
 from test.unit import Timeout, write_stub_builder
@@ -2181,6 +2182,27 @@ class TestCommands(unittest.TestCase, RunSwiftRingBuilderMixin):
         argv = ["", self.tmpfile, "rebalance", "--seed", "2"]
         self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
 
+    @unittest.skipIf(not NUMPY_INSTALLED, 'numpy is not installed')
+    def test_rebalance_incremental(self):
+        self.create_sample_ring()
+        full_file = self.tmpfile + '.full'
+        shutil.copy(self.tmpfile, full_file)
+        argv = ["", full_file, "rebalance", "--seed", "2"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        argv = ["", self.tmpfile, "rebalance", "--seed", "2", "--incremental"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        self.assertEqual(RingBuilder.load(full_file)._replica2part2dev,
+                         RingBuilder.load(self.tmpfile)._replica2part2dev)
+
+    def test_rebalance_incremental_without_numpy(self):
+        self.create_sample_ring()
+        argv = ["", self.tmpfile, "rebalance", "--incremental"]
+        with mock.patch('swift.cli.ringbuilder.NUMPY_INSTALLED', False), \
+                mock.patch('sys.stdout', new=six.StringIO()) as mock_stdout:
+            self.assertSystemExit(EXIT_ERROR, ringbuilder.main, argv)
+        self.assertIn('requires numpy', mock_stdout.getvalue())
+        self.assertFalse(RingBuilder.load(self.tmpfile).ever_rebalanced)
+
     def test_rebalance_removed_devices(self):
         self.create_sample_ring()
         argvs = [
@@ -2232,6 +2254,44 @@ class TestCommands(unittest.TestCase, RunSwiftRingBuilderMixin):
         argv = ["", self.tmpfile, "write_ring"]
         self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
 
+    def test_write_ring_format_version(self):
+        self.create_sample_ring()
+        argv = ["", self.tmpfile, "rebalance"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        ring_file = self.tmpfile + '.ring.gz'
+        self.assertEqual(1, RingData.file_format_version(ring_file))
+        ring_v1 = RingData.load(ring_file)
+
+        argv = ["", self.tmpfile, "write_ring", "--format-version", "2"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        self.assertEqual(2, RingData.file_format_version(ring_file))
+        ring_v2 = RingData.load(ring_file)
+        self.assertEqual(ring_v1.devs, ring_v2.devs)
+        self.assertEqual(ring_v1._replica2part2dev_id,
+                         ring_v2._replica2part2dev_id)
+
+        # the format is kept by rewrites and rebalances...
+        argv = ["", self.tmpfile, "write_ring"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        self.assertEqual(2, RingData.file_format_version(ring_file))
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, [
+            "", self.tmpfile, "add", "r1z1-127.0.0.1:6200/sdz", "100"])
+        argv = ["", self.tmpfile, "pretend_min_part_hours_passed"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        self.run_srb("rebalance", exp_results={'valid_exit_codes': [0, 1]})
+        self.assertEqual(2, RingData.file_format_version(ring_file))
+        self.assertEqual(5, len(RingData.load(ring_file).devs))
+
+        # ... until it's changed back
+        argv = ["", self.tmpfile, "write_ring", "--format-version", "1"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        self.assertEqual(1, RingData.file_format_version(ring_file))
+
+        exp_results = {'valid_exit_codes': [2]}
+        out, err = self.run_srb("write_ring", "--format-version", "3",
+                                exp_results=exp_results)
+        self.assertIn("invalid choice: '3'", err)
+
     def test_write_empty_ring(self):
         ring = RingBuilder(6, 3, 1)
         ring.save(self.tmpfile)
@@ -2248,6 +2308,23 @@ class TestCommands(unittest.TestCase, RunSwiftRingBuilderMixin):
         exp_results = {'valid_exit_codes': [2]}
         self.run_srb(*argv, exp_results=exp_results)
 
+    def test_write_builder_from_v2_ring(self):
+        self.create_sample_ring()
+        argv = ["", self.tmpfile, "rebalance"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        argv = ["", self.tmpfile, "write_ring", "--format-version", "2"]
+        self.assertSystemExit(EXIT_SUCCESS, ringbuilder.main, argv)
+        orig_builder = RingBuilder.load(self.tmpfile)
+        os.remove(self.tmpfile)
+
+        argv = ["", self.tmpfile + ".ring.gz", "write_builder", "24"]
+        self.assertIsNone(ringbuilder.main(argv))
+        builder = RingBuilder.load(self.tmpfile + '.builder')
+        self.assertEqual(orig_builder._replica2part2dev,
+                         builder._replica2part2dev)
+        self.assertEqual([dev['parts'] for dev in orig_builder.devs],
+                         [dev['parts'] for dev in builder.devs])
+
     def test_write_builder_fractional_replicas(self):
         # Test builder file already exists
         self.create_sample_ring(replicas=1.2)
@@ -1147,6 +1147,73 @@ class TestDecrypterContainerRequests(unittest.TestCase):
             'Error decrypting container listing: unknown_key',
         ])
 
+    def test_cont_get_json_req_with_unknown_secret_id_warns_once(self):
+        bad_crypto_meta = fake_get_crypto_meta()
+        bad_crypto_meta['key_id'] = {'secret_id': 'unknown_key'}
+        key = fetch_crypto_keys()['container']
+        pt_etag = 'c6e8196d7f0fff6444b90861fe8d609d'
+        ct_etag = encrypt_and_append_meta(pt_etag, key,
+                                          crypto_meta=bad_crypto_meta)
+
+        listing = [{"bytes": 16,
+                    "last_modified": "2015-04-14T23:33:06.439040",
+                    "hash": ct_etag,
+                    "name": "testfile%d" % i,
+                    "content_type": "image/jpeg"} for i in range(3)]
+        fake_body = json.dumps(listing).encode('ascii')
+
+        resp = self._make_cont_get_req(fake_body, 'json')
+
+        self.assertEqual('200 OK', resp.status)
+        self.assertEqual(
+            ['<unknown>'] * 3,
+            [x['hash'] for x in json.loads(resp.body)])
+        self.assertEqual(
+            ['Error decrypting container listing: unknown_key'],
+            [line for line in
+             self.decrypter.logger.get_lines_for_level('error')
+             if 'listing' in line])
+
+    def test_GET_container_json_fetches_keys_for_each_entry(self):
+        key = fetch_crypto_keys()['container']
+        other_key = fetch_crypto_keys(key_id={'secret_id': 'myid'})[
+            'container']
+        crypto_meta = fake_get_crypto_meta(
+            key_id={'v': 'fake', 'path': '/a/c/fake'})
+        other_crypto_meta = fake_get_crypto_meta(
+            key_id={'v': 'fake', 'path': '/a/c/fake', 'secret_id': 'myid'})
+        pt_etags = [md5hex(b'obj%d' % i) for i in range(6)]
+        listing = []
+        for i, pt_etag in enumerate(pt_etags):
+            if i % 2:
+                ct_etag = encrypt_and_append_meta(
+                    pt_etag, other_key, crypto_meta=other_crypto_meta)
+            else:
+                ct_etag = encrypt_and_append_meta(
+                    pt_etag, key, crypto_meta=crypto_meta)
+            listing.append({"bytes": 16,
+                            "last_modified": "2015-04-14T23:33:06.439040",
+                            "hash": ct_etag,
+                            "name": "testfile%d" % i,
+                            "content_type": "image/jpeg"})
+        fake_body = json.dumps(listing).encode('ascii')
+        calls = []
+
+        def wrapped_fetch_crypto_keys(key_id=None):
+            calls.append(key_id)
+            return fetch_crypto_keys(key_id=key_id)
+
+        resp = self._make_cont_get_req(fake_body, 'json',
+                                       callback=wrapped_fetch_crypto_keys)
+
+        self.assertEqual('200 OK', resp.status)
+        self.assertEqual(pt_etags,
+                         [x['hash'] for x in json.loads(resp.body)])
+        # keys are fetched with each entry's own key id
+        self.assertEqual([{'v': 'fake', 'path': '/a/c/fake'},
+                          {'v': 'fake', 'path': '/a/c/fake',
+                           'secret_id': 'myid'}] * 3, calls)
+
     def test_GET_container_json_not_encrypted_obj(self):
         pt_etag = '%s; symlink_path=/a/c/o' % MD5_OF_EMPTY_STRING
 
@@ -30,7 +30,7 @@ from swift.common.swob import Request
 from test.unit.common.middleware.helpers import FakeSwift, FakeAppThatExcepts
 from test.unit.common.middleware.crypto.crypto_helpers import (
     TEST_KEYMASTER_CONF)
-from test.unit import tmpfile
+from test.unit import tmpfile, debug_logger
 
 
 def capture_start_response():
@@ -372,9 +372,9 @@ class TestKeymaster(unittest.TestCase):
         orig_create_key = self.app.create_key
         calls = []
 
-        def mock_create_key(path, secret_id=None):
+        def mock_create_key(path, secret_id=None, cache=False):
             calls.append((path, secret_id))
-            return orig_create_key(path, secret_id)
+            return orig_create_key(path, secret_id, cache=cache)
 
         context = keymaster.KeyMasterContext(self.app, 'a', 'c', 'o')
         with mock.patch.object(self.app, 'create_key', mock_create_key):
@@ -414,6 +414,84 @@ class TestKeymaster(unittest.TestCase):
                           ('/a/c', None), ('/a/c/o', None)],
                          calls)
 
+    def test_derived_key_cache(self):
+        secret = b'x' * 32
+        self.app.logger = debug_logger()
+        derive_calls = []
+        orig_derive_key = self.app._derive_key
+
+        def mock_derive_key(path, secret_id):
+            derive_calls.append((path, secret_id))
+            return orig_derive_key(path, secret_id)
+
+        with mock.patch.object(self.app, '_derive_key', mock_derive_key):
+            for obj in ('o1', 'o2', 'o3'):
+                context = keymaster.KeyMasterContext(self.app, 'a', 'c', obj)
+                keys = context.fetch_crypto_keys()
+                self.assertEqual(
+                    hmac.new(secret, b'/a/c',
+                             digestmod=hashlib.sha256).digest(),
+                    keys['container'])
+                self.assertEqual(
+                    hmac.new(secret, b'/a/c/' + obj.encode('ascii'),
+                             digestmod=hashlib.sha256).digest(),
+                    keys['object'])
+            context = keymaster.KeyMasterContext(self.app, 'a', 'c2', None)
+            keys = context.fetch_crypto_keys()
+            self.assertEqual(
+                hmac.new(secret, b'/a/c2', digestmod=hashlib.sha256).digest(),
+                keys['container'])
+
+        # container key derived once per container, object keys every time
+        self.assertEqual([('/a/c', None), ('/a/c/o1', None),
+                          ('/a/c/o2', None), ('/a/c/o3', None),
+                          ('/a/c2', None)], derive_calls)
+        self.assertEqual({'derived_key_cache.hits': 2,
+                          'derived_key_cache.misses': 2},
+                         self.app.logger.get_increment_counts())
+
+    def test_derived_key_cache_size(self):
+        conf = dict(TEST_KEYMASTER_CONF, derived_key_cache_size='1')
+        app = keymaster.KeyMaster(self.swift, conf)
+        app.logger = debug_logger()
+        for path in ('/a/c1', '/a/c2', '/a/c1', '/a/c1'):
+            app.create_key(path, cache=True)
+        self.assertEqual({'derived_key_cache.hits': 1,
+                          'derived_key_cache.misses': 3},
+                         app.logger.get_increment_counts())
+
+        conf = dict(TEST_KEYMASTER_CONF, derived_key_cache_size='0')
+        app = keymaster.KeyMaster(self.swift, conf)
+        app.logger = debug_logger()
+        self.assertIsNone(app._cached_derive_key)
+        self.assertEqual(
+            hmac.new(b'x' * 32, b'/a/c1', digestmod=hashlib.sha256).digest(),
+            app.create_key('/a/c1', cache=True))
+        self.assertEqual({}, app.logger.get_increment_counts())
+
+        conf = dict(TEST_KEYMASTER_CONF, derived_key_cache_size='-1')
+        with self.assertRaises(ValueError) as cm:
+            keymaster.KeyMaster(self.swift, conf)
+        self.assertEqual('derived_key_cache_size must be >= 0',
+                         str(cm.exception))
+
+    def test_derived_key_cache_v1_object_keys(self):
+        # v1 object key paths may have as few slashes as a container path,
+        # but are still not cached
+        self.app.logger = debug_logger()
+        for obj, key_path in (('/o', '/o'), ('/x/y', '/x/y')):
+            context = keymaster.KeyMasterContext(self.app, 'a', 'c', obj)
+            keys = context.fetch_crypto_keys(key_id={
+                'v': '1', 'path': key_path})
+            self.assertEqual(
+                hmac.new(b'x' * 32, key_path.encode('ascii'),
+                         digestmod=hashlib.sha256).digest(),
+                keys['object'])
+        # only the container key went through the cache
+        self.assertEqual({'derived_key_cache.hits': 1,
+                          'derived_key_cache.misses': 1},
+                         self.app.logger.get_increment_counts())
+
     def test_v1_keys(self):
         secrets = {None: os.urandom(32),
                    '22': os.urandom(33)}
@@ -427,9 +505,9 @@ class TestKeymaster(unittest.TestCase):
         orig_create_key = self.app.create_key
         calls = []
 
-        def mock_create_key(path, secret_id=None):
+        def mock_create_key(path, secret_id=None, cache=False):
             calls.append((path, secret_id))
-            return orig_create_key(path, secret_id)
+            return orig_create_key(path, secret_id, cache=cache)
 
         context = keymaster.KeyMasterContext(self.app, 'a', 'c', 'o')
         for version in ('1', '2'):
@@ -495,9 +573,9 @@ class TestKeymaster(unittest.TestCase):
         orig_create_key = self.app.create_key
         calls = []
 
-        def mock_create_key(path, secret_id=None):
+        def mock_create_key(path, secret_id=None, cache=False):
             calls.append((path, secret_id))
-            return orig_create_key(path, secret_id)
+            return orig_create_key(path, secret_id, cache=cache)
 
         # request path doesn't match stored path -- this could happen if you
         # misconfigured your proxy to have copy right of encryption
@@ -501,6 +501,46 @@ class TestS3ApiBucket(S3ApiTestCase):
         for o in objects:
             self.assertIsNotNone(o.find('./Owner'))
 
+    def test_bucket_GET_documents_are_valid(self):
+        def do_test(path, root_tag):
+            headers = {'Authorization': 'AWS test:tester:hmac',
+                       'Date': self.get_date_header()}
+            req = Request.blank(path, environ={'REQUEST_METHOD': 'GET'},
+                                headers=headers)
+            status, headers, body = self.call_s3api(req)
+            self.assertEqual(status.split()[0], '200')
+            # validated against the schema
+            fromstring(body, root_tag)
+
+        for path in ('/junk', '/junk?encoding-type=url',
+                     '/junk?list-type=2', '/junk?list-type=2&fetch-owner=true',
+                     '/junk?list-type=2&encoding-type=url',
+                     '/junk-subdir', '/junk-subdir?list-type=2',
+                     '/subdirs?delimiter=/&max-keys=2',
+                     '/subdirs?delimiter=/&max-keys=2&list-type=2',
+                     '/junk?delimiter=a&max-keys=2&marker=viola'):
+            do_test(path, 'ListBucketResult')
+        for path in ('/junk?versions', '/junk?versions&max-keys=2',
+                     '/junk?versions&encoding-type=url',
+                     '/junk?versions&key-marker=rose&version-id-marker=x',
+                     '/subdirs?versions&delimiter=/&max-keys=2',
+                     '/junk-subdir?versions&prefix=app'):
+            do_test(path, 'ListVersionsResult')
+
+    def test_bucket_GET_unserializable_name(self):
+        self.swift.register(
+            'GET', '/v1/AUTH_test/control', swob.HTTPOk,
+            {'Content-Type': 'application/json'},
+            json.dumps([{'name': u'nul\x01', 'hash': '0', 'bytes': 0,
+                         'last_modified': '2011-01-05T02:19:14.275290'}]))
+        for path in ('/control', '/control?versions'):
+            headers = {'Authorization': 'AWS test:tester:hmac',
+                       'Date': self.get_date_header()}
+            req = Request.blank(path, environ={'REQUEST_METHOD': 'GET'},
+                                headers=headers)
+            status, headers, body = self.call_s3api(req)
+            self.assertEqual(status.split()[0], '500')
+
     def test_bucket_GET_with_versions_versioning_not_configured(self):
         req = Request.blank('/junk?versions',
                             environ={'REQUEST_METHOD': 'GET'},
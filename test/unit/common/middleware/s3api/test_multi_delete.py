@@ -18,8 +18,12 @@ import unittest
 from datetime import datetime
 from hashlib import md5
 
+import eventlet
+
 from swift.common import swob
 from swift.common.swob import Request
+from swift.common.middleware.s3api.controllers import \
+    MultiObjectDeleteController
 
 from test.unit.common.middleware.s3api import S3ApiTestCase
 from test.unit.common.middleware.s3api.helpers import UnreadableInput
@@ -167,6 +171,71 @@ class TestS3ApiMultiDelete(S3ApiTestCase):
             ('DELETE', '/v1/AUTH_test/bucket/Key4?multipart-manifest=delete'),
         ])
 
+    @s3acl
+    def test_object_multi_DELETE_unexpected_error(self):
+        # there's no DELETE registered for Key1, so FakeSwift blows up
+        elem = Element('Delete')
+        for key in ['Key1', 'Key2']:
+            obj = SubElement(elem, 'Object')
+            SubElement(obj, 'Key').text = key
+        body = tostring(elem, use_s3ns=False)
+        content_md5 = md5(body).digest().encode('base64').strip()
+
+        req = Request.blank('/bucket?delete',
+                            environ={'REQUEST_METHOD': 'POST'},
+                            headers={'Authorization': 'AWS test:tester:hmac',
+                                     'Date': self.get_date_header(),
+                                     'Content-MD5': content_md5},
+                            body=body)
+        status, headers, body = self.call_s3api(req)
+        # the body is already on its way by the time the delete fails
+        self.assertEqual(status.split()[0], '200')
+        self.assertEqual(headers['Content-Type'], 'application/xml')
+
+        elem = fromstring(body, 'DeleteResult')
+        self.assertEqual([el.find('Key').text
+                          for el in elem.findall('Deleted')], ['Key2'])
+        self.assertEqual(
+            [(el.find('Key').text, el.find('Code').text)
+             for el in elem.findall('Error')], [('Key1', 'InternalError')])
+
+    def test_object_multi_DELETE_adaptive_concurrency(self):
+        self.s3api.conf.multi_delete_concurrency = 2
+        self.s3api.conf.max_multi_delete_concurrency = 4
+        controller = MultiObjectDeleteController(
+            self.app, self.s3api.conf, self.s3api.logger)
+
+        def run_deletes(err):
+            # how many deletes have been started but not yet handed back
+            # when each delete starts
+            outstanding = []
+            counts = {'started': 0, 'consumed': 0}
+
+            def fake_delete(key):
+                counts['started'] += 1
+                outstanding.append(counts['started'] - counts['consumed'])
+                eventlet.sleep(0)
+                return key, err
+
+            keys = ['k%d' % i for i in range(10)]
+            results = []
+            for key, _err in controller._iter_delete_results(
+                    fake_delete, [(key,) for key in keys]):
+                counts['consumed'] += 1
+                results.append(key)
+            self.assertEqual(sorted(results), keys)
+            return outstanding
+
+        # starts out at multi_delete_concurrency, and grows no further than
+        # max_multi_delete_concurrency
+        outstanding = run_deletes(None)
+        self.assertEqual(outstanding[:2], [1, 2])
+        self.assertEqual(max(outstanding), 4)
+
+        # an overloaded backend drives it down to one at a time
+        outstanding = run_deletes({'code': 'InternalError', 'message': 'x'})
+        self.assertEqual(outstanding, [1, 2] + [1] * 8)
+
     @s3acl
     def test_object_multi_DELETE_quiet(self):
         self.swift.register('DELETE', '/v1/AUTH_test/bucket/Key1',
@@ -683,6 +683,8 @@ class TestS3ApiMultiUpload(S3ApiTestCase):
             ('HEAD', '/v1/AUTH_test/bucket'),
             # Segment container exists
             ('HEAD', '/v1/AUTH_test/bucket+segments/object/X'),
+            ('GET', '/v1/AUTH_test/bucket+segments?delimiter=/&format=json&'
+             'limit=10000&marker=&prefix=object/X/'),
             # Create the SLO
             ('PUT', '/v1/AUTH_test/bucket/object'
                     '?heartbeat=on&multipart-manifest=put'),
@@ -698,6 +700,68 @@ class TestS3ApiMultiUpload(S3ApiTestCase):
         h = 'X-Object-Sysmeta-Container-Update-Override-Etag'
         self.assertEqual(headers.get(h), override_etag)
 
+    def test_object_multipart_upload_complete_known_segments(self):
+        segment_bucket = '/v1/AUTH_test/bucket+segments'
+        for marker, item in zip(('', 'object/X/1', 'object/X/2'),
+                                objects_template + (None,)):
+            listing = []
+            if item:
+                listing.append({'name': item[0], 'last_modified': item[1],
+                                'hash': item[2], 'bytes': item[3],
+                                'content_type': 'application/octet-stream'})
+            self.swift.register(
+                'GET', segment_bucket + '?delimiter=/&format=json&limit=1&'
+                'marker=%s&prefix=object/X/' % marker,
+                swob.HTTPOk, {}, json.dumps(listing))
+
+        put_envs = []
+
+        def capture_put_env(env, start_response):
+            if env['REQUEST_METHOD'] == 'PUT':
+                put_envs.append(env)
+            return self.swift(env, start_response)
+
+        req = Request.blank('/bucket/object?uploadId=X',
+                            environ={'REQUEST_METHOD': 'POST'},
+                            headers={'Authorization': 'AWS test:tester:hmac',
+                                     'Date': self.get_date_header(), },
+                            body=xml)
+        with patch('swift.common.middleware.s3api.controllers.multi_upload.'
+                   'CONTAINER_LISTING_LIMIT', 1), \
+                patch.object(self.app, 'swift', capture_put_env):
+            status, headers, body = self.call_s3api(req)
+        self.assertEqual(status.split()[0], '200')
+        self.assertEqual(
+            [call for call in self.swift.calls if call[0] == 'GET'], [
+                ('GET', segment_bucket + '?delimiter=/&format=json&limit=1&'
+                 'marker=&prefix=object/X/'),
+                ('GET', segment_bucket + '?delimiter=/&format=json&limit=1&'
+                 'marker=object/X/1&prefix=object/X/'),
+                ('GET', segment_bucket + '?delimiter=/&format=json&limit=1&'
+                 'marker=object/X/2&prefix=object/X/'),
+            ])
+        self.assertEqual(len(put_envs), 1)
+        known_segments = put_envs[0]['swift.slo_known_segments']
+        self.assertEqual(sorted(known_segments), [
+            '/bucket+segments/object/X/1', '/bucket+segments/object/X/2'])
+        self.assertEqual(known_segments['/bucket+segments/object/X/2']['hash'],
+                         'fedcba9876543210')
+
+    def test_object_multipart_upload_complete_listing_fails(self):
+        self.swift.register('GET', '/v1/AUTH_test/bucket+segments',
+                            swob.HTTPServiceUnavailable, {}, None)
+        req = Request.blank('/bucket/object?uploadId=X',
+                            environ={'REQUEST_METHOD': 'POST'},
+                            headers={'Authorization': 'AWS test:tester:hmac',
+                                     'Date': self.get_date_header(), },
+                            body=xml)
+        status, headers, body = self.call_s3api(req)
+        # SLO just has to HEAD all the segments
+        self.assertEqual(status.split()[0], '200')
+        self.assertEqual(self.swift.calls[-2], (
+            'PUT', '/v1/AUTH_test/bucket/object'
+                   '?heartbeat=on&multipart-manifest=put'))
+
     @patch('swift.common.middleware.s3api.controllers.multi_upload.time')
     def test_object_multipart_upload_complete_with_heartbeat(self, mock_time):
         self.swift.register(
@@ -745,6 +809,8 @@ class TestS3ApiMultiUpload(S3ApiTestCase):
         self.assertEqual(self.swift.calls, [
             ('HEAD', '/v1/AUTH_test/bucket'),
             ('HEAD', '/v1/AUTH_test/bucket+segments/heartbeat-ok/X'),
+            ('GET', '/v1/AUTH_test/bucket+segments?delimiter=/&format=json&'
+             'limit=10000&marker=&prefix=heartbeat-ok/X/'),
             ('PUT', '/v1/AUTH_test/bucket/heartbeat-ok?'
                     'heartbeat=on&multipart-manifest=put'),
             ('DELETE', '/v1/AUTH_test/bucket+segments/heartbeat-ok/X'),
@@ -795,6 +861,8 @@ class TestS3ApiMultiUpload(S3ApiTestCase):
         self.assertEqual(self.swift.calls, [
             ('HEAD', '/v1/AUTH_test/bucket'),
             ('HEAD', '/v1/AUTH_test/bucket+segments/heartbeat-fail/X'),
+            ('GET', '/v1/AUTH_test/bucket+segments?delimiter=/&format=json&'
+             'limit=10000&marker=&prefix=heartbeat-fail/X/'),
             ('PUT', '/v1/AUTH_test/bucket/heartbeat-fail?'
                     'heartbeat=on&multipart-manifest=put'),
         ])
@@ -844,6 +912,8 @@ class TestS3ApiMultiUpload(S3ApiTestCase):
         self.assertEqual(self.swift.calls, [
             ('HEAD', '/v1/AUTH_test/bucket'),
             ('HEAD', '/v1/AUTH_test/bucket+segments/heartbeat-fail/X'),
+            ('GET', '/v1/AUTH_test/bucket+segments?delimiter=/&format=json&'
+             'limit=10000&marker=&prefix=heartbeat-fail/X/'),
             ('PUT', '/v1/AUTH_test/bucket/heartbeat-fail?'
                     'heartbeat=on&multipart-manifest=put'),
         ])
@@ -933,7 +1003,7 @@ class TestS3ApiMultiUpload(S3ApiTestCase):
         self.assertEqual(self._get_error_message(body), msg)
         # We punt to SLO to do the validation
         self.assertEqual([method for method, _ in self.swift.calls],
-                         ['HEAD', 'HEAD', 'PUT'])
+                         ['HEAD', 'HEAD', 'GET', 'PUT'])
 
         self.swift.clear_calls()
         self.s3api.conf.min_segment_size = 5242880
@@ -954,7 +1024,7 @@ class TestS3ApiMultiUpload(S3ApiTestCase):
         self.assertEqual(self._get_error_message(body), msg)
         # Again, we punt to SLO to do the validation
         self.assertEqual([method for method, _ in self.swift.calls],
-                         ['HEAD', 'HEAD', 'PUT'])
+                         ['HEAD', 'HEAD', 'GET', 'PUT'])
 
     def test_object_multipart_upload_complete_zero_segments(self):
         segment_bucket = '/v1/AUTH_test/empty-bucket+segments'
@@ -1040,6 +1110,8 @@ class TestS3ApiMultiUpload(S3ApiTestCase):
         self.assertEqual(self.swift.calls, [
             ('HEAD', '/v1/AUTH_test/empty-bucket'),
             ('HEAD', '/v1/AUTH_test/empty-bucket+segments/object/X'),
+            ('GET', '/v1/AUTH_test/empty-bucket+segments?delimiter=/&'
+             'format=json&limit=10000&marker=&prefix=object/X/'),
             ('PUT', '/v1/AUTH_test/empty-bucket/object?'
                     'heartbeat=on&multipart-manifest=put'),
             ('DELETE', '/v1/AUTH_test/empty-bucket+segments/object/X'),
@@ -1109,6 +1181,8 @@ class TestS3ApiMultiUpload(S3ApiTestCase):
         self.assertEqual(self.swift.calls, [
             ('HEAD', '/v1/AUTH_test/bucket'),
             ('HEAD', '/v1/AUTH_test/bucket+segments/object/X'),
+            ('GET', '/v1/AUTH_test/bucket+segments?delimiter=/&format=json&'
+             'limit=10000&marker=&prefix=object/X/'),
             ('PUT', '/v1/AUTH_test/bucket/object?'
                     'heartbeat=on&multipart-manifest=put'),
             ('DELETE', '/v1/AUTH_test/bucket+segments/object/X'),
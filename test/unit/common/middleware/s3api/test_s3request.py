@@ -14,6 +14,7 @@
 # limitations under the License.
 
 import hashlib
+import hmac
 from mock import patch, MagicMock
 import unittest
 
@@ -26,6 +27,7 @@ from swift.common.middleware.s3api.acl_handlers import get_acl_handler
 from swift.common.middleware.s3api.subresource import ACL, User, Owner, \
     Grant, encode_acl
 from test.unit.common.middleware.s3api.test_s3api import S3ApiTestCase
+from swift.common.middleware.s3api import s3request
 from swift.common.middleware.s3api.s3request import S3Request, \
     S3AclRequest, SigV4Request, SIGV4_X_AMZ_DATE_FORMAT, HashingInput
 from swift.common.middleware.s3api.s3response import InvalidArgument, \
@@ -812,6 +814,62 @@ class TestRequest(S3ApiTestCase):
         self.assertFalse(sigv4_req.check_signature(
             u'\u30c9\u30e9\u30b4\u30f3'))
 
+    def test_check_signature_sigv4_caches_signing_key(self):
+        amz_date_header = self.get_v4_amz_date_header()
+        date = amz_date_header.split('T', 1)[0]
+        req = Request.blank('/photos/puppy.jpg', headers={
+            'Authorization':
+                'AWS4-HMAC-SHA256 '
+                'Credential=test/%s/us-east-1/s3/aws4_request, '
+                'SignedHeaders=host;x-amz-content-sha256;x-amz-date,'
+                'Signature=X' % date,
+            'X-Amz-Content-SHA256': '0123456789',
+            'X-Amz-Date': amz_date_header
+        })
+        sigv4_req = SigV4Request(
+            req.environ, storage_domain='s3.amazonaws.com')
+        signing_key = 'AWS4secret'
+        for scope_piece in (date, 'us-east-1', 's3', 'aws4_request'):
+            signing_key = hmac.new(
+                signing_key, scope_piece, hashlib.sha256).digest()
+        sigv4_req.signature = hmac.new(
+            signing_key, sigv4_req.string_to_sign,
+            hashlib.sha256).hexdigest()
+
+        s3request._sigv4_signing_key.reset()
+        self.assertTrue(sigv4_req.check_signature('secret'))
+        self.assertEqual(1, s3request._sigv4_signing_key.size())
+        with patch('swift.common.middleware.s3api.s3request.hmac.new',
+                   side_effect=hmac.new) as mock_hmac:
+            self.assertTrue(sigv4_req.check_signature('secret'))
+        # only the signature itself needed computing
+        self.assertEqual(1, mock_hmac.call_count)
+        # the cached key is never used for a different secret
+        self.assertFalse(sigv4_req.check_signature('wrong'))
+        self.assertEqual(2, s3request._sigv4_signing_key.size())
+
+    def test_headers_to_sign_sigv4_skips_unsigned_headers(self):
+        headers = {
+            'Authorization':
+                'AWS4-HMAC-SHA256 '
+                'Credential=test/%s/us-east-1/s3/aws4_request, '
+                'SignedHeaders=host;x-amz-content-sha256;x-amz-date,'
+                'Signature=X' % self.get_v4_amz_date_header().split('T', 1)[0],
+            'X-Amz-Content-SHA256': '0123456789',
+            'X-Amz-Date': self.get_v4_amz_date_header(),
+            'X-Amz-Meta-Unsigned': '  not   normalized  ',
+        }
+        req = Request.blank('/', environ={'REQUEST_METHOD': 'GET'},
+                            headers=headers)
+        sigv4_req = SigV4Request(req.environ)
+        with patch('swift.common.middleware.s3api.s3request._header_strip',
+                   side_effect=lambda v: v) as mock_strip:
+            headers_to_sign = sigv4_req._headers_to_sign()
+        self.assertEqual(['host', 'x-amz-content-sha256', 'x-amz-date'],
+                         [k for k, v in headers_to_sign])
+        self.assertNotIn('  not   normalized  ',
+                         [c[0][0] for c in mock_strip.call_args_list])
+
 
 class TestHashingInput(S3ApiTestCase):
     def test_good(self):
@@ -605,6 +605,88 @@ class S3TokenMiddlewareTestGood(S3TokenMiddlewareTestBase):
         cache.set.assert_called_once_with('s3secret/access', expected_cache,
                                           time=20)
 
+    @mock.patch('swift.common.middleware.s3api.s3token.cache_from_env')
+    @mock.patch('keystoneclient.v3.client.Client')
+    @mock.patch.object(requests, 'post')
+    def test_secret_is_locally_cached(self, MOCK_REQUEST, MOCK_KEYSTONE,
+                                      MOCK_CACHE_FROM_ENV):
+        self.middleware = s3token.filter_factory({
+            'auth_uri': 'http://example.com',
+            'secret_cache_duration': '20',
+            'local_secret_cache_duration': '5',
+            'auth_type': 'v3password',
+            'auth_url': 'http://example.com:5000/v3',
+            'username': 'swift',
+            'password': 'secret',
+            'project_name': 'service',
+            'user_domain_name': 'default',
+            'project_domain_name': 'default',
+        })(FakeApp())
+        self.assertEqual(5, self.middleware._local_cache_duration)
+
+        cache = MOCK_CACHE_FROM_ENV.return_value
+        fake_cache_response = ({}, 'token_id', {'id': 'tenant_id'}, 'secret')
+        cache.get.return_value = fake_cache_response
+        MOCK_REQUEST.return_value = TestResponse({
+            'status_code': 201,
+            'text': json.dumps(GOOD_RESPONSE_V2)})
+        checked = []
+
+        def do_request(valid=True):
+            req = Request.blank('/v1/AUTH_cfa/c/o')
+            req.environ['s3api.auth_details'] = {
+                'access_key': u'access',
+                'signature': u'signature',
+                'string_to_sign': u'token',
+                'check_signature': lambda x: checked.append(x) or valid
+            }
+            return req.get_response(self.middleware)
+
+        now = time.time()
+        with mock.patch('time.time', return_value=now):
+            do_request()
+            do_request()
+        # memcache is only consulted once; the signature is always checked
+        self.assertEqual(1, cache.get.call_count)
+        self.assertEqual(['secret', 'secret'], checked)
+        self.assertFalse(MOCK_REQUEST.called)
+
+        # the local cache expires long before memcache would
+        with mock.patch('time.time', return_value=now + 6):
+            do_request()
+        self.assertEqual(2, cache.get.call_count)
+        self.assertFalse(MOCK_REQUEST.called)
+
+        # a signature that doesn't match the cached secret goes to keystone,
+        # and the secret fetched from keystone replaces the cached one
+        keystone_client = MOCK_KEYSTONE.return_value
+        keystone_client.ec2.get.return_value = mock.Mock(secret='new-secret')
+        with mock.patch('time.time', return_value=now + 6):
+            do_request(valid=False)
+        self.assertTrue(MOCK_REQUEST.called)
+        self.assertEqual(
+            'new-secret', self.middleware._get_local_cache('access')[3])
+
+    def test_local_secret_cache_size(self):
+        middleware = s3token.filter_factory({
+            'auth_uri': 'http://example.com',
+            'local_secret_cache_duration': '5',
+        })(FakeApp())
+        # there's nothing to cache without keystone secret caching
+        self.assertEqual(0, middleware._local_cache_duration)
+        middleware._set_local_cache('access', ('auth', 'data'))
+        self.assertIsNone(middleware._get_local_cache('access'))
+
+        middleware._local_cache_duration = 5
+        middleware._local_cache_size = 2
+        middleware._set_local_cache('a', 'data-a')
+        middleware._set_local_cache('b', 'data-b')
+        self.assertEqual('data-a', middleware._get_local_cache('a'))
+        # the least recently used entry is evicted
+        middleware._set_local_cache('c', 'data-c')
+        self.assertEqual(['a', 'c'], list(middleware._local_cache))
+        self.assertIsNone(middleware._get_local_cache('b'))
+
 
 class S3TokenMiddlewareTestBad(S3TokenMiddlewareTestBase):
     def test_unauthorized_token(self):
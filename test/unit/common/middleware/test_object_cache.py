@@ -0,0 +1,231 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import mock
+
+from swift.common import swob, utils
+from swift.common.middleware import object_cache
+from swift.common.swob import Request
+
+from test.unit import FakeLogger
+from test.unit.common.middleware.helpers import FakeSwift
+
+
+class TestObjectCache(unittest.TestCase):
+    def setUp(self):
+        self.app = FakeSwift()
+        self.logger = FakeLogger()
+        self.conf = {'max_object_size': '10', 'max_cache_size': '1000'}
+        self.cache = object_cache.ObjectCacheMiddleware(
+            self.app, self.conf, logger=self.logger)
+        self.app.register('HEAD', '/v1/a', swob.HTTPNoContent, {})
+        self.app.register('HEAD', '/v1/a/c', swob.HTTPNoContent, {
+            'X-Container-Sysmeta-Object-Cache': 'true',
+            'X-Container-Read': '.r:*'})
+        self.app.register('HEAD', '/v1/a/off', swob.HTTPNoContent, {})
+        self.app.register('GET', '/v1/a/off', swob.HTTPOk, {}, '')
+        self.app.register('GET', '/v1/a/c/o', swob.HTTPOk, {
+            'Content-Type': 'text/plain', 'Etag': 'the-etag',
+            'X-Object-Meta-Color': 'blue'}, 'small')
+        self.app.register('GET', '/v1/a/c/big', swob.HTTPOk, {},
+                          'too big to cache')
+        self.app.register('GET', '/v1/a/off/o', swob.HTTPOk, {}, 'small')
+        self.app.register('PUT', '/v1/a/c/o', swob.HTTPCreated, {})
+        self.app.register('POST', '/v1/a/c/o', swob.HTTPAccepted, {})
+        self.app.register('DELETE', '/v1/a/c/o', swob.HTTPNoContent, {})
+
+    def call_cache(self, path, method='GET', environ=None, headers=None):
+        env = {'REQUEST_METHOD': method}
+        env.update(environ or {})
+        req = Request.blank(path, environ=env, headers=headers)
+        return req.get_response(self.cache)
+
+    def object_calls(self, path='/v1/a/c/o'):
+        return [method for method, call_path in self.app.calls
+                if call_path == path]
+
+    def test_filter_factory(self):
+        factory = object_cache.filter_factory({}, max_object_size='100')
+        mw = factory(self.app)
+        self.assertIsInstance(mw, object_cache.ObjectCacheMiddleware)
+        self.assertEqual(mw.max_object_size, 100)
+        self.assertEqual(mw.max_cache_size, 67108864)
+        self.assertEqual(mw.cache_ttl, 5)
+        self.assertEqual(utils.get_swift_info()['object_cache'],
+                         {'max_object_size': 100})
+
+    def test_get_hit(self):
+        resp = self.call_cache('/v1/a/c/o')
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual(resp.body, 'small')
+        self.assertEqual(self.object_calls(), ['GET'])
+
+        for method in ('GET', 'HEAD'):
+            resp = self.call_cache('/v1/a/c/o', method=method)
+            self.assertEqual(resp.status_int, 200)
+            self.assertEqual(resp.headers['Etag'], 'the-etag')
+            self.assertEqual(resp.headers['X-Object-Meta-Color'], 'blue')
+            self.assertEqual(resp.headers['Content-Length'], '5')
+            self.assertEqual(resp.body, 'small' if method == 'GET' else '')
+        self.assertEqual(self.object_calls(), ['GET'])
+
+        self.assertEqual(self.logger.get_increment_counts(), {
+            'object_cache.miss': 1, 'object_cache.hit': 2})
+        self.assertEqual(self.logger.log_dict['update_stats'], [
+            (('object_cache.hit.bytes', 5), {})])
+
+    def test_conditional_hit(self):
+        self.call_cache('/v1/a/c/o')
+        resp = self.call_cache('/v1/a/c/o',
+                               headers={'If-None-Match': 'the-etag'})
+        self.assertEqual(resp.status_int, 304)
+        resp = self.call_cache('/v1/a/c/o', headers={'If-Match': 'other'})
+        self.assertEqual(resp.status_int, 412)
+        self.assertEqual(self.object_calls(), ['GET'])
+
+    def test_container_not_enabled(self):
+        for _ in range(2):
+            resp = self.call_cache('/v1/a/off/o')
+            self.assertEqual(resp.body, 'small')
+        self.assertEqual(self.object_calls('/v1/a/off/o'), ['GET', 'GET'])
+        self.assertEqual(self.logger.get_increment_counts(), {})
+
+    def test_uncacheable_requests(self):
+        for kwargs in ({'headers': {'Range': 'bytes=1-2'}},
+                       {'headers': {'X-Newest': 'true'}},
+                       {'headers': {'X-Backend-Etag-Is-At': 'X-Foo'}}):
+            self.call_cache('/v1/a/c/o', **kwargs)
+        self.call_cache('/v1/a/c/o?multipart-manifest=get')
+        self.call_cache('/v1/a/c/big')
+        self.call_cache('/v1/a/c/o', method='HEAD')
+        self.assertFalse(self.cache._cache)
+
+        self.call_cache('/v1/a/c/o')
+        self.assertEqual(list(self.cache._cache), ['/v1/a/c/o'])
+
+    def test_uncacheable_responses(self):
+        self.app.register('GET', '/v1/a/c/missing', swob.HTTPNotFound, {})
+        for path in ('/v1/a/c/missing', '/v1/a/c/big'):
+            self.call_cache(path)
+            self.call_cache(path)
+            self.assertEqual(self.object_calls(path), ['GET', 'GET'])
+        self.assertFalse(self.cache._cache)
+
+    def test_writes_invalidate(self):
+        expected = []
+        for method in ('PUT', 'POST', 'DELETE'):
+            self.call_cache('/v1/a/c/o')
+            self.call_cache('/v1/a/c/o')
+            self.call_cache('/v1/a/c/o', method=method)
+            expected.extend(['GET', method])
+            self.assertEqual(self.object_calls(), expected)
+            self.assertFalse(self.cache._cache)
+
+    def test_read_racing_write_is_not_cached(self):
+        def racing_get(env, start_response):
+            if env['REQUEST_METHOD'] == 'GET' and \
+                    env['PATH_INFO'] == '/v1/a/c/o':
+                # someone overwrites the object while we're reading it
+                self.cache.invalidate('/v1/a/c/o')
+            return FakeSwift.__call__(self.app, env, start_response)
+
+        with mock.patch.object(self.cache, 'app', racing_get):
+            resp = self.call_cache('/v1/a/c/o')
+        self.assertEqual(resp.body, 'small')
+        self.assertFalse(self.cache._cache)
+
+        # but later reads may fill the cache again
+        self.call_cache('/v1/a/c/o')
+        self.assertEqual(list(self.cache._cache), ['/v1/a/c/o'])
+
+    def test_ttl(self):
+        with mock.patch('swift.common.middleware.object_cache.time.time',
+                        return_value=1000.0):
+            self.call_cache('/v1/a/c/o')
+            self.call_cache('/v1/a/c/o')
+        with mock.patch('swift.common.middleware.object_cache.time.time',
+                        return_value=1004.9):
+            self.call_cache('/v1/a/c/o')
+        self.assertEqual(self.object_calls(), ['GET'])
+        with mock.patch('swift.common.middleware.object_cache.time.time',
+                        return_value=1005.0):
+            self.call_cache('/v1/a/c/o')
+        self.assertEqual(self.object_calls(), ['GET', 'GET'])
+
+    def test_lru_eviction(self):
+        for name in ('o1', 'o2', 'o3'):
+            self.app.register('GET', '/v1/a/c/' + name, swob.HTTPOk, {},
+                              'small')
+        self.call_cache('/v1/a/c/o1')
+        entry_size = self.cache._cache_size
+        self.cache.max_cache_size = 2 * entry_size
+        self.call_cache('/v1/a/c/o2')
+        # o1 is now most recently used
+        self.call_cache('/v1/a/c/o1')
+        self.call_cache('/v1/a/c/o3')
+        self.assertEqual(list(self.cache._cache), ['/v1/a/c/o1', '/v1/a/c/o3'])
+        self.assertEqual(self.cache._cache_size, 2 * entry_size)
+
+    def test_unauthorized_hit_goes_to_proxy(self):
+        self.call_cache('/v1/a/c/o')
+        acls = []
+
+        def authorize(req):
+            acls.append(req.acl)
+            return swob.HTTPForbidden(request=req)
+
+        resp = self.call_cache('/v1/a/c/o',
+                               environ={'swift.authorize': authorize})
+        self.assertEqual(resp.status_int, 403)
+        # once by the cache, then again by the "proxy"
+        self.assertEqual(acls, ['.r:*', '.r:*'])
+        self.assertEqual(self.logger.get_increment_counts(), {
+            'object_cache.miss': 1})
+
+        resp = self.call_cache('/v1/a/c/o', environ={
+            'swift.authorize': lambda req: None})
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual(self.object_calls(), ['GET'])
+        self.assertEqual(self.logger.get_increment_counts(), {
+            'object_cache.miss': 1, 'object_cache.hit': 1})
+
+    def test_container_header_translation(self):
+        self.app.register('PUT', '/v1/a/c2', swob.HTTPCreated, {})
+        self.app.register('POST', '/v1/a/c2', swob.HTTPNoContent, {})
+        self.app.register('GET', '/v1/a/c', swob.HTTPOk, {
+            'X-Container-Sysmeta-Object-Cache': 'true'}, '')
+
+        for method, value, sysmeta in (('PUT', 'yes', 'true'),
+                                       ('POST', 'false', ''),
+                                       ('POST', '', '')):
+            self.call_cache('/v1/a/c2', method=method,
+                            headers={'X-Container-Object-Cache': value})
+            headers = self.app.headers[-1]
+            self.assertNotIn('X-Container-Object-Cache', headers)
+            self.assertEqual(
+                headers['X-Container-Sysmeta-Object-Cache'], sysmeta)
+
+        for method in ('GET', 'HEAD'):
+            resp = self.call_cache('/v1/a/c', method=method)
+            self.assertEqual(resp.headers['X-Container-Object-Cache'],
+                             'true')
+            resp = self.call_cache('/v1/a/off', method=method)
+            self.assertNotIn('X-Container-Object-Cache', resp.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,6 +13,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+import os
+import shutil
+import socket
+import tempfile
+import time
 import unittest
 from logging.handlers import SysLogHandler
 
@@ -1034,3 +1040,243 @@ class TestProxyLogging(unittest.TestCase):
             b''.join(resp)
         log_parts = self._log_parts(app)
         self.assertEqual(log_parts[20], '1')
+
+
+@patch_policies([StoragePolicy(0, 'zero', False)])
+class TestAccessLogSink(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.tempdir, 'access.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def _make_app(self, **conf):
+        conf.setdefault('access_log_sink', 'file')
+        conf.setdefault('access_log_sink_path', self.log_path)
+        app = proxy_logging.ProxyLoggingMiddleware(FakeApp(), conf)
+        app.access_logger = FakeLogger()
+        return app
+
+    def _do_request(self, app, path='/v1/a/c/o'):
+        req = Request.blank(path, environ={'REQUEST_METHOD': 'GET'})
+        with mock.patch.object(proxy_logging.AccessLogSink, '_start'):
+            resp = app(req.environ, start_response)
+            b''.join(resp)
+
+    def _read_lines(self, path=None):
+        with open(path or self.log_path, 'rb') as f:
+            return f.read().decode('utf-8').splitlines()
+
+    def test_bad_config(self):
+        for conf, msg in (
+                ({'access_log_sink': 'syslog'}, 'access_log_sink must be'),
+                ({'access_log_sink': 'file'}, 'access_log_sink_path'),
+                ({'access_log_sink': 'file', 'access_log_sink_path': 'x',
+                  'access_log_sink_format': 'xml'},
+                 'access_log_sink_format must be one of json, text'),
+                ({'access_log_sink': 'file', 'access_log_sink_path': 'x',
+                  'access_log_sink_queue_size': '0'}, 'must be positive')):
+            with self.assertRaises(ValueError) as cm:
+                proxy_logging.ProxyLoggingMiddleware(FakeApp(), conf)
+            self.assertIn(msg, str(cm.exception))
+
+    def test_no_sink_by_default(self):
+        app = proxy_logging.ProxyLoggingMiddleware(FakeApp(), {})
+        self.assertIsNone(app.access_log_sink)
+
+    def test_file_sink_text(self):
+        app = self._make_app()
+        self._do_request(app)
+        self._do_request(app, '/v1/a/c/o2')
+        # nothing logged synchronously, but stats still are
+        self.assertEqual([], app.access_logger.log_dict['info'])
+        self.assertTrue(app.access_logger.log_dict['timing'])
+        self.assertFalse(os.path.exists(self.log_path))
+        self.assertEqual(2, len(app.access_log_sink.queue))
+
+        app.access_log_sink.flush()
+        lines = self._read_lines()
+        self.assertEqual(2, len(lines))
+        for line, path in zip(lines, ('/v1/a/c/o', '/v1/a/c/o2')):
+            log_parts = line.split(' ')
+            self.assertEqual(len(proxy_logging.ACCESS_LOG_FIELDS),
+                             len(log_parts))
+            self.assertEqual('GET', log_parts[3])
+            self.assertEqual(path, log_parts[4])
+            self.assertEqual('200', log_parts[6])
+        self.assertFalse(app.access_log_sink.queue)
+
+    def test_file_sink_text_matches_syslog_format(self):
+        app = self._make_app()
+        syslog_app = proxy_logging.ProxyLoggingMiddleware(FakeApp(), {})
+        syslog_app.access_logger = FakeLogger()
+        req = Request.blank('/v1/a/c/o', environ={'REQUEST_METHOD': 'GET'})
+        for a in (app, syslog_app):
+            with mock.patch.object(proxy_logging.AccessLogSink, '_start'):
+                a.log_request(req, 200, 7, 13, 10000.0, 10001.5)
+        app.access_log_sink.flush()
+        self.assertEqual([syslog_app.access_logger.log_dict['info'][0][0][0]],
+                         self._read_lines())
+
+    def test_file_sink_json(self):
+        app = self._make_app(access_log_sink_format='json')
+        self._do_request(app)
+        app.access_log_sink.flush()
+        lines = self._read_lines()
+        self.assertEqual(1, len(lines))
+        record = json.loads(lines[0])
+        self.assertEqual(sorted(proxy_logging.ACCESS_LOG_FIELDS),
+                         sorted(record))
+        self.assertEqual('GET', record['request_method'])
+        self.assertEqual('/v1/a/c/o', record['request_path'])
+        self.assertEqual(200, record['status_int'])
+
+    def test_file_sink_batches(self):
+        app = self._make_app(access_log_sink_batch_size='2')
+        sink = app.access_log_sink
+        written = []
+        orig_write_file = sink._write_file
+
+        def capture_write_file(lines):
+            written.append(len(lines))
+            orig_write_file(lines)
+
+        for i in range(5):
+            self._do_request(app, '/v1/a/c/o%d' % i)
+        self.assertTrue(sink._wakeup.is_set())
+        with mock.patch.object(sink, '_write_file', capture_write_file):
+            sink.flush()
+        self.assertEqual([2, 2, 1], written)
+        self.assertEqual(5, len(self._read_lines()))
+
+    def test_file_sink_reopened_after_rotation(self):
+        app = self._make_app()
+        sink = app.access_log_sink
+        self._do_request(app, '/v1/a/c/o0')
+        sink.flush()
+        # logrotate moves the file aside
+        os.rename(self.log_path, self.log_path + '.1')
+        self._do_request(app, '/v1/a/c/o1')
+        sink.flush()
+        self._do_request(app, '/v1/a/c/o2')
+        sink.flush()
+        self.assertEqual(1, len(self._read_lines(self.log_path + '.1')))
+        self.assertIn('/v1/a/c/o0',
+                      self._read_lines(self.log_path + '.1')[0])
+        lines = self._read_lines()
+        self.assertEqual(2, len(lines))
+        self.assertIn('/v1/a/c/o1', lines[0])
+        self.assertIn('/v1/a/c/o2', lines[1])
+
+        # and removes it
+        os.unlink(self.log_path)
+        self._do_request(app, '/v1/a/c/o3')
+        sink.flush()
+        lines = self._read_lines()
+        self.assertEqual(1, len(lines))
+        self.assertIn('/v1/a/c/o3', lines[0])
+        self.assertEqual(0, sink.failed)
+
+    def test_file_sink_many_workers_rotated(self):
+        # each worker has its own sink appending to the same file
+        apps = [self._make_app(access_log_sink_batch_size='3')
+                for _ in range(4)]
+        rotated = 0
+        for i in range(100):
+            app = apps[i % len(apps)]
+            self._do_request(app, '/v1/a/c/o%d' % i)
+            app.access_log_sink.flush()
+            if i % 25 == 24:
+                rotated += 1
+                os.rename(self.log_path, '%s.%d' % (self.log_path, rotated))
+        for app in apps:
+            self.assertEqual(0, app.access_log_sink.failed)
+            self.assertEqual(0, app.access_log_sink.dropped)
+        self.assertFalse(os.path.exists(self.log_path))
+        for n in range(1, rotated + 1):
+            lines = self._read_lines('%s.%d' % (self.log_path, n))
+            self.assertEqual(
+                ['/v1/a/c/o%d' % i for i in range((n - 1) * 25, n * 25)],
+                [line.split(' ')[4] for line in lines])
+
+    def test_drained_at_exit(self):
+        with mock.patch('swift.common.middleware.proxy_logging.atexit.'
+                        'register') as mock_register:
+            app = self._make_app()
+        sink = app.access_log_sink
+        mock_register.assert_called_once_with(sink.close)
+        for i in range(3):
+            self._do_request(app, '/v1/a/c/o%d' % i)
+        self.assertFalse(os.path.exists(self.log_path))
+
+        # as the process exits, before the background thread gets to them
+        sink.close()
+        lines = self._read_lines()
+        self.assertEqual(3, len(lines))
+        self.assertIn('/v1/a/c/o2', lines[2])
+        self.assertFalse(sink.queue)
+        self.assertIsNone(sink._stream)
+
+    def test_queue_full_drops(self):
+        app = self._make_app(access_log_sink_queue_size='2')
+        for i in range(4):
+            self._do_request(app, '/v1/a/c/o%d' % i)
+        self.assertEqual(2, app.access_log_sink.dropped)
+        self.assertEqual(
+            [(('access_log_sink.dropped', 1), {})] * 2,
+            [call for call in app.access_logger.log_dict['update_stats']
+             if call[0][0] == 'access_log_sink.dropped'])
+        app.access_log_sink.flush()
+        self.assertEqual(2, len(self._read_lines()))
+
+    def test_write_failure_counted(self):
+        app = self._make_app(
+            access_log_sink_path=os.path.join(self.tempdir, 'missing', 'x'))
+        self._do_request(app)
+        app.access_log_sink.flush()
+        self.assertEqual(1, app.access_log_sink.failed)
+        self._do_request(app)
+        self.assertEqual(
+            [(('access_log_sink.dropped', 1), {})],
+            [call for call in app.access_logger.log_dict['update_stats']
+             if call[0][0] == 'access_log_sink.dropped'])
+
+    def test_unix_dgram_sink(self):
+        sock_path = os.path.join(self.tempdir, 'log.sock')
+        receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        receiver.bind(sock_path)
+        receiver.settimeout(5)
+        self.addCleanup(receiver.close)
+        app = self._make_app(access_log_sink='unix_dgram',
+                             access_log_sink_path=sock_path,
+                             access_log_sink_format='json')
+        for i in range(3):
+            self._do_request(app, '/v1/a/c/o%d' % i)
+        with mock.patch.object(app.access_log_sink, 'MAX_DATAGRAM_SIZE', 1):
+            app.access_log_sink.flush()
+        for i in range(3):
+            datagram = receiver.recv(65536)
+            self.assertTrue(datagram.endswith(b'\n'))
+            self.assertEqual('/v1/a/c/o%d' % i,
+                             json.loads(datagram)['request_path'])
+
+        self._do_request(app, '/v1/a/c/o3')
+        self._do_request(app, '/v1/a/c/o4')
+        app.access_log_sink.flush()
+        datagram = receiver.recv(65536)
+        self.assertEqual(['/v1/a/c/o3', '/v1/a/c/o4'],
+                         [json.loads(line)['request_path']
+                          for line in datagram.splitlines()])
+
+    def test_background_thread(self):
+        app = self._make_app(access_log_sink_flush_interval='0.01')
+        req = Request.blank('/v1/a/c/o', environ={'REQUEST_METHOD': 'GET'})
+        resp = app(req.environ, start_response)
+        b''.join(resp)
+        self.assertEqual(os.getpid(), app.access_log_sink._pid)
+        for _ in range(500):
+            if os.path.exists(self.log_path) and self._read_lines():
+                break
+            time.sleep(0.01)
+        self.assertEqual(1, len(self._read_lines()))
@@ -569,6 +569,106 @@ class TestRateLimit(unittest.TestCase):
             time_took = time.time() - begin
             self.assertEqual(round(time_took, 1), 0)  # no memcache, no limit
 
+    def test_ratelimit_sync_interval(self):
+        current_rate = 5
+        num_calls = 50
+        conf_dict = {'account_ratelimit': current_rate,
+                     'sync_interval_seconds': 1}
+        self.test_ratelimit = ratelimit.filter_factory(conf_dict)(FakeApp())
+        req = Request.blank('/v1/a/c')
+        req.method = 'PUT'
+        fake_memcache = FakeMemcache()
+        req.environ['swift.cache'] = fake_memcache
+
+        def make_app_call():
+            self.test_ratelimit(req.environ, start_response)
+
+        begin = time.time()
+        with mock.patch('swift.common.middleware.ratelimit.get_account_info',
+                        lambda *args, **kwargs: {}), \
+                mock.patch.object(fake_memcache, 'incr',
+                                  side_effect=fake_memcache.incr) as incr, \
+                mock.patch('eventlet.spawn_n', lambda f, *a: f(*a)):
+            self._run(make_app_call, num_calls, current_rate, check_time=False)
+            self.assertEqual(round(time.time() - begin, 1), 9.8)
+        # the first request seeds the local state, later requests are only
+        # added to memcache about once per sync_interval_seconds
+        self.assertEqual(10, incr.call_count)
+        deltas = [call[1]['delta'] for call in incr.call_args_list]
+        self.assertEqual(200, deltas[0])
+        state = self.test_ratelimit.local_states['ratelimit/a']
+        self.assertEqual(num_calls * 200, sum(deltas) + state.pending_m)
+        self.assertEqual(state.running_time_m,
+                         fake_memcache.store['ratelimit/a'] + state.pending_m)
+
+    def test_ratelimit_sync_interval_max_sleep(self):
+        conf_dict = {'account_ratelimit': 2,
+                     'max_sleep_time_seconds': 1,
+                     'sync_interval_seconds': 1}
+        rl = ratelimit.filter_factory(conf_dict)(FakeApp())
+        rl.memcache_client = FakeMemcache()
+        with mock.patch('eventlet.spawn_n') as mock_spawn:
+            self.assertEqual(0, rl._get_sleep_time('key', 2))
+            self.assertEqual(0.5, rl._get_sleep_time('key', 2))
+            self.assertRaises(ratelimit.MaxSleepTimeHitError,
+                              rl._get_sleep_time, 'key', 2)
+        self.assertFalse(mock_spawn.called)
+        # a request over the limit is not added to the running time
+        state = rl.local_states['key']
+        self.assertEqual(1000, state.running_time_m)
+        self.assertEqual(500, state.pending_m)
+        self.assertEqual(500, rl.memcache_client.store['key'])
+
+    def test_ratelimit_sync_interval_memcache_error(self):
+        conf_dict = {'account_ratelimit': 2,
+                     'sync_interval_seconds': 1}
+        rl = ratelimit.filter_factory(conf_dict)(FakeApp())
+        rl.logger = FakeLogger()
+        rl.memcache_client = FakeMemcache()
+        self.assertEqual(0, rl._get_sleep_time('key', 2))
+        mock_sleep(1)
+        with mock.patch('eventlet.spawn_n') as mock_spawn:
+            self.assertEqual(0, rl._get_sleep_time('key', 2))
+        state = rl.local_states['key']
+        mock_spawn.assert_called_once_with(rl._sync_local_state, 'key', state)
+        self.assertTrue(state.syncing)
+
+        rl.memcache_client.error_on_incr = True
+        rl._sync_local_state('key', state)
+        self.assertFalse(state.syncing)
+        self.assertEqual(500, state.pending_m)
+        self.assertEqual(500, rl.memcache_client.store['key'])
+
+        rl.memcache_client.error_on_incr = False
+        with mock.patch.object(rl.memcache_client, 'incr',
+                               side_effect=ValueError('kaboom')):
+            rl._sync_local_state('key', state)
+        self.assertEqual(500, state.pending_m)
+        self.assertEqual(['Error syncing ratelimit for key'],
+                         rl.logger.get_lines_for_level('error'))
+
+        rl._sync_local_state('key', state)
+        self.assertEqual(0, state.pending_m)
+        self.assertEqual(1000, state.running_time_m)
+        self.assertEqual(1000, rl.memcache_client.store['key'])
+
+    def test_ratelimit_sync_interval_prunes_idle_keys(self):
+        conf_dict = {'account_ratelimit': 2,
+                     'sync_interval_seconds': 1}
+        rl = ratelimit.filter_factory(conf_dict)(FakeApp())
+        rl.memcache_client = FakeMemcache()
+        with mock.patch.object(ratelimit, 'MAX_LOCAL_STATES', 2):
+            rl._get_sleep_time('key1', 2)
+            rl._get_sleep_time('key2', 2)
+            self.assertEqual(['key1', 'key2'], sorted(rl.local_states))
+            mock_sleep(1)
+            rl._get_sleep_time('key3', 2)
+            self.assertEqual(['key1', 'key2', 'key3'],
+                             sorted(rl.local_states))
+            mock_sleep(5)
+            rl._get_sleep_time('key4', 2)
+            self.assertEqual(['key4'], sorted(rl.local_states))
+
 
 class TestSwiftInfo(unittest.TestCase):
     def setUp(self):
@@ -199,6 +199,9 @@ class FakeRecon(object):
     def fake_time(self):
         return {'timetest': "1"}
 
+    def fake_hub(self):
+        return {'hubtest': "1"}
+
     def nocontent(self):
         return None
 
@@ -1107,6 +1110,15 @@ class TestReconSuccess(TestCase):
             rv = self.app.get_time()
             self.assertEqual(rv, now)
 
+    def test_get_hub_info(self):
+        app = recon.ReconMiddleware(FakeApp(), {
+            'recon_cache_path': self.tempdir})
+        self.assertEqual(app.get_hub_info(), {})
+        hub_info = {'proxy-server': {'1234': {'max_lag': 0.5}}}
+        with open(os.path.join(self.tempdir, 'hub.recon'), 'w') as f:
+            json.dump(hub_info, f)
+        self.assertEqual(app.get_hub_info(), hub_info)
+
 
 class TestReconMiddleware(unittest.TestCase):
 
@@ -1139,6 +1151,7 @@ class TestReconMiddleware(unittest.TestCase):
         self.app.get_socket_info = self.frecon.fake_sockstat
         self.app.get_driveaudit_error = self.frecon.fake_driveaudit
         self.app.get_time = self.frecon.fake_time
+        self.app.get_hub_info = self.frecon.fake_hub
 
     def test_recon_get_mem(self):
         get_mem_resp = [b'{"memtest": "1"}']
@@ -1381,6 +1394,11 @@ class TestReconMiddleware(unittest.TestCase):
         resp = self.app(req.environ, start_response)
         self.assertEqual(resp, get_time_resp)
 
+    def test_recon_get_hub(self):
+        req = Request.blank('/recon/hub', environ={'REQUEST_METHOD': 'GET'})
+        resp = self.app(req.environ, start_response)
+        self.assertEqual(resp, [b'{"hubtest": "1"}'])
+
     def test_get_device_info_function(self):
         """Test get_device_info function call success"""
         resp = self.app.get_device_info()
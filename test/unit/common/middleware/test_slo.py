@@ -863,6 +863,57 @@ class TestSloPutManifest(SloTestCase):
             not manifest_data[0]['last_modified'].startswith('2012'))
         self.assertTrue(manifest_data[1]['last_modified'].startswith('2012'))
 
+    def test_handle_multipart_put_known_segments(self):
+        good_data = json.dumps(
+            [{'path': '/checktest/a_1', 'etag': 'a', 'size_bytes': '1'},
+             {'path': '/checktest/b_2', 'etag': 'b', 'size_bytes': '2'},
+             {'path': '/checktest/c_3', 'etag': 'c', 'size_bytes': '3'}])
+        known_segments = {
+            '/checktest/a_1': {
+                'name': 'a_1', 'hash': 'a', 'bytes': 1,
+                'content_type': 'text/plain',
+                'last_modified': '2012-02-01T20:38:35.123450'},
+            # stale listing entries get HEADed anyway...
+            '/checktest/b_2': {
+                'name': 'b_2', 'hash': 'not-b', 'bytes': 2,
+                'content_type': 'text/plain',
+                'last_modified': '2012-02-01T20:38:36.000000'},
+            # ... as do entries that aren't simple objects
+            '/checktest/c_3': {
+                'name': 'c_3', 'hash': 'c', 'bytes': 3,
+                'content_type': 'text/plain;swift_bytes=300',
+                'last_modified': '2012-02-01T20:38:36.000000'},
+        }
+        self.app.register(
+            'HEAD', '/v1/AUTH_test/checktest/c_3',
+            swob.HTTPOk, {'Content-Length': '3', 'Etag': 'c'}, None)
+        req = Request.blank(
+            '/v1/AUTH_test/checktest/man_3?multipart-manifest=put',
+            environ={'REQUEST_METHOD': 'PUT',
+                     'swift.slo_known_segments': known_segments},
+            body=good_data)
+        status, headers, body = self.call_slo(req)
+        self.assertEqual(status, '201 Created')
+        self.assertEqual(sorted(self.app.calls), [
+            ('HEAD', '/v1/AUTH_test/checktest/b_2'),
+            ('HEAD', '/v1/AUTH_test/checktest/c_3'),
+            ('PUT', '/v1/AUTH_test/checktest/man_3?multipart-manifest=put'),
+        ])
+
+        req = Request.blank(
+            '/v1/AUTH_test/checktest/man_3?multipart-manifest=put',
+            environ={'REQUEST_METHOD': 'GET'})
+        status, headers, body = self.call_app(req)
+        manifest_data = json.loads(body)
+        self.assertEqual(
+            [(seg['name'], seg['hash'], seg['bytes'])
+             for seg in manifest_data],
+            [('/checktest/a_1', 'a', 1), ('/checktest/b_2', 'b', 2),
+             ('/checktest/c_3', 'c', 3)])
+        # the listing timestamp is rounded up, just like a HEAD's would be
+        self.assertEqual(manifest_data[0]['last_modified'],
+                         '2012-02-01T20:38:36.000000')
+
     def test_handle_multipart_put_check_data_bad(self):
         bad_data = json.dumps(
             [{'path': '/checktest/a_1', 'etag': 'a', 'size_bytes': '2'},
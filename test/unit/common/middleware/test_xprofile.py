@@ -16,9 +16,13 @@
 import os
 import json
 import shutil
+import signal
+import sys
 import tempfile
+import time
 import unittest
 
+import mock
 from six import BytesIO
 
 from swift import gettext_ as _
@@ -34,6 +38,7 @@ try:
         HTMLViewer, PLOTLIB_INSTALLED)
     from swift.common.middleware.x_profile.profile_model import (
         ODFLIB_INSTALLED, ProfileLog, Stats2)
+    from swift.common.middleware.x_profile import sampler
 except ImportError:
     xprofile = None
 
@@ -184,6 +189,25 @@ class TestProfileMiddleware(unittest.TestCase):
         new_profiler = self.app.profiler
         self.assertTrue(old_profiler != new_profiler)
 
+    def test_sampling_profiler(self):
+        app = self.get_app(FakeApp(), {}, profile_module=sampler.__name__,
+                           sample_interval='0.05')
+        self.assertIsInstance(app.profiler, sampler.Profile)
+        self.assertEqual(app.profiler.interval, 0.05)
+        app.renew_profile()
+        self.assertIsInstance(app.profiler, sampler.Profile)
+
+        with mock.patch.object(sampler.signal, 'setitimer') as setitimer, \
+                mock.patch.object(sampler.signal, 'signal'):
+            resp = app({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/a'},
+                       self.start_response)
+            self.assertEqual(resp, [b'FAKE APP'])
+            app({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/a'},
+                self.start_response)
+        # started once, by the first request
+        self.assertEqual(setitimer.mock_calls, [
+            mock.call(signal.ITIMER_PROF, 0.05, 0.05)])
+
 
 class Test_profile_log(unittest.TestCase):
 
@@ -464,6 +488,138 @@ class Test_html_viewer(unittest.TestCase):
                       self.viewer.format_source_code(nfl_not_exist))
 
 
+class TestSampler(unittest.TestCase):
+
+    @unittest.skipIf(xprofile is None, "can't import xprofile")
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.profiler = sampler.Profile()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def inner(self):
+        return sys._getframe()
+
+    def outer(self):
+        return self.inner()
+
+    def test_sample(self):
+        frame = self.outer()
+        self.profiler._sample(signal.SIGPROF, frame)
+        self.profiler._sample(signal.SIGPROF, frame)
+        self.profiler._sample(signal.SIGPROF, frame.f_back)
+        counts = self.profiler.folded_stacks()
+        self.assertEqual(sorted(counts.values()), [1, 2])
+        inner_label = sampler.frame_label(self.inner.__code__)
+        outer_label = sampler.frame_label(self.outer.__code__)
+        self.assertEqual(inner_label, '%s:%d(inner)' % (
+            self.inner.__code__.co_filename,
+            self.inner.__code__.co_firstlineno))
+        stacks = sorted(counts, key=len)
+        self.assertEqual(stacks[0][-1], outer_label)
+        self.assertEqual(stacks[1][-2:], (outer_label, inner_label))
+        self.assertEqual(stacks[1][:-1], stacks[0])
+
+    def test_dump_and_parse(self):
+        frame = self.outer()
+        for _junk in range(3):
+            self.profiler._sample(signal.SIGPROF, frame)
+        path = os.path.join(self.tempdir, 'folded')
+        self.profiler.dump_stats(path)
+        with open(path) as f:
+            data = f.read()
+        self.assertEqual(data.count('\n'), 1)
+        self.assertTrue(data.endswith('(inner) 3\n'), data)
+        self.assertEqual(sampler.parse_folded(data),
+                         self.profiler.folded_stacks())
+        # counts add up
+        counts = sampler.parse_folded(data.encode('utf-8'))
+        sampler.parse_folded(data, counts)
+        self.assertEqual(list(counts.values()), [6])
+        self.assertRaises(ValueError, sampler.parse_folded, 'junk')
+
+    def test_folded_to_stats(self):
+        counts = {('a.py:1(main)', 'b.py:2(f)', 'c.py:3(g)'): 3,
+                  ('a.py:1(main)', 'b.py:2(f)'): 2,
+                  ('a.py:1(main)', 'b.py:2(f)', 'b.py:2(f)'): 1,
+                  ('<string>',): 1}
+        stats = sampler.folded_to_stats(counts)
+        main, f, g = ('a.py', 1, 'main'), ('b.py', 2, 'f'), ('c.py', 3, 'g')
+        self.assertEqual(stats[main], (6, 6, 0, 6, {}))
+        self.assertEqual(stats[f], (6, 6, 3, 6, {main: 6, f: 1}))
+        self.assertEqual(stats[g], (3, 3, 3, 3, {f: 3}))
+        self.assertEqual(stats[('<string>', 0, '<string>')],
+                         (1, 1, 1, 1, {}))
+
+    def test_timer(self):
+        with mock.patch('os.getpid', return_value=1234):
+            self.profiler.runcall(lambda: None)
+        try:
+            self.assertEqual(self.profiler._pid, 1234)
+            self.assertEqual(signal.getsignal(signal.SIGPROF),
+                             self.profiler._sample)
+            # spin until sampled
+            deadline = time.time() + 10
+            while not self.profiler.samples and time.time() < deadline:
+                sum(range(1000))
+            # after a fork, the timer is restarted
+            with mock.patch.object(self.profiler, 'start') as start:
+                self.profiler.runctx('x = 1', {}, {})
+            self.assertEqual(start.mock_calls, [mock.call()])
+        finally:
+            self.profiler.stop()
+        self.assertEqual(signal.getitimer(signal.ITIMER_PROF), (0.0, 0.0))
+        self.assertEqual(signal.getsignal(signal.SIGPROF), signal.SIG_DFL)
+        self.assertTrue(self.profiler.samples)
+        this_test = sampler.frame_label(self.test_timer.__code__)
+        self.assertTrue(any(this_test in stack
+                            for stack in self.profiler.folded_stacks()))
+
+
+class TestSampledProfiles(unittest.TestCase):
+
+    @unittest.skipIf(xprofile is None, "can't import xprofile")
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.log_files = []
+        for i, data in enumerate((
+                'a.py:1(main);b.py:2(f) 2\na.py:1(main);c.py:3(g) 1\n',
+                'a.py:1(main);b.py:2(f) 3\n')):
+            path = os.path.join(self.tempdir, 'unittest.profile%d' % i)
+            with open(path, 'w') as f:
+                f.write(data)
+            self.log_files.append(path)
+        self.viewer = HTMLViewer('__profile__', sampler.__name__,
+                                 ProfileLog(self.tempdir + '/unittest.profile',
+                                            False))
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def test_stats(self):
+        stats = Stats2(*self.log_files)
+        self.assertEqual(stats.total_tt, 6)
+        self.assertEqual(stats.stats[('b.py', 2, 'f')][:4], (5, 5, 5, 5))
+        self.assertIn('function calls', stats.to_csv())
+        self.assertTrue(json.loads(stats.to_json())['stats'])
+
+    def test_download_folded(self):
+        content, headers = self.viewer.download(self.log_files,
+                                                output_format='folded')
+        self.assertEqual(headers, [('content-type', 'text/plain')])
+        self.assertEqual(content, 'a.py:1(main);b.py:2(f) 5\n'
+                                  'a.py:1(main);c.py:3(g) 1\n')
+        content, headers = self.viewer.download(
+            self.log_files, nfl_filter='(g)', output_format='folded')
+        self.assertEqual(content, 'a.py:1(main);c.py:3(g) 1\n')
+
+    def test_index_page(self):
+        content, headers = self.viewer.index_page(self.log_files)
+        self.assertIn('numbers of samples', content)
+        self.assertIn('folded stacks', content)
+
+
 class TestStats2(unittest.TestCase):
 
     @unittest.skipIf(xprofile is None, "can't import xprofile")
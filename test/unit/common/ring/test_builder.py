@@ -35,7 +35,7 @@ from six.moves import range
 from swift.common import exceptions
 from swift.common import ring
 from swift.common.ring import utils
-from swift.common.ring.builder import MAX_BALANCE
+from swift.common.ring.builder import MAX_BALANCE, NUMPY_INSTALLED
 
 
 def _partition_counts(builder, key='id'):
@@ -2377,6 +2377,53 @@ class TestRingBuilder(unittest.TestCase):
         expected = 'The partition 200 has been assigned to duplicate devices'
         self.assertIn(expected, str(e.exception))
 
+    @unittest.skipIf(not NUMPY_INSTALLED, 'numpy is not installed')
+    def test_validate_numpy(self):
+        rb = ring.RingBuilder(8, 2.5, 1)
+        for dev_id in range(6):
+            rb.add_dev({'id': dev_id, 'region': 0, 'zone': dev_id % 3,
+                        'weight': 1 + dev_id % 2, 'ip': '127.0.0.1',
+                        'port': 10000 + dev_id, 'device': 'sda'})
+        rb.rebalance(seed=1)
+
+        def swap_replicas(rb):
+            rb._replica2part2dev[1], rb._replica2part2dev[2] = \
+                rb._replica2part2dev[2], rb._replica2part2dev[1]
+
+        def double_up(rb):
+            rb._replica2part2dev[1][200] = rb._replica2part2dev[0][200]
+            rb._replica2part2dev[2][100] = rb._replica2part2dev[1][100]
+
+        def unassign(rb):
+            rb._replica2part2dev[1][150] = ring.builder.NONE_DEV
+            double_up(rb)
+
+        def unknown_dev(rb):
+            rb._replica2part2dev[0][50] = 99
+
+        def results(rb, stats):
+            try:
+                return rb.validate(stats=stats)
+            except Exception as err:
+                return type(err), str(err)
+
+        for corrupt in (lambda rb: None, swap_replicas, double_up, unassign,
+                        unknown_dev):
+            corrupted = copy.deepcopy(rb)
+            corrupt(corrupted)
+            for stats in (False, True):
+                with mock.patch('swift.common.ring.builder.NUMPY_INSTALLED',
+                                False):
+                    expected = results(corrupted, stats)
+                self.assertEqual(expected, results(corrupted, stats))
+
+        # the first of several invalid parts is the one reported
+        double_up(rb)
+        err_type, err_msg = results(rb, True)
+        self.assertEqual(exceptions.RingValidationError, err_type)
+        self.assertIn('The partition 100 has been assigned to duplicate '
+                      'devices', err_msg)
+
     def test_get_part_devices(self):
         rb = ring.RingBuilder(8, 3, 1)
         self.assertEqual(rb.get_part_devices(0), [])
@@ -2431,6 +2478,123 @@ class TestRingBuilder(unittest.TestCase):
             (0, 0, '127.0.0.1', 2): [0, 256, 0, 0],
         })
 
+    def _make_incremental_test_builder(self, replicas):
+        rb = ring.RingBuilder(8, replicas, 1)
+        dev_id = 0
+        for region in (1, 2):
+            for zone in range(3):
+                for server in range(3):
+                    for device in ('sda', 'sdb'):
+                        rb.add_dev({
+                            'id': dev_id, 'region': region, 'zone': zone,
+                            'ip': '10.%d.%d.%d' % (region, zone, server),
+                            'port': 6200, 'device': device,
+                            'weight': 100 + 10 * (dev_id * 7 % 5)})
+                        dev_id += 1
+        rb.rebalance(seed=1)
+        return rb
+
+    @unittest.skipIf(not NUMPY_INSTALLED, 'numpy is not installed')
+    def test_incremental_rebalance_same_as_full(self):
+        changes = [
+            lambda rb: rb.add_dev({
+                'id': 36, 'region': 1, 'zone': 0, 'ip': '10.1.0.9',
+                'port': 6200, 'device': 'sda', 'weight': 500}),
+            lambda rb: rb.set_dev_weight(3, 10),
+            lambda rb: rb.remove_dev(5),
+            lambda rb: (rb.set_overload(0.1), rb.set_dev_weight(7, 0)),
+            lambda rb: rb.add_dev({
+                'id': 37, 'region': 3, 'zone': 0, 'ip': '10.3.0.1',
+                'port': 6200, 'device': 'sda', 'weight': 300}),
+            lambda rb: None,
+        ]
+        for replicas in (3, 2.5, 4):
+            full = self._make_incremental_test_builder(replicas)
+            incremental = copy.deepcopy(full)
+            for seed, change in enumerate(changes):
+                for rb in (full, incremental):
+                    change(rb)
+                    rb.pretend_min_part_hours_passed()
+                self.assertEqual(
+                    full.rebalance(seed=seed),
+                    incremental.rebalance(seed=seed, incremental=True))
+                self.assertEqual(full._replica2part2dev,
+                                 incremental._replica2part2dev)
+                self.assertEqual(full._last_part_moves,
+                                 incremental._last_part_moves)
+                self.assertEqual(full._dispersion_graph,
+                                 incremental._dispersion_graph)
+                self.assertEqual(full.dispersion, incremental.dispersion)
+                full.validate()
+                incremental.validate()
+
+    @unittest.skipIf(not NUMPY_INSTALLED, 'numpy is not installed')
+    def test_incremental_rebalance_looks_at_fewer_parts(self):
+        rb = self._make_incremental_test_builder(3)
+        rb.add_dev({'id': 36, 'region': 1, 'zone': 0, 'ip': '10.1.0.0',
+                    'port': 6200, 'device': 'sdc', 'weight': 100})
+        rb.pretend_min_part_hours_passed()
+        full = copy.deepcopy(rb)
+
+        def count_parts_looked_at(rb, **kwargs):
+            parts = []
+            can_part_move = rb._can_part_move
+
+            def record(part):
+                parts.append(part)
+                return can_part_move(part)
+
+            with mock.patch.object(rb, '_can_part_move', record):
+                rb.rebalance(seed=1, **kwargs)
+            return len(parts)
+
+        looked_at_full = count_parts_looked_at(full)
+        looked_at_incremental = count_parts_looked_at(rb, incremental=True)
+        self.assertEqual(full._replica2part2dev, rb._replica2part2dev)
+        self.assertLess(looked_at_incremental, looked_at_full / 2)
+
+    def test_incremental_rebalance_requires_numpy(self):
+        rb = self._make_incremental_test_builder(3)
+        with mock.patch('swift.common.ring.builder.NUMPY_INSTALLED', False):
+            with self.assertRaises(exceptions.RingBuilderError) as cm:
+                rb.rebalance(incremental=True)
+        self.assertEqual('Incremental rebalance requires numpy',
+                         str(cm.exception))
+
+    @unittest.skipIf(not NUMPY_INSTALLED, 'numpy is not installed')
+    def test_update_last_part_moves_numpy(self):
+        rb = self._make_incremental_test_builder(3)
+        rb._last_part_moves = array('B', range(256))
+        rb._last_part_moves_epoch -= 10 * 3600
+        expected = copy.deepcopy(rb)
+        with mock.patch('swift.common.ring.builder.NUMPY_INSTALLED', False):
+            expected._update_last_part_moves()
+        rb._update_last_part_moves()
+        self.assertEqual(expected._last_part_moves, rb._last_part_moves)
+        self.assertEqual(255, rb._last_part_moves[250])
+        self.assertEqual(expected._last_part_moves_epoch,
+                         rb._last_part_moves_epoch)
+
+    @unittest.skipIf(not NUMPY_INSTALLED, 'numpy is not installed')
+    def test_build_dispersion_graph_numpy(self):
+        rb = self._make_incremental_test_builder(2.5)
+        # doubled-up replicas, as in rings built by older versions
+        rb._replica2part2dev[1][:10] = rb._replica2part2dev[0][:10]
+        rb.set_dev_weight(3, 0)
+        old_replica2part2dev = copy.deepcopy(rb._replica2part2dev)
+        old_replica2part2dev[0][:20] = array('H', [0] * 20)
+        old_replica2part2dev[2] = old_replica2part2dev[2][:50]
+        expected = copy.deepcopy(rb)
+        with mock.patch('swift.common.ring.builder.NUMPY_INSTALLED', False):
+            changed_parts = expected._build_dispersion_graph(
+                old_replica2part2dev)
+        self.assertEqual(changed_parts, rb._build_dispersion_graph(
+            old_replica2part2dev))
+        self.assertEqual(expected._dispersion_graph, rb._dispersion_graph)
+        self.assertEqual(expected.dispersion, rb.dispersion)
+        self.assertGreater(rb.dispersion, 0)
+        self.assertEqual(expected.version, rb.version)
+
     def test_dispersion_with_zero_weight_devices_with_parts(self):
         rb = ring.RingBuilder(8, 3.0, 1)
         # add four devices to a single server in a single zone
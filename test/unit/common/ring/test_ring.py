@@ -15,6 +15,7 @@
 
 import array
 import collections
+import ctypes
 import six.moves.cPickle as pickle
 import os
 import unittest
@@ -27,6 +28,7 @@ from time import sleep, time
 import sys
 import copy
 import mock
+import six
 
 from six.moves import range
 
@@ -135,6 +137,130 @@ class TestRingData(unittest.TestCase):
         rd2 = ring.RingData.load(ring_fname)
         self.assert_ring_data_equal(rd1, rd2)
 
+    def test_roundtrip_serialization_v2(self):
+        ring_fname = os.path.join(self.testdir, 'foo.ring.gz')
+        rd = ring.RingData(
+            [array.array('H', [0, 1, 0, 1]), array.array('H', [0, 1, 0, 1]),
+             array.array('H', [3, 3])],
+            [{'id': 0, 'zone': 0, 'ip': '10.0.0.0'},
+             {'id': 1, 'zone': 1, 'ip': '10.0.0.1'}, None,
+             {'id': 3, 'zone': 2, 'ip': '10.0.0.3'}], 30)
+        rd.save(ring_fname, format_version=2)
+        with open(ring_fname, 'rb') as f:
+            self.assertEqual(b'R1NG\x00\x02', f.read(6))
+        meta_only = ring.RingData.load(ring_fname, metadata_only=True)
+        self.assertEqual([
+            {'id': 0, 'zone': 0, 'ip': '10.0.0.0', 'region': 1},
+            {'id': 1, 'zone': 1, 'ip': '10.0.0.1', 'region': 1},
+            None,
+            {'id': 3, 'zone': 2, 'ip': '10.0.0.3', 'region': 1},
+        ], meta_only.devs)
+        self.assertEqual([], meta_only._replica2part2dev_id)
+        rd2 = ring.RingData.load(ring_fname)
+        self.assert_ring_data_equal(rd, rd2)
+        self.assertEqual({0, 1, 3}, rd2.dev_ids_with_parts)
+        self.assertEqual([
+            [[1], [0, 1, 3]],
+            [[1, 0], [0]],
+            [[1, 0, '10.0.0.0'], [0]],
+            [[1, 0, '10.0.0.0', 0], [0]],
+            [[1, 1], [1]],
+            [[1, 1, '10.0.0.1'], [1]],
+            [[1, 1, '10.0.0.1', 1], [1]],
+            [[1, 2], [3]],
+            [[1, 2, '10.0.0.3'], [3]],
+            [[1, 2, '10.0.0.3', 3], [3]],
+        ], rd2.tier2dev_ids)
+        # the tables are views of the mapped file, not copies of it
+        for part2dev_id in rd2._replica2part2dev_id:
+            if six.PY2:
+                self.assertIsInstance(part2dev_id, ctypes.Array)
+            else:
+                self.assertIsInstance(part2dev_id, memoryview)
+
+        # a ring loaded from a v2 file can be written out again in either
+        # format
+        ring_fname2 = os.path.join(self.testdir, 'bar.ring.gz')
+        rd2.save(ring_fname2)
+        self.assert_ring_data_equal(rd, ring.RingData.load(ring_fname2))
+        rd2.save(ring_fname2, format_version=2)
+        with open(ring_fname, 'rb') as ring1:
+            with open(ring_fname2, 'rb') as ring2:
+                self.assertEqual(ring1.read(), ring2.read())
+
+    def test_v2_tables_are_aligned(self):
+        ring_fname = os.path.join(self.testdir, 'foo.ring.gz')
+        rd = ring.RingData([array.array('H', [0, 1, 0, 1])],
+                           [{'id': 0, 'zone': 0, 'ip': '10.0.0.0'},
+                            {'id': 1, 'zone': 1, 'ip': '10.0.0.1'}], 30)
+        for meta in ('', 'x', 'xx', 'xxx', 'xxxx', 'xxxxxxxxx'):
+            rd.devs[0]['meta'] = meta
+            rd.save(ring_fname, format_version=2)
+            with open(ring_fname, 'rb') as f:
+                data = f.read()
+            self.assertEqual(0, (len(data) - 8) % 8, repr(meta))
+            self.assertEqual(array.array('H', [0, 1, 0, 1]),
+                             array.array('H', data[-8:]))
+            self.assert_ring_data_equal(rd, ring.RingData.load(ring_fname))
+
+    def test_byteswapped_serialization_v2(self):
+        ring_fname = os.path.join(self.testdir, 'foo.ring.gz')
+        data = [array.array('H', [0, 1, 0, 1]), array.array('H', [0, 1, 0, 1])]
+        swapped_data = copy.deepcopy(data)
+        for x in swapped_data:
+            x.byteswap()
+
+        with mock.patch.object(sys, 'byteorder',
+                               'big' if sys.byteorder == 'little'
+                               else 'little'):
+            rds = ring.RingData(swapped_data,
+                                [{'id': 0, 'zone': 0, 'ip': '10.0.0.0'},
+                                 {'id': 1, 'zone': 1, 'ip': '10.0.0.1'}],
+                                30)
+            rds.save(ring_fname, format_version=2)
+
+        rd1 = ring.RingData(data, [{'id': 0, 'zone': 0, 'ip': '10.0.0.0'},
+                                   {'id': 1, 'zone': 1, 'ip': '10.0.0.1'}],
+                            30)
+        rd2 = ring.RingData.load(ring_fname)
+        self.assert_ring_data_equal(rd1, rd2)
+
+    def test_load_truncated_v2(self):
+        ring_fname = os.path.join(self.testdir, 'foo.ring.gz')
+        rd = ring.RingData(
+            [array.array('H', [0, 1, 0, 1]), array.array('H', [0, 1, 0, 1])],
+            [{'id': 0, 'zone': 0, 'ip': '10.0.0.0'},
+             {'id': 1, 'zone': 1, 'ip': '10.0.0.1'}], 30)
+        rd.save(ring_fname, format_version=2)
+        with open(ring_fname, 'rb+') as f:
+            f.truncate(os.path.getsize(ring_fname) - 2)
+        with self.assertRaises(ValueError) as cm:
+            ring.RingData.load(ring_fname)
+        self.assertEqual('Ring file is truncated', str(cm.exception))
+        # the devices are all there still
+        self.assertEqual(2, len(ring.RingData.load(
+            ring_fname, metadata_only=True).devs))
+
+    def test_file_format_version(self):
+        ring_fname = os.path.join(self.testdir, 'foo.ring.gz')
+        rd = ring.RingData(
+            [array.array('H', [0, 1, 0, 1]), array.array('H', [0, 1, 0, 1])],
+            [{'id': 0, 'zone': 0, 'ip': '10.0.0.0'},
+             {'id': 1, 'zone': 1, 'ip': '10.0.0.1'}], 30)
+        rd.save(ring_fname)
+        self.assertEqual(1, ring.RingData.file_format_version(ring_fname))
+        rd.save(ring_fname, format_version=2)
+        self.assertEqual(2, ring.RingData.file_format_version(ring_fname))
+        with closing(GzipFile(ring_fname, 'wb')) as f:
+            pickle.dump(rd, f, protocol=2)
+        self.assertEqual(0, ring.RingData.file_format_version(ring_fname))
+
+        with self.assertRaises(ValueError) as cm:
+            rd.save(ring_fname, format_version=3)
+        self.assertEqual('Unknown ring format version 3', str(cm.exception))
+        # the ring already there is left alone
+        self.assertEqual(0, ring.RingData.file_format_version(ring_fname))
+
     def test_deterministic_serialization(self):
         """
         Two identical rings should produce identical .gz files on disk.
@@ -311,6 +437,73 @@ class TestRing(TestRingBase):
         self.assertEqual(len(self.ring.devs), 9)
         self.assertNotEqual(self.ring._mtime, orig_mtime)
 
+    def test_reload_v2(self):
+        ring.RingData(
+            self.intended_replica2part2dev_id,
+            self.intended_devs, self.intended_part_shift).save(
+                self.testgz, format_version=2)
+        with mock.patch('swift.common.ring.ring.calc_dev_ids_with_parts') \
+                as calc_dev_ids_with_parts, \
+                mock.patch('swift.common.ring.ring.tiers_for_dev') \
+                as tiers_for_dev:
+            ring_v2 = ring.Ring(self.testdir, ring_name='whatever')
+        # which devices have partitions, and the devices in each tier, come
+        # from the ring file
+        self.assertFalse(calc_dev_ids_with_parts.called)
+        self.assertFalse(tiers_for_dev.called)
+        self.assertEqual(ring_v2._replica2part2dev_id,
+                         self.intended_replica2part2dev_id)
+        self.assertEqual(ring_v2.devs, self.intended_devs)
+        for attr in ('_num_devs', '_num_regions', '_num_zones', '_num_ips',
+                     'tier2devs', 'tiers_by_length'):
+            self.assertEqual(getattr(self.ring, attr),
+                             getattr(ring_v2, attr), attr)
+        for part in range(self.ring.partition_count):
+            self.assertEqual(self.ring.get_part_nodes(part),
+                             ring_v2.get_part_nodes(part))
+            self.assertEqual(list(self.ring.get_more_nodes(part)),
+                             list(ring_v2.get_more_nodes(part)))
+
+    def test_reload_is_atomic(self):
+        orig_mtime = self.ring._mtime
+        orig_state = dict(self.ring.__dict__)
+        self.intended_devs.append(
+            {'id': 5, 'region': 0, 'zone': 4, 'weight': 1.0,
+             'ip': '10.5.5.5', 'port': 6200})
+        self.intended_replica2part2dev_id[2][1] = 5
+        ring.RingData(
+            self.intended_replica2part2dev_id,
+            self.intended_devs, self.intended_part_shift).save(self.testgz)
+        new_mtime = int(orig_mtime) + 60
+        os.utime(self.testgz, (new_mtime, new_mtime))
+
+        # nothing of a ring that fails to load half way is used
+        with mock.patch.object(ring.Ring, '_update_bookkeeping',
+                               side_effect=Exception('boom')):
+            self.assertRaises(Exception, self.ring._reload, force=True)
+        for attr, value in orig_state.items():
+            if attr != '_rtime':
+                self.assertIs(value, self.ring.__dict__[attr], attr)
+
+        # the mtime recorded is the file's before it was loaded, so a ring
+        # written while this one was being loaded gets loaded next
+        load = ring.RingData.load
+
+        def load_then_replace(*args, **kwargs):
+            ring_data = load(*args, **kwargs)
+            os.utime(self.testgz, (new_mtime + 60, new_mtime + 60))
+            return ring_data
+
+        with mock.patch.object(ring.RingData, 'load',
+                               side_effect=load_then_replace):
+            self.ring._reload(force=True)
+        self.assertEqual(new_mtime, self.ring._mtime)
+        self.assertTrue(self.ring.has_changed())
+        self.assertEqual(6, len(self.ring.devs))
+        self.assertEqual(5, self.ring._num_devs)
+        self.assertEqual([1, 5], [
+            dev['id'] for dev in self.ring.get_part_nodes(1)])
+
     def test_reload_without_replication(self):
         replication_less_devs = [{'id': 0, 'region': 0, 'zone': 0,
                                   'weight': 1.0, 'ip': '10.1.1.1',
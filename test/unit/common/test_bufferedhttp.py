@@ -17,11 +17,12 @@ import mock
 import unittest
 import socket
 
-from eventlet import spawn, Timeout
+from eventlet import spawn, wsgi, Timeout
 
 from swift.common import bufferedhttp
 
 from test import listen_zero
+from test.unit import debug_logger
 
 
 class MockHTTPSConnection(object):
@@ -128,5 +129,209 @@ class TestBufferedHTTP(unittest.TestCase):
                                 % (e, dev, path, header))
 
 
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.bindsock = listen_zero()
+        self.port = self.bindsock.getsockname()[1]
+        self.logger = debug_logger()
+        self.pool = bufferedhttp.ConnectionPool(max_idle=2, logger=self.logger)
+        self.server = None
+
+    def tearDown(self):
+        if self.server:
+            self.server.kill()
+        self.bindsock.close()
+
+    def start_wsgi_server(self):
+        self.client_ports = []
+
+        def app(env, start_response):
+            # which client socket the request came in on
+            self.client_ports.append(env['REMOTE_PORT'])
+            body = b'x' * 100
+            start_response('200 OK', [('Content-Length', str(len(body)))])
+            return [body]
+
+        self.server = spawn(wsgi.server, self.bindsock, app,
+                            log=open('/dev/null', 'w'))
+
+    def request(self, method='GET', read=True):
+        with Timeout(3):
+            conn = bufferedhttp.http_connect(
+                '127.0.0.1', self.port, 'sda', 1, method, '/a/c/o',
+                pool=self.pool)
+            resp = conn.getresponse()
+            if read:
+                resp.read()
+            return conn, resp, self.pool.release(conn, resp)
+
+    def assert_metrics(self, **expected):
+        self.assertEqual(self.logger.get_increment_counts(), dict(
+            ('backend_pool.' + k, v) for k, v in expected.items()))
+
+    def test_reuse(self):
+        self.start_wsgi_server()
+        conns = []
+        for method in ('GET', 'HEAD', 'GET'):
+            conn, resp, released = self.request(method)
+            self.assertEqual(resp.status, 200)
+            self.assertTrue(released)
+            conns.append(conn)
+        self.assertIs(conns[0], conns[1])
+        self.assertIs(conns[1], conns[2])
+        self.assertEqual(len(set(self.client_ports)), 1)
+        self.assert_metrics(new=1, reused=2)
+
+    def test_partially_read_response_is_not_reused(self):
+        self.start_wsgi_server()
+        conn, resp, released = self.request(read=False)
+        self.assertFalse(released)
+        resp.read(10)
+        self.assertFalse(self.pool.release(conn, resp))
+        resp.nuke_from_orbit()
+        self.request()
+        self.assertEqual(len(set(self.client_ports)), 2)
+        self.assert_metrics(new=2)
+
+    def test_max_idle(self):
+        self.start_wsgi_server()
+        pool = bufferedhttp.ConnectionPool(max_idle=1)
+        conns = [bufferedhttp.http_connect(
+            '127.0.0.1', self.port, 'sda', 1, 'GET', '/a/c/o', pool=pool)
+            for _ in range(2)]
+        resps = [conn.getresponse() for conn in conns]
+        for resp in resps:
+            resp.read()
+        self.assertTrue(pool.release(conns[0], resps[0]))
+        self.assertFalse(pool.release(conns[1], resps[1]))
+        self.assertIs(pool.get('127.0.0.1', self.port), conns[0])
+        self.assertIsNone(pool.get('127.0.0.1', self.port))
+
+    def test_max_idle_time_and_age(self):
+        self.start_wsgi_server()
+        conn, resp, released = self.request()
+        self.assertTrue(released)
+        with mock.patch('swift.common.bufferedhttp.time.time',
+                        return_value=conn._connected_time + 11):
+            self.request()
+        self.assertEqual(len(set(self.client_ports)), 2)
+
+        self.pool.max_idle_time = 1000
+        conn, resp, released = self.request()
+        self.assertTrue(released)
+        with mock.patch('swift.common.bufferedhttp.time.time',
+                        return_value=conn._connected_time + 301):
+            self.request()
+        self.assertEqual(len(set(self.client_ports)), 3)
+        self.assert_metrics(new=3, reused=1)
+
+    def test_disabled_pool(self):
+        self.start_wsgi_server()
+        self.pool.max_idle = 0
+        conn, resp, released = self.request()
+        self.assertFalse(released)
+        self.assertIsNone(conn.pool)
+        self.assert_metrics()
+
+    def _raw_server(self, handlers):
+        # each handler deals with one accepted connection
+        def serve():
+            try:
+                with Timeout(3):
+                    for handler in handlers:
+                        sock, addr = self.bindsock.accept()
+                        fp = sock.makefile('rwb')
+                        handler(sock, fp)
+            except BaseException as err:
+                return err
+        return spawn(serve)
+
+    @staticmethod
+    def _read_request(fp):
+        lines = []
+        line = fp.readline()
+        while line and line != b'\r\n':
+            lines.append(line)
+            line = fp.readline()
+        return lines
+
+    def _respond(self, fp, headers=b''):
+        fp.write(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n' + headers +
+                 b'\r\nok')
+        fp.flush()
+
+    def test_server_closed_idle_connection(self):
+        def hang_up(sock, fp):
+            self._read_request(fp)
+            self._respond(fp)
+            fp.close()
+            sock.close()
+
+        def serve_one(sock, fp):
+            self._read_request(fp)
+            self._respond(fp)
+
+        server = self._raw_server([hang_up, serve_one])
+        conn, resp, released = self.request()
+        self.assertTrue(released)
+        with Timeout(3):
+            # wait for the server to hang up
+            self.assertEqual(conn.sock.recv(1, socket.MSG_PEEK), b'')
+        conn2, resp2, released = self.request()
+        self.assertIsNot(conn, conn2)
+        self.assertEqual(resp2.status, 200)
+        self.assert_metrics(new=2)
+        self.assertIsNone(server.wait())
+
+    def test_replay_request_on_reused_connection(self):
+        requests = []
+
+        def hang_up_on_second_request(sock, fp):
+            requests.append(self._read_request(fp))
+            self._respond(fp)
+            requests.append(self._read_request(fp))
+            fp.close()
+            sock.close()
+
+        def serve_one(sock, fp):
+            requests.append(self._read_request(fp))
+            self._respond(fp, b'Connection: close\r\n')
+
+        server = self._raw_server([hang_up_on_second_request, serve_one])
+        conn, resp, released = self.request()
+        self.assertTrue(released)
+        conn2, resp2, released = self.request(method='HEAD')
+        self.assertIs(conn, conn2)
+        self.assertEqual(resp2.status, 200)
+        self.assertFalse(released)
+        self.assertIsNone(server.wait())
+        self.assertEqual([r[0] for r in requests], [
+            b'GET /sda/1/a/c/o HTTP/1.1\r\n',
+            b'HEAD /sda/1/a/c/o HTTP/1.1\r\n',
+            b'HEAD /sda/1/a/c/o HTTP/1.1\r\n'])
+        self.assert_metrics(new=1, reused=1)
+
+    def test_no_replay_once_body_is_sent(self):
+        def hang_up_on_second_request(sock, fp):
+            self._read_request(fp)
+            self._respond(fp)
+            self._read_request(fp)
+            fp.read(4)
+            fp.close()
+            sock.close()
+
+        server = self._raw_server([hang_up_on_second_request])
+        self.request()
+        with Timeout(3):
+            conn = bufferedhttp.http_connect(
+                '127.0.0.1', self.port, 'sda', 1, 'PUT', '/a/c/o',
+                {'Content-Length': '4'}, pool=self.pool)
+            conn.send(b'body')
+            with self.assertRaises(Exception):
+                conn.getresponse()
+        self.assertIsNone(server.wait())
+
+
 if __name__ == '__main__':
     unittest.main()
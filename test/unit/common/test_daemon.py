@@ -64,6 +64,15 @@ class TestDaemon(unittest.TestCase):
         self.assertRaises(NotImplementedError, d.run_once)
         self.assertRaises(NotImplementedError, d.run_forever)
 
+    def test_run_starts_hub_monitor(self):
+        conf = {'log_name': 'my-daemon', 'hub_monitor_interval': '1'}
+        d = MyDaemon(conf)
+        with mock.patch('swift.common.daemon.HubMonitor') as monitor:
+            d.run(once=True)
+        self.assertTrue(MyDaemon.once_called)
+        self.assertEqual(monitor.mock_calls, [
+            mock.call(conf, d.logger, 'my-daemon'), mock.call().start()])
+
 
 class MyWorkerDaemon(MyDaemon):
 
@@ -0,0 +1,150 @@
+# Copyright (c) 2010-2018 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import errno
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import eventlet
+import mock
+
+from swift.common import hub_monitor
+from swift.common.utils import load_recon_cache
+
+from test.unit import FakeLogger
+
+
+def block_the_hub(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+class TestHubMonitor(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.logger = FakeLogger()
+        self.conf = {'recon_cache_path': self.tempdir,
+                     'hub_monitor_interval': '0.01',
+                     'hub_lag_threshold': '0.05'}
+        self.recon_cache = os.path.join(self.tempdir, 'hub.recon')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def test_disabled_by_default(self):
+        monitor = hub_monitor.HubMonitor({}, self.logger, 'test')
+        with mock.patch.object(hub_monitor, 'spawn_n') as spawn_n, \
+                mock.patch.object(hub_monitor.thread,
+                                  'start_new_thread') as start_new_thread:
+            self.assertFalse(monitor.start())
+        self.assertFalse(monitor.running)
+        self.assertFalse(spawn_n.called)
+        self.assertFalse(start_new_thread.called)
+
+    def test_record(self):
+        pool = eventlet.GreenPool(10)
+        monitor = hub_monitor.HubMonitor(self.conf, self.logger, 'test',
+                                         pool=pool)
+        monitor.record(0.01)
+        monitor.record(0.2, ('a.py:10(f)', 'b.py:20(g)'))
+        monitor.record(0.1, ('a.py:10(f)', 'b.py:20(g)'))
+        monitor.record(0.3, ('c.py:30(h)',))
+        monitor.record(0.07)
+        self.assertEqual(self.logger.log_dict['timing'][:2], [
+            (('hub.lag', 10.0), {}), (('hub.greenthreads', 0), {})])
+        self.assertEqual(
+            [args[1] for args, _ in self.logger.log_dict['timing']
+             if args[0] == 'hub.lag'],
+            [10.0, 200.0, 100.0, 300.0, 70.0])
+        self.assertEqual(self.logger.get_increment_counts(),
+                         {'hub.lag_exceeded': 4})
+        self.assertEqual(monitor.max_lag, 0.3)
+        self.assertEqual(monitor.call_sites, {
+            ('a.py:10(f)', 'b.py:20(g)'): [2, 0.30000000000000004],
+            ('c.py:30(h)',): [1, 0.3]})
+
+    def test_call_sites_are_bounded(self):
+        monitor = hub_monitor.HubMonitor(self.conf, self.logger, 'test')
+        with mock.patch.object(hub_monitor, 'MAX_CALL_SITES', 3):
+            for i in range(5):
+                monitor.record(0.1 * (i + 1), ('x.py:%d(f)' % i,))
+        self.assertEqual(sorted(monitor.call_sites),
+                         [('x.py:2(f)',), ('x.py:3(f)',), ('x.py:4(f)',)])
+
+    def test_report(self):
+        pool = eventlet.GreenPool(10)
+        monitor = hub_monitor.HubMonitor(self.conf, self.logger, 'test',
+                                         pool=pool)
+        for i in range(7):
+            monitor.record(0.1 * (i + 1), ('x.py:%d(f)' % i,))
+        # a worker that has gone away, and one of another server
+        with open(self.recon_cache, 'w') as f:
+            f.write('{"test": {"999999": {"max_lag": 1}}, '
+                    '"other": {"999999": {"max_lag": 2}}}\n')
+
+        def fake_kill(pid, sig):
+            if pid != os.getpid():
+                raise OSError(errno.ESRCH, 'No such process')
+
+        with mock.patch('swift.common.hub_monitor.time.time',
+                        return_value=1500000000.0), \
+                mock.patch('os.kill', fake_kill):
+            monitor.report()
+        cache = load_recon_cache(self.recon_cache)
+        self.assertEqual(cache['other'], {'999999': {'max_lag': 2}})
+        self.assertEqual(list(cache['test']), [str(os.getpid())])
+        entry = cache['test'][str(os.getpid())]
+        sites = entry.pop('blocking_call_sites')
+        self.assertEqual(entry, {'timestamp': 1500000000.0,
+                                 'max_lag': 0.7000000000000001,
+                                 'lag_exceeded': 7,
+                                 'greenthreads': 0,
+                                 'pool_size': 10})
+        self.assertEqual([site['stack'] for site in sites], [
+            ['x.py:%d(f)' % i] for i in (6, 5, 4, 3, 2)])
+        self.assertEqual(sites[0]['count'], 1)
+        self.assertAlmostEqual(sites[0]['lag'], 0.7)
+        # the lag is per report, the call sites for the process's lifetime
+        self.assertEqual(monitor.max_lag, 0)
+        self.assertEqual(monitor.lag_exceeded, 0)
+        self.assertEqual(len(monitor.call_sites), 7)
+
+    def test_blocked_hub(self):
+        monitor = hub_monitor.HubMonitor(self.conf, self.logger, 'test')
+        self.assertTrue(monitor.start())
+        self.assertFalse(monitor.start())
+        try:
+            eventlet.sleep(0.05)
+            block_the_hub(0.3)
+            eventlet.sleep(0.05)
+        finally:
+            monitor.stop()
+        lags = [args[1] for args, _ in self.logger.log_dict['timing']
+                if args[0] == 'hub.lag']
+        self.assertGreaterEqual(max(lags), 200)
+        self.assertGreaterEqual(
+            self.logger.get_increment_counts()['hub.lag_exceeded'], 1)
+        stacks = [stack for stack in monitor.call_sites
+                  if '(block_the_hub)' in stack[0]]
+        self.assertEqual(len(stacks), 1, monitor.call_sites)
+        self.assertIn('(test_blocked_hub)', stacks[0][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -98,12 +98,49 @@ class TestHeaderEnvironProxy(unittest.TestCase):
             set(proxy.keys()),
             set(('Content-Length', 'Content-Type', 'Something-Else')))
 
+    def test_get(self):
+        proxy = swift.common.swob.HeaderEnvironProxy({})
+        proxy['Something-Else'] = 'somevalue'
+        self.assertEqual(proxy.get('something-else'), 'somevalue')
+        self.assertIsNone(proxy.get('content-type'))
+        self.assertEqual(proxy.get('content-type', 'x'), 'x')
+
+    def test_memoized_environ_keys(self):
+        memo = swift.common.swob._memoized_header_to_environ_key.memo
+        memo.clear()
+        self.assertEqual(
+            swift.common.swob.header_to_environ_key('X-Some-Header'),
+            'HTTP_X_SOME_HEADER')
+        self.assertEqual(memo, {'X-Some-Header': 'HTTP_X_SOME_HEADER'})
+        self.assertEqual(
+            swift.common.swob.header_to_environ_key('X-Some-Header'),
+            'HTTP_X_SOME_HEADER')
+
+        if six.PY2:
+            # unicode header names never get into the memo
+            key = swift.common.swob.header_to_environ_key(u'X-Other-Header')
+            self.assertEqual(key, 'HTTP_X_OTHER_HEADER')
+            self.assertNotIn('X-Other-Header', memo)
+
+        # a full memo starts over
+        for i in range(1023):
+            swift.common.swob.header_to_environ_key('X-Header-%d' % i)
+        self.assertEqual(len(memo), 1024)
+        swift.common.swob.header_to_environ_key('X-Other-Header')
+        self.assertEqual(memo, {'X-Other-Header': 'HTTP_X_OTHER_HEADER'})
+
 
 class TestRange(unittest.TestCase):
     def test_range(self):
         swob_range = swift.common.swob.Range('bytes=1-7')
         self.assertEqual(swob_range.ranges[0], (1, 7))
 
+    def test_ranges_are_not_shared(self):
+        swob_range = swift.common.swob.Range('bytes=1-7,9-')
+        swob_range.ranges.pop(0)
+        self.assertEqual(swift.common.swob.Range('bytes=1-7,9-').ranges,
+                         [(1, 7), (9, None)])
+
     def test_upsidedown_range(self):
         swob_range = swift.common.swob.Range('bytes=5-10')
         self.assertEqual(swob_range.ranges_for_length(2), [])
@@ -277,6 +314,12 @@ class TestMatch(unittest.TestCase):
         self.assertNotIn(None, match)
         self.assertEqual(repr(match), "Match('a, b')")
 
+    def test_tags_are_not_shared(self):
+        match = swift.common.swob.Match('"a", "b"')
+        match.tags.add('c')
+        self.assertEqual(swift.common.swob.Match('"a", "b"').tags,
+                         set(('a', 'b')))
+
     def test_match_star(self):
         match = swift.common.swob.Match('"a", "*"')
         self.assertIn('a', match)
@@ -1345,6 +1388,14 @@ class TestResponse(unittest.TestCase):
         self.assertEqual(resp.status, '200 OK')
         self.assertEqual(10, resp.content_length)
 
+    def test_boundary(self):
+        resp = swift.common.swob.Response()
+        self.assertIsNone(resp._boundary)
+        self.assertTrue(re.match(b'^[0-9a-f]{32}$', resp.boundary))
+        self.assertEqual(resp.boundary, resp._boundary)
+        resp.boundary = b'abc'
+        self.assertEqual(resp.boundary, b'abc')
+
     def test_multi_range_body(self):
         def test_app(environ, start_response):
             start_response('200 OK', [('Content-Length', '4')])
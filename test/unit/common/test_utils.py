@@ -3845,6 +3845,31 @@ cluster_dfw1 = http://dfw1.host/v1/
             else:
                 self.fail("Unexpected call: %r" % called)
 
+    def test_set_cpu_affinity(self):
+        calls = []
+
+        def _fake_sched_setaffinity(pid, size, mask):
+            calls.append((pid, size, list(mask)))
+
+        bits = ctypes.sizeof(ctypes.c_ulong) * 8
+        word = ctypes.sizeof(ctypes.c_ulong)
+        # without os.sched_setaffinity, as on py2, libc's is called
+        with patch('swift.common.utils._libc_sched_setaffinity',
+                   _fake_sched_setaffinity), \
+                patch('swift.common.utils.os', spec=[]):
+            utils.set_cpu_affinity(1234, [0])
+            utils.set_cpu_affinity(0, [3, 0, bits + 1])
+            self.assertRaises(ValueError, utils.set_cpu_affinity, 1234, [])
+            self.assertRaises(ValueError, utils.set_cpu_affinity, 1234, [-1])
+        self.assertEqual(calls, [
+            (1234, word, [1]),
+            (0, 2 * word, [0b1001, 0b10]),
+        ])
+
+        with patch('os.sched_setaffinity', create=True) as mock_setaffinity:
+            utils.set_cpu_affinity(1234, [2, 1])
+        mock_setaffinity.assert_called_once_with(1234, {1, 2})
+
     def test__NR_ioprio_set(self):
         with patch('os.uname', return_value=('', '', '', '', 'x86_64')), \
                 patch('platform.architecture', return_value=('64bit', '')):
@@ -4851,6 +4876,122 @@ class TestStatsdLogging(unittest.TestCase):
         self.assertEqual(logger.logger.statsd_client._sample_rate_factor,
                          0.81)
 
+    def test_get_logger_aggregating_statsd_client(self):
+        logger = utils.get_logger({
+            'log_statsd_host': 'some.host.com',
+        }, 'some-name', log_route='some-route')
+        self.assertNotIsInstance(logger.logger.statsd_client,
+                                 utils.AggregatingStatsdClient)
+
+        logger = utils.get_logger({
+            'log_statsd_host': 'some.host.com',
+            'log_statsd_flush_interval': '250',
+        }, 'some-name', log_route='some-route')
+        statsd_client = logger.logger.statsd_client
+        self.assertIsInstance(statsd_client, utils.AggregatingStatsdClient)
+        self.assertEqual(0.25, statsd_client.flush_interval)
+        self.assertEqual(1400, statsd_client.max_packet_size)
+        self.assertEqual(statsd_client._prefix, 'some-name.')
+
+        logger = utils.get_logger({
+            'log_statsd_host': 'some.host.com',
+            'log_statsd_flush_interval': '100',
+            'log_statsd_max_packet_size': '512',
+        }, 'some-name', log_route='some-route')
+        statsd_client = logger.logger.statsd_client
+        self.assertEqual(0.1, statsd_client.flush_interval)
+        self.assertEqual(512, statsd_client.max_packet_size)
+
+    def _make_aggregating_logger(self, **conf):
+        conf.setdefault('log_statsd_host', 'some.host.com')
+        conf.setdefault('log_statsd_flush_interval', '1000')
+        logger = utils.get_logger(conf, 'some-name', log_route='some-route')
+        mock_socket = MockUdpSocket()
+        logger.logger.statsd_client._open_socket = lambda *_: mock_socket
+        return logger, mock_socket
+
+    def test_aggregating_statsd_client(self):
+        logger, mock_socket = self._make_aggregating_logger()
+        statsd_client = logger.logger.statsd_client
+        now = [1000.0]
+        with mock.patch('swift.common.utils.time.time',
+                        lambda: now[0]), \
+                mock.patch('swift.common.utils.eventlet.spawn_after') as \
+                mock_spawn:
+            logger.increment('tribbles')
+            logger.increment('tribbles')
+            logger.update_stats('bytes', 100)
+            logger.decrement('tribbles')
+            for timing in (5, 1, 4):
+                logger.timing('req', timing)
+            logger.set_statsd_prefix('other')
+            logger.increment('tribbles')
+            logger.set_statsd_prefix('some-name')
+            self.assertEqual([], mock_socket.sent)
+            self.assertEqual([mock.call(1.0, statsd_client.flush)],
+                             mock_spawn.call_args_list)
+            now[0] += 1.0
+            logger.timing_since('req', now[0] - 0.5)
+        self.assertEqual(1, len(mock_socket.sent))
+        payload, target = mock_socket.sent[0]
+        self.assertEqual(('some.host.com', 8125), target)
+        self.assertEqual([
+            b'other.tribbles:1|c',
+            b'some-name.bytes:100|c',
+            b'some-name.tribbles:1|c',
+            # timings are still sent as timers, in the order they happened
+            b'some-name.req:5|ms',
+            b'some-name.req:1|ms',
+            b'some-name.req:4|ms',
+            b'some-name.req:500.0|ms',
+        ], payload.split(b'\n'))
+
+        # aggregates were reset
+        statsd_client.flush()
+        self.assertEqual(1, len(mock_socket.sent))
+
+    def test_aggregating_statsd_client_sample_rate(self):
+        logger, mock_socket = self._make_aggregating_logger()
+        statsd_client = logger.logger.statsd_client
+        statsd_client.random = lambda: 0.50001
+        with mock.patch('swift.common.utils.eventlet.spawn_after'):
+            logger.increment('tribbles', sample_rate=0.5)
+            statsd_client.random = lambda: 0.49999
+            logger.increment('tribbles', sample_rate=0.5)
+            logger.timing('req', 5, sample_rate=0.5)
+            logger.timing('req', 6)
+        statsd_client.flush()
+        self.assertEqual([
+            b'some-name.tribbles:2|c',
+            b'some-name.req:5|ms|@0.5',
+            b'some-name.req:6|ms',
+        ], mock_socket.sent[0][0].split(b'\n'))
+
+    def test_aggregating_statsd_client_packet_size(self):
+        logger, mock_socket = self._make_aggregating_logger(
+            log_statsd_max_packet_size='60')
+        with mock.patch('swift.common.utils.eventlet.spawn_after'):
+            for i in range(5):
+                logger.increment('counter%d' % i)
+        logger.logger.statsd_client.flush()
+        # each line is 24 bytes, so two fit in each packet
+        self.assertEqual([
+            b'some-name.counter0:1|c\nsome-name.counter1:1|c',
+            b'some-name.counter2:1|c\nsome-name.counter3:1|c',
+            b'some-name.counter4:1|c',
+        ], [payload for payload, _ in mock_socket.sent])
+
+    def test_aggregating_statsd_client_send_error(self):
+        logger, mock_socket = self._make_aggregating_logger()
+        mock_socket.sendto_errno = errno.EPERM
+        with mock.patch.object(logger.logger, 'warning') as mock_warning, \
+                mock.patch('swift.common.utils.eventlet.spawn_after'):
+            logger.increment('tribbles')
+            logger.logger.statsd_client.flush()
+        self.assertEqual(1, mock_warning.call_count)
+        self.assertIn('Error sending UDP message',
+                      mock_warning.call_args[0][0])
+
     def test_ipv4_or_ipv6_hostname_defaults_to_ipv4(self):
         def stub_getaddrinfo_both_ipv4_and_ipv6(host, port, family, *rest):
             if family == socket.AF_INET:
@@ -6004,6 +6145,25 @@ class TestLRUCache(unittest.TestCase):
         # reuses cache space
         self.assertEqual(f.size(), 10)
 
+    def test_maxtime_repopulated_entries_evict(self):
+        @utils.LRUCache(maxsize=2, maxtime=30)
+        def f(*args):
+            return math.sqrt(*args)
+
+        now = time.time()
+        with patch('time.time', lambda: now):
+            f(1)
+        with patch('time.time', lambda: now + 31):
+            # 1 has expired and is repopulated
+            self.assertEqual(1, f(1))
+            f(4)
+            f(9)
+            f(16)
+            self.assertEqual(2, f.size())
+            with patch('math.sqrt'):
+                self.assertEqual(3, f(9))
+                self.assertEqual(4, f(16))
+
     def test_set_maxtime(self):
         @utils.LRUCache(maxtime=30)
         def f(*args):
@@ -17,6 +17,7 @@
 
 from argparse import Namespace
 import errno
+import json
 import logging
 import socket
 import unittest
@@ -389,6 +390,59 @@ class TestWSGI(unittest.TestCase):
             wsgi.listen = old_listen
             wsgi.ssl = old_ssl
 
+    def test_get_socket_reuse_port(self):
+        conf = {'bind_port': 54321, 'bind_ip': '127.0.0.1'}
+        with mock.patch.object(wsgi, 'listen') as mock_listen, \
+                mock.patch.object(wsgi, 'reuse_port_listen') as mock_reuse:
+            sock = wsgi.get_socket(conf, reuse_port=True)
+        self.assertIs(sock, mock_reuse.return_value)
+        self.assertEqual([], mock_listen.mock_calls)
+        mock_reuse.assert_called_once_with(
+            ('127.0.0.1', 54321), backlog=4096, family=socket.AF_INET)
+
+    def test_reuse_port_listen(self):
+        if not wsgi.reuse_port_supported():
+            raise unittest.SkipTest('SO_REUSEPORT is not supported')
+        sock1 = wsgi.reuse_port_listen(('127.0.0.1', 0))
+        port = sock1.getsockname()[1]
+        sock2 = wsgi.reuse_port_listen(('127.0.0.1', port), backlog=10)
+        sock3 = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            for sock in (sock1, sock2):
+                self.assertEqual(('127.0.0.1', port), sock.getsockname())
+                self.assertEqual(1, sock.getsockopt(socket.SOL_SOCKET,
+                                                    socket.SO_REUSEPORT))
+            # but not with a socket that doesn't set it too
+            with self.assertRaises(socket.error) as cm:
+                sock3.bind(('127.0.0.1', port))
+            self.assertEqual(errno.EADDRINUSE, cm.exception.errno)
+        finally:
+            sock1.close()
+            sock2.close()
+            sock3.close()
+
+    def test_reuse_port_supported(self):
+        with mock.patch.object(wsgi.sys, 'platform', 'darwin'):
+            self.assertFalse(wsgi.reuse_port_supported())
+        with mock.patch.object(wsgi.sys, 'platform', 'linux2'), \
+                mock.patch.object(wsgi.socket, 'SO_REUSEPORT', 15,
+                                  create=True), \
+                mock.patch.object(wsgi.socket, 'socket') as mock_socket:
+            self.assertTrue(wsgi.reuse_port_supported())
+            # an older kernel
+            mock_socket.return_value.setsockopt.side_effect = socket.error(
+                errno.ENOPROTOOPT, 'Protocol not available')
+            self.assertFalse(wsgi.reuse_port_supported())
+        self.assertEqual(2, mock_socket.return_value.close.call_count)
+
+    def test_parse_cpu_list(self):
+        self.assertEqual([], wsgi.parse_cpu_list(''))
+        self.assertEqual([3], wsgi.parse_cpu_list('3'))
+        self.assertEqual([0, 1, 2, 3, 8, 10, 11],
+                         wsgi.parse_cpu_list('0-3, 8,10-11'))
+        for bad in ('x', '-1', '3-1', '1-2-3', '0,,a'):
+            self.assertRaises(ValueError, wsgi.parse_cpu_list, bad)
+
     def test_address_in_use(self):
         # stubs
         conf = {'bind_port': 54321}
@@ -459,7 +513,8 @@ class TestWSGI(unittest.TestCase):
             with mock.patch('swift.proxy.server.Application.'
                             'modify_wsgi_pipeline'), \
                     mock.patch('swift.common.wsgi.wsgi') as _wsgi, \
-                    mock.patch('swift.common.wsgi.eventlet') as _wsgi_evt:
+                    mock.patch('swift.common.wsgi.eventlet') as _wsgi_evt, \
+                    mock.patch('swift.common.wsgi.HubMonitor') as _monitor:
                 conf = wsgi.appconfig(conf_file)
                 logger = logging.getLogger('test')
                 sock = listen_zero()
@@ -476,6 +531,9 @@ class TestWSGI(unittest.TestCase):
         self.assertTrue(isinstance(server_logger, wsgi.NullLogger))
         self.assertTrue('custom_pool' in kwargs)
         self.assertEqual(1000, kwargs['custom_pool'].size)
+        self.assertEqual(_monitor.mock_calls, [
+            mock.call(conf, logger, 'test', pool=kwargs['custom_pool']),
+            mock.call().start()])
 
         proto_class = kwargs['protocol']
         self.assertEqual(proto_class, wsgi.SwiftHttpProtocol)
@@ -613,6 +671,19 @@ class TestWSGI(unittest.TestCase):
         self.assertEqual('HTTP/1.0',
                          kwargs['protocol'].default_request_version)
 
+    def test_run_server_with_app(self):
+        conf = {'__file__': 'test', 'client_timeout': '30'}
+        app = object()
+        with mock.patch('swift.common.wsgi.wsgi') as _wsgi, \
+                mock.patch('swift.common.wsgi.eventlet'), \
+                mock.patch('swift.common.wsgi.HubMonitor'), \
+                mock.patch('swift.common.wsgi.loadapp') as _loadapp:
+            sock = listen_zero()
+            wsgi.run_server(conf, logging.getLogger('test'), sock, app=app)
+        self.assertFalse(_loadapp.called)
+        args, kwargs = _wsgi.server.call_args
+        self.assertEqual((sock, app), args[:2])
+
     def test_run_server_debug(self):
         config = """
         [DEFAULT]
@@ -838,6 +909,50 @@ class TestWSGI(unittest.TestCase):
                                                            select=True,
                                                            thread=True)
 
+    def test_run_server_preload_app(self):
+        logger = FakeLogger()
+        conf = {'__file__': 'test', 'workers': 0}
+        app = object()
+
+        def do_run_wsgi():
+            with mock.patch.object(wsgi, '_initrp',
+                                   return_value=(conf, logger, 'log_name')), \
+                    mock.patch.object(wsgi, 'get_socket'), \
+                    mock.patch.object(wsgi, 'drop_privileges'), \
+                    mock.patch.object(wsgi, 'loadapp',
+                                      return_value=app) as mock_loadapp, \
+                    mock.patch.object(wsgi, 'capture_stdio'), \
+                    mock.patch.object(wsgi, 'run_server') as mock_run_server, \
+                    mock.patch('swift.common.utils.eventlet'), \
+                    mock.patch.object(wsgi.gc, 'collect') as mock_collect, \
+                    mock.patch.object(wsgi.os, 'fork', return_value=0), \
+                    mock.patch.object(wsgi.signal, 'signal'):
+                self.assertEqual(0, wsgi.run_wsgi('conf_file', 'app_section'))
+            self.assertEqual([mock.call('conf_file',
+                                        global_conf={'log_name': 'log_name'})],
+                             mock_loadapp.mock_calls)
+            return mock_run_server.call_args, mock_collect.called
+
+        # by default, the app is only loaded to check it can be
+        (args, kwargs), collected = do_run_wsgi()
+        self.assertIsNone(kwargs['app'])
+        self.assertFalse(collected)
+
+        conf['preload_app'] = 'true'
+        (args, kwargs), collected = do_run_wsgi()
+        self.assertIs(app, kwargs['app'])
+        self.assertTrue(collected)
+
+        # and the same app goes to forked workers
+        conf['workers'] = 1
+        (args, kwargs), collected = do_run_wsgi()
+        self.assertIs(app, kwargs['app'])
+        self.assertTrue(collected)
+
+        del conf['preload_app']
+        (args, kwargs), collected = do_run_wsgi()
+        self.assertIsNone(kwargs['app'])
+
     @mock.patch('swift.common.wsgi.run_server')
     @mock.patch('swift.common.wsgi.WorkersStrategy')
     @mock.patch('swift.common.wsgi.ServersPerPortStrategy')
@@ -899,6 +1014,55 @@ class TestWSGI(unittest.TestCase):
             ], mock_per_port.mock_calls)
             self.assertEqual([], mock_workers.mock_calls)
 
+    @mock.patch('swift.common.wsgi.run_server')
+    @mock.patch('swift.common.wsgi.WorkersStrategy')
+    @mock.patch('swift.common.wsgi.ReusePortStrategy')
+    @mock.patch('swift.common.wsgi.ServersPerPortStrategy')
+    def test_run_server_reuse_port_strategy(self, mock_per_port,
+                                            mock_reuse_port, mock_workers,
+                                            mock_run_server):
+        for strategy in (mock_per_port, mock_reuse_port, mock_workers):
+            strategy().do_bind_ports.return_value = 'stop early'
+        logger = FakeLogger()
+        conf = {'__file__': 'test', 'workers': 2, 'reuse_port': 'true'}
+        with mock.patch.object(wsgi, '_initrp',
+                               return_value=[conf, logger, 'log_name']), \
+                mock.patch.object(wsgi, 'loadapp'), \
+                mock.patch.object(wsgi, 'capture_stdio'), \
+                mock.patch.object(wsgi, 'reuse_port_supported',
+                                  return_value=True):
+            for server_type in ('proxy-server', 'account-server',
+                                'container-server', 'object-server'):
+                mock_reuse_port.reset_mock()
+                self.assertEqual(1, wsgi.run_wsgi('conf_file', server_type))
+                self.assertEqual([
+                    mock.call(conf, logger),
+                    mock.call().do_bind_ports(),
+                ], mock_reuse_port.mock_calls)
+
+            # servers_per_port wins for the object-server
+            conf['servers_per_port'] = 3
+            mock_reuse_port.reset_mock()
+            self.assertEqual(1, wsgi.run_wsgi('conf_file', 'object-server'))
+            self.assertEqual([], mock_reuse_port.mock_calls)
+            del conf['servers_per_port']
+
+            # fall back to a shared socket if SO_REUSEPORT is unsupported
+            mock_reuse_port.reset_mock()
+            mock_workers.reset_mock()
+            logger._clear()
+            wsgi.reuse_port_supported.return_value = False
+            self.assertEqual(1, wsgi.run_wsgi('conf_file', 'proxy-server'))
+            self.assertEqual([], mock_reuse_port.mock_calls)
+            self.assertEqual([
+                mock.call(conf, logger),
+                mock.call().do_bind_ports(),
+            ], mock_workers.mock_calls)
+            self.assertEqual([
+                'reuse_port is set but SO_REUSEPORT is not supported; '
+                'workers will share a listen socket',
+            ], logger.get_lines_for_level('warning'))
+
     def test_run_server_failure1(self):
         calls = defaultdict(lambda: 0)
 
@@ -1622,6 +1786,158 @@ class TestWorkersStrategy(unittest.TestCase):
         ], self.logger.get_lines_for_level('notice'))
 
 
+class TestReusePortStrategy(unittest.TestCase):
+    def setUp(self):
+        self.logger = FakeLogger()
+        self.conf = {
+            'workers': 3,
+            'user': 'bob',
+            'cpu_affinity': '4-5',
+        }
+        self.strategy = wsgi.ReusePortStrategy(self.conf, self.logger)
+        self.socks = [mock.MagicMock(), mock.MagicMock(), mock.MagicMock()]
+        patcher = mock.patch('swift.common.wsgi.get_socket',
+                             side_effect=self.socks)
+        self.mock_get_socket = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('swift.common.wsgi.drop_privileges')
+        self.mock_drop_privileges = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('swift.common.wsgi.set_cpu_affinity')
+        self.mock_set_cpu_affinity = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_loop_timeout(self):
+        self.assertEqual(0.5, self.strategy.loop_timeout())
+
+    def test_bad_cpu_affinity(self):
+        self.conf['cpu_affinity'] = 'all'
+        self.assertRaises(ValueError, wsgi.ReusePortStrategy, self.conf,
+                          self.logger)
+
+    def test_binding(self):
+        self.assertIsNone(self.strategy.do_bind_ports())
+
+        self.assertEqual(self.socks, self.strategy.socks)
+        self.assertEqual([
+            mock.call(self.conf, reuse_port=True),
+        ] * 3, self.mock_get_socket.mock_calls)
+        self.assertEqual([
+            mock.call('bob'),
+        ], self.mock_drop_privileges.mock_calls)
+
+        self.mock_get_socket.side_effect = wsgi.ConfigFilePortError()
+
+        self.assertEqual(
+            'bind_port wasn\'t properly set in the config file. '
+            'It must be explicitly set to a valid port number.',
+            self.strategy.do_bind_ports())
+
+    def test_no_fork_sock(self):
+        self.strategy.do_bind_ports()
+        self.assertIsNone(self.strategy.no_fork_sock())
+
+        self.conf['workers'] = 0
+        self.strategy = wsgi.ReusePortStrategy(self.conf, self.logger)
+        self.mock_get_socket.side_effect = self.socks
+        self.strategy.do_bind_ports()
+
+        self.assertEqual([self.socks[0]], self.strategy.socks)
+        self.assertEqual(self.socks[0], self.strategy.no_fork_sock())
+        self.assertEqual([], list(self.strategy.new_worker_socks()))
+
+    def test_new_worker_socks(self):
+        self.strategy.do_bind_ports()
+        pid = 88
+        started = []
+        for s, i in self.strategy.new_worker_socks():
+            self.strategy.register_worker_start(s, i, pid)
+            started.append((s, i))
+            pid += 1
+
+        self.assertEqual(list(zip(self.socks, range(3))), started)
+        self.assertEqual([88, 89, 90], self.strategy.children)
+        self.assertEqual([], list(self.strategy.new_worker_socks()))
+        # workers are pinned to the CPUs in turn
+        self.assertEqual([
+            mock.call(88, [4]), mock.call(89, [5]), mock.call(90, [4]),
+        ], self.mock_set_cpu_affinity.mock_calls)
+
+        mypid = os.getpid()
+        self.assertEqual([
+            'Started child %d (PID %d) from parent %d' % (i, 88 + i, mypid)
+            for i in range(3)
+        ], self.logger.get_lines_for_level('notice'))
+
+        # a dead worker is replaced on the same socket and CPU
+        self.strategy.register_worker_exit(89)
+        self.strategy.register_worker_exit(12345)  # not one of ours
+        self.assertEqual([
+            'Removing dead child 1 (PID: 89) from parent %s' % mypid
+        ], self.logger.get_lines_for_level('error'))
+        self.assertEqual([(self.socks[1], 1)],
+                         list(self.strategy.new_worker_socks()))
+        self.mock_set_cpu_affinity.reset_mock()
+        self.strategy.register_worker_start(self.socks[1], 1, 91)
+        self.assertEqual([88, 91, 90], self.strategy.children)
+        self.assertEqual([mock.call(91, [5])],
+                         self.mock_set_cpu_affinity.mock_calls)
+
+    def test_post_fork_hook(self):
+        self.strategy.do_bind_ports()
+        for s, i in self.strategy.new_worker_socks():
+            if i == 1:
+                # as in the child forked off for worker 1
+                self.strategy.post_fork_hook()
+                break
+            self.strategy.register_worker_start(s, i, 88 + i)
+
+        # the worker keeps only its own socket, and none are shut down
+        self.assertEqual([mock.call.close()], self.socks[0].mock_calls)
+        self.assertEqual([], self.socks[1].mock_calls)
+        self.assertEqual([mock.call.close()], self.socks[2].mock_calls)
+
+    def test_cpu_affinity_errors(self):
+        self.mock_set_cpu_affinity.side_effect = OSError(
+            errno.EINVAL, 'Invalid argument')
+        self.strategy.do_bind_ports()
+        for s, i in self.strategy.new_worker_socks():
+            self.strategy.register_worker_start(s, i, 88 + i)
+        self.assertEqual([88, 89, 90], self.strategy.children)
+        self.assertEqual([
+            'Unable to pin child 0 (PID 88) to CPU 4: '
+            '[Errno 22] Invalid argument',
+            'Unable to pin child 1 (PID 89) to CPU 5: '
+            '[Errno 22] Invalid argument',
+            'Unable to pin child 2 (PID 90) to CPU 4: '
+            '[Errno 22] Invalid argument',
+        ], self.logger.get_lines_for_level('error'))
+
+    def test_no_cpu_affinity(self):
+        del self.conf['cpu_affinity']
+        self.strategy = wsgi.ReusePortStrategy(self.conf, self.logger)
+        self.strategy.do_bind_ports()
+        for s, i in self.strategy.new_worker_socks():
+            self.strategy.register_worker_start(s, i, 88 + i)
+        self.assertEqual([], self.mock_set_cpu_affinity.mock_calls)
+
+    def test_shutdown_sockets(self):
+        self.strategy.do_bind_ports()
+        with mock.patch('swift.common.wsgi.greenio') as mock_greenio:
+            self.strategy.shutdown_sockets()
+        self.assertEqual([
+            mock.call.shutdown_safe(sock) for sock in self.socks
+        ], mock_greenio.mock_calls)
+        for sock in self.socks:
+            self.assertEqual([mock.call.close()], sock.mock_calls)
+
+    def test_log_sock_exit(self):
+        self.strategy.log_sock_exit(self.socks[2], 2)
+        self.assertEqual([
+            'Child 2 (PID %d) exiting normally' % os.getpid(),
+        ], self.logger.get_lines_for_level('notice'))
+
+
 class TestWSGIContext(unittest.TestCase):
 
     def test_app_call(self):
@@ -2333,5 +2649,187 @@ class TestPipelineModification(unittest.TestCase):
         self.assertEqual(filtered_app.foo, 'bar')
 
 
+class TestPipelineTimer(unittest.TestCase):
+    def test_request_type(self):
+        timer = wsgi.PipelineTimer({}, logger=FakeLogger())
+        for path, method, expected in (
+                ('/v1/a', 'HEAD', 'account.HEAD'),
+                ('/v1/a/c', 'GET', 'container.GET'),
+                ('/v1/a/c/o/with/slashes', 'PUT', 'object.PUT'),
+                ('/info', 'GET', 'other.GET'),
+                ('/healthcheck', 'GET', 'other.GET'),
+                ('/v2.0/tokens', 'POST', 'other.POST'),
+                ('/v1/a/c/o', 'FOO', 'object.BAD_METHOD'),
+                ('/v1/a/c/o', 'get', 'object.BAD_METHOD'),
+                ('/info', 'PATCH', 'other.BAD_METHOD')):
+            env = {'PATH_INFO': path, 'REQUEST_METHOD': method}
+            self.assertEqual(timer.request_type(env), expected)
+
+        timer = wsgi.PipelineTimer(
+            {'log_statsd_valid_http_methods': 'GET, patch'},
+            logger=FakeLogger())
+        for path, method, expected in (
+                ('/v1/a/c/o', 'GET', 'object.GET'),
+                ('/v1/a/c/o', 'PATCH', 'object.PATCH'),
+                ('/v1/a/c/o', 'PUT', 'object.BAD_METHOD')):
+            env = {'PATH_INFO': path, 'REQUEST_METHOD': method}
+            self.assertEqual(timer.request_type(env), expected)
+
+    def test_self_and_inclusive_times(self):
+        logger = FakeLogger()
+        timer = wsgi.PipelineTimer({}, logger=logger)
+
+        def inner(env, start_response):
+            start_response('200 OK', [])
+            return [b'ok']
+
+        class Filter(object):
+            def __init__(self, app):
+                self.app = app
+
+            def __call__(self, env, start_response):
+                # a subrequest doesn't change the request type
+                env2 = dict(env, PATH_INFO='/v1/a/c')
+                self.app(env2, lambda *a: None)
+                return self.app(env, start_response)
+
+        app = wsgi._TimedApp(timer, 'app', inner)
+        app = wsgi._TimedApp(timer, 'filter', Filter(app))
+
+        # filter starts, app runs twice for 1s each, filter ends after 5s
+        times = [100.0, 101.0, 102.0, 103.0, 104.0, 105.0]
+        with mock.patch('swift.common.wsgi.time.time', side_effect=times):
+            resp = Request.blank('/v1/a/c/o').get_response(app)
+        self.assertEqual(resp.body, b'ok')
+        self.assertEqual(dict(timer.totals), {
+            ('app', 'object.GET'): [2, 2.0, 2.0],
+            ('filter', 'object.GET'): [1, 5.0, 3.0]})
+        self.assertEqual(logger.log_dict['timing'], [
+            (('pipeline.app.object.GET.timing', 1000.0), {}),
+            (('pipeline.app.object.GET.self.timing', 1000.0), {}),
+            (('pipeline.app.object.GET.timing', 1000.0), {}),
+            (('pipeline.app.object.GET.self.timing', 1000.0), {}),
+            (('pipeline.filter.object.GET.timing', 5000.0), {}),
+            (('pipeline.filter.object.GET.self.timing', 3000.0), {})])
+
+    def test_time_recorded_on_error(self):
+        timer = wsgi.PipelineTimer({}, logger=FakeLogger())
+
+        def broken(env, start_response):
+            raise ValueError('boom')
+
+        app = wsgi._TimedApp(timer, 'broken', broken)
+        with self.assertRaises(ValueError):
+            Request.blank('/v1/a').get_response(app)
+        self.assertEqual(list(timer.totals), [('broken', 'account.GET')])
+        self.assertEqual(timer._local.stack, [])
+
+    def test_duplicate_names(self):
+        timer = wsgi.PipelineTimer({}, logger=FakeLogger())
+        self.assertEqual([timer.add_name(name) for name in (
+            'mw', 'other', 'mw', 'mw')], ['mw', 'other', 'mw-2', 'mw-3'])
+        self.assertEqual(timer.names, ['mw', 'other', 'mw-2', 'mw-3'])
+
+    def test_report(self):
+        timer = wsgi.PipelineTimer({'pipeline_timing_endpoint': 'yes',
+                                    'pipeline_timing_path': '/timing'},
+                                   logger=FakeLogger())
+
+        def inner(env, start_response):
+            start_response('204 No Content', [])
+            return [b'']
+
+        app = wsgi._TimedApp(timer, timer.add_name('app'), inner)
+        Request.blank('/v1/a/c', method='PUT').get_response(app)
+
+        resp = Request.blank('/timing', remote_addr='10.0.0.1').get_response(
+            app)
+        self.assertEqual(resp.status_int, 403)
+
+        resp = Request.blank('/timing', remote_addr='127.0.0.1').get_response(
+            app)
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual(resp.content_type, 'application/json')
+        report = json.loads(resp.body)
+        self.assertEqual(report['pipeline'], ['app'])
+        self.assertEqual(list(report['timings']), ['app'])
+        self.assertEqual(report['timings']['app']['container.PUT']['count'],
+                         1)
+        # the report itself isn't timed
+        self.assertEqual(list(timer.totals), [('app', 'container.PUT')])
+
+    def test_report_not_enabled(self):
+        timer = wsgi.PipelineTimer({'pipeline_timing_path': '/timing'},
+                                   logger=FakeLogger())
+
+        def inner(env, start_response):
+            start_response('404 Not Found', [])
+            return [b'']
+
+        app = wsgi._TimedApp(timer, timer.add_name('app'), inner)
+        # the path is passed down the pipeline like any other
+        resp = Request.blank('/timing', remote_addr='127.0.0.1').get_response(
+            app)
+        self.assertEqual(resp.status_int, 404)
+        self.assertEqual(list(timer.totals), [('app', 'other.GET')])
+
+    def test_loadapp(self):
+        config = """
+        [DEFAULT]
+        swift_dir = TEMPDIR
+
+        [pipeline:main]
+        pipeline = catch_errors healthcheck proxy-server
+
+        [app:proxy-server]
+        use = egg:swift#proxy
+        pipeline_timing = %s
+
+        [filter:catch_errors]
+        use = egg:swift#catch_errors
+
+        [filter:healthcheck]
+        use = egg:swift#healthcheck
+        """
+
+        with temptree(['proxy-server.conf']) as t:
+            conf_file = os.path.join(t, 'proxy-server.conf')
+            _fake_rings(t)
+            with open(conf_file, 'w') as f:
+                f.write(dedent(config % 'no').replace('TEMPDIR', t))
+            app = wsgi.loadapp(conf_file, global_conf={})
+            self.assertIsInstance(
+                app, swift.common.middleware.catch_errors.CatchErrorMiddleware)
+
+            with open(conf_file, 'w') as f:
+                f.write(dedent(config % 'yes').replace('TEMPDIR', t))
+            app = wsgi.loadapp(conf_file, global_conf={})
+
+        self.assertIsInstance(app, wsgi._TimedApp)
+        timer = app.timer
+        self.assertEqual(timer.names, [
+            'catch_errors', 'gatekeeper', 'listing_formats', 'copy', 'dlo',
+            'versioned_writes', 'healthcheck', 'proxy-server'])
+        # each middleware and the app sits behind its own timer
+        layers = []
+        layer = app
+        while isinstance(layer, wsgi._TimedApp):
+            layers.append((layer.name, layer.app.__class__.__module__))
+            layer = getattr(layer.app, 'app', None)
+        self.assertEqual(layers[0], ('catch_errors',
+                                     'swift.common.middleware.catch_errors'))
+        self.assertEqual(layers[-1], ('proxy-server', 'swift.proxy.server'))
+        self.assertEqual([name for name, _ in layers], timer.names)
+        # attributes of the middleware are still reachable
+        self.assertEqual(app.trans_id_suffix, '')
+
+        with mock.patch.object(timer, 'logger', FakeLogger()):
+            resp = Request.blank('/healthcheck').get_response(app)
+        self.assertEqual(resp.body, b'OK')
+        # healthcheck answers without calling the proxy server app
+        self.assertEqual(sorted(timer.totals), sorted(
+            (name, 'other.GET') for name in timer.names[:-1]))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -3919,6 +3919,87 @@ class TestContainerBroker(unittest.TestCase):
         ts_now = Timestamp.now()
         container_name = 'test_container'
 
+    @with_tempdir
+    def test_find_shard_ranges_walks_index_once(self, tempdir):
+        ts_iter = make_timestamp_iter()
+        db_path = os.path.join(tempdir, 'test_container.db')
+        broker = ContainerBroker(db_path, account='a', container='c')
+        broker.initialize(next(ts_iter).internal, 0)
+        for i in range(10):
+            broker.put_object(
+                'obj%02d' % i, next(ts_iter).internal, 0, 'text/plain', 'etag')
+        broker.delete_object('obj05', next(ts_iter).internal)
+
+        orig_get_uppers = ContainerBroker._get_next_shard_range_uppers
+        with mock.patch(
+                'swift.container.backend.ContainerBroker.'
+                '_get_next_shard_range_uppers',
+                side_effect=lambda *args: orig_get_uppers(broker, *args)) \
+                as mock_get_uppers:
+            ranges, last_found = broker.find_shard_ranges(2)
+        # all names are found by a single call
+        self.assertEqual([mock.call(2, 4, ShardRange.MIN)],
+                         mock_get_uppers.call_args_list)
+        self.assertEqual(
+            [('', 'obj01'), ('obj01', 'obj03'), ('obj03', 'obj06'),
+             ('obj06', 'obj08'), ('obj08', '')],
+            [(r['lower'], r['upper']) for r in ranges])
+        self.assertTrue(last_found)
+
+        # the final shard range needs no query
+        self.assertEqual(
+            ['obj01', 'obj03', 'obj06', 'obj08'],
+            broker._get_next_shard_range_uppers(2, 10))
+        self.assertEqual(
+            ['obj03', 'obj06'], broker._get_next_shard_range_uppers(2, 2,
+                                                                    'obj01'))
+        self.assertEqual([], broker._get_next_shard_range_uppers(2, 0))
+
+    @with_tempdir
+    def test_find_shard_ranges_sampled(self, tempdir):
+        ts_iter = make_timestamp_iter()
+        db_path = os.path.join(tempdir, 'test_container.db')
+        broker = ContainerBroker(db_path, account='a', container='c')
+        broker.initialize(next(ts_iter).internal, 0)
+        self.assertEqual(
+            [], broker._get_sampled_shard_range_uppers(5, 10, 0, 10))
+        for i in range(100):
+            broker.put_object(
+                'obj%03d' % i, next(ts_iter).internal, 0, 'text/plain', 'etag')
+            # commit each object so that ROWIDs follow name order
+            broker._commit_puts()
+
+        # every row is sampled
+        ranges, last_found = broker.find_shard_ranges(25, sample_count=100)
+        self.assertEqual(
+            [('', 'obj024', 25), ('obj024', 'obj049', 25),
+             ('obj049', 'obj074', 25), ('obj074', '', 25)],
+            [(r['lower'], r['upper'], r['object_count']) for r in ranges])
+        self.assertTrue(last_found)
+
+        # every fifth row is sampled
+        ranges, last_found = broker.find_shard_ranges(
+            25, limit=2, sample_count=20)
+        self.assertEqual(
+            [('', 'obj020', 25), ('obj020', 'obj045', 25)],
+            [(r['lower'], r['upper'], r['object_count']) for r in ranges])
+        self.assertFalse(last_found)
+        existing = [ShardRange('.shards_a/c-0', Timestamp.now(), '',
+                               'obj020', state=ShardRange.FOUND,
+                               object_count=25)]
+        ranges, last_found = broker.find_shard_ranges(
+            25, existing_ranges=existing, sample_count=20)
+        self.assertEqual(
+            [('obj020', 'obj045', 25), ('obj045', 'obj070', 25),
+             ('obj070', '', 25)],
+            [(r['lower'], r['upper'], r['object_count']) for r in ranges])
+        self.assertTrue(last_found)
+
+        # shard size smaller than the rows between samples
+        self.assertEqual(
+            ['obj000', 'obj005'],
+            broker._get_sampled_shard_range_uppers(2, 2, 100, 20))
+
     @with_tempdir
     def test_find_shard_ranges_errors(self, tempdir):
         ts_iter = make_timestamp_iter()
@@ -3931,7 +4012,7 @@ class TestContainerBroker(unittest.TestCase):
                 'obj%d' % i, next(ts_iter).internal, 0, 'text/plain', 'etag')
 
         klass = 'swift.container.backend.ContainerBroker'
-        with mock.patch(klass + '._get_next_shard_range_upper',
+        with mock.patch(klass + '._get_next_shard_range_uppers',
                         side_effect=LockTimeout()):
             ranges, last_found = broker.find_shard_ranges(1)
         self.assertFalse(ranges)
@@ -3941,7 +4022,7 @@ class TestContainerBroker(unittest.TestCase):
         self.assertFalse(lines[1:])
 
         broker.logger.clear()
-        with mock.patch(klass + '._get_next_shard_range_upper',
+        with mock.patch(klass + '._get_next_shard_range_uppers',
                         side_effect=sqlite3.OperationalError()):
             ranges, last_found = broker.find_shard_ranges(1)
         self.assertFalse(last_found)
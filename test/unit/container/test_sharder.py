@@ -41,7 +41,8 @@ from swift.container.sharder import ContainerSharder, sharding_enabled, \
     CleavingContext, DEFAULT_SHARD_SHRINK_POINT, \
     DEFAULT_SHARD_CONTAINER_THRESHOLD
 from swift.common.utils import ShardRange, Timestamp, hash_path, \
-    encode_timestamps, parse_db_filename, quorum_size, Everything
+    encode_timestamps, parse_db_filename, quorum_size, Everything, \
+    dump_recon_cache, load_recon_cache
 from test import annotate_failure
 
 from test.unit import FakeLogger, debug_logger, FakeRing, \
@@ -141,6 +142,7 @@ class TestSharder(BaseTestSharder):
             'shard_container_threshold': 1000000,
             'split_size': 500000,
             'cleave_batch_size': 2,
+            'cleave_concurrency': 1,
             'scanner_batch_size': 10,
             'rcache': '/var/cache/swift/container.recon',
             'shards_account_prefix': '.shards_',
@@ -167,6 +169,7 @@ class TestSharder(BaseTestSharder):
             'shard_shrink_merge_point': 85,
             'shard_container_threshold': 20000000,
             'cleave_batch_size': 4,
+            'cleave_concurrency': 3,
             'shard_scanner_batch_size': 8,
             'request_tries': 2,
             'internal_client_conf_path': '/etc/swift/my-sharder-ic.conf',
@@ -191,6 +194,7 @@ class TestSharder(BaseTestSharder):
             'shard_container_threshold': 20000000,
             'split_size': 10000000,
             'cleave_batch_size': 4,
+            'cleave_concurrency': 3,
             'scanner_batch_size': 8,
             'rcache': '/var/cache/swift-alt/container.recon',
             'shards_account_prefix': '...shards_',
@@ -467,6 +471,143 @@ class TestSharder(BaseTestSharder):
             check_recon(recon_data[3], sum(fake_periods[5:7]),
                         sum(fake_periods[:7]), fake_stats)
 
+    def _add_local_devices(self, sharder, devices):
+        for i, device in enumerate(devices, len(sharder.ring.devs)):
+            sharder.ring.add_node({
+                'ip': '10.0.0.1', 'replication_ip': '10.0.0.1',
+                'port': sharder.port, 'replication_port': sharder.port,
+                'device': device, 'zone': 0, 'region': 0, 'id': i})
+
+    def test_get_worker_args(self):
+        with self._mock_sharder() as sharder:
+            self.assertEqual([], sharder.get_worker_args())
+
+        with self._mock_sharder({'sharder_workers': 2}) as sharder:
+            self._add_local_devices(sharder, ['sdx', 'sdy', 'sdz'])
+            with mock.patch('swift.container.sharder.whataremyips',
+                            return_value=['10.0.0.1']):
+                self.assertEqual(
+                    [{'override_devices': ['sdx', 'sdz'],
+                      'override_partitions': [],
+                      'multiprocess_worker_index': 0},
+                     {'override_devices': ['sdy'],
+                      'override_partitions': [],
+                      'multiprocess_worker_index': 1}],
+                    sharder.get_worker_args())
+                self.assertEqual({'sdx', 'sdy', 'sdz'},
+                                 sharder.all_local_devices)
+
+                # once mode, with overrides
+                self.assertEqual(
+                    [{'override_devices': ['sdy'],
+                      'override_partitions': [1, 2],
+                      'multiprocess_worker_index': 0}],
+                    sharder.get_worker_args(once=True, devices='sdy,sdq',
+                                            partitions='1,2'))
+                self.assertEqual(1, sharder.sharder_workers)
+
+                self.assertTrue(sharder.is_healthy())
+                self._add_local_devices(sharder, ['sdw'])
+                self.assertFalse(sharder.is_healthy())
+
+    def test_run_once_worker(self):
+        conf = {'recon_cache_path': self.tempdir, 'sharder_workers': 2}
+        with self._mock_sharder(conf) as sharder:
+            logger = sharder.logger
+            with mock.patch.object(
+                    sharder, '_one_shard_cycle') as mock_cycle, \
+                    mock.patch('os.getpid', return_value=8804):
+                sharder.run_once(multiprocess_worker_index=1,
+                                 override_devices=['sdy'],
+                                 override_partitions=[])
+        mock_cycle.assert_called_once_with(devices_to_shard=['sdy'],
+                                           partitions_to_shard=mock.ANY)
+        self.assertIsInstance(
+            mock_cycle.call_args[1]['partitions_to_shard'], Everything)
+        self.assertEqual(1, sharder.multiprocess_worker_index)
+        self.assertEqual(
+            ['[worker 2/2 pid=8804] Begin container sharder "once" mode',
+             '[worker 2/2 pid=8804] Container sharder "once" mode '
+             'completed: 0.00s'],
+            logger.get_lines_for_level('info'))
+
+        sharder._increment_stat('visited', 'attempted')
+        sharder._report_stats()
+        recon = load_recon_cache(sharder.rcache)
+        self.assertNotIn('sharding_stats', recon)
+        self.assertEqual(
+            1, recon['sharding_stats_per_worker']['1']['sharding_stats'][
+                'sharding']['visited']['attempted'])
+
+    def test_aggregate_recon_update(self):
+        conf = {'recon_cache_path': self.tempdir, 'sharder_workers': 2,
+                'recon_candidates_limit': 2}
+        with self._mock_sharder(conf) as sharder:
+            self.assertEqual({}, sharder.aggregate_recon_update())
+
+            def candidate(name, object_count):
+                return {'path': name, 'object_count': object_count}
+
+            worker_stats = [
+                {'sharding_stats': {
+                    'attempted': 1, 'start': 100, 'failure_nodes': {
+                        '10.0.0.1': {'sdx': 1}},
+                    'sharding': {
+                        'visited': {'attempted': 2, 'success': 2},
+                        'cleaved': {'min_time': 0.5, 'max_time': 2},
+                        'sharding_in_progress': {'all': [{'path': 'a'}]},
+                        'sharding_candidates': {
+                            'found': 2,
+                            'top': [candidate('b', 20), candidate('c', 5)]}}},
+                 'sharding_time': 10, 'sharding_last': 200},
+                {'sharding_stats': {
+                    'attempted': 2, 'start': 90, 'failure_nodes': {
+                        '10.0.0.1': {'sdx': 2, 'sdy': 1}},
+                    'sharding': {
+                        'visited': {'attempted': 1, 'failure': 1},
+                        'cleaved': {'min_time': 0, 'max_time': 1},
+                        'sharding_in_progress': {'all': [{'path': 'd'}]},
+                        'sharding_candidates': {
+                            'found': 1,
+                            'top': [candidate('e', 10)]}}},
+                 'sharding_time': 20, 'sharding_last': 150},
+            ]
+            dump_recon_cache({'sharding_stats_per_worker': {
+                '0': worker_stats[0], '2': worker_stats[1]}},
+                sharder.rcache, sharder.logger)
+            # worker 1 has not reported yet; worker 2 no longer exists
+            self.assertEqual(
+                {'sharding_stats_per_worker': {'2': {}}},
+                sharder.aggregate_recon_update())
+
+            dump_recon_cache({'sharding_stats_per_worker': {
+                '1': worker_stats[1], '2': {}}},
+                sharder.rcache, sharder.logger)
+            self.assertEqual({
+                'sharding_stats': {
+                    'attempted': 3, 'start': 90, 'failure_nodes': {
+                        '10.0.0.1': {'sdx': 3, 'sdy': 1}},
+                    'sharding': {
+                        'visited': {'attempted': 3, 'success': 2,
+                                    'failure': 1},
+                        'cleaved': {'min_time': 0.5, 'max_time': 2},
+                        'sharding_in_progress': {
+                            'all': [{'path': 'a'}, {'path': 'd'}]},
+                        'sharding_candidates': {
+                            'found': 3,
+                            'top': [candidate('b', 20),
+                                    candidate('e', 10)]}}},
+                'sharding_time': 20, 'sharding_last': 150},
+                sharder.aggregate_recon_update())
+
+            with mock.patch('swift.container.sharder.time.time',
+                            return_value=time.time() + 3600), \
+                    mock.patch.object(sharder, '_get_local_devices',
+                                      return_value=set()):
+                self.assertTrue(sharder.is_healthy())
+            self.assertEqual(20, load_recon_cache(sharder.rcache)[
+                'sharding_time'])
+
     def test_one_shard_cycle(self):
         conf = {'recon_cache_path': self.tempdir,
                 'devices': self.tempdir,
@@ -1214,6 +1355,112 @@ class TestSharder(BaseTestSharder):
         # get_objects() for each shard range, to check the marker moves on
         self._check_cleave_root(conf={'cleave_row_batch_size': 1})
 
+    def test_cleave_root_concurrent(self):
+        broker = self._make_broker()
+        objects = [
+            # shard 0
+            ('a', self.ts_encoded(), 10, 'text/plain', 'etag_a', 0, 0),
+            ('here', self.ts_encoded(), 10, 'text/plain', 'etag_here', 0, 0),
+            # shard 1
+            ('m', self.ts_encoded(), 1, 'text/plain', 'etag_m', 0, 0),
+            ('n', self.ts_encoded(), 2, 'text/plain', 'etag_n', 0, 0),
+            ('o', self.ts_encoded(), 0, '', '', 1, 0),  # deleted
+            ('there', self.ts_encoded(), 3, 'text/plain', 'etag_there', 0, 0),
+            # shard 2
+            ('where', self.ts_encoded(), 100, 'text/plain', 'etag_where', 0,
+             0),
+            # shard 3
+            ('x', self.ts_encoded(), 0, '', '', 1, 0),  # deleted
+            ('y', self.ts_encoded(), 1000, 'text/plain', 'etag_y', 0, 0),
+            # shard 4
+            ('yyyy', self.ts_encoded(), 14, 'text/plain', 'etag_yyyy', 0, 0),
+        ]
+        for obj in objects:
+            broker.put_object(*obj)
+        broker.enable_sharding(Timestamp.now())
+
+        shard_bounds = (('', 'here'), ('here', 'there'),
+                        ('there', 'where'), ('where', 'yonder'),
+                        ('yonder', ''))
+        shard_ranges = self._make_shard_ranges(
+            shard_bounds, state=ShardRange.CREATED)
+        expected_shard_dbs = []
+        for shard_range in shard_ranges:
+            db_hash = hash_path(shard_range.account, shard_range.container)
+            expected_shard_dbs.append(
+                os.path.join(self.tempdir, 'sda', 'containers', '0',
+                             db_hash[-3:], db_hash, db_hash + '.db'))
+        broker.merge_shard_ranges(shard_ranges[:4])
+        self.assertTrue(broker.set_sharding_state())
+
+        # replication of the second shard db fails so the cursor only moves
+        # past the first shard range, although all of the batch are cleaved
+        conf = {'cleave_batch_size': 4, 'cleave_concurrency': 4}
+        with self._mock_sharder(conf=conf) as sharder:
+            sharder._replicate_object = mock.MagicMock(side_effect=[
+                (True, [True] * 3), (False, [False] * 3),
+                (True, [True] * 3), (True, [True] * 3)])
+            with mock.patch.object(
+                    sharder, 'yield_objects',
+                    side_effect=sharder.yield_objects) as mock_yield:
+                self.assertFalse(sharder._cleave(broker))
+        # the retiring db is read once for each shard range
+        self.assertEqual(
+            [(lower, upper) for lower, upper in shard_bounds[:4]],
+            [(call[0][1].lower_str, call[0][1].upper_str)
+             for call in mock_yield.call_args_list])
+        sharder._replicate_object.assert_has_calls(
+            [mock.call(0, db, 0) for db in expected_shard_dbs[:4]])
+        expected = {'attempted': 4, 'success': 1, 'failure': 1}
+        self._assert_stats(expected, sharder, 'cleaved')
+        self._check_objects(objects[:2], expected_shard_dbs[0])
+        # deleted rows are cleaved into every shard range of the batch
+        self._check_objects(objects[2:6], expected_shard_dbs[1])
+        self._check_objects(objects[6:7], expected_shard_dbs[2])
+        self._check_objects(objects[7:9], expected_shard_dbs[3])
+        self.assertFalse(os.path.exists(expected_shard_dbs[4]))
+        updated_shard_ranges = broker.get_shard_ranges()
+        self.assertEqual(
+            [ShardRange.CLEAVED] + [ShardRange.CREATED] * 3,
+            [sr.state for sr in updated_shard_ranges])
+        context = CleavingContext.load(broker)
+        self.assertFalse(context.cleaving_done)
+        self.assertEqual('here', context.cursor)
+        self.assertEqual(1, context.ranges_done)
+        self.assertEqual(3, context.ranges_todo)
+
+        # shard dbs are in sync, so the retiring db is not read again
+        with self._mock_sharder(conf=conf) as sharder:
+            with mock.patch.object(
+                    sharder, 'yield_objects',
+                    side_effect=sharder.yield_objects) as mock_yield:
+                self.assertFalse(sharder._cleave(broker))
+        mock_yield.assert_not_called()
+        sharder._replicate_object.assert_has_calls(
+            [mock.call(0, db, 0) for db in expected_shard_dbs[1:4]])
+        expected = {'attempted': 3, 'success': 3, 'failure': 0}
+        self._assert_stats(expected, sharder, 'cleaved')
+        updated_shard_ranges = broker.get_shard_ranges()
+        self.assertEqual(
+            [ShardRange.CLEAVED] * 4,
+            [sr.state for sr in updated_shard_ranges])
+        self.assertEqual([2, 3, 1, 1],
+                         [sr.object_count for sr in updated_shard_ranges])
+        context = CleavingContext.load(broker)
+        self.assertFalse(context.cleaving_done)
+        self.assertEqual('yonder', context.cursor)
+        self.assertEqual(4, context.ranges_done)
+        self.assertEqual(0, context.ranges_todo)
+
+        # final shard range
+        broker.merge_shard_ranges(shard_ranges[4:])
+        with self._mock_sharder(conf=conf) as sharder:
+            self.assertTrue(sharder._cleave(broker))
+        self._check_objects(objects[9:], expected_shard_dbs[4])
+        context = CleavingContext.load(broker)
+        self.assertTrue(context.cleaving_done)
+        self.assertEqual(5, context.ranges_done)
+
     def test_cleave_root_ranges_change(self):
         # verify that objects are not missed if shard ranges change between
         # cleaving batches
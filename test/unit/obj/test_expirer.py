@@ -20,13 +20,17 @@ from tempfile import mkdtemp
 from shutil import rmtree
 from collections import defaultdict
 from copy import deepcopy
+import json
+import os
 
 import mock
 import six
 from six.moves import urllib
 
 from swift.common import internal_client, utils, swob
+from swift.common.db_replicator import ReplicatorRpc
 from swift.common.utils import Timestamp
+from swift.container.backend import ContainerBroker
 from swift.obj import expirer
 
 
@@ -588,6 +592,118 @@ class TestObjectExpirer(TestCase):
                 task_account_container_list, my_index, divisor)),
             expected)
 
+    def test_iter_task_to_expire_partition_by_container(self):
+        self.conf['partition_by_container'] = 'true'
+        x = expirer.ObjectExpirer(self.conf, logger=self.logger,
+                                  swift=self.fake_swift)
+        task_account_container_list = [('.expiring_objects', self.past_time)]
+        expected = [
+            self.make_task(self.past_time, target_path)
+            for target_path in self.expired_target_path_list]
+
+        # tasks are not re-hashed; the whole container belongs to whichever
+        # process it was assigned to
+        for my_index in range(3):
+            self.assertEqual(
+                list(x.iter_task_to_expire(
+                    task_account_container_list, my_index, 3)),
+                expected)
+
+        containers = ['%010d' % (int(self.past_time) - i) for i in range(100)]
+        assigned = defaultdict(list)
+        for my_index in range(3):
+            for c in containers:
+                if x.is_assigned_task_container(c, my_index, 3):
+                    assigned[c].append(my_index)
+        # every task container is assigned to exactly one process
+        self.assertEqual(sorted(assigned), sorted(containers))
+        self.assertEqual(
+            [c for c, indexes in assigned.items() if len(indexes) != 1], [])
+
+    def test_run_once_partition_by_container(self):
+        fake_swift = FakeInternalClient({
+            '.expiring_objects': {
+                '%010d' % (int(self.past_time) - i): [
+                    '%s-a/c/o%d' % (self.past_time, i)]
+                for i in range(10)}
+        })
+        self.conf['partition_by_container'] = 'true'
+        self.conf['processes'] = 2
+        deleted = defaultdict(list)
+        for process in range(2):
+            self.conf['process'] = process
+            x = expirer.ObjectExpirer(self.conf, logger=self.logger,
+                                      swift=fake_swift)
+            with mock.patch.object(x, 'delete_actual_object'), \
+                    mock.patch.object(x, 'pop_queue') as mock_pop, \
+                    mock.patch.object(fake_swift, 'iter_objects',
+                                      side_effect=fake_swift.iter_objects) \
+                    as mock_iter:
+                x.run_once()
+            # a process only lists the containers it pops tasks from
+            self.assertEqual(
+                sorted(c[0][1] for c in mock_iter.call_args_list),
+                sorted(set(c[0][1] for c in mock_pop.call_args_list)))
+            for call in mock_pop.call_args_list:
+                deleted[call[0][2]].append(process)
+        self.assertEqual(sorted(deleted), sorted(
+            '%s-a/c/o%d' % (self.past_time, i) for i in range(10)))
+        self.assertEqual(
+            [o for o, processes in deleted.items() if len(processes) != 1],
+            [])
+
+    def test_iter_task_objects_direct(self):
+        self.conf['direct_listing'] = 'true'
+        x = expirer.ObjectExpirer(self.conf, logger=self.logger,
+                                  swift=self.fake_swift)
+        listing = [{'name': self.past_time + '-a%d/c/o' % i}
+                   for i in range(3)]
+        pages = [listing[:2], listing[2:], []]
+        calls = []
+
+        def fake_direct_get_container(node, part, account, container,
+                                      **kwargs):
+            calls.append((node, account, container, kwargs))
+            if len(calls) == 2:
+                raise Exception('boom')
+            return {}, pages.pop(0)
+
+        now = float(self.past_time) + 10
+        with mock.patch('swift.obj.expirer.direct_get_container',
+                        fake_direct_get_container), \
+                mock.patch('swift.obj.expirer.time', return_value=now):
+            self.assertEqual(
+                list(x.iter_task_objects('.expiring_objects',
+                                         self.past_time)),
+                listing)
+
+        self.assertEqual(4, len(calls))
+        # the listing resumes from the marker on the next primary
+        self.assertEqual([''] + [listing[1]['name']] * 2 + [
+            listing[2]['name']], [c[3]['marker'] for c in calls])
+        self.assertNotEqual(calls[1][0], calls[2][0])
+        self.assertEqual(calls[2][0], calls[3][0])
+        for _node, account, container, kwargs in calls:
+            self.assertEqual('.expiring_objects', account)
+            self.assertEqual(self.past_time, container)
+            self.assertEqual('%010d' % (int(self.past_time) + 11),
+                             kwargs['end_marker'])
+        warnings = x.logger.get_lines_for_level('warning')
+        self.assertEqual(1, len(warnings))
+        self.assertIn('Failed to list task container', warnings[0])
+
+    def test_iter_task_objects_direct_all_nodes_fail(self):
+        self.conf['direct_listing'] = 'true'
+        x = expirer.ObjectExpirer(self.conf, logger=self.logger,
+                                  swift=self.fake_swift)
+        with mocked_http_conn(503, 503, 503):
+            self.assertEqual([], list(x.iter_task_to_expire(
+                [('.expiring_objects', self.past_time)], 0, 1)))
+        self.assertEqual(3, len(x.logger.get_lines_for_level('warning')))
+        self.assertEqual(
+            ['Unable to list task container .expiring_objects/%s' %
+             self.past_time], x.logger.get_lines_for_level('error'))
+
     def test_run_once_unicode_problem(self):
         requests = []
 
@@ -881,6 +997,171 @@ class TestObjectExpirer(TestCase):
             self.assertEqual(container, 'c')
             self.assertEqual(obj, 'o')
 
+    def test_init_pop_batch_size_too_small(self):
+        conf = {'pop_batch_size': 0}
+        with self.assertRaises(ValueError):
+            expirer.ObjectExpirer(conf, swift=self.fake_swift)
+
+    def test_run_once_batches_pops(self):
+        self.conf['pop_batch_size'] = 4
+        x = expirer.ObjectExpirer(self.conf, logger=self.logger,
+                                  swift=self.fake_swift)
+        with mock.patch.object(x, 'delete_actual_object'), \
+                mock.patch.object(x, 'pop_queue') as mock_pop, \
+                mock.patch.object(x, 'pop_queue_batch') as mock_batch:
+            x.run_once()
+
+        self.assertFalse(mock_pop.called)
+        # 10 expired tasks in one task container: two full batches and the
+        # remainder flushed at the end of the pass
+        self.assertEqual([4, 4, 2], [len(c[0][2])
+                                     for c in mock_batch.call_args_list])
+        popped = []
+        for call in mock_batch.call_args_list:
+            self.assertEqual(('.expiring_objects', self.past_time),
+                             call[0][:2])
+            popped.extend(call[0][2])
+        self.assertEqual(
+            sorted(self.past_time + '-' + path
+                   for path in self.expired_target_path_list),
+            sorted(popped))
+        self.assertFalse(x.pending_pops)
+        self.assertEqual(
+            'Pass completed in 0s; 10 objects expired',
+            x.logger.get_lines_for_level('info')[-1])
+
+    def test_run_once_batch_pops_only_successful_deletes(self):
+        self.conf['pop_batch_size'] = 100
+
+        def fail_some(actual_obj, timestamp):
+            if actual_obj.startswith('a1/'):
+                raise Exception('failed to delete actual object')
+
+        x = expirer.ObjectExpirer(self.conf, logger=self.logger,
+                                  swift=self.fake_swift)
+        with mock.patch.object(x, 'delete_actual_object', fail_some), \
+                mock.patch.object(x, 'pop_queue_batch') as mock_batch:
+            x.run_once()
+        self.assertEqual(1, len(mock_batch.call_args_list))
+        popped = mock_batch.call_args_list[0][0][2]
+        self.assertEqual(9, len(popped))
+        self.assertNotIn(self.past_time + '-a1/c1/o1', popped)
+
+    def test_pop_queue_batch(self):
+        broker = ContainerBroker(
+            os.path.join(self.rcache, 'queue.db'),
+            account='.expiring_objects', container=self.past_time)
+        broker.initialize(Timestamp.now().internal, 0)
+        names = [self.past_time + '-a/c/o%d' % i for i in range(5)]
+        for name in names:
+            broker.put_object(name, Timestamp.now().internal, 0,
+                              'text/plain', 'd41d8cd98f00b204e9800998ecf8427e')
+        rpc = ReplicatorRpc(self.rcache, 'containers', ContainerBroker, False)
+        requests = []
+
+        class FakeReplConnection(object):
+            def __init__(self, node, part, hsh, logger):
+                self.node = node
+                self.path = (node['device'], part, hsh)
+
+            def replicate(self, *args):
+                requests.append((self.node, self.path, args))
+                op, items, source = args
+                # round trip through json like a real REPLICATE request
+                items = json.loads(json.dumps(items))
+                resp = getattr(rpc, op)(broker, [items, source])
+                return mock.MagicMock(status=resp.status_int)
+
+        x = expirer.ObjectExpirer(self.conf, logger=self.logger,
+                                  swift=self.fake_swift)
+        with mock.patch('swift.obj.expirer.ReplConnection',
+                        FakeReplConnection):
+            x.pop_queue_batch('.expiring_objects', self.past_time, names[:3])
+
+        # one request to each primary
+        self.assertEqual(3, len(requests))
+        part, nodes = self.fake_swift.container_ring.get_nodes(
+            '.expiring_objects', self.past_time)
+        self.assertEqual(sorted(n['id'] for n in nodes),
+                         sorted(r[0]['id'] for r in requests))
+        hsh = utils.hash_path('.expiring_objects', self.past_time)
+        for node, path, args in requests:
+            self.assertEqual((node['device'], part, hsh), path)
+            self.assertEqual('merge_items', args[0])
+        self.assertEqual(names[3:],
+                         [o[0] for o in broker.list_objects_iter(
+                             10, '', None, None, None)])
+        self.assertFalse(x.logger.get_lines_for_level('error'))
+        self.assertFalse(x.logger.get_lines_for_level('warning'))
+
+    def test_pop_queue_batch_errors(self):
+        x = expirer.ObjectExpirer(self.conf, logger=self.logger,
+                                  swift=self.fake_swift)
+        statuses = [202, 404, 507]
+        nodes = []
+
+        class FakeReplConnection(object):
+            def __init__(self, node, part, hsh, logger):
+                nodes.append(node)
+
+            def replicate(self, *args):
+                return mock.MagicMock(status=statuses.pop(0))
+
+        name = self.past_time + '-a/c/o'
+        with mock.patch('swift.obj.expirer.ReplConnection',
+                        FakeReplConnection), \
+                mock.patch('swift.obj.expirer.'
+                           'direct_delete_container_object') as mock_delete:
+            x.pop_queue_batch('.expiring_objects', self.past_time, [name])
+        self.assertFalse(statuses)
+        # a missing db is not worth a warning, or a DELETE
+        warnings = x.logger.get_lines_for_level('warning')
+        self.assertEqual(1, len(warnings))
+        self.assertIn('Unexpected response 507', warnings[0])
+        # the server that failed the REPLICATE gets a DELETE instead
+        part, _nodes = self.fake_swift.container_ring.get_nodes(
+            '.expiring_objects', self.past_time)
+        self.assertEqual(1, len(mock_delete.call_args_list))
+        args, kwargs = mock_delete.call_args
+        self.assertEqual((nodes[2], part, '.expiring_objects',
+                          self.past_time, name), args)
+        self.assertIn('X-Timestamp', kwargs['headers'])
+        self.assertFalse(x.logger.get_lines_for_level('error'))
+
+        # the replication network can't be reached at all
+        x.logger.clear()
+        with mock.patch('swift.obj.expirer.ReplConnection',
+                        side_effect=Exception('kaboom')), \
+                mock.patch('swift.obj.expirer.'
+                           'direct_delete_container_object') as mock_delete:
+            x.pop_queue_batch('.expiring_objects', self.past_time,
+                              [name, name + '2'])
+        errors = x.logger.get_lines_for_level('error')
+        self.assertEqual(3, len(errors))
+        self.assertIn('kaboom', errors[0])
+        self.assertEqual(6, len(mock_delete.call_args_list))
+        self.assertEqual(
+            sorted([name, name + '2'] * 3),
+            sorted(call[0][4] for call in mock_delete.call_args_list))
+        # all with the same timestamp
+        self.assertEqual(1, len(set(
+            call[1]['headers']['X-Timestamp']
+            for call in mock_delete.call_args_list)))
+
+        # and the DELETEs fail too
+        x.logger.clear()
+        with mock.patch('swift.obj.expirer.ReplConnection',
+                        side_effect=Exception('kaboom')), \
+                mock.patch('swift.obj.expirer.'
+                           'direct_delete_container_object',
+                           side_effect=[None, Exception('ouch')] * 3):
+            x.pop_queue_batch('.expiring_objects', self.past_time,
+                              [name, name + '2'])
+        errors = x.logger.get_lines_for_level('error')
+        self.assertEqual(6, len(errors))
+        failed = [e for e in errors if 'ouch' in e]
+        self.assertEqual(3, len(failed))
+        self.assertIn('Failed to delete 1 of 2 queue entries', failed[0])
 
 if __name__ == '__main__':
     main()
@@ -24,7 +24,9 @@ import six
 from swift.proxy.controllers.base import headers_to_container_info, \
     headers_to_account_info, headers_to_object_info, get_container_info, \
     get_cache_key, get_account_info, get_info, get_object_info, \
-    Controller, GetOrHeadHandler, bytes_to_skip
+    Controller, GetOrHeadHandler, bytes_to_skip, close_swift_conn, \
+    backend_http_connect
+from swift.common.bufferedhttp import BufferedHTTPConnection
 from swift.common.swob import Request, HTTPException, RESPONSE_REASONS
 from swift.common import exceptions
 from swift.common.utils import split_path, ShardRange, Timestamp
@@ -734,6 +736,39 @@ class TestFuncs(unittest.TestCase):
         self.assertEqual(resp.status, '404 Not Found')
         self.assertEqual(resp.body, b'Custom body')
 
+    def test_backend_http_connect(self):
+        with mock.patch('swift.proxy.controllers.base.http_connect') as \
+                mock_connect:
+            backend_http_connect(self.app, '1.2.3.4', 6200, 'sda', 1, 'GET',
+                                 '/a/c', headers={})
+            self.app.backend_pool = pool = mock.Mock()
+            backend_http_connect(self.app, '1.2.3.4', 6200, 'sda', 1, 'GET',
+                                 '/a/c', headers={})
+        self.assertEqual(mock_connect.mock_calls, [
+            mock.call('1.2.3.4', 6200, 'sda', 1, 'GET', '/a/c', headers={}),
+            mock.call('1.2.3.4', 6200, 'sda', 1, 'GET', '/a/c', headers={},
+                      pool=pool)])
+
+    def test_close_swift_conn(self):
+        conn = BufferedHTTPConnection('127.0.0.1:6200')
+        src = mock.Mock(swift_conn=conn)
+        close_swift_conn(src)
+        src.nuke_from_orbit.assert_called_once_with()
+        self.assertIs(src.swift_conn, conn)
+
+        conn.pool = mock.Mock()
+        conn.pool.release.return_value = False
+        src = mock.Mock(swift_conn=conn)
+        close_swift_conn(src)
+        conn.pool.release.assert_called_once_with(conn, src)
+        src.nuke_from_orbit.assert_called_once_with()
+
+        conn.pool.release.return_value = True
+        src = mock.Mock(swift_conn=conn)
+        close_swift_conn(src)
+        self.assertFalse(src.nuke_from_orbit.called)
+        self.assertIsNone(src.swift_conn)
+
     def test_range_fast_forward(self):
         req = Request.blank('/')
         handler = GetOrHeadHandler(None, req, None, None, None, None, {})
@@ -577,6 +577,22 @@ class TestProxyServerConfiguration(unittest.TestCase):
         self.assertEqual(app.node_timeout, 3.5)
         self.assertEqual(app.recoverable_node_timeout, 1.5)
 
+    def test_backend_pool(self):
+        app = self._make_app({})
+        self.assertIsNone(app.backend_pool)
+
+        app = self._make_app({'backend_pool_max_idle': '5'})
+        self.assertEqual(app.backend_pool.max_idle, 5)
+        self.assertEqual(app.backend_pool.max_idle_time, 10)
+        self.assertEqual(app.backend_pool.max_age, 300)
+        self.assertIs(app.backend_pool.logger, app.logger)
+
+        app = self._make_app({'backend_pool_max_idle': '5',
+                              'backend_pool_max_idle_time': '2.5',
+                              'backend_pool_max_age': '60'})
+        self.assertEqual(app.backend_pool.max_idle_time, 2.5)
+        self.assertEqual(app.backend_pool.max_age, 60)
+
     def test_cors_options(self):
         # check defaults
         app = self._make_app({})